@@ -1,17 +1,31 @@
 import json
-import boto3
 import os
 import logging
+from dalscooter_runtime import clients
+from dalscooter_runtime.user_emails import EmailCache
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-sns = boto3.client('sns')
-cognito = boto3.client('cognito-idp')
+sns = clients.client('sns')
+cognito = clients.client('cognito-idp')
 
 TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
 USER_POOL_ID = os.environ['USER_POOL_ID']
 
+users_table = clients.table(os.environ['DYNAMODB_TABLE'])
+user_emails = EmailCache(cognito, USER_POOL_ID)
+
+def user_email(user_id):
+    """
+    The email stored at registration, or for users registered before it
+    was, the one in Cognito through the container's cache
+    """
+    item = users_table.get_item(Key={'userId': user_id}, ProjectionExpression='email').get('Item')
+    if item and item.get('email'):
+        return item['email']
+    return user_emails.get(user_id)
+
 def handler(event, context):
     try:
         logger.info("Received event:")
@@ -22,14 +36,8 @@ def handler(event, context):
         if not user_id:
             raise ValueError("Missing userId (Cognito sub) in event payload.")
 
-        # Fetching user's email from Cognito
         logger.info(f"Fetching email for Cognito userId: {user_id}")
-        user = cognito.admin_get_user(
-            UserPoolId=USER_POOL_ID,
-            Username=user_id
-        )
-
-        email_attr = next((attr['Value'] for attr in user['UserAttributes'] if attr['Name'] == 'email'), None)
+        email_attr = user_email(user_id)
         if not email_attr:
             raise ValueError("Email attribute not found for the user in Cognito.")
 
@@ -1,15 +1,15 @@
 import random
-import boto3
 import os
 import logging
 import json
+from dalscooter_runtime import clients
 
-dynamodb = boto3.client('dynamodb')
+dynamodb = clients.client('dynamodb')
 table_name = os.environ['DYNAMODB_TABLE']
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-lambda_client = boto3.client('lambda')
+lambda_client = clients.client('lambda')
 
 def lambda_handler(event, context):
     logger.info("=== Event Received ===")
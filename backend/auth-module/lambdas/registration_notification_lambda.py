@@ -1,12 +1,12 @@
 import json
-import boto3
 import os
 import logging
+from dalscooter_runtime import clients
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-sns = boto3.client('sns')
+sns = clients.client('sns')
 TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
 
 def handler(event, context):
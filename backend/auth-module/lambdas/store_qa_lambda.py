@@ -1,18 +1,17 @@
 import json
-import boto3
 import os
 import logging
+from dalscooter_runtime import clients
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['DYNAMODB_TABLE'])
+table = clients.table(os.environ['DYNAMODB_TABLE'])
 
-sqs = boto3.client('sqs')
+sqs = clients.client('sqs')
 QUEUE_URL = os.environ.get("REGISTRATION_QUEUE_URL")
 
-sns = boto3.client('sns')
+sns = clients.client('sns')
 SNS_TOPIC_ARN = os.environ.get("SNS_TOPIC_ARN")
 
 def handler(event, context):
@@ -28,13 +27,17 @@ def handler(event, context):
         answer = body['answer']
         email = body['email']
 
-        # Store Q&A in DynamoDB
+        # Store Q&A in DynamoDB, with the email so the login notification
+        # does not have to ask Cognito for it
         logger.info(f"Storing in DynamoDB for userId: {user_id}")
-        table.put_item(Item={
+        item = {
             'userId': user_id,
             'securityQuestion': question,
             'securityAnswer': answer
-        })
+        }
+        if email:
+            item['email'] = email
+        table.put_item(Item=item)
 
         # Subscribe email to SNS topic
         if SNS_TOPIC_ARN and email:
@@ -119,6 +119,7 @@ resource "aws_lambda_function" "custom_auth_lambda" {
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
   handler       = "question_answer_lambda.lambda_handler"
   runtime       = "python3.9"
+  layers        = [var.runtime_layer_arn]
   timeout       = 30
 
   environment {
@@ -155,6 +156,7 @@ resource "aws_lambda_function" "registration_notification_lambda" {
   filename      = data.archive_file.registration_notification_lambda_zip.output_path
   handler       = "registration_notification_lambda.handler"
   runtime       = "python3.11"
+  layers        = [var.runtime_layer_arn]
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
 
   environment {
@@ -169,12 +171,14 @@ resource "aws_lambda_function" "login_notification_lambda" {
   filename      = data.archive_file.login_notification_lambda_zip.output_path
   handler       = "login_notification_lambda.handler"
   runtime       = "python3.11"
+  layers        = [var.runtime_layer_arn]
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
 
   environment {
     variables = {
-      SNS_TOPIC_ARN = aws_sns_topic.authentication_sns_topic.arn
-      USER_POOL_ID  = aws_cognito_user_pool.dalscooter_user_pool.id
+      SNS_TOPIC_ARN  = aws_sns_topic.authentication_sns_topic.arn
+      USER_POOL_ID   = aws_cognito_user_pool.dalscooter_user_pool.id
+      DYNAMODB_TABLE = aws_dynamodb_table.dalscooter_users.name
     }
   }
 }
@@ -229,6 +233,7 @@ resource "aws_lambda_function" "store_qa_lambda" {
   filename      = data.archive_file.store_qa_lambda_zip.output_path
   handler       = "store_qa_lambda.handler"
   runtime       = "python3.9"
+  layers        = [var.runtime_layer_arn]
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
 
   environment {
@@ -2,4 +2,9 @@ variable "aws_region" {
   description = "AWS region for deployment"
   type        = string
   default     = "us-east-1"
-}
\ No newline at end of file
+}
+
+variable "runtime_layer_arn" {
+  description = "ARN of the shared DALScooter runtime layer"
+  type        = string
+}
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the DALScooter backend, run against the local AWS stand-ins in
+``local_aws``. Run them from the ``backend`` directory with
+``python -m benchmarks.<name>``.
+"""
@@ -0,0 +1,178 @@
+"""
+Latency benchmark for ``GET /availability``.
+
+Seeds a fleet of bikes with bookings spread over the coming days, and the
+hourly slot locks each booking holds, then times ``get_availability_lambda``
+for random windows against the local DynamoDB stand-in at several
+worker-pool sizes. Every response is checked against a brute-force scan of
+the bookings table.
+
+    cd backend
+    python -m benchmarks.availability_search --bikes 2000 --latency-ms 4
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from local_aws import LocalAWS
+from local_aws.aws import LAYER_PATHS
+from local_aws.events import http_event
+from local_aws.schemas import BIKE_INVENTORY_TABLE, BOOKING_SLOTS_TABLE, BOOKINGS_TABLE, create_tables
+
+from .common import print_table, quiet_handler_logs, summarize_latencies
+
+HANDLER = 'booking-module/lambdas/get_availability_lambda.py'
+BUDGET_MS = 150
+TYPES = ('eBike', 'Gyroscooter', 'Segway')
+
+
+def _iso(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def _batch_put(client, table, items):
+    for i in range(0, len(items), 25):
+        client.batch_write_item(RequestItems={
+            table: [{'PutRequest': {'Item': item}} for item in items[i:i + 25]]
+        })
+
+
+def seed(client, bikes, bookings_per_bike, types, rng, day):
+    from booking_runtime.slots import claim_slots
+
+    bike_items = []
+    booking_items = []
+    # Seeded bookings may overlap; an hour is locked once, as it would be
+    slot_items = {}
+    for i in range(bikes):
+        bike_id = f'bike-{i:05d}'
+        bike_items.append({
+            'bikeId': {'S': bike_id},
+            'model': {'S': 'Xiaomi M365'},
+            'type': {'S': TYPES[i % types]},
+            'hourlyRate': {'N': str(rng.choice((4, 5, 6, 7.5, 9)))},
+            'batteryLife': {'S': '80%'},
+            'discount': {'S': ''}
+        })
+        for j in range(bookings_per_bike):
+            start = day + timedelta(hours=rng.randrange(72), minutes=rng.choice((0, 30)))
+            end = start + timedelta(hours=rng.choice((1, 2, 3, 5)))
+            booking_items.append({
+                'bookingId': {'S': f'{bike_id}-{j}'},
+                'userId': {'S': f'user-{rng.randrange(500)}'},
+                'bikeId': {'S': bike_id},
+                'startDate': {'S': _iso(start)},
+                'endDate': {'S': _iso(end)},
+                'status': {'S': rng.choice(('active', 'active', 'active', 'cancelled'))},
+                'bookingDate': {'S': _iso(start).split('T')[0]}
+            })
+            if booking_items[-1]['status']['S'] != 'cancelled':
+                for entry in claim_slots(BOOKING_SLOTS_TABLE['TableName'], bike_id, f'{bike_id}-{j}', start, end):
+                    slot_items.setdefault(entry['Put']['Item']['slotId']['S'], entry['Put']['Item'])
+    _batch_put(client, BIKE_INVENTORY_TABLE['TableName'], bike_items)
+    _batch_put(client, BOOKINGS_TABLE['TableName'], booking_items)
+    _batch_put(client, BOOKING_SLOTS_TABLE['TableName'], list(slot_items.values()))
+    return bike_items, booking_items
+
+
+def expected_free(bike_items, booking_items, bike_type, start, end):
+    """Free bikes by brute force, at the same hourly granularity as the slot locks."""
+    from booking_runtime.slots import slot_hours
+
+    window = set(slot_hours(start, end))
+    busy = set()
+    for booking in booking_items:
+        if booking['status']['S'] == 'cancelled':
+            continue
+        if window & set(slot_hours(booking['startDate']['S'], booking['endDate']['S'])):
+            busy.add(booking['bikeId']['S'])
+    return {
+        bike['bikeId']['S'] for bike in bike_items
+        if bike['type']['S'] == bike_type and bike['bikeId']['S'] not in busy
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bikes', type=int, default=2000, help='fleet size')
+    parser.add_argument('--types', type=int, default=1, choices=(1, 2, 3),
+                        help='bike types in the fleet; 1 makes every bike a candidate')
+    parser.add_argument('--bookings-per-bike', type=int, default=4)
+    parser.add_argument('--searches', type=int, default=20, help='timed searches per pool size')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 25], help='AVAILABILITY_WORKERS values to compare')
+    parser.add_argument('--latency-ms', type=float, default=4.0, help='simulated DynamoDB round-trip')
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    day = (datetime.now(timezone.utc) + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    for layer_path in LAYER_PATHS:
+        sys.path.insert(0, str(layer_path))
+
+    aws = LocalAWS()
+    create_tables(aws.dynamodb, (BOOKINGS_TABLE, BOOKING_SLOTS_TABLE, BIKE_INVENTORY_TABLE))
+    bike_items, booking_items = seed(aws.dynamodb, args.bikes, args.bookings_per_bike, args.types, rng, day)
+    aws.dynamodb.latency = args.latency_ms / 1000.0
+
+    searches = []
+    for _ in range(args.searches):
+        start = day + timedelta(hours=rng.randrange(1, 70))
+        end = start + timedelta(hours=rng.choice((1, 2, 4)))
+        searches.append((TYPES[0], start, end))
+
+    results = []
+    mismatches = 0
+    for workers in args.workers:
+        handler = aws.load_handler(HANDLER, {
+            'SLOTS_TABLE': BOOKING_SLOTS_TABLE['TableName'],
+            'BIKE_INVENTORY_TABLE': BIKE_INVENTORY_TABLE['TableName'],
+            'AVAILABILITY_WORKERS': str(workers),
+        })
+        quiet_handler_logs()
+
+        latencies = []
+        free_counts = []
+        for bike_type, start, end in searches:
+            event = http_event('GET', '/availability', query={'type': bike_type, 'start': _iso(start), 'end': _iso(end)})
+            started = time.perf_counter()
+            response = handler.lambda_handler(event, None)
+            latencies.append(time.perf_counter() - started)
+
+            body = json.loads(response['body'])
+            free = [bike['bikeId'] for bike in body.get('bikes', [])]
+            rates = [bike['hourlyRate'] for bike in body.get('bikes', [])]
+            free_counts.append(len(free))
+            if (response['statusCode'] != 200 or rates != sorted(rates)
+                    or set(free) != expected_free(bike_items, booking_items, bike_type, start, end)):
+                mismatches += 1
+        handler.executor.shutdown()
+
+        summary = summarize_latencies(latencies)
+        results.append({
+            'workers': workers,
+            'candidates': body['checked'],
+            'free_avg': sum(free_counts) / len(free_counts),
+            **{f'{key}_ms': value for key, value in summary.items()},
+        })
+
+    if args.json:
+        print(json.dumps({'results': results, 'mismatches': mismatches}, indent=2))
+    else:
+        print_table(
+            ['workers', 'candidates', 'free avg', 'p50 ms', 'p95 ms', 'p99 ms', f'<{BUDGET_MS} ms'],
+            [[r['workers'], r['candidates'], f"{r['free_avg']:.0f}", f"{r['p50_ms']:.1f}", f"{r['p95_ms']:.1f}",
+              f"{r['p99_ms']:.1f}", 'yes' if r['p95_ms'] < BUDGET_MS else 'no']
+             for r in results]
+        )
+        print(f'\nresponses differing from brute force: {mismatches}')
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
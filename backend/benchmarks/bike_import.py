@@ -0,0 +1,126 @@
+"""
+Throughput of the bulk fleet import (``POST /bikes:batch``).
+
+Imports ``--bikes`` generated bikes as JSON or CSV at several thread-pool
+sizes against the local DynamoDB stand-in, with a share of BatchWriteItem
+entries returned as UnprocessedItems, and compares bikes per second with
+one ``POST /bikes`` per bike. Checks that every row was written and that
+the table holds every bike, and exits non-zero if the default pool size
+falls under ``--min-rate`` bikes per second.
+
+    cd backend
+    python -m benchmarks.bike_import --bikes 5000 --workers 1 2 4 8 --latency-ms 10
+    python -m benchmarks.bike_import --format csv --unprocessed 0.2
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import sys
+import time
+
+from local_aws.emulator import ADMIN_GROUP, Caller, Emulator
+from local_aws.schemas import BIKE_INVENTORY_TABLE
+
+from .common import print_table, quiet_handler_logs
+
+MODELS = {'eBike': 'Xiaomi M365', 'Gyroscooter': 'Ninebot S', 'Segway': 'Segway i2 SE'}
+COLUMNS = ('type', 'model', 'accessCode', 'batteryLife', 'hourlyRate', 'features')
+
+
+def generate(count, rng):
+    rows = []
+    for i in range(count):
+        bike_type = rng.choice(tuple(MODELS))
+        rows.append({
+            'type': bike_type,
+            'model': MODELS[bike_type],
+            'accessCode': f'{rng.randrange(10 ** 6):06d}',
+            'batteryLife': f'{rng.randrange(40, 101)}%',
+            'hourlyRate': rng.choice((3, 4, 5, 6, 8)),
+            'features': rng.sample(['lights', 'basket', 'bell', 'phone mount'], 2),
+        })
+    return rows
+
+
+def as_csv(rows):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({**row, 'features': ';'.join(row['features'])})
+    return out.getvalue()
+
+
+def table_size(emulator):
+    return emulator.aws.dynamodb.describe_table(TableName=BIKE_INVENTORY_TABLE['TableName'])['Table']['ItemCount']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bikes', type=int, default=5000)
+    parser.add_argument('--format', choices=('json', 'csv'), default='json')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--sequential', type=int, default=200, help='bikes created one POST /bikes at a time')
+    parser.add_argument('--latency-ms', type=float, default=10.0, help='simulated round-trip per DynamoDB call')
+    parser.add_argument('--unprocessed', type=float, default=0.05,
+                        help='share of BatchWriteItem entries returned as UnprocessedItems')
+    parser.add_argument('--min-rate', type=float, default=1000.0,
+                        help='bikes per second the default pool size must sustain')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    rows = generate(args.bikes, rng)
+    body, headers = (as_csv(rows), {'content-type': 'text/csv'}) if args.format == 'csv' else (rows, None)
+    admin = Caller('franchise-0', 'franchise-0@example.com', (ADMIN_GROUP,))
+
+    table_rows = []
+    failures = []
+
+    emulator = Emulator(latency_ms=args.latency_ms)
+    quiet_handler_logs()
+    started = time.perf_counter()
+    for row in rows[:args.sequential]:
+        emulator.call('POST /bikes', admin, body=row)
+    sequential_rate = min(args.sequential, len(rows)) / (time.perf_counter() - started)
+    table_rows.append(['POST /bikes', '-', f'{sequential_rate:.0f}', '-', '-', '-'])
+
+    default_workers = None
+    for workers in args.workers:
+        emulator = Emulator(latency_ms=args.latency_ms)
+        handler = emulator.handlers['bike_crud']
+        default_workers = handler.IMPORT_WORKERS if default_workers is None else default_workers
+        handler.IMPORT_WORKERS = workers
+        throttle_rng = random.Random(args.seed)
+        emulator.aws.dynamodb.set_throttle(
+            lambda operation, request: operation == 'BatchWriteItem' and throttle_rng.random() < args.unprocessed
+        )
+        started = time.perf_counter()
+        response = emulator.call('POST /bikes:batch', admin, body=body, headers=headers)
+        elapsed = time.perf_counter() - started
+        result = json.loads(response['body'])
+        metrics = emulator.aws.dynamodb.metrics
+        rate = result['written'] / elapsed
+        table_rows.append([
+            'POST /bikes:batch', workers, f'{rate:.0f}', metrics['calls.BatchWriteItem'],
+            metrics['throttled'], result['failed']
+        ])
+        if response['statusCode'] != 200 or table_size(emulator) != args.bikes:
+            failures.append(f'{workers} workers: status {response["statusCode"]}, {result["written"]} written, '
+                            f'{table_size(emulator)} in the table')
+        if workers == default_workers and rate < args.min_rate:
+            failures.append(f'{workers} workers: {rate:.0f} bikes/s is under {args.min_rate:g}')
+
+    print_table(['import', 'workers', 'bikes/s', 'BatchWriteItem calls', 'unprocessed', 'failed'], table_rows)
+    if failures:
+        print()
+        for failure in failures:
+            print(f'FAIL {failure}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Contention benchmark for booking slot locks.
+
+Fires concurrent ``create_booking_lambda`` invocations at the local DynamoDB
+stand-in, all competing for a handful of bikes and hours, then checks that no
+two active bookings of a bike overlap and that every booking holds exactly
+its own slot locks. Reports throughput at 1, 8 and 64 concurrent writers.
+
+    cd backend
+    python -m benchmarks.booking_contention --requests 2000 --latency-ms 5
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from local_aws import LocalAWS
+from local_aws.events import http_event, jwt_claims
+from local_aws.schemas import (
+    BIKE_INVENTORY_TABLE, BOOKING_SLOTS_TABLE, BOOKINGS_TABLE, NOTIFICATION_OUTBOX_TABLE, create_tables,
+)
+
+from .common import print_table, quiet_handler_logs, summarize_latencies
+
+HANDLER = 'booking-module/lambdas/create_booking_lambda.py'
+ENV = {
+    'BOOKINGS_TABLE': BOOKINGS_TABLE['TableName'],
+    'BIKE_INVENTORY_TABLE': BIKE_INVENTORY_TABLE['TableName'],
+    'SLOTS_TABLE': BOOKING_SLOTS_TABLE['TableName'],
+    'OUTBOX_TABLE': NOTIFICATION_OUTBOX_TABLE['TableName'],
+}
+
+
+def build_requests(count, bikes, hours, seed):
+    """Booking requests crowded into ``hours`` hours of tomorrow on ``bikes`` bikes."""
+    rng = random.Random(seed)
+    day = (datetime.now(timezone.utc) + timedelta(days=1)).replace(hour=6, minute=0, second=0, microsecond=0)
+    requests = []
+    for i in range(count):
+        start = day + timedelta(hours=rng.randrange(hours), minutes=rng.choice((0, 0, 15, 30)))
+        end = start + timedelta(minutes=rng.choice((30, 60, 90, 120, 180)))
+        requests.append(http_event('POST', '/bookings', claims=jwt_claims(f'user-{i % 200}'), body={
+            'bikeId': f'bike-{rng.randrange(bikes)}',
+            'startDate': start.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'endDate': end.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'duration': round((end - start).total_seconds() / 3600, 2),
+        }))
+    return requests
+
+
+def verify(aws):
+    """Count overlapping active bookings and bookings whose locks are missing or foreign."""
+    client = aws.dynamodb
+    bookings = client.scan(TableName=BOOKINGS_TABLE['TableName'])['Items']
+    slots = {
+        item['slotId']['S']: item['bookingId']['S']
+        for item in client.scan(TableName=BOOKING_SLOTS_TABLE['TableName'])['Items']
+    }
+    by_bike = defaultdict(list)
+    for booking in bookings:
+        if booking['status']['S'] != 'cancelled':
+            by_bike[booking['bikeId']['S']].append(booking)
+
+    from booking_runtime.slots import slot_ids, to_utc
+
+    double_bookings = 0
+    lock_mismatches = 0
+    for bike_id, bike_bookings in by_bike.items():
+        bike_bookings.sort(key=lambda b: to_utc(b['startDate']['S']))
+        latest_end = None
+        for booking in bike_bookings:
+            start, end = to_utc(booking['startDate']['S']), to_utc(booking['endDate']['S'])
+            if latest_end is not None and start < latest_end:
+                double_bookings += 1
+            latest_end = end if latest_end is None else max(latest_end, end)
+            for slot in slot_ids(bike_id, start, end):
+                if slots.get(slot) != booking['bookingId']['S']:
+                    lock_mismatches += 1
+    return len(bookings), double_bookings, lock_mismatches
+
+
+def run(writers, requests, bikes, latency_ms):
+    aws = LocalAWS(latency_ms=latency_ms)
+    create_tables(aws.dynamodb, (BOOKINGS_TABLE, BOOKING_SLOTS_TABLE, NOTIFICATION_OUTBOX_TABLE, BIKE_INVENTORY_TABLE))
+    for i in range(bikes):
+        aws.dynamodb.put_item(TableName=BIKE_INVENTORY_TABLE['TableName'], Item={
+            'bikeId': {'S': f'bike-{i}'},
+            'model': {'S': 'Xiaomi M365'},
+            'type': {'S': 'eBike'},
+            'hourlyRate': {'N': '5'},
+        })
+    handler = aws.load_handler(HANDLER, ENV)
+    quiet_handler_logs()
+
+    statuses = Counter()
+    latencies = []
+
+    def invoke(event):
+        started = time.perf_counter()
+        response = handler.lambda_handler(event, None)
+        latencies.append(time.perf_counter() - started)
+        return response['statusCode']
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        statuses.update(pool.map(invoke, requests))
+    elapsed = time.perf_counter() - started
+
+    stored, double_bookings, lock_mismatches = verify(aws)
+    summary = summarize_latencies(latencies)
+    return {
+        'writers': writers,
+        'requests': len(requests),
+        'created': statuses[201],
+        'conflicts': statuses[409],
+        'errors': sum(count for status, count in statuses.items() if status not in (201, 409)),
+        'stored': stored,
+        'double_bookings': double_bookings,
+        'lock_mismatches': lock_mismatches,
+        'throughput': len(requests) / elapsed,
+        'p50_ms': summary['p50'],
+        'p99_ms': summary['p99'],
+        'transactions_cancelled': aws.dynamodb.metrics['transactions_cancelled'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='booking requests per run')
+    parser.add_argument('--bikes', type=int, default=4, help='bikes the requests compete for')
+    parser.add_argument('--hours', type=int, default=12, help='hours of the day the requests crowd into')
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 8, 64], help='concurrent writer counts')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated DynamoDB round-trip')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    requests = build_requests(args.requests, args.bikes, args.hours, args.seed)
+    results = [run(writers, requests, args.bikes, args.latency_ms) for writers in args.writers]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(
+            ['writers', 'requests', '201', '409', 'errors', 'double', 'lock errs', 'req/s', 'p50 ms', 'p99 ms'],
+            [[r['writers'], r['requests'], r['created'], r['conflicts'], r['errors'], r['double_bookings'],
+              r['lock_mismatches'], f"{r['throughput']:.0f}", f"{r['p50_ms']:.1f}", f"{r['p99_ms']:.1f}"]
+             for r in results]
+        )
+
+    failed = any(r['double_bookings'] or r['lock_mismatches'] or r['errors'] for r in results)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
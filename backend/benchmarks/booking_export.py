@@ -0,0 +1,133 @@
+"""
+Throughput benchmark for the bookings export.
+
+Seeds the local DynamoDB stand-in with bookings, runs
+``export_bookings_lambda`` at several parallel-scan segment counts into the
+directory-backed S3 stand-in, and reads every part back to check that each
+booking was exported exactly once.
+
+    cd backend
+    python -m benchmarks.booking_export --bookings 100000 --segments 1 4 8 16
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import random
+import shutil
+import sys
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from local_aws import LocalAWS
+from local_aws.schemas import BOOKINGS_TABLE, create_tables
+
+from .common import print_table, quiet_handler_logs
+
+HANDLER = 'booking-module/lambdas/export_bookings_lambda.py'
+BUCKET = 'dalscooter-booking-exports'
+
+
+def seed(client, count, rng):
+    now = datetime.now(timezone.utc)
+    for first in range(0, count, 25):
+        requests = []
+        for i in range(first, min(first + 25, count)):
+            start = now + timedelta(hours=rng.randrange(-24 * 365, 24 * 30))
+            end = start + timedelta(hours=rng.choice((1, 2, 3)))
+            requests.append({'PutRequest': {'Item': {
+                'bookingId': {'S': f'booking-{i:08d}'},
+                'userId': {'S': f'user-{rng.randrange(5000)}'},
+                'userEmail': {'S': f'user{i % 5000}@example.com'},
+                'bikeId': {'S': f'bike-{rng.randrange(2000)}'},
+                'bikeModel': {'S': 'Xiaomi M365'},
+                'bikeType': {'S': 'eBike'},
+                'startDate': {'S': start.isoformat()},
+                'endDate': {'S': end.isoformat()},
+                'duration': {'N': str((end - start).seconds // 3600)},
+                'status': {'S': rng.choice(('active', 'completed', 'completed', 'cancelled'))},
+                'notes': {'S': rng.choice(('', '', 'Helmet, please', 'Pick-up at the "north" gate, thanks'))},
+                'createdAt': {'S': now.isoformat()},
+                'updatedAt': {'S': now.isoformat()},
+                'bookingDate': {'S': start.date().isoformat()}
+            }}})
+        client.batch_write_item(RequestItems={BOOKINGS_TABLE['TableName']: requests})
+
+
+def read_back(s3, manifest):
+    """Booking ids found in the exported parts."""
+    ids = []
+    for part in manifest['parts']:
+        body = s3.get_object(Bucket=BUCKET, Key=part['key'])['Body'].read()
+        text = gzip.decompress(body).decode('utf-8')
+        if manifest['format'] == 'csv':
+            rows = list(csv.DictReader(io.StringIO(text)))
+            ids.extend(row['bookingId'] for row in rows)
+        else:
+            ids.extend(json.loads(line)['bookingId'] for line in text.splitlines())
+    return ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--segments', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson')
+    parser.add_argument('--part-mb', type=float, default=8, help='uncompressed MB per part')
+    parser.add_argument('--latency-ms', type=float, default=100.0,
+                        help='simulated round-trip per call; a full 1 MB Scan page takes on the order of 100 ms')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='report peak Python allocations during each export (much slower)')
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    aws = LocalAWS()
+    create_tables(aws.dynamodb, (BOOKINGS_TABLE,))
+    seed(aws.dynamodb, args.bookings, random.Random(args.seed))
+    aws.dynamodb.latency = aws.s3.latency = args.latency_ms / 1000.0
+
+    handler = aws.load_handler(HANDLER, {
+        'BOOKINGS_TABLE': BOOKINGS_TABLE['TableName'],
+        'EXPORT_BUCKET': BUCKET,
+    })
+    quiet_handler_logs()
+
+    rows = []
+    failures = 0
+    try:
+        for segments in args.segments:
+            if args.trace_memory:
+                tracemalloc.start()
+            manifest = handler.lambda_handler({
+                'format': args.format,
+                'segments': segments,
+                'partBytes': int(args.part_mb * 1024 * 1024),
+            }, None)
+            peak_mb = None
+            if args.trace_memory:
+                peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                tracemalloc.stop()
+
+            ids = read_back(aws.s3, manifest)
+            exact = len(ids) == args.bookings and len(set(ids)) == args.bookings
+            failures += not exact
+            rows.append([
+                segments,
+                manifest['items'],
+                len(manifest['parts']),
+                f"{manifest['compressedBytes'] / 1024 / 1024:.1f}",
+                f"{manifest['seconds']:.2f}",
+                f"{manifest['itemsPerSecond']:.0f}",
+                f'{peak_mb:.1f}' if peak_mb is not None else '-',
+                'yes' if exact else 'NO',
+            ])
+    finally:
+        shutil.rmtree(aws.s3.root, ignore_errors=True)
+
+    print_table(['segments', 'items', 'parts', 'gzip MB', 'seconds', 'items/s', 'peak MB', 'exact'], rows)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
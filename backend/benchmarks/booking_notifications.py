@@ -0,0 +1,181 @@
+"""
+Create latency with and without SNS on the request path, and delivery
+through the notification outbox.
+
+``inline`` times ``create_booking_lambda`` followed by the ``sns.publish`` it
+used to make before returning; ``outbox`` times the handler as it is, with
+the confirmation written in the booking's transaction. The outbox stream is
+then fed to ``dispatch_notifications_lambda`` in batches the way Lambda
+would (retrying from a reported failure, giving up after five retries),
+with a share of SNS publishes failing, followed by sweeps until the outbox
+is empty. Every booking must end up with a confirmation.
+
+    cd backend
+    python -m benchmarks.booking_notifications --bookings 300 --sns-latency-ms 60 --failure-rate 0.1
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from local_aws import LocalAWS
+from local_aws.events import http_event, jwt_claims
+from local_aws.schemas import (
+    BIKE_INVENTORY_TABLE, BOOKING_SLOTS_TABLE, BOOKINGS_TABLE, NOTIFICATION_OUTBOX_TABLE, create_tables,
+)
+
+from .common import print_table, quiet_handler_logs, summarize_latencies
+
+TOPIC_ARN = 'arn:aws:sns:local:000000000000:dalscooter_sns_topic'
+ENV = {
+    'BOOKINGS_TABLE': BOOKINGS_TABLE['TableName'],
+    'BIKE_INVENTORY_TABLE': BIKE_INVENTORY_TABLE['TableName'],
+    'SLOTS_TABLE': BOOKING_SLOTS_TABLE['TableName'],
+    'OUTBOX_TABLE': NOTIFICATION_OUTBOX_TABLE['TableName'],
+    'SNS_TOPIC_ARN': TOPIC_ARN,
+    # Sweep everything left in the outbox, however recent
+    'SWEEP_AGE_SECONDS': '0',
+}
+
+# Stream batch size and retries, as in the event source mapping
+STREAM_BATCH = 100
+STREAM_RETRIES = 5
+
+
+def setup(args):
+    aws = LocalAWS()
+    create_tables(aws.dynamodb, (BOOKINGS_TABLE, BOOKING_SLOTS_TABLE, NOTIFICATION_OUTBOX_TABLE, BIKE_INVENTORY_TABLE))
+    for i in range(args.bookings):
+        aws.dynamodb.put_item(TableName=BIKE_INVENTORY_TABLE['TableName'], Item={
+            'bikeId': {'S': f'bike-{i}'}, 'model': {'S': 'Xiaomi M365'}, 'type': {'S': 'eBike'}
+        })
+    create = aws.load_handler('booking-module/lambdas/create_booking_lambda.py', ENV)
+    dispatch = aws.load_handler('booking-module/lambdas/dispatch_notifications_lambda.py', ENV)
+    dispatch.RETRY_BASE_SECONDS = 0.001
+    quiet_handler_logs()
+    aws.dynamodb.latency = args.latency_ms / 1000.0
+    aws.sns.latency = args.sns_latency_ms / 1000.0
+    return aws, create, dispatch
+
+
+def create_event(i, day):
+    start = day + timedelta(hours=i % 20)
+    return http_event('POST', '/bookings', body={
+        'bikeId': f'bike-{i}',
+        'startDate': start.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        'endDate': (start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        'duration': 1,
+    }, claims=jwt_claims(f'user-{i}'))
+
+
+def book(aws, create, count, day, inline_publish):
+    latencies, booking_ids, statuses = [], [], Counter()
+    for i in range(count):
+        started = time.perf_counter()
+        response = create.lambda_handler(create_event(i, day), None)
+        if inline_publish and response['statusCode'] == 201:
+            aws.sns.publish(TopicArn=TOPIC_ARN, Subject='DALScooter Booking Confirmation', Message=response['body'])
+        latencies.append(time.perf_counter() - started)
+        statuses[response['statusCode']] += 1
+        if response['statusCode'] == 201:
+            booking_ids.append(json.loads(response['body'])['bookingId'])
+    return latencies, booking_ids, statuses
+
+
+def drive_stream(aws, dispatch):
+    """Feed the outbox stream to the dispatcher as Lambda's event source mapping would."""
+    table = NOTIFICATION_OUTBOX_TABLE['TableName']
+    invocations = abandoned = 0
+    batch, retries = [], 0
+    while True:
+        if len(batch) < STREAM_BATCH:
+            batch += aws.dynamodb.drain_stream(table, limit=STREAM_BATCH - len(batch))['Records']
+        if not batch:
+            return invocations, abandoned
+        invocations += 1
+        failures = dispatch.lambda_handler({'Records': batch}, None)['batchItemFailures']
+        if not failures:
+            batch, retries = [], 0
+            continue
+        failed = failures[0]['itemIdentifier']
+        batch = [r for r in batch if r['dynamodb']['SequenceNumber'] >= failed]
+        retries += 1
+        if retries > STREAM_RETRIES:
+            abandoned += len(batch)
+            batch, retries = [], 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=300)
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated DynamoDB round-trip')
+    parser.add_argument('--sns-latency-ms', type=float, default=60.0, help='simulated SNS round-trip')
+    parser.add_argument('--failure-rate', type=float, default=0.1, help='share of SNS publishes that fail')
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args(argv)
+
+    day = (datetime.now(timezone.utc) + timedelta(days=2)).replace(hour=0, minute=0, second=0, microsecond=0)
+    failures = []
+    rows = []
+
+    for name, inline_publish in (('inline', True), ('outbox', False)):
+        aws, create, _ = setup(args)
+        latencies, booking_ids, statuses = book(aws, create, args.bookings, day, inline_publish)
+        if statuses[201] != args.bookings:
+            failures.append(f'{name}: {dict(statuses)}')
+        s = summarize_latencies(latencies)
+        rows.append([name, f"{s['p50']:.1f}", f"{s['p95']:.1f}", f"{s['p99']:.1f}", f"{s['mean']:.1f}"])
+    print_table(['create', 'p50 ms', 'p95 ms', 'p99 ms', 'mean ms'], rows)
+
+    # SNS down entirely: bookings still succeed
+    aws, create, _ = setup(args)
+    aws.sns.set_failure(lambda operation, message: True)
+    _, _, statuses = book(aws, create, min(args.bookings, 20), day, False)
+    if statuses[201] != min(args.bookings, 20):
+        failures.append(f'with SNS failing, creates returned {dict(statuses)}')
+
+    # Delivery through the outbox with flaky SNS
+    aws, create, dispatch = setup(args)
+    _, booking_ids, _ = book(aws, create, args.bookings, day, False)
+    rng = random.Random(args.seed)
+    aws.sns.set_failure(lambda operation, message: rng.random() < args.failure_rate)
+    started = time.perf_counter()
+    invocations, abandoned = drive_stream(aws, dispatch)
+    sweeps = 0
+    outbox = NOTIFICATION_OUTBOX_TABLE['TableName']
+    while aws.dynamodb.scan(TableName=outbox, Select='COUNT')['Count'] and sweeps < 10:
+        dispatch.lambda_handler({}, None)
+        drive_stream(aws, dispatch)
+        sweeps += 1
+    elapsed = time.perf_counter() - started
+
+    confirmed = Counter(
+        line.split(': ', 1)[1]
+        for message in aws.sns.published
+        for line in message['Message'].splitlines()
+        if line.startswith('Booking ID: ')
+    )
+    missing = [b for b in booking_ids if not confirmed[b]]
+    duplicates = sum(count - 1 for count in confirmed.values() if count > 1)
+    left = aws.dynamodb.scan(TableName=outbox, Select='COUNT')['Count']
+    if missing:
+        failures.append(f'{len(missing)} bookings without a confirmation')
+    if left:
+        failures.append(f'{left} notifications left in the outbox')
+
+    print(
+        f'\ndelivery: {len(booking_ids)} confirmations in {elapsed:.2f}s, '
+        f'{invocations} stream invocations, {abandoned} records given up by the stream, {sweeps} sweeps, '
+        f"{aws.sns.metrics['calls.PublishBatch']} PublishBatch calls, {aws.sns.metrics['failed']} failed publishes, "
+        f'{duplicates} duplicates'
+    )
+    for failure in failures:
+        print(f'FAIL {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Latency comparison of the two booking cancellation paths.
+
+``read-then-write`` is the previous flow: ``get_item``, ownership/status/start
+checks in Python, then the cancel write (a transaction releasing the slot
+locks for slot-locked bookings). ``conditional`` is ``cancel_booking_lambda``
+today: one conditional ``UpdateItem`` with the checks in its
+``ConditionExpression``, the slot locks released afterwards from the table's
+stream by ``release_slots_lambda``.
+
+Both run against the local DynamoDB stand-in with the same per-call latency.
+The script also checks that rejected cancellations map to the same status
+codes and that every lock is gone once the stream is drained.
+
+    cd backend
+    python -m benchmarks.cancel_latency --bookings 300 --latency-ms 5
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from local_aws import LocalAWS
+from local_aws.events import http_event, jwt_claims
+from local_aws.schemas import (
+    BIKE_INVENTORY_TABLE, BOOKING_SLOTS_TABLE, BOOKINGS_TABLE, NOTIFICATION_OUTBOX_TABLE, create_tables,
+)
+
+from .common import print_table, quiet_handler_logs, summarize_latencies
+
+ENV = {
+    'BOOKINGS_TABLE': BOOKINGS_TABLE['TableName'],
+    'BIKE_INVENTORY_TABLE': BIKE_INVENTORY_TABLE['TableName'],
+    'SLOTS_TABLE': BOOKING_SLOTS_TABLE['TableName'],
+    'OUTBOX_TABLE': NOTIFICATION_OUTBOX_TABLE['TableName'],
+}
+
+
+def _claims_event(method, path, user_id, body=None, path_parameters=None):
+    return http_event(method, path, body=body, claims=jwt_claims(user_id), path_parameters=path_parameters)
+
+
+def legacy_cancel(client, booking_id, user_id):
+    """The read-then-write cancellation this change replaced, as (status code, calls)."""
+    from booking_runtime.slots import release_slots
+
+    table = BOOKINGS_TABLE['TableName']
+    item = client.get_item(TableName=table, Key={'bookingId': {'S': booking_id}}).get('Item')
+    if item is None:
+        return 404, 1
+    if item['userId']['S'] != user_id:
+        return 403, 1
+    if item['status']['S'] in ('cancelled', 'completed'):
+        return 400, 1
+    start = datetime.fromisoformat(item['startDate']['S'].replace('Z', '+00:00'))
+    if start < datetime.now(timezone.utc):
+        return 400, 1
+
+    update = {
+        'TableName': table,
+        'Key': {'bookingId': {'S': booking_id}},
+        'UpdateExpression': 'SET #status = :status, updatedAt = :updatedAt',
+        'ConditionExpression': '#status = :currentStatus',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {
+            ':status': {'S': 'cancelled'},
+            ':updatedAt': {'S': datetime.now(timezone.utc).isoformat()},
+            ':currentStatus': item['status'],
+        },
+    }
+    if item.get('slotLocked', {}).get('BOOL'):
+        client.transact_write_items(TransactItems=[{'Update': update}] + release_slots(
+            BOOKING_SLOTS_TABLE['TableName'], item['bikeId']['S'], booking_id,
+            item['startDate']['S'], item['endDate']['S']
+        ))
+    else:
+        client.update_item(**update)
+    return 200, 2
+
+
+def book(aws, create, count, day):
+    """Create ``count`` bookings for user-0 through the create handler."""
+    booking_ids = []
+    for i in range(count):
+        start = day + timedelta(hours=2 * (i % 10))
+        response = create.lambda_handler(_claims_event('POST', '/bookings', 'user-0', body={
+            'bikeId': f'bike-{i // 10}',
+            'startDate': start.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'endDate': (start + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'duration': 2,
+        }), None)
+        assert response['statusCode'] == 201, response['body']
+        booking_ids.append(json.loads(response['body'])['bookingId'])
+    return booking_ids
+
+
+def setup(args, day):
+    aws = LocalAWS()
+    create_tables(aws.dynamodb, (BOOKINGS_TABLE, BOOKING_SLOTS_TABLE, NOTIFICATION_OUTBOX_TABLE, BIKE_INVENTORY_TABLE))
+    for i in range(args.bookings // 10 + 1):
+        aws.dynamodb.put_item(TableName=BIKE_INVENTORY_TABLE['TableName'], Item={
+            'bikeId': {'S': f'bike-{i}'}, 'model': {'S': 'Xiaomi M365'}, 'type': {'S': 'eBike'}
+        })
+    create = aws.load_handler('booking-module/lambdas/create_booking_lambda.py', ENV)
+    cancel = aws.load_handler('booking-module/lambdas/cancel_booking_lambda.py', ENV)
+    release = aws.load_handler('booking-module/lambdas/release_slots_lambda.py', ENV)
+    quiet_handler_logs()
+    booking_ids = book(aws, create, args.bookings, day)
+    aws.dynamodb.drain_stream(BOOKINGS_TABLE['TableName'])
+    aws.dynamodb.latency = args.latency_ms / 1000.0
+    return aws, cancel, release, booking_ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=300, help='bookings cancelled per path')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated DynamoDB round-trip')
+    args = parser.parse_args(argv)
+
+    day = (datetime.now(timezone.utc) + timedelta(days=2)).replace(hour=0, minute=0, second=0, microsecond=0)
+    failures = []
+
+    # Previous read-then-write path
+    aws, _, _, booking_ids = setup(args, day)
+    before = sum(v for k, v in aws.dynamodb.metrics.items() if k.startswith('calls.'))
+    latencies = []
+    for booking_id in booking_ids:
+        started = time.perf_counter()
+        status, _ = legacy_cancel(aws.dynamodb, booking_id, 'user-0')
+        latencies.append(time.perf_counter() - started)
+        if status != 200:
+            failures.append(f'read-then-write cancel returned {status}')
+    legacy = summarize_latencies(latencies)
+    legacy_calls = (sum(v for k, v in aws.dynamodb.metrics.items() if k.startswith('calls.')) - before) / len(booking_ids)
+
+    # Conditional update path
+    aws, cancel, release, booking_ids = setup(args, day)
+    before = sum(v for k, v in aws.dynamodb.metrics.items() if k.startswith('calls.'))
+    latencies = []
+    for booking_id in booking_ids:
+        started = time.perf_counter()
+        response = cancel.lambda_handler(
+            _claims_event('DELETE', f'/bookings/{booking_id}', 'user-0', path_parameters={'bookingId': booking_id}),
+            None
+        )
+        latencies.append(time.perf_counter() - started)
+        if response['statusCode'] != 200:
+            failures.append(f"conditional cancel returned {response['statusCode']}: {response['body']}")
+    conditional = summarize_latencies(latencies)
+    conditional_calls = (sum(v for k, v in aws.dynamodb.metrics.items() if k.startswith('calls.')) - before) / len(booking_ids)
+
+    # Slot locks are released off the request path
+    started = time.perf_counter()
+    result = release.lambda_handler(aws.dynamodb.drain_stream(BOOKINGS_TABLE['TableName']), None)
+    release_seconds = time.perf_counter() - started
+    if result['batchItemFailures']:
+        failures.append(f"release_slots reported failures: {result['batchItemFailures']}")
+    remaining_locks = aws.dynamodb.scan(TableName=BOOKING_SLOTS_TABLE['TableName'], Select='COUNT')['Count']
+    if remaining_locks:
+        failures.append(f'{remaining_locks} slot locks left after cancelling every booking')
+
+    # Rejections map to the same responses as before
+    booking_id = booking_ids[0]
+    expectations = [
+        ('already cancelled', 'user-0', booking_id, 400, 'Booking is already cancelled'),
+        ('someone else', 'user-1', booking_id, 403, 'You can only cancel your own bookings'),
+        ('missing', 'user-0', 'no-such-booking', 404, 'Booking not found'),
+    ]
+    past = datetime.now(timezone.utc) - timedelta(hours=1)
+    aws.dynamodb.put_item(TableName=BOOKINGS_TABLE['TableName'], Item={
+        'bookingId': {'S': 'started'}, 'userId': {'S': 'user-0'}, 'bikeId': {'S': 'bike-0'},
+        'status': {'S': 'active'}, 'startDate': {'S': past.strftime('%Y-%m-%dT%H:%M:%S.000Z')},
+        'endDate': {'S': (past + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M:%S.000Z')},
+        'bookingDate': {'S': past.date().isoformat()}, 'duration': {'N': '2'}, 'createdAt': {'S': past.isoformat()}
+    })
+    expectations.append(('already started', 'user-0', 'started', 400, 'Cannot cancel a booking that has already started'))
+    for label, user_id, target, status, message in expectations:
+        response = cancel.lambda_handler(
+            _claims_event('DELETE', f'/bookings/{target}', user_id, path_parameters={'bookingId': target}), None
+        )
+        body = json.loads(response['body'])
+        if response['statusCode'] != status or body.get('error') != message:
+            failures.append(f"{label}: got {response['statusCode']} {body}")
+
+    print_table(
+        ['path', 'calls/cancel', 'p50 ms', 'p95 ms', 'p99 ms', 'mean ms'],
+        [[name, f'{calls:.1f}', f"{s['p50']:.1f}", f"{s['p95']:.1f}", f"{s['p99']:.1f}", f"{s['mean']:.1f}"]
+         for name, calls, s in (('read-then-write', legacy_calls, legacy), ('conditional', conditional_calls, conditional))]
+    )
+    print(f'\nslot release from the stream: {len(booking_ids)} bookings in {release_seconds * 1000:.0f} ms')
+    for failure in failures:
+        print(f'FAIL {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
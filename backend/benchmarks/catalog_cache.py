@@ -0,0 +1,87 @@
+"""
+Cost of GET /bikes with the catalog snapshot cache.
+
+Seeds a fleet into the local DynamoDB stand-in and reports latency, read
+units and response bytes per request for:
+
+- cold:        a new container, which scans the whole catalog
+- warm:        the snapshot reused after one version read
+- revalidate:  a client sending the ETag it holds, answered with 304
+- write mix:   warm reads with a bike update every ``--write-every`` reads,
+               each of which makes the next read rebuild
+
+    cd backend
+    python -m benchmarks.catalog_cache --bikes 3000 --requests 200 --latency-ms 5
+"""
+import argparse
+import random
+import sys
+import time
+
+from local_aws.emulator import ADMIN_GROUP, Caller, Emulator
+from local_aws.schemas import BIKE_INVENTORY_TABLE
+
+from .common import print_table, quiet_handler_logs, summarize_latencies
+from .data_scale import Dataset, bikes, seed_table
+
+
+def measure(emulator, requests, before_each=None, headers=None):
+    metrics = emulator.aws.dynamodb.metrics
+    latencies = []
+    units = size = 0
+    statuses = set()
+    for i in range(requests):
+        if before_each:
+            before_each(i)
+        read_units = metrics['read_units']
+        started = time.perf_counter()
+        response = emulator.call('GET /bikes', headers=headers)
+        latencies.append(time.perf_counter() - started)
+        units += metrics['read_units'] - read_units
+        size += len(response['body'].encode('utf-8'))
+        statuses.add(response['statusCode'])
+    summary = summarize_latencies(latencies)
+    return summary, units / requests, size / requests / 1024, statuses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bikes', type=int, default=3000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--write-every', type=int, default=50, help='reads between bike updates in the write mix')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated round-trip per DynamoDB call')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    emulator = Emulator()
+    quiet_handler_logs()
+    seed_table(emulator.aws.dynamodb, BIKE_INVENTORY_TABLE['TableName'],
+               bikes(Dataset(args.bikes), random.Random(args.seed)))
+    emulator.aws.dynamodb.latency = args.latency_ms / 1000.0
+    handler = emulator.handlers['bike_crud']
+    admin = Caller('franchise-0', 'franchise-0@example.com', (ADMIN_GROUP,))
+
+    def cold(i):
+        handler._snapshot = None
+
+    def write(i):
+        if i % args.write_every == 0:
+            emulator.call('PUT /bikes/{bikeId}', admin, body={'batteryLife': f'{i % 100}%'},
+                          path_parameters={'bikeId': 'bike-00000000'})
+
+    etag = emulator.call('GET /bikes')['headers']['ETag']
+    rows = []
+    for name, kwargs in (
+        ('cold', {'before_each': cold}),
+        ('warm', {}),
+        ('revalidate', {'headers': {'if-none-match': etag}}),
+        ('write mix', {'before_each': write}),
+    ):
+        summary, units, kb, statuses = measure(emulator, args.requests, **kwargs)
+        rows.append([name, '/'.join(str(status) for status in sorted(statuses)), f"{summary['p50']:.1f}",
+                     f"{summary['p95']:.1f}", f'{units:.1f}', f'{kb:.1f}'])
+    print_table(['scenario', 'status', 'p50 ms', 'p95 ms', 'RCU/req', 'KB/resp'], rows)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
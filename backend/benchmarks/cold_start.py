@@ -0,0 +1,178 @@
+"""
+Init time of every Lambda handler module, from ``python -X importtime``.
+
+Each handler is imported in a fresh interpreter, as a new Lambda container
+would, with its layers on ``sys.path``, a placeholder for every environment
+variable it reads and a dummy region so boto3 can build clients offline.
+``init`` is the cumulative import time of the handler module, ``body`` the
+part spent in its own top level (building clients, reading configuration),
+and ``boto3`` the time spent in the boto3/botocore modules themselves.
+
+``--rev`` measures the handlers at an earlier git revision side by side.
+``--budget-ms`` and ``--max-regression`` turn the report into a check that
+exits non-zero, so a cold-start regression fails before deploy:
+
+    cd backend
+    python -m benchmarks.cold_start --rev HEAD~1 --max-regression 25
+"""
+import argparse
+import io
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from pathlib import Path
+
+from local_aws.aws import BACKEND_DIR, LAYER_PATHS
+
+from .common import print_table
+
+ENV_READ = re.compile(r'''os\.environ\[\s*["'](\w+)["']\s*\]''')
+IMPORT_LINE = re.compile(r'^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|( *)(\S+)\s*$')
+
+# Regressions smaller than this are within run-to-run noise
+NOISE_MS = 5.0
+
+
+def discover(root):
+    """Handler sources under ``root``, by module/lambdas/file"""
+    return sorted(root.glob('*-module/lambdas/*.py'))
+
+
+def handler_env(source):
+    env = {
+        key: value for key, value in os.environ.items()
+        if not key.startswith('AWS_') and key != 'PYTHONPATH'
+    }
+    env.update({
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'local',
+        'AWS_SECRET_ACCESS_KEY': 'local',
+        'AWS_EC2_METADATA_DISABLED': 'true',
+        'PYTHONDONTWRITEBYTECODE': '1',
+    })
+    for name in ENV_READ.findall(source.read_text()):
+        env.setdefault(name, f'local-{name.lower()}')
+    return env
+
+
+def measure(root, path):
+    """
+    Import ``path`` once in a fresh interpreter; returns (init, body, boto3)
+    in milliseconds
+    """
+    layers = [root / layer.relative_to(BACKEND_DIR) for layer in LAYER_PATHS]
+    env = handler_env(path)
+    env['PYTHONPATH'] = os.pathsep.join(str(p) for p in [path.parent] + layers)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {path.stem}'],
+        cwd=path.parent, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        last = result.stderr.strip().splitlines()[-1:] or ['']
+        raise RuntimeError(f'{path.name} failed to import: {last[0]}')
+
+    init = body = boto = 0
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, name = int(match[1]), int(match[2]), len(match[3]), match[4]
+        if name == path.stem and indent == 1:
+            init, body = cumulative, own
+        elif name in ('boto3', 'botocore') or name.startswith(('boto3.', 'botocore.')):
+            boto += own
+    return init / 1000, body / 1000, boto / 1000
+
+
+def profile(roots, repeat, handlers=()):
+    """
+    Median (init, body, boto3) per handler under each of ``roots``, keyed by
+    module/file. Imports from the different trees are interleaved so drift
+    in machine load affects them alike.
+    """
+    trees = []
+    for root in roots:
+        paths = discover(root)
+        if handlers:
+            paths = [p for p in paths if any(h in p.name for h in handlers)]
+        trees.append({f'{p.parent.parent.name}/{p.name}': (root, p) for p in paths})
+
+    runs = [{key: [] for key in tree} for tree in trees]
+    for _ in range(repeat):
+        for tree, samples in zip(trees, runs):
+            for key, (root, path) in tree.items():
+                samples[key].append(measure(root, path))
+    return [
+        {
+            key: tuple(statistics.median(sample[i] for sample in samples) for i in range(3))
+            for key, samples in tree_runs.items()
+        }
+        for tree_runs in runs
+    ]
+
+
+def export_revision(rev, into):
+    """Extract ``backend/`` as of ``rev`` into ``into``; returns its root"""
+    # Run from backend/, git archive only includes that directory
+    archive = subprocess.run(
+        ['git', 'archive', '--format=tar', rev],
+        cwd=BACKEND_DIR, capture_output=True, check=True
+    )
+    with tarfile.open(fileobj=io.BytesIO(archive.stdout)) as tar:
+        tar.extractall(into)
+    return Path(into)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='imports per handler; the median is reported')
+    parser.add_argument('--rev', help='git revision to compare against')
+    parser.add_argument('--budget-ms', type=float, help='fail if any handler takes longer to init')
+    parser.add_argument('--max-regression', type=float, metavar='PCT',
+                        help='with --rev, fail if any handler inits this much slower')
+    parser.add_argument('handlers', nargs='*', help='only handlers whose file name contains one of these')
+    args = parser.parse_args(argv)
+
+    if args.rev:
+        with tempfile.TemporaryDirectory() as tmp:
+            now, before = profile([BACKEND_DIR, export_revision(args.rev, tmp)], args.repeat, args.handlers)
+    else:
+        now, = profile([BACKEND_DIR], args.repeat, args.handlers)
+        before = {}
+
+    headers = ['handler', 'init ms', 'body ms', 'boto3 ms']
+    if args.rev:
+        headers += [f'init ms at {args.rev}', f'body ms at {args.rev}', 'change']
+    rows = []
+    failures = []
+    for key, (init, body, boto) in now.items():
+        row = [key, f'{init:.1f}', f'{body:.1f}', f'{boto:.1f}']
+        if args.rev:
+            if key in before:
+                old_init, old_body, _ = before[key]
+                change = (init - old_init) / old_init * 100 if old_init else 0.0
+                row += [f'{old_init:.1f}', f'{old_body:.1f}', f'{change:+.0f}%']
+                if (args.max_regression is not None and change > args.max_regression
+                        and init - old_init > NOISE_MS):
+                    failures.append(f'{key} init {old_init:.1f} -> {init:.1f} ms ({change:+.0f}%)')
+            else:
+                row += ['-', '-', 'new']
+        if args.budget_ms is not None and init > args.budget_ms:
+            failures.append(f'{key} init {init:.1f} ms is over the {args.budget_ms:g} ms budget')
+        rows.append(row)
+    print_table(headers, rows)
+
+    if failures:
+        print()
+        for failure in failures:
+            print(f'FAIL {failure}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
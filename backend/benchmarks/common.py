@@ -0,0 +1,43 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import logging
+import statistics
+
+
+def quiet_handler_logs():
+    """
+    The handlers log every event at INFO on the root logger; keep benchmark
+    output readable by only letting errors through.
+    """
+    logging.getLogger().setLevel(logging.ERROR)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize_latencies(samples):
+    """p50/p95/p99 and mean of a list of latencies in seconds, in milliseconds."""
+    return {
+        'p50': percentile(samples, 50) * 1000,
+        'p95': percentile(samples, 95) * 1000,
+        'p99': percentile(samples, 99) * 1000,
+        'mean': (statistics.fmean(samples) * 1000) if samples else 0.0,
+    }
+
+
+def print_table(headers, rows):
+    widths = [
+        max(len(str(header)), *(len(str(row[i])) for row in rows)) if rows else len(str(header))
+        for i, header in enumerate(headers)
+    ]
+    line = '  '.join(str(header).rjust(width) for header, width in zip(headers, widths))
+    print(line)
+    print('-' * len(line))
+    for row in rows:
+        print('  '.join(str(value).rjust(width) for value, width in zip(row, widths)))
@@ -0,0 +1,119 @@
+"""
+Throughput of complaint routing by queue batch size.
+
+Routes ``--complaints`` complaints to ``--franchises`` franchise users in
+SQS batches of each of ``--batch-sizes``, as the event source mapping on the
+complaint queue delivers them, and reports complaints routed per second and
+DynamoDB calls per complaint. Every batch also carries one unreadable
+record, which must come back alone in ``batchItemFailures``. After the timed
+runs, a batch that repeats an already routed complaint checks that the rest
+of the batch is still routed and nothing is counted twice.
+
+    cd backend
+    python -m benchmarks.complaint_batches --complaints 5000 --batch-sizes 1 10 100 --latency-ms 5
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+import uuid
+
+from local_aws.emulator import COMPLAINT_QUEUE_ARN, Emulator
+from local_aws.events import sqs_event
+from local_aws.schemas import COMPLAINT_LOGS_TABLE, FRANCHISE_LOAD_TABLE
+
+from .common import print_table, quiet_handler_logs
+
+
+def complaint(customer_id):
+    return {'messageId': str(uuid.uuid4()), 'bookingRef': 'booking-0', 'userId': customer_id,
+            'complaint': 'The brakes were not working'}
+
+
+def record(body):
+    message_id = str(uuid.uuid4())
+    return {'MessageId': message_id, 'ReceiptHandle': message_id, 'Body': body}
+
+
+def calls(metrics):
+    return sum(count for name, count in metrics.items() if name.startswith('calls.'))
+
+
+def open_complaints(dynamodb):
+    total = 0
+    params = {'TableName': FRANCHISE_LOAD_TABLE['TableName']}
+    while True:
+        response = dynamodb.scan(**params)
+        total += sum(int(item['openComplaints']['N']) for item in response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return total
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def run(args, batch_size, failures):
+    emulator = Emulator()
+    quiet_handler_logs()
+    # The unreadable records are logged as errors, one per batch
+    logging.getLogger().setLevel(logging.CRITICAL)
+    dynamodb = emulator.aws.dynamodb
+    for i in range(args.franchises):
+        emulator.add_user(f'franchise-{i:05d}@example.com', admin=True)
+    customer = emulator.add_user('customer@example.com')
+    dynamodb.latency = emulator.aws.cognito_idp.latency = args.latency_ms / 1000.0
+
+    before = calls(dynamodb.metrics)
+    started = time.perf_counter()
+    for first in range(0, args.complaints, batch_size):
+        records = [record(json.dumps(complaint(customer.user_id)))
+                   for _ in range(min(batch_size, args.complaints - first))]
+        poison = record('not a complaint')
+        records.insert(len(records) // 2, poison)
+        response = emulator.invoke('route_complaint', sqs_event(records, COMPLAINT_QUEUE_ARN))
+        reported = [failure['itemIdentifier'] for failure in response.get('batchItemFailures', [])]
+        if reported != [poison['MessageId']]:
+            failures.append(f'batch size {batch_size}: reported {len(reported)} failures for one unreadable record')
+            break
+    elapsed = time.perf_counter() - started
+    used = calls(dynamodb.metrics) - before
+
+    # A redelivered complaint among new ones
+    dynamodb.latency = emulator.aws.cognito_idp.latency = 0.0
+    stored = dynamodb.scan(TableName=COMPLAINT_LOGS_TABLE['TableName'], Limit=1)['Items'][0]
+    redelivered = {name: value['S'] for name, value in stored.items()
+                   if name in ('messageId', 'bookingRef', 'userId', 'complaint')}
+    fresh = [complaint(customer.user_id) for _ in range(batch_size)]
+    response = emulator.invoke('route_complaint', sqs_event(
+        [record(json.dumps(message)) for message in [redelivered] + fresh], COMPLAINT_QUEUE_ARN))
+    if response.get('batchItemFailures'):
+        failures.append(f'batch size {batch_size}: a redelivered complaint failed its batch')
+    stored = dynamodb.describe_table(TableName=COMPLAINT_LOGS_TABLE['TableName'])['Table']['ItemCount']
+    counted = open_complaints(dynamodb)
+    if stored != args.complaints + batch_size or counted != stored:
+        failures.append(f'batch size {batch_size}: {stored:,} complaints stored, {counted:,} counted, '
+                        f'{args.complaints + batch_size:,} sent')
+    return [batch_size, f'{args.complaints / elapsed:,.0f}', f'{used / args.complaints:.2f}',
+            f'{elapsed / (args.complaints / batch_size) * 1000:.1f}']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--complaints', type=int, default=5000)
+    parser.add_argument('--franchises', type=int, default=200)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated round-trip per AWS call')
+    args = parser.parse_args(argv)
+
+    failures = []
+    rows = [run(args, batch_size, failures) for batch_size in args.batch_sizes]
+    print_table(['batch size', 'complaints/s', 'DynamoDB calls/complaint', 'ms/batch'], rows)
+    if failures:
+        print()
+        for failure in failures:
+            print(f'FAIL {failure}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Cost and balance of complaint routing (``route_complaint_lambda``).
+
+Seeds ``--franchises`` franchise users, then routes ``--complaints``
+complaints one at a time, each in its own queue batch,
+with franchises answering a share ``--answer`` of the open complaints as
+they go. Reports the routing latency, the Cognito and DynamoDB calls per
+complaint and how the open complaints ended up spread over the franchises,
+next to the same run with the original assignment: a random pick among the
+first page of 60 group members. Checks that every franchise was eligible,
+that the open-complaint counters match the complaints still open, and that
+the open complaints are spread more evenly than with the original pick.
+Answers reach a container's counts only when it re-reads them, every
+``LOAD_CACHE_SECONDS``, so the spread is wider than with exact counts.
+
+    cd backend
+    python -m benchmarks.complaint_routing --franchises 200 --complaints 2000 --answer 0.5 --latency-ms 5
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+
+from local_aws.emulator import COMPLAINT_QUEUE_ARN, Emulator
+from local_aws.events import sqs_event
+from local_aws.schemas import COMPLAINT_LOGS_TABLE, FRANCHISE_LOAD_TABLE
+
+from .common import print_table, quiet_handler_logs, summarize_latencies
+
+# Cognito's page size for ListUsersInGroup, all the original handler read
+FIRST_PAGE = 60
+
+
+def original(franchises, complaints, answer, rng):
+    """Open complaints per franchise with the original random pick among the first page"""
+    eligible = franchises[:FIRST_PAGE]
+    open_complaints = []
+    for _ in range(complaints):
+        open_complaints.append(rng.choice(eligible))
+        if rng.random() < answer:
+            open_complaints.pop(rng.randrange(len(open_complaints)))
+    return open_by_franchise(franchises, open_complaints), set(eligible)
+
+
+def open_by_franchise(franchises, assigned):
+    counts = Counter(dict.fromkeys(franchises, 0))
+    counts.update(assigned)
+    return counts
+
+
+def calls(metrics):
+    return sum(count for name, count in metrics.items() if name.startswith('calls.'))
+
+
+def spread(loads):
+    counts = list(loads.values())
+    return [max(counts), min(counts), f'{statistics.pstdev(counts):.2f}']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--franchises', type=int, default=200)
+    parser.add_argument('--complaints', type=int, default=2000)
+    parser.add_argument('--answer', type=float, default=0.5,
+                        help='chance that a franchise answers an open complaint after each one routed')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated round-trip per AWS call')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    emulator = Emulator()
+    quiet_handler_logs()
+    aws = emulator.aws
+    callers = {}
+    for i in range(args.franchises):
+        caller = emulator.add_user(f'franchise-{i:05d}@example.com', admin=True)
+        callers[caller.user_id] = caller
+    customer = emulator.add_user('customer@example.com')
+    aws.dynamodb.latency = aws.cognito_idp.latency = args.latency_ms / 1000.0
+
+    rng = random.Random(args.seed)
+    table_name = COMPLAINT_LOGS_TABLE['TableName']
+    dynamodb_calls = calls(aws.dynamodb.metrics)
+    cognito_calls = calls(aws.cognito_idp.metrics)
+    latencies = []
+    routed_calls = 0
+    assigned = set()
+    open_complaints = []
+    for _ in range(args.complaints):
+        message_id = str(uuid.uuid4())
+        message = {'messageId': message_id, 'bookingRef': 'booking-0', 'userId': customer.user_id,
+                   'complaint': 'The brakes were not working'}
+        before = calls(aws.dynamodb.metrics)
+        started = time.perf_counter()
+        record = {'MessageId': message_id, 'ReceiptHandle': message_id, 'Body': json.dumps(message)}
+        response = emulator.invoke('route_complaint', sqs_event([record], COMPLAINT_QUEUE_ARN))
+        latencies.append(time.perf_counter() - started)
+        routed_calls += calls(aws.dynamodb.metrics) - before
+        if response.get('batchItemFailures') or response.get('statusCode') == 502:
+            print(emulator.failures[-1][1] if emulator.failures else response, file=sys.stderr)
+            return 1
+        franchise = aws.dynamodb.get_item(TableName=table_name, Key={'messageId': {'S': message_id}})[
+            'Item']['assignedFranchiseId']['S']
+        assigned.add(franchise)
+        open_complaints.append((message_id, franchise))
+        if rng.random() < args.answer:
+            message_id, franchise = open_complaints.pop(rng.randrange(len(open_complaints)))
+            reply = emulator.call('POST /complaints/{id}/reply', callers[franchise],
+                                  body={'message': 'Sorry about that, we have fixed the brakes'},
+                                  path_parameters={'id': message_id})
+            if reply['statusCode'] != 200:
+                print(reply['body'], file=sys.stderr)
+                return 1
+    dynamodb_calls = calls(aws.dynamodb.metrics) - dynamodb_calls
+    cognito_calls = calls(aws.cognito_idp.metrics) - cognito_calls
+    aws.dynamodb.latency = aws.cognito_idp.latency = 0.0
+
+    actual = open_by_franchise(callers, (franchise for _, franchise in open_complaints))
+    counters = {franchise: 0 for franchise in callers}
+    for franchise in callers:
+        item = aws.dynamodb.get_item(TableName=FRANCHISE_LOAD_TABLE['TableName'],
+                                     Key={'franchiseId': {'S': franchise}}).get('Item')
+        if item:
+            counters[franchise] = int(item['openComplaints']['N'])
+    before, eligible = original(list(callers), args.complaints, args.answer, random.Random(args.seed))
+
+    summary = summarize_latencies(latencies)
+    print_table(
+        ['assignment', 'p50 ms', 'p95 ms', 'DynamoDB calls/complaint', 'eligible', 'max open', 'min open', 'stdev'],
+        [
+            ['random of first 60', '', '', '', f'{len(eligible)}/{args.franchises}'] + spread(before),
+            ['least loaded', f"{summary['p50']:.1f}", f"{summary['p95']:.1f}",
+             f'{routed_calls / args.complaints:.2f}', f'{len(assigned)}/{args.franchises}'] + spread(actual),
+        ]
+    )
+    print(f'\nCognito calls: {cognito_calls} for {args.complaints:,} complaints; '
+          f'DynamoDB calls including replies: {dynamodb_calls:,}')
+
+    failures = []
+    if args.complaints >= args.franchises and len(assigned) < args.franchises:
+        failures.append(f'only {len(assigned)} of {args.franchises} franchises were assigned a complaint')
+    wrong = sum(1 for franchise in callers if counters[franchise] != actual[franchise])
+    if wrong:
+        failures.append(f'{wrong} franchise counters differ from their open complaints')
+    if statistics.pstdev(actual.values()) >= statistics.pstdev(before.values()):
+        failures.append('open complaints are spread no more evenly than with the original pick')
+    if failures:
+        print()
+        for failure in failures:
+            print(f'FAIL {failure}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,381 @@
+"""
+How the read paths behave as their tables grow.
+
+For each table size in ``--sizes`` (10k, 100k and 1M items by default) this
+seeds the bookings, bike inventory and feedback tables of the local
+stand-in, calls every read path ``--requests`` times through the emulator
+and reports, per request: latency, items DynamoDB read, items it returned,
+read capacity consumed and the size of the response body. A read path
+whose items read grow with the table while its items returned do not is a
+scan.
+
+Results are compared with the committed baseline
+(``benchmarks/baselines/data_scale.json``); any metric more than
+``--max-regression`` percent above it fails the run. Latency depends on the
+machine, so it is only compared when it also moved by more than
+``NOISE_MS``. Refresh the baseline after an intended change with
+``--write-baseline``.
+
+    cd backend
+    python -m benchmarks.data_scale
+    python -m benchmarks.data_scale --sizes 10000 100000 --max-regression 10
+    python -m benchmarks.data_scale --write-baseline
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+from local_aws.emulator import ADMIN_GROUP, CUSTOMER_GROUP, Caller, Emulator
+from local_aws.schemas import (
+    BIKE_INVENTORY_TABLE, BOOKINGS_TABLE, COMPLAINT_LOGS_TABLE, FEEDBACK_BACKFILL_TABLE, FEEDBACK_SUMMARY_TABLE,
+    FEEDBACK_TABLE
+)
+
+from .common import print_table, quiet_handler_logs, summarize_latencies
+
+BASELINE = Path(__file__).resolve().parent / 'baselines' / 'data_scale.json'
+
+NOISE_MS = 5.0
+
+# Metrics compared with the baseline, all "lower is better"
+METRICS = ('p50_ms', 'items_read', 'read_units', 'response_kb')
+
+BIKE_TYPES = ('eBike', 'Gyroscooter', 'Segway')
+MODELS = tuple(f'{bike_type} model {i}' for bike_type in BIKE_TYPES for i in range(8))
+COMMENTS = (
+    'Great ride, battery lasted all day',
+    'Brakes felt poor on the hill',
+    'Nice and smooth',
+    'Terrible pickup experience',
+    'It was fine',
+)
+BATCH = 25
+
+
+class Case(NamedTuple):
+    name: str
+    table: str
+    route: str
+    request: Callable  # (Dataset, rng) -> Emulator.call keyword arguments
+    # Items a complete listing would hold, for read paths that list everything
+    expected: Callable = None  # Dataset -> int
+
+
+class Dataset:
+    """What was seeded, so requests can pick existing users and bookings"""
+
+    def __init__(self, size):
+        self.size = size
+        self.users = max(100, size // 20)
+        self.franchises = max(10, size // 1000)
+        self.admin = Caller('franchise-0', 'franchise-0@example.com', (ADMIN_GROUP,))
+
+    def customer(self, rng):
+        user_id = f'user-{rng.randrange(self.users):07d}'
+        return Caller(user_id, f'{user_id}@example.com', (CUSTOMER_GROUP,))
+
+    def franchise(self, rng):
+        franchise_id = f'franchise-{rng.randrange(self.franchises):05d}'
+        return Caller(franchise_id, f'{franchise_id}@example.com', (ADMIN_GROUP,))
+
+    def booking_id(self, rng):
+        return f'booking-{rng.randrange(self.size):08d}'
+
+
+def seed_table(client, table_name, items):
+    # Nothing consumes the seed's stream records; drop them as they come
+    # rather than hold a second copy of the table until the end
+    streamed = bool(client.describe_table(TableName=table_name)['Table'].get('StreamSpecification'))
+    batch = []
+    for item in items:
+        batch.append({'PutRequest': {'Item': item}})
+        if len(batch) == BATCH:
+            client.batch_write_item(RequestItems={table_name: batch})
+            batch = []
+            if streamed:
+                client.drain_stream(table_name)
+    if batch:
+        client.batch_write_item(RequestItems={table_name: batch})
+        if streamed:
+            client.drain_stream(table_name)
+
+
+def bookings(dataset, rng):
+    now = datetime.now(timezone.utc)
+    for i in range(dataset.size):
+        start = now + timedelta(hours=rng.randrange(-24 * 365, 24 * 30))
+        end = start + timedelta(hours=rng.choice((1, 2, 3)))
+        user_id = f'user-{i % dataset.users:07d}'
+        yield {
+            'bookingId': {'S': f'booking-{i:08d}'},
+            'userId': {'S': user_id},
+            'userEmail': {'S': f'{user_id}@example.com'},
+            'bikeId': {'S': f'bike-{rng.randrange(2000):05d}'},
+            'bikeModel': {'S': 'eBike model 0'},
+            'bikeType': {'S': 'eBike'},
+            'startDate': {'S': start.isoformat()},
+            'endDate': {'S': end.isoformat()},
+            'duration': {'N': str((end - start).seconds // 3600)},
+            'status': {'S': rng.choice(('active', 'completed', 'completed', 'cancelled'))},
+            'createdAt': {'S': now.isoformat()},
+            'updatedAt': {'S': now.isoformat()},
+            'bookingDate': {'S': start.date().isoformat()},
+            'version': {'N': '1'},
+        }
+
+
+def bikes(dataset, rng):
+    now = datetime.now(timezone.utc).isoformat()
+    for i in range(dataset.size):
+        model = MODELS[i % len(MODELS)]
+        yield {
+            'bikeId': {'S': f'bike-{i:08d}'},
+            'type': {'S': model.split(' ')[0]},
+            'model': {'S': model},
+            'accessCode': {'S': f'{rng.randrange(10 ** 6):06d}'},
+            'batteryLife': {'S': f'{rng.randrange(40, 101)}%'},
+            'hourlyRate': {'N': str(rng.choice((3, 4, 5, 6, 8)))},
+            'createdAt': {'S': now},
+        }
+
+
+def feedback(dataset, rng):
+    now = datetime.now(timezone.utc)
+    for i in range(dataset.size):
+        model = MODELS[i % len(MODELS)]
+        yield {
+            'feedbackId': {'S': f'feedback-{i:08d}'},
+            'bikeId': {'S': f'bike-{rng.randrange(2000):05d}'},
+            'model': {'S': model},
+            'type': {'S': model.split(' ')[0]},
+            'userEmail': {'S': f'user-{rng.randrange(dataset.users):07d}@example.com'},
+            'comment': {'S': rng.choice(COMMENTS)},
+            'sentiment': {'S': rng.choice(('Positive', 'Negative', 'Neutral'))},
+            'rating': {'S': str(rng.randrange(1, 6))},
+            'timestamp': {'S': (now - timedelta(minutes=i)).isoformat()},
+            'feedbackMonth': {'S': (now - timedelta(minutes=i)).strftime('%Y-%m')},
+        }
+
+
+def complaints(dataset, rng):
+    now = datetime.now(timezone.utc)
+    for i in range(dataset.size):
+        franchise_id = f'franchise-{rng.randrange(dataset.franchises):05d}'
+        yield {
+            'messageId': {'S': f'complaint-{i:08d}'},
+            'bookingRef': {'S': f'booking-{rng.randrange(dataset.size):08d}'},
+            'userId': {'S': f'user-{i % dataset.users:07d}'},
+            'userEmail': {'S': f'user-{i % dataset.users:07d}@example.com'},
+            'complaint': {'S': rng.choice(COMMENTS)},
+            'assignedFranchiseId': {'S': franchise_id},
+            'assignedFranchiseEmail': {'S': f'{franchise_id}@example.com'},
+            'timestampUTC': {'S': (now - timedelta(minutes=i)).isoformat().replace('+00:00', 'Z')},
+            'status': {'S': rng.choice(('forwarded', 'forwarded', 'answered'))},
+        }
+
+
+# Seeded one at a time, so only one table of the largest size is in memory
+TABLES = {
+    BOOKINGS_TABLE['TableName']: bookings,
+    BIKE_INVENTORY_TABLE['TableName']: bikes,
+    FEEDBACK_TABLE['TableName']: feedback,
+    COMPLAINT_LOGS_TABLE['TableName']: complaints,
+}
+
+# Tables derived from a seeded one by a job, run after seeding: (handler, table)
+DERIVED = {
+    FEEDBACK_TABLE['TableName']: ('rebuild_feedback_summary', FEEDBACK_SUMMARY_TABLE['TableName']),
+}
+
+# Items a completed one-off job leaves behind for a seeded table: every
+# seeded feedback item has a feedbackMonth, as after the backfill
+MARKERS = {
+    FEEDBACK_TABLE['TableName']: (FEEDBACK_BACKFILL_TABLE['TableName'],
+                                  {'runId': {'S': 'feedbackMonth'}, 'segment': {'N': '0'}}),
+}
+
+CASES = (
+    Case('get_bookings (admin)', BOOKINGS_TABLE['TableName'], 'GET /bookings',
+         lambda data, rng: {'caller': data.admin}),
+    Case('get_bookings (admin, status)', BOOKINGS_TABLE['TableName'], 'GET /bookings',
+         lambda data, rng: {'caller': data.admin, 'query': {'status': 'active'}}),
+    Case('get_bookings (customer)', BOOKINGS_TABLE['TableName'], 'GET /bookings',
+         lambda data, rng: {'caller': data.customer(rng)}),
+    Case('get_booking_details', BOOKINGS_TABLE['TableName'], 'GET /bookings/{bookingId}',
+         lambda data, rng: {'caller': data.admin, 'path_parameters': {'bookingId': data.booking_id(rng)}}),
+    Case('list_bikes', BIKE_INVENTORY_TABLE['TableName'], 'GET /bikes',
+         lambda data, rng: {}, lambda data: data.size),
+    Case('list_bikes (type, page)', BIKE_INVENTORY_TABLE['TableName'], 'GET /bikes',
+         lambda data, rng: {'query': {'type': rng.choice(BIKE_TYPES), 'limit': '50'}}),
+    Case('get_feedback', FEEDBACK_TABLE['TableName'], 'GET /get-feedback',
+         lambda data, rng: {}),
+    Case('get_feedback (page)', FEEDBACK_TABLE['TableName'], 'GET /get-feedback',
+         lambda data, rng: {'query': {'limit': '50'}}),
+    Case('get_feedback (model)', FEEDBACK_TABLE['TableName'], 'GET /get-feedback',
+         lambda data, rng: {'query': {'model': rng.choice(MODELS)}}),
+    Case('feedback_summary (model)', FEEDBACK_TABLE['TableName'], 'GET /feedback/summary',
+         lambda data, rng: {'query': {'model': rng.choice(MODELS)}}),
+    Case('get_complaints (customer)', COMPLAINT_LOGS_TABLE['TableName'], 'GET /complaints',
+         lambda data, rng: {'caller': data.customer(rng)}),
+    Case('get_complaints (franchise, page)', COMPLAINT_LOGS_TABLE['TableName'], 'GET /complaints',
+         lambda data, rng: {'caller': data.franchise(rng), 'query': {'role': 'franchise', 'limit': '50'}}),
+    Case('get_complaints (franchise, status)', COMPLAINT_LOGS_TABLE['TableName'], 'GET /complaints',
+         lambda data, rng: {'caller': data.franchise(rng),
+                            'query': {'role': 'franchise', 'status': 'answered', 'limit': '50'}}),
+)
+
+
+def measure(emulator, case, dataset, requests, rng):
+    metrics = emulator.aws.dynamodb.metrics
+    latencies = []
+    read = returned = units = size = listed = 0
+    for _ in range(requests):
+        kwargs = case.request(dataset, rng)
+        before = (metrics['items_read'], metrics['items_returned'], metrics['read_units'])
+        started = time.perf_counter()
+        response = emulator.call(case.route, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        if response['statusCode'] != 200:
+            raise RuntimeError(f'{case.name} answered {response["statusCode"]}: {response["body"][:200]}')
+        read += metrics['items_read'] - before[0]
+        returned += metrics['items_returned'] - before[1]
+        units += metrics['read_units'] - before[2]
+        size += len(response['body'].encode('utf-8'))
+        body = json.loads(response['body'])
+        listed += len(body) if isinstance(body, list) else len(
+            body.get('bookings', body.get('bikes', body.get('feedback', body.get('complaints', [body])))))
+    summary = summarize_latencies(latencies)
+    return {
+        'p50_ms': round(summary['p50'], 2),
+        'p95_ms': round(summary['p95'], 2),
+        'items_read': read / requests,
+        'items_returned': returned / requests,
+        'read_units': units / requests,
+        'response_kb': round(size / requests / 1024, 2),
+        'listed': listed / requests,
+        'expected': case.expected(dataset) if case.expected else None,
+    }
+
+
+def run(sizes, cases, requests, latency_ms, seed):
+    emulator = Emulator()
+    quiet_handler_logs()
+    results = {}
+    for size in sizes:
+        dataset = Dataset(size)
+        results[str(size)] = {}
+        for table_name, generate in TABLES.items():
+            table_cases = [case for case in cases if case.table == table_name]
+            if not table_cases:
+                continue
+            dynamodb = emulator.aws.dynamodb
+            dynamodb.latency = 0.0
+            started = time.perf_counter()
+            seed_table(dynamodb, table_name, generate(dataset, random.Random(seed)))
+            if table_name in DERIVED:
+                emulator.invoke(DERIVED[table_name][0], {})
+            if table_name in MARKERS:
+                dynamodb.put_item(TableName=MARKERS[table_name][0], Item=MARKERS[table_name][1])
+            print(f'seeded {size:,} items into {table_name} in {time.perf_counter() - started:.1f}s',
+                  file=sys.stderr)
+            dynamodb.latency = latency_ms / 1000.0
+            for case in table_cases:
+                rng = random.Random(seed)
+                # The first call pays for sorting the stand-in's scan order
+                measure(emulator, case, dataset, 1, rng)
+                results[str(size)][case.name] = measure(emulator, case, dataset, requests, rng)
+            dynamodb.truncate(table_name)
+            if table_name in DERIVED:
+                dynamodb.truncate(DERIVED[table_name][1])
+            if table_name in MARKERS:
+                dynamodb.truncate(MARKERS[table_name][0])
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """Regressions against ``baseline`` as printable lines"""
+    failures = []
+    for size, by_case in results.items():
+        for name, now in by_case.items():
+            before = baseline.get(size, {}).get(name)
+            if before is None:
+                continue
+            for metric in METRICS:
+                old, new = before.get(metric), now[metric]
+                if not old or new <= old:
+                    continue
+                change = (new - old) / old * 100
+                if change <= max_regression:
+                    continue
+                if metric == 'p50_ms' and new - old <= NOISE_MS:
+                    continue
+                failures.append(f'{name} at {int(size):,} items: {metric} {old:g} -> {new:g} ({change:+.0f}%)')
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help='items seeded into each table')
+    parser.add_argument('--requests', type=int, default=20, help='calls per read path and size')
+    parser.add_argument('--latency-ms', type=float, default=10.0, help='simulated round-trip per DynamoDB call')
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--max-regression', type=float, default=25.0, metavar='PCT',
+                        help='fail if a metric is this much above the baseline')
+    parser.add_argument('--write-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('cases', nargs='*', help='only read paths whose name contains one of these')
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if not args.cases or any(part in case.name for part in args.cases)]
+    results = run(args.sizes, cases, args.requests, args.latency_ms, args.seed)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(
+            ['read path', 'items', 'p50 ms', 'p95 ms', 'read/req', 'returned/req', 'RCU/req', 'KB/resp'],
+            [[name, f'{int(size):,}', f"{r['p50_ms']:.1f}", f"{r['p95_ms']:.1f}", f"{r['items_read']:.0f}",
+              f"{r['items_returned']:.0f}", f"{r['read_units']:.1f}", f"{r['response_kb']:.1f}"]
+             for size, by_case in results.items() for name, r in by_case.items()]
+        )
+
+    # Listings that stop at DynamoDB's first 1 MB page without saying so
+    truncated = [
+        (name, size, r) for size, by_case in results.items() for name, r in by_case.items()
+        if r['expected'] and r['listed'] < r['expected']
+    ]
+    if truncated:
+        print()
+        for name, size, r in truncated:
+            print(f"WARN {name} at {int(size):,} items lists {r['listed']:,.0f} of {r['expected']:,}")
+
+    if args.write_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        for size, by_case in results.items():
+            baseline.setdefault(size, {}).update(by_case)
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        print(f'\nwrote {args.baseline}')
+        return 0
+
+    if not args.baseline.exists():
+        print(f'\nno baseline at {args.baseline}; run with --write-baseline to create one')
+        return 0
+    failures = compare(results, json.loads(args.baseline.read_text()), args.max_regression)
+    if failures:
+        print()
+        for failure in failures:
+            print(f'FAIL {failure}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
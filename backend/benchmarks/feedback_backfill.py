@@ -0,0 +1,130 @@
+"""
+Throughput of the sentiment backfill (``rescore_feedback_lambda``).
+
+Seeds ``--items`` feedback items with sentiments from an older scorer (and
+a share without ``feedbackMonth``, some of them without a comment), then runs one backfill in invocations
+cut off after ``--slice`` seconds, each resuming from the checkpoints of the
+last, as Lambda's time limit would. Reports items scanned and rewritten per
+second, the write units per second the backfill used against its
+``--wcu`` budget, and the time 5M items would take at that rate. Checks
+that every item ends with a ``feedbackMonth`` and every commented one with
+the current scorer's sentiment, that the run marks MonthTimeIndex
+complete, and that a second run rewrites nothing.
+
+    cd backend
+    python -m benchmarks.feedback_backfill --items 200000 --segments 32 --workers 8 --wcu 1500 --latency-ms 5
+"""
+import argparse
+import random
+import sys
+import time
+
+from local_aws.emulator import Emulator
+from local_aws.schemas import FEEDBACK_BACKFILL_TABLE, FEEDBACK_TABLE
+
+from .common import print_table, quiet_handler_logs
+from .data_scale import Dataset, feedback, seed_table
+
+TARGET_ITEMS = 5_000_000
+
+
+def stale(items, rng, without_month, without_comment):
+    """Seeded feedback as an older scorer left it"""
+    for item in items:
+        if rng.random() < without_month:
+            del item['feedbackMonth']
+        if rng.random() < without_comment:
+            del item['comment']
+        yield item
+
+
+def scan_all(client, table_name):
+    params = {'TableName': table_name}
+    while True:
+        response = client.scan(**params)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=200000)
+    parser.add_argument('--segments', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--wcu', type=float, default=1500.0, help='write units per second the backfill may use')
+    parser.add_argument('--slice', type=float, default=10.0, help='seconds per invocation')
+    parser.add_argument('--without-month', type=float, default=0.1, help='share of items without feedbackMonth')
+    parser.add_argument('--without-comment', type=float, default=0.05, help='share of items without a comment')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated round-trip per DynamoDB call')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    emulator = Emulator()
+    quiet_handler_logs()
+    dynamodb = emulator.aws.dynamodb
+    table_name = FEEDBACK_TABLE['TableName']
+    rng = random.Random(args.seed)
+    seed_table(dynamodb, table_name, stale(feedback(Dataset(args.items), rng), rng, args.without_month,
+                                                    args.without_comment))
+    dynamodb.latency = args.latency_ms / 1000.0
+
+    handler = emulator.handlers['rescore_feedback']
+    handler.WORKERS = args.workers
+    handler.WRITE_BUDGET = args.wcu
+    write_units = dynamodb.metrics['write_units']
+
+    invocations = 0
+    result = {}
+    started = time.perf_counter()
+    while not result.get('complete'):
+        event = {'segments': args.segments, 'stopAfterSeconds': args.slice}
+        if result:
+            event['runId'] = result['runId']
+        result = emulator.invoke('rescore_feedback', event)
+        invocations += 1
+        if 'runId' not in result:
+            print(emulator.failures[-1][1] if emulator.failures else result, file=sys.stderr)
+            return 1
+    elapsed = time.perf_counter() - started
+    used = dynamodb.metrics['write_units'] - write_units
+
+    rate = result['scanned'] / elapsed
+    print_table(
+        ['items', 'invocations', 'seconds', 'items/s', 'rewritten', 'WCU/s', 'budget', '5M items in'],
+        [[f"{result['scanned']:,}", invocations, f'{elapsed:.1f}', f'{rate:,.0f}', f"{result['rescored']:,}",
+          f'{used / elapsed:,.0f}', f'{args.wcu:,.0f}', f'{TARGET_ITEMS / rate / 60:.0f} min']]
+    )
+
+    failures = []
+    dynamodb.latency = 0.0
+    scorer = handler.scorer
+    wrong = sum(
+        1 for item in scan_all(dynamodb, table_name)
+        if 'feedbackMonth' not in item
+        or 'comment' in item and item['sentiment']['S'] != scorer.label(item['comment']['S'])
+    )
+    marker = dynamodb.get_item(TableName=FEEDBACK_BACKFILL_TABLE['TableName'],
+                               Key={'runId': {'S': 'feedbackMonth'}, 'segment': {'N': '0'}}).get('Item')
+    if result['scanned'] != args.items:
+        failures.append(f"scanned {result['scanned']:,} of {args.items:,} items")
+    if wrong:
+        failures.append(f'{wrong:,} items left with a stale sentiment or no feedbackMonth')
+    if not marker:
+        failures.append('the run did not mark MonthTimeIndex complete')
+    if used / elapsed > args.wcu * 1.1:
+        failures.append(f'used {used / elapsed:,.0f} WCU/s against a budget of {args.wcu:,.0f}')
+    again = emulator.invoke('rescore_feedback', {'segments': args.segments})
+    if again.get('rescored'):
+        failures.append(f"a second run rewrote {again['rescored']:,} items")
+    if failures:
+        print()
+        for failure in failures:
+            print(f'FAIL {failure}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+Per-invocation CPU of the request plumbing the booking handlers share, and
+the size of their deployment zips.
+
+``inline`` is the code every handler used to carry: the claims fallback
+chain, the CORS header literal rebuilt on each return, hand-written item
+unmarshalling and, in create/get_bookings, JSON dumps of the event and
+authorizer logged at INFO. ``shared`` is the same work through
+``booking_runtime.claims``, ``booking_runtime.codec`` and
+``booking_runtime.http``.
+
+With ``--baseline REV`` the zips are also built from the handler and layer
+sources at that git revision for comparison.
+
+    cd backend
+    python -m benchmarks.runtime_overhead --baseline HEAD~1
+"""
+import argparse
+import io
+import json
+import logging
+import subprocess
+import sys
+import timeit
+import zipfile
+from pathlib import Path
+
+from local_aws.aws import BACKEND_DIR, LAYER_PATHS
+from local_aws.events import http_event, jwt_claims
+
+from .common import print_table
+
+HANDLERS = [
+    'create_booking_lambda.py',
+    'get_bookings_lambda.py',
+    'get_booking_details_lambda.py',
+    'update_booking_lambda.py',
+    'cancel_booking_lambda.py',
+]
+LAMBDAS_DIR = Path('booking-module/lambdas')
+LAYER_DIR = Path('booking-module/layer')
+
+ITEM = {
+    'bookingId': {'S': '5bd465f4-5796-48ad-8ba2-5f91456311b1'},
+    'userId': {'S': 'user-1'},
+    'userEmail': {'S': 'user-1@example.com'},
+    'bikeId': {'S': 'bike-1'},
+    'startDate': {'S': '2026-10-19T20:00:00.000Z'},
+    'endDate': {'S': '2026-10-19T22:00:00.000Z'},
+    'duration': {'N': '2'},
+    'status': {'S': 'active'},
+    'notes': {'S': 'Helmet, please'},
+    'createdAt': {'S': '2026-10-18T20:30:04.157203+00:00'},
+    'updatedAt': {'S': '2026-10-18T20:30:04.157203+00:00'},
+    'bikeModel': {'S': 'Xiaomi M365'},
+    'bikeType': {'S': 'eBike'},
+    'bookingDate': {'S': '2026-10-19'},
+    'slotLocked': {'BOOL': True},
+    'version': {'N': '3'},
+}
+
+
+def inline_request(event, item, logger):
+    """Claims, one booking and the response, as the handlers did it inline."""
+    logger.info(f"Event structure: {json.dumps(event, default=str)}")
+    logger.info(f"Authorizer structure: {json.dumps(event.get('requestContext', {}).get('authorizer', {}), default=str)}")
+    authorizer = event.get('requestContext', {}).get('authorizer', {})
+    if 'claims' in authorizer:
+        claims = authorizer['claims']
+        user_id = claims.get('sub', 'unknown')
+        user_email = claims.get('email', 'unknown@example.com')
+        user_groups = claims.get('cognito:groups', '')
+    elif 'jwt' in authorizer:
+        jwt_data = authorizer['jwt']
+        user_id = jwt_data.get('sub', 'unknown')
+        user_email = jwt_data.get('email', 'unknown@example.com')
+        user_groups = jwt_data.get('cognito:groups', '')
+    else:
+        user_id = authorizer.get('sub', 'unknown')
+        user_email = authorizer.get('email', 'unknown@example.com')
+        user_groups = authorizer.get('cognito:groups', '')
+    logger.info(f"Extracted user_id: {user_id}, user_email: {user_email}, groups: {user_groups}")
+    is_admin = 'BikeFranchise' in user_groups
+    booking = {
+        'bookingId': item['bookingId']['S'],
+        'userId': item['userId']['S'],
+        'userEmail': item.get('userEmail', {}).get('S', ''),
+        'bikeId': item['bikeId']['S'],
+        'startDate': item['startDate']['S'],
+        'endDate': item['endDate']['S'],
+        'duration': int(item['duration']['N']),
+        'status': item['status']['S'],
+        'notes': item.get('notes', {}).get('S', ''),
+        'createdAt': item['createdAt']['S'],
+        'updatedAt': item.get('updatedAt', {}).get('S', ''),
+        'bikeModel': item.get('bikeModel', {}).get('S', 'Unknown'),
+        'bikeType': item.get('bikeType', {}).get('S', 'Unknown')
+    }
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+            'Access-Control-Allow-Methods': 'GET,OPTIONS'
+        },
+        'body': json.dumps({'booking': booking, 'userEmail': user_email, 'isAdmin': is_admin})
+    }
+
+
+def shared_request(event, item, logger):
+    """The same through the shared runtime."""
+    from booking_runtime.claims import caller_from_event
+    from booking_runtime.codec import BOOKING
+    from booking_runtime.http import GET_HEADERS, respond
+
+    caller = caller_from_event(event)
+    return respond(200, {
+        'booking': BOOKING.decode(item),
+        'userEmail': caller.email,
+        'isAdmin': caller.is_admin
+    }, GET_HEADERS)
+
+
+def zip_size(files):
+    """Deflated size of a zip holding ``files`` ({archive name: bytes})."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in sorted(files.items()):
+            archive.writestr(name, data)
+    return len(buffer.getvalue())
+
+
+def _git_show(rev, path):
+    result = subprocess.run(
+        ['git', 'show', f'{rev}:backend/{path.as_posix()}'],
+        cwd=BACKEND_DIR, capture_output=True
+    )
+    return result.stdout if result.returncode == 0 else None
+
+
+def _git_layer_files(rev):
+    result = subprocess.run(
+        ['git', 'ls-tree', '-r', '--name-only', rev, f'backend/{LAYER_DIR.as_posix()}'],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    prefix = f'backend/{LAYER_DIR.as_posix()}/'
+    return {
+        name[len(prefix):]: _git_show(rev, Path(name[len('backend/'):]))
+        for name in result.stdout.split()
+        if name.endswith('.py')
+    }
+
+
+def deployment_sizes(rev=None):
+    """Zip size per handler, plus the layer, now or at ``rev``."""
+    sizes = {}
+    for handler in HANDLERS:
+        path = LAMBDAS_DIR / handler
+        data = _git_show(rev, path) if rev else (BACKEND_DIR / path).read_bytes()
+        sizes[handler] = zip_size({handler: data}) if data is not None else None
+    if rev:
+        layer = _git_layer_files(rev)
+    else:
+        root = BACKEND_DIR / LAYER_DIR
+        layer = {p.relative_to(root).as_posix(): p.read_bytes() for p in root.rglob('*.py')}
+    sizes['layer'] = zip_size(layer) if layer else 0
+    return sizes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=20000, help='calls per timing')
+    parser.add_argument('--baseline', help='git revision to compare deployment zips against')
+    args = parser.parse_args(argv)
+
+    for layer_path in LAYER_PATHS:
+        sys.path.insert(0, str(layer_path))
+
+    # Logged lines go to a buffer at INFO, as the handlers' root logger
+    # writes them to CloudWatch
+    logger = logging.getLogger('benchmarks.runtime_overhead')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler(io.StringIO()))
+
+    event = http_event('GET', '/bookings/5bd465f4', claims=jwt_claims('user-1', groups=['Customers']),
+                       path_parameters={'bookingId': '5bd465f4'})
+    # The inline chain only finds claims in the REST API shape
+    rest_event = json.loads(json.dumps(event))
+    rest_event['requestContext']['authorizer'] = {'claims': event['requestContext']['authorizer']['jwt']['claims']}
+
+    rows = []
+    for name, fn, ev in (('inline', inline_request, rest_event), ('shared', shared_request, event)):
+        fn(ev, ITEM, logger)
+        seconds = min(timeit.repeat(lambda: fn(ev, ITEM, logger), number=args.number, repeat=5))
+        rows.append([name, f'{seconds / args.number * 1e6:.1f}'])
+    print_table(['request plumbing', 'us/invocation'], rows)
+
+    now = deployment_sizes()
+    before = deployment_sizes(args.baseline) if args.baseline else None
+    rows = []
+    for name in HANDLERS + ['layer']:
+        row = [name, now[name]]
+        if before is not None:
+            row += [before[name] if before[name] is not None else '-']
+        rows.append(row)
+    total = sum(now.values())
+    rows.append(['total', total] + ([sum(v or 0 for v in before.values())] if before else []))
+    print()
+    print_table(['zip', 'bytes'] + ([f'bytes at {args.baseline}'] if before else []), rows)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Cost of sentiment scoring as the lexicon grows.
+
+Scores ``--comments`` generated feedback comments with lexicons of
+``--sizes`` terms (the built-in lexicon padded with generated words) three
+ways:
+
+- substring:  the original ``analyze_sentiment``, one ``in`` test of the
+              lowercased comment per keyword
+- compiled:   ``dalscooter_runtime.sentiment.Scorer.label``, one comment at
+              a time
+- batch:      ``Scorer.label_many`` over the whole batch
+
+and prints microseconds per comment. Also prints how each classifies a few
+comments the substring test gets wrong. Exits non-zero if the compiled
+scorer's cost per comment at the largest lexicon is more than
+``--max-growth`` times its cost at the smallest.
+
+    cd backend
+    python -m benchmarks.sentiment_scorer --sizes 14 100 1000 10000 --comments 5000
+"""
+import argparse
+import random
+import string
+import sys
+import time
+
+from local_aws.aws import LAYER_PATHS
+
+from .common import print_table
+
+ORIGINAL_POSITIVE = ['good', 'great', 'excellent', 'awesome', 'love', 'nice', 'happy']
+ORIGINAL_NEGATIVE = ['bad', 'poor', 'terrible', 'hate', 'worst', 'awful', 'disappointed']
+
+SUBJECTS = ('the bike', 'the scooter', 'the battery', 'the brakes', 'pickup', 'the app', 'the seat')
+FILLER = ('it was', 'honestly', 'overall', 'today', 'on the way to campus', 'for the price', 'again')
+
+EXAMPLES = (
+    'not good at all',
+    'said goodbye to the scooter at the dock',
+    'the brakes were not working',
+    'never had a bad ride',
+    'great bike but the battery ran out',
+)
+
+
+def substring_label(keywords):
+    """The original analyze_sentiment over ``keywords`` ({word: weight})"""
+    positive = [word for word, weight in keywords.items() if weight > 0]
+    negative = [word for word, weight in keywords.items() if weight < 0]
+
+    def label(text):
+        text_lower = text.lower()
+        score = 0
+        for word in positive:
+            if word in text_lower:
+                score += 1
+        for word in negative:
+            if word in text_lower:
+                score -= 1
+        if score > 0:
+            return 'Positive'
+        elif score < 0:
+            return 'Negative'
+        return 'Neutral'
+    return label
+
+
+def lexicon(size, base, rng):
+    """``base`` padded to ``size`` terms with generated words and two-word phrases"""
+    terms = dict(list(base.items())[:size])
+    while len(terms) < size:
+        word = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randrange(5, 11)))
+        if rng.random() < 0.2:
+            word += ' ' + ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randrange(3, 8)))
+        terms.setdefault(word, rng.choice((-2.0, -1.0, -0.5, 0.5, 1.0, 2.0)))
+    return terms
+
+
+def comments(count, words, rng):
+    result = []
+    for _ in range(count):
+        parts = [rng.choice(FILLER), rng.choice(SUBJECTS), 'was']
+        for _ in range(rng.randrange(1, 4)):
+            if rng.random() < 0.2:
+                parts.append('not')
+            parts.append(rng.choice(words))
+        if rng.random() < 0.5:
+            parts.append(', ' + rng.choice(FILLER))
+        result.append(' '.join(parts).capitalize() + rng.choice(('.', '!', '')))
+    return result
+
+
+def per_comment_us(label_all, texts, repeat=3):
+    """Best of ``repeat`` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        label_all(texts)
+        best = min(best, time.perf_counter() - started)
+    return best / len(texts) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[14, 100, 1000, 10000], help='lexicon terms')
+    parser.add_argument('--comments', type=int, default=5000)
+    parser.add_argument('--max-growth', type=float, default=2.0,
+                        help='largest allowed ratio of compiled cost at the largest and smallest lexicon')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    for layer_path in LAYER_PATHS:
+        sys.path.insert(0, str(layer_path))
+    from dalscooter_runtime.sentiment import DEFAULT_LEXICON, Scorer
+
+    rng = random.Random(args.seed)
+    # The original 14 keywords first, so the smallest size is the old lexicon
+    base = {word: 1.0 for word in ORIGINAL_POSITIVE}
+    base.update({word: -1.0 for word in ORIGINAL_NEGATIVE})
+    base.update((term, weight) for term, weight in DEFAULT_LEXICON.items() if term not in base)
+
+    # The same comments at every size, so only the lexicon changes
+    texts = comments(args.comments, list(base), random.Random(args.seed))
+    rows = []
+    compiled_costs = []
+    for size in args.sizes:
+        terms = lexicon(size, base, rng)
+        scorer = Scorer(terms)
+        substring = substring_label(terms)
+        compiled = per_comment_us(lambda batch: [scorer.label(text) for text in batch], texts)
+        compiled_costs.append(compiled)
+        rows.append([
+            f'{size:,}',
+            f'{per_comment_us(lambda batch: [substring(text) for text in batch], texts):.1f}',
+            f'{compiled:.1f}',
+            f'{per_comment_us(scorer.label_many, texts):.1f}',
+        ])
+    print_table(['lexicon terms', 'substring us', 'compiled us', 'batch us'], rows)
+
+    print()
+    original = substring_label(lexicon(14, base, rng))
+    scorer = Scorer(DEFAULT_LEXICON)
+    print_table(['comment', 'substring', 'compiled'],
+                [[text, original(text), scorer.label(text)] for text in EXAMPLES])
+
+    growth = compiled_costs[-1] / compiled_costs[0]
+    if growth > args.max_growth:
+        print()
+        print(f'FAIL compiled scoring costs {growth:.1f}x as much per comment with '
+              f'{args.sizes[-1]:,} terms as with {args.sizes[0]:,}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Write volume and throughput of battery telemetry ingestion.
+
+Simulates ``--bikes`` scooters reporting their battery every 30 seconds for
+``--minutes``, with a share of readings sent twice and a share arriving
+late, and feeds them to the ingest lambda in the batches the SQS event
+source mapping would gather for each batching window. Reports DynamoDB
+writes per reading, which coalescing keeps at two per bike per batch
+however many readings a bike sent, plus at most one catalog version bump
+per batch, and checks that every bike ends with
+its latest reading and a history of its newest readings.
+
+    cd backend
+    python -m benchmarks.telemetry_ingest --bikes 2000 --minutes 10 --windows 10 60 --latency-ms 5
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from local_aws.emulator import Emulator
+from local_aws.events import sqs_event
+from local_aws.schemas import BIKE_INVENTORY_TABLE, BIKE_TELEMETRY_TABLE
+
+from .common import print_table, quiet_handler_logs
+from .data_scale import Dataset, bikes, seed_table
+
+REPORT_INTERVAL = 30
+QUEUE_ARN = 'arn:aws:sqs:us-east-1:000000000000:DALScooterBikeTelemetry'
+
+
+def generate(args, rng, start):
+    """(arrival, reading) pairs in arrival order"""
+    arrivals = []
+    for i in range(args.bikes):
+        bike_id = f'bike-{i:08d}'
+        phase = rng.uniform(0, REPORT_INTERVAL)
+        level = rng.randrange(60, 101)
+        for tick in range(args.minutes * 60 // REPORT_INTERVAL):
+            reported_at = start + int(phase + tick * REPORT_INTERVAL)
+            level = max(0, level - rng.choice((0, 0, 1)))
+            reading = {'bikeId': bike_id, 'batteryLife': level, 'reportedAt': reported_at}
+            delay = rng.uniform(0, 2)
+            if rng.random() < args.late:
+                delay += rng.uniform(REPORT_INTERVAL, 2 * REPORT_INTERVAL)
+            arrivals.append((reported_at + delay, reading))
+            if rng.random() < args.duplicates:
+                arrivals.append((reported_at + delay + rng.uniform(0, 5), reading))
+    arrivals.sort(key=lambda arrival: arrival[0])
+    return arrivals
+
+
+def batches(arrivals, window, batch_size):
+    """What the event source mapping delivers: a batch per window or per ``batch_size`` messages"""
+    batch = []
+    opened = None
+    for arrived, reading in arrivals:
+        if batch and (arrived - opened >= window or len(batch) == batch_size):
+            yield batch
+            batch = []
+        if not batch:
+            opened = arrived
+        batch.append(reading)
+    if batch:
+        yield batch
+
+
+def expected_state(arrivals, history_size):
+    latest = {}
+    history = {}
+    for _, reading in arrivals:
+        bike_id, reported_at = reading['bikeId'], reading['reportedAt']
+        history.setdefault(bike_id, {})[reported_at] = reading['batteryLife']
+        if reported_at >= latest.get(bike_id, (0, 0))[0]:
+            latest[bike_id] = (reported_at, reading['batteryLife'])
+    return latest, {bike_id: sorted(readings.items())[-history_size:] for bike_id, readings in history.items()}
+
+
+def check(emulator, arrivals, history_size):
+    from dalscooter_runtime import telemetry
+
+    latest, history = expected_state(arrivals, history_size)
+    inventory = emulator.aws.dynamodb.scan(TableName=BIKE_INVENTORY_TABLE['TableName'])['Items']
+    stored = {
+        item['bikeId']['S']: telemetry.unpack(item['readings']['B'])
+        for item in emulator.aws.dynamodb.scan(TableName=BIKE_TELEMETRY_TABLE['TableName'])['Items']
+    }
+    wrong = 0
+    for item in inventory:
+        bike_id = item['bikeId']['S']
+        reported_at, level = latest[bike_id]
+        if item['batteryLife']['S'] != f'{level}%' or item['batteryReportedAt']['S'] != telemetry.format_time(reported_at):
+            wrong += 1
+        elif [tuple(reading) for reading in stored.get(bike_id, [])] != history[bike_id]:
+            wrong += 1
+    return wrong
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bikes', type=int, default=2000)
+    parser.add_argument('--minutes', type=int, default=10)
+    parser.add_argument('--windows', type=float, nargs='+', default=[10, 60],
+                        help='batching windows in seconds')
+    parser.add_argument('--batch-size', type=int, default=10000, help='most messages per batch')
+    parser.add_argument('--duplicates', type=float, default=0.05, help='share of readings sent twice')
+    parser.add_argument('--late', type=float, default=0.05, help='share of readings delayed past the next one')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated round-trip per DynamoDB call')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    arrivals = generate(args, rng, start=int(time.time()) - args.minutes * 60)
+    distinct = len({(reading['bikeId'], reading['reportedAt']) for _, reading in arrivals})
+
+    rows = []
+    failures = []
+    for window in args.windows:
+        emulator = Emulator()
+        quiet_handler_logs()
+        seed_table(emulator.aws.dynamodb, BIKE_INVENTORY_TABLE['TableName'],
+                   bikes(Dataset(args.bikes), random.Random(args.seed)))
+        emulator.aws.dynamodb.latency = args.latency_ms / 1000.0
+        metrics = emulator.aws.dynamodb.metrics
+        handler = emulator.handlers['ingest_telemetry']
+        updates, puts = metrics['calls.UpdateItem'], metrics['calls.PutItem']
+
+        count = 0
+        bike_batches = 0
+        started = time.perf_counter()
+        for count, batch in enumerate(batches(arrivals, window, args.batch_size), 1):
+            messages = [
+                {'MessageId': f'{window}-{count}-{i}', 'ReceiptHandle': f'{window}-{count}-{i}',
+                 'Body': json.dumps(reading)}
+                for i, reading in enumerate(batch)
+            ]
+            bike_batches += len({reading['bikeId'] for reading in batch})
+            response = emulator.invoke('ingest_telemetry', sqs_event(messages, QUEUE_ARN))
+            if response.get('batchItemFailures'):
+                failures.append(f'{window:g}s window: batch {count} reported '
+                                f'{len(response["batchItemFailures"])} failed messages')
+        elapsed = time.perf_counter() - started
+
+        writes = metrics['calls.UpdateItem'] - updates + metrics['calls.PutItem'] - puts
+        rows.append([f'{window:g}', count, len(arrivals), writes, f'{writes / len(arrivals):.2f}',
+                     f'{len(arrivals) / elapsed:.0f}'])
+        if not 2 * bike_batches <= writes <= 2 * bike_batches + count:
+            failures.append(f'{window:g}s window: {writes} writes for {bike_batches} bike batches')
+        wrong = check(emulator, arrivals, handler.HISTORY_SIZE)
+        if wrong:
+            failures.append(f'{window:g}s window: {wrong} bikes with the wrong battery level or history')
+
+    print(f'{args.bikes} bikes, {len(arrivals)} messages, {distinct} distinct readings')
+    print()
+    print_table(['window s', 'batches', 'readings', 'writes', 'writes/reading', 'readings/s'], rows)
+    if failures:
+        print()
+        for failure in failures:
+            print(f'FAIL {failure}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
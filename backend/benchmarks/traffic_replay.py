@@ -0,0 +1,275 @@
+"""
+Replays a mix of user sessions against the whole backend running in-process
+(``local_aws.emulator``) and reports latency and errors per handler.
+
+Sessions start open-loop at ``--rate`` per second for ``--duration``
+seconds, whatever the backend's response times, and run on a pool of
+``--concurrency`` workers; ``lag`` is how far session starts fell behind
+schedule once the pool was saturated. Each session is one of:
+
+- browse:   list bikes, search availability
+- book:     search availability, book a free bike, list own bookings
+- cancel:   cancel one of the bookings made earlier in the run
+- complain: submit a complaint about a booking, list own complaints
+- feedback: submit feedback on a bike, read the feedback list
+
+Stream consumers and the queue-fed complaint router run as the
+emulator pumps their triggers in the background. Exits non-zero if any
+handler returned a 5xx or raised.
+
+    cd backend
+    python -m benchmarks.traffic_replay --rate 50 --duration 20 --latency-ms 5
+    python -m benchmarks.traffic_replay --mix browse=80,book=20
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from local_aws.emulator import Emulator
+
+from .common import print_table, quiet_handler_logs, summarize_latencies
+
+BIKE_TYPES = ('eBike', 'Gyroscooter', 'Segway')
+MODELS = {'eBike': 'Xiaomi M365', 'Gyroscooter': 'Ninebot S', 'Segway': 'Segway i2 SE'}
+COMMENTS = (
+    'Great ride, battery lasted all day',
+    'Brakes felt poor on the hill',
+    'Nice and smooth',
+    'Terrible pickup experience',
+    'It was fine',
+)
+DEFAULT_MIX = 'browse=50,book=20,cancel=10,complain=10,feedback=10'
+
+
+def iso(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+class Replay:
+    """The users, bikes and bookings a run's sessions share"""
+
+    def __init__(self, emulator, rng):
+        self.emulator = emulator
+        self.rng = rng
+        self.customers = []
+        self.bikes = []
+        self.bookings = []
+        self.sessions = Counter()
+        self._lock = threading.Lock()
+        self._day = (datetime.now(timezone.utc) + timedelta(days=1)).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+
+    def seed(self, customers, franchise, bikes):
+        admins = [self.emulator.add_user(f'franchise-{i}@example.com', admin=True) for i in range(franchise)]
+        self.customers = [self.emulator.add_user(f'customer-{i}@example.com') for i in range(customers)]
+        for i in range(bikes):
+            bike_type = BIKE_TYPES[i % len(BIKE_TYPES)]
+            response = self.emulator.call('POST /bikes', admins[i % len(admins)], body={
+                'type': bike_type,
+                'model': MODELS[bike_type],
+                'accessCode': f'{i:06d}',
+                'batteryLife': f'{self.rng.randrange(40, 101)}%',
+                'hourlyRate': self.rng.choice((3, 4, 5, 6, 8)),
+                'createdAt': iso(datetime.now(timezone.utc)),
+            })
+            self.bikes.append((json.loads(response['body'])['bikeId'], bike_type))
+        self.emulator.reset_stats()
+
+    def _window(self, rng):
+        start = self._day + timedelta(days=rng.randrange(7), hours=rng.randrange(6, 21))
+        return start, start + timedelta(hours=rng.choice((1, 2, 3)))
+
+    def _search(self, rng):
+        start, end = self._window(rng)
+        bike_type = rng.choice(BIKE_TYPES)
+        response = self.emulator.call('GET /availability', query={
+            'type': bike_type, 'start': iso(start), 'end': iso(end)
+        })
+        bikes = json.loads(response['body']).get('bikes', []) if response['statusCode'] == 200 else []
+        return bikes, start, end
+
+    def browse(self, rng, user):
+        self.emulator.call('GET /bikes')
+        self._search(rng)
+
+    def book(self, rng, user):
+        bikes, start, end = self._search(rng)
+        if not bikes:
+            return
+        bike = rng.choice(bikes[:5])
+        response = self.emulator.call('POST /bookings', user, body={
+            'bikeId': bike['bikeId'],
+            'startDate': iso(start),
+            'endDate': iso(end),
+            'duration': int((end - start).total_seconds() // 3600),
+        })
+        if response['statusCode'] == 201:
+            with self._lock:
+                self.bookings.append((user, json.loads(response['body'])['bookingId']))
+        self.emulator.call('GET /bookings', user)
+
+    def cancel(self, rng, user):
+        with self._lock:
+            if not self.bookings:
+                return
+            user, booking_id = self.bookings.pop(rng.randrange(len(self.bookings)))
+        self.emulator.call('DELETE /bookings/{bookingId}', user, path_parameters={'bookingId': booking_id})
+
+    def complain(self, rng, user):
+        with self._lock:
+            booking_ref = rng.choice(self.bookings)[1] if self.bookings else 'no-booking'
+        self.emulator.call('POST /submit-complaint', user, body={
+            'bookingRef': booking_ref,
+            'complaint': rng.choice(COMMENTS),
+        })
+        self.emulator.call('GET /complaints', user)
+
+    def feedback(self, rng, user):
+        bike_id, bike_type = rng.choice(self.bikes)
+        self.emulator.call('POST /submit-feedback', user, body={
+            'bikeId': bike_id,
+            'model': MODELS[bike_type],
+            'type': bike_type,
+            'comment': rng.choice(COMMENTS),
+            'rating': rng.randrange(1, 6),
+        })
+        self.emulator.call('GET /get-feedback')
+
+    def session(self, kind, seed):
+        rng = random.Random(seed)
+        getattr(self, kind)(rng, rng.choice(self.customers))
+        with self._lock:
+            self.sessions[kind] += 1
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        if kind not in ('browse', 'book', 'cancel', 'complain', 'feedback'):
+            raise argparse.ArgumentTypeError(f'unknown session kind {kind!r}')
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def pump_until(emulator, stop, interval):
+    while not stop.wait(interval):
+        emulator.pump()
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    emulator = Emulator(latency_ms=args.latency_ms)
+    quiet_handler_logs()
+    replay = Replay(emulator, rng)
+    replay.seed(args.customers, args.franchise, args.bikes)
+
+    kinds, weights = zip(*args.mix.items())
+    total = int(args.rate * args.duration)
+    schedule = []
+    at = 0.0
+    for _ in range(total):
+        at += rng.expovariate(args.rate) if args.poisson else 1.0 / args.rate
+        schedule.append((at, rng.choices(kinds, weights)[0], rng.random()))
+
+    lags = []
+    stop = threading.Event()
+    pumper = threading.Thread(target=pump_until, args=(emulator, stop, args.pump_interval), daemon=True)
+    pumper.start()
+
+    def start(due, kind, seed):
+        lags.append(time.perf_counter() - due)
+        replay.session(kind, seed)
+
+    began = time.perf_counter()
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for offset, kind, seed in schedule:
+            due = began + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(start, due, kind, seed))
+    elapsed = time.perf_counter() - began
+    for future in futures:
+        future.result()
+    stop.set()
+    pumper.join()
+    while emulator.pump():
+        pass
+    return emulator, replay, elapsed, lags
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=float, default=50.0, help='sessions started per second')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of traffic')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'session weights (default {DEFAULT_MIX})')
+    parser.add_argument('--poisson', action='store_true', help='exponential gaps between session starts')
+    parser.add_argument('--concurrency', type=int, default=64, help='sessions running at once at most')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated round-trip of every AWS call')
+    parser.add_argument('--customers', type=int, default=500)
+    parser.add_argument('--franchise', type=int, default=5, help='franchise operators complaints are routed to')
+    parser.add_argument('--bikes', type=int, default=150)
+    parser.add_argument('--pump-interval', type=float, default=0.05,
+                        help='seconds between deliveries of stream records and SNS messages')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    emulator, replay, elapsed, lags = run(args)
+    stats = emulator.stats()
+
+    results = []
+    for name in sorted(stats):
+        latencies, statuses = stats[name]['latencies'], stats[name]['statuses']
+        summary = summarize_latencies(latencies)
+        errors = sum(count for status, count in statuses.items()
+                     if status == 'exception' or (isinstance(status, int) and status >= 500))
+        client_errors = sum(count for status, count in statuses.items()
+                            if isinstance(status, int) and 400 <= status < 500)
+        results.append({
+            'handler': name,
+            'calls': len(latencies),
+            'p50_ms': summary['p50'],
+            'p95_ms': summary['p95'],
+            'p99_ms': summary['p99'],
+            '4xx': client_errors,
+            'errors': errors,
+            'discarded': statuses.get('discarded', 0),
+        })
+
+    sessions = sum(replay.sessions.values())
+    if args.json:
+        print(json.dumps({
+            'sessions': dict(replay.sessions),
+            'achieved_rate': sessions / elapsed,
+            'lag_p99_ms': summarize_latencies(lags)['p99'],
+            'handlers': results,
+        }, indent=2))
+    else:
+        print_table(
+            ['handler', 'calls', 'p50 ms', 'p95 ms', 'p99 ms', '4xx', 'errors'],
+            [[r['handler'], r['calls'], f"{r['p50_ms']:.1f}", f"{r['p95_ms']:.1f}", f"{r['p99_ms']:.1f}",
+              r['4xx'], r['errors'] + r['discarded']] for r in results]
+        )
+        lag = summarize_latencies(lags)
+        print()
+        print(f'{sessions} sessions in {elapsed:.1f}s ({sessions / elapsed:.1f}/s of {args.rate:g}/s requested), '
+              + ', '.join(f'{kind} {count}' for kind, count in sorted(replay.sessions.items())))
+        print(f'start lag p50 {lag["p50"]:.1f} ms, p99 {lag["p99"]:.1f} ms')
+        for name, trace in emulator.failures[:3]:
+            print(f'\n{name} raised:\n{trace}')
+
+    return 1 if any(r['errors'] or r['discarded'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
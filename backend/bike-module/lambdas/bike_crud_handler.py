@@ -1,10 +1,22 @@
+import base64
+import csv
+import hashlib
+import io
+import itertools
 import json
-import boto3
 import os
+import random
+import time
 import uuid
 import logging
-from boto3.dynamodb.conditions import Key
-from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+from decimal import Decimal, InvalidOperation
+from dalscooter_runtime import clients
+from dalscooter_runtime import telemetry
+from dalscooter_runtime.cursors import InvalidCursor, decode_cursor, encode_cursor
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, o):
@@ -17,22 +29,84 @@ logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # DynamoDB setup
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(os.environ["DYNAMODB_TABLE"])
+table_name = os.environ["DYNAMODB_TABLE"]
+table = clients.table(table_name)
+dynamodb = clients.client("dynamodb")
+catalog_table = clients.table(os.environ["CATALOG_TABLE"])
+telemetry_table = clients.table(os.environ["TELEMETRY_TABLE"])
+
+# The catalog's version counter item in CATALOG_TABLE; every bike write bumps it
+CATALOG_KEY = {"catalogId": "bikes"}
+
+# Rebuild a snapshot this old even if the version has not moved, in case a
+# write's version bump failed
+CATALOG_MAX_AGE = int(os.environ.get("CATALOG_MAX_AGE", "300"))
+
+# Lambda rejects synchronous responses over 6 MB
+MAX_CATALOG_BYTES = 5 * 1024 * 1024
+
+# The encoded catalog this container served last, reused while the version
+# counter has not moved
+_snapshot = None
+
+# Paginated listing: bikes of a type, cheapest first, from TypeRateIndex
+TYPE_RATE_INDEX = "TypeRateIndex"
+cursor_secret = os.environ["CURSOR_SECRET"]
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+# What the list view shows; accessCode and features stay out of listings
+LIST_ATTRIBUTES = ("bikeId", "type", "model", "batteryLife", "hourlyRate", "discount", "createdBy", "createdAt")
+
+# Bulk import: POST /bikes:batch
+MAX_IMPORT_ROWS = int(os.environ.get("MAX_IMPORT_ROWS", "10000"))
+IMPORT_WORKERS = int(os.environ.get("IMPORT_WORKERS", "4"))
+BATCH_WRITE_LIMIT = 25
+# Attempts per 25-bike chunk; unprocessed items are resubmitted after an
+# exponentially growing, jittered pause
+BATCH_WRITE_ATTEMPTS = 8
+BACKOFF_BASE = 0.05
+BACKOFF_CAP = 2.0
+RETRYABLE_ERRORS = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "InternalServerError"
+}
+serializer = TypeSerializer()
+
+# Query parameters that ask GET /bikes for a filtered or paginated listing;
+# any other parameter (a cache-buster, say) still gets the cached snapshot
+PAGE_PARAMS = {"type", "maxRate", "limit", "cursor"}
 
 def lambda_handler(event, context):
-    logger.info(f"Received event: {json.dumps(event)}")
     method = event["requestContext"]["http"].get("method")
     path = event["rawPath"]
+    if path == "/bikes:batch":
+        # Imports run to megabytes; leave the rows out of the log
+        logged = {**event, "body": f"<{len(event.get('body') or '')} chars>"}
+    else:
+        logged = event
+    logger.info(f"Received event: {json.dumps(logged)}")
     path_params = event.get("pathParameters") or {}
 
     try:
         if method == "GET" and path == "/bikes":
-            return list_bikes()
+            query_params = event.get("queryStringParameters") or {}
+            if PAGE_PARAMS.intersection(query_params):
+                return list_bikes_page(query_params)
+            headers = event.get("headers") or {}
+            return list_bikes(headers.get("if-none-match"))
 
         if method == "POST" and path == "/bikes":
             return create_bike(json.loads(event["body"]))
 
+        if method == "POST" and path == "/bikes:batch":
+            return import_bikes(event)
+
+        if method == "GET" and path.startswith("/bikes/") and path.endswith("/battery"):
+            return battery_history(path_params.get("bikeId"))
+
         if method == "PUT" and path.startswith("/bikes/"):
             return update_bike(path_params.get("bikeId"), json.loads(event["body"]))
 
@@ -44,37 +118,315 @@ def lambda_handler(event, context):
         logger.error(f"Unexpected error: {str(e)}")
         return respond(500, {"error": str(e)})
 
-def list_bikes():
+class CatalogSnapshot:
+    def __init__(self, version, body, truncated):
+        self.version = version
+        self.body = body
+        self.truncated = truncated
+        self.etag = '"%s-%s"' % (version, hashlib.sha1(body.encode("utf-8")).hexdigest()[:16])
+        self.built_at = time.monotonic()
+
+
+def catalog_version():
+    response = catalog_table.get_item(Key=CATALOG_KEY)
+    return int(response.get("Item", {}).get("version", 0))
+
+
+def bump_catalog_version():
+    """
+    Mark the cached catalog snapshots stale. Called after a bike write
+    succeeds; if this fails the snapshots still expire after CATALOG_MAX_AGE.
+    """
     try:
-        response = table.scan()
+        catalog_table.update_item(
+            Key=CATALOG_KEY,
+            UpdateExpression="ADD #version :one",
+            ExpressionAttributeNames={"#version": "version"},
+            ExpressionAttributeValues={":one": 1}
+        )
+    except Exception as e:
+        logger.error(f"Error bumping the catalog version: {str(e)}")
+
+
+def build_snapshot(version):
+    bikes = []
+    size = 2
+    truncated = False
+    scan_params = {}
+    while True:
+        response = table.scan(**scan_params)
+        for item in response["Items"]:
+            encoded = json.dumps(item, cls=DecimalEncoder)
+            if size + len(encoded) + 2 > MAX_CATALOG_BYTES:
+                truncated = True
+                break
+            bikes.append(encoded)
+            size += len(encoded) + 2
+        if truncated or "LastEvaluatedKey" not in response:
+            break
+        scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    if truncated:
+        logger.warning(f"Catalog snapshot truncated to {len(bikes)} bikes at {MAX_CATALOG_BYTES} bytes")
+    return CatalogSnapshot(version, "[" + ", ".join(bikes) + "]", truncated)
+
+
+def catalog_snapshot():
+    """
+    The encoded catalog at its current version. A warm container only
+    reads the version counter and reuses its snapshot while it matches.
+    """
+    global _snapshot
+    version = catalog_version()
+    snapshot = _snapshot
+    if (snapshot is None or snapshot.version != version
+            or time.monotonic() - snapshot.built_at > CATALOG_MAX_AGE):
+        # Read the version before the bikes, so a write landing mid-scan
+        # leaves the snapshot older than the counter and it is rebuilt
+        snapshot = _snapshot = build_snapshot(version)
+        logger.info(f"Built catalog snapshot for version {version}.")
+    return snapshot
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def list_bikes(if_none_match=None):
+    try:
+        snapshot = catalog_snapshot()
+        headers = {
+            "Content-Type": "application/json",
+            "ETag": snapshot.etag,
+            # Clients may keep the catalog but must revalidate it each time
+            "Cache-Control": "no-cache"
+        }
+        if snapshot.truncated:
+            headers["X-Catalog-Truncated"] = "true"
+        if etag_matches(if_none_match, snapshot.etag):
+            return {"statusCode": 304, "headers": headers, "body": ""}
         logger.info("Listed all bikes successfully.")
-        return respond(200, response["Items"])
+        return {"statusCode": 200, "headers": headers, "body": snapshot.body}
     except Exception as e:
         logger.error(f"Error listing bikes: {str(e)}")
         return respond(500, {"error": str(e)})
 
+def list_bikes_page(query_params):
+    """
+    One page of the catalog in list view. With a type it is a TypeRateIndex
+    query, cheapest first, with maxRate narrowing the sort key, so every
+    item read is returned and a page costs the same whatever the fleet
+    size. Without a type the table is scanned page by page, and a maxRate
+    filter can leave a page short of the limit.
+    """
+    bike_type = query_params.get("type")
+    try:
+        limit = min(max(int(query_params.get("limit", DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        max_rate = Decimal(query_params["maxRate"]) if "maxRate" in query_params else None
+    except (ValueError, InvalidOperation):
+        return respond(400, {"message": "limit and maxRate must be numbers."})
+
+    params = {
+        "Limit": limit,
+        "ProjectionExpression": ", ".join(f"#{name}" for name in LIST_ATTRIBUTES),
+        "ExpressionAttributeNames": {f"#{name}": name for name in LIST_ATTRIBUTES}
+    }
+    if bike_type:
+        key_condition = Key("type").eq(bike_type)
+        if max_rate is not None:
+            key_condition &= Key("hourlyRate").lte(max_rate)
+        params["IndexName"] = TYPE_RATE_INDEX
+        params["KeyConditionExpression"] = key_condition
+    elif max_rate is not None:
+        params["FilterExpression"] = Attr("hourlyRate").lte(max_rate)
+
+    # A cursor only continues the listing it was issued for
+    cursor_scope = {"type": bike_type, "maxRate": query_params.get("maxRate")}
+    cursor = query_params.get("cursor")
+    if cursor:
+        try:
+            start_key = decode_cursor(cursor, cursor_scope, cursor_secret)
+        except InvalidCursor as e:
+            logger.warning(f"Rejected pagination cursor: {str(e)}")
+            return respond(400, {"message": "Invalid pagination cursor."})
+        if "hourlyRate" in start_key:
+            start_key["hourlyRate"] = Decimal(start_key["hourlyRate"])
+        params["ExclusiveStartKey"] = start_key
+
+    try:
+        response = table.query(**params) if bike_type else table.scan(**params)
+        next_cursor = None
+        if "LastEvaluatedKey" in response:
+            # Cursors are JSON; the rate goes in as its string form
+            last_key = {
+                name: str(value) if isinstance(value, Decimal) else value
+                for name, value in response["LastEvaluatedKey"].items()
+            }
+            next_cursor = encode_cursor(last_key, cursor_scope, cursor_secret)
+        return respond(200, {
+            "bikes": response["Items"],
+            "count": len(response["Items"]),
+            "nextCursor": next_cursor
+        })
+    except Exception as e:
+        logger.error(f"Error listing bikes: {str(e)}")
+        return respond(500, {"error": str(e)})
+
+def bike_item(body, bike_id=None):
+    return {
+        "bikeId": bike_id or str(uuid.uuid4()),
+        "type": body.get("type"),
+        "model": body.get("model"),
+        "accessCode": body.get("accessCode"),
+        "batteryLife": body.get("batteryLife"),
+        "hourlyRate": Decimal(str(body.get("hourlyRate", "0"))),
+        "discount": body.get("discount", ""),
+        "features": body.get("features", []),
+        "createdBy": body.get("createdBy"),
+        "createdAt": body.get("createdAt")
+    }
+
 def create_bike(body):
     try:
-        bike_id = str(uuid.uuid4())
-        item = {
-            "bikeId": bike_id,
-            "type": body.get("type"),
-            "model": body.get("model"),
-            "accessCode": body.get("accessCode"),
-            "batteryLife": body.get("batteryLife"),
-            "hourlyRate": Decimal(str(body.get("hourlyRate", "0"))),
-            "discount": body.get("discount", ""),
-            "features": body.get("features", []),
-            "createdBy": body.get("createdBy"),
-            "createdAt": body.get("createdAt")
-        }
+        item = bike_item(body)
+        bike_id = item["bikeId"]
         table.put_item(Item=item)
+        bump_catalog_version()
         logger.info(f"Created new bike: {bike_id}")
         return respond(201, {"message": "Bike added.", "bikeId": bike_id})
     except Exception as e:
         logger.error(f"Error creating bike: {str(e)}")
         return respond(500, {"error": str(e)})
 
+def import_rows(event):
+    """
+    The rows of a bulk import: a JSON array of bikes (or {"bikes": [...]}),
+    or CSV with a header row when the content type says so. CSV features
+    are separated by semicolons.
+    """
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode("utf-8")
+    headers = event.get("headers") or {}
+    if "csv" in headers.get("content-type", ""):
+        def csv_rows():
+            for row in csv.DictReader(io.StringIO(body)):
+                row = {key.strip(): value.strip() for key, value in row.items() if key and value}
+                if "features" in row:
+                    row["features"] = [feature.strip() for feature in row["features"].split(";") if feature.strip()]
+                yield row
+        return csv_rows()
+    # Decimals, as DynamoDB takes no floats
+    data = json.loads(body, parse_float=Decimal)
+    if isinstance(data, dict):
+        data = data.get("bikes")
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of bikes or CSV.")
+    return iter(data)
+
+def validate_bike(row, seen_ids):
+    """The typed item to write for one import row, and what is wrong with it"""
+    if not isinstance(row, dict):
+        return None, ["Row is not an object."]
+    errors = [f"{field} is required." for field in ("type", "model") if not row.get(field)]
+    try:
+        rate = Decimal(str(row.get("hourlyRate", "0")))
+        if not rate.is_finite() or rate < 0:
+            errors.append("hourlyRate must be a non-negative number.")
+    except InvalidOperation:
+        errors.append("hourlyRate must be a non-negative number.")
+    if not isinstance(row.get("features", []), list):
+        errors.append("features must be a list.")
+    bike_id = row.get("bikeId")
+    if bike_id is not None:
+        if not isinstance(bike_id, str) or not bike_id:
+            errors.append("bikeId must be a non-empty string.")
+        elif bike_id in seen_ids:
+            errors.append("bikeId appears earlier in this import.")
+    if errors:
+        return None, errors
+    try:
+        item = {name: serializer.serialize(value) for name, value in bike_item(row, bike_id).items()}
+    except TypeError as e:
+        return None, [f"Unsupported value: {str(e)}"]
+    if bike_id is not None:
+        seen_ids.add(bike_id)
+    return item, []
+
+def write_chunk(chunk):
+    """
+    Write up to 25 (row, item) pairs with BatchWriteItem, resubmitting
+    UnprocessedItems with backoff. Returns (row, error) for the rows that
+    could not be written.
+    """
+    requests = [{"PutRequest": {"Item": item}} for _, item in chunk]
+    error = "Throttled; retry these rows."
+    for attempt in range(BATCH_WRITE_ATTEMPTS):
+        if attempt:
+            time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+        try:
+            response = dynamodb.batch_write_item(RequestItems={table_name: requests})
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in RETRYABLE_ERRORS:
+                error = str(e)
+                break
+            continue
+        requests = response.get("UnprocessedItems", {}).get(table_name, [])
+        if not requests:
+            return []
+    unwritten = {request["PutRequest"]["Item"]["bikeId"]["S"] for request in requests}
+    return [(row, error) for row, item in chunk if item["bikeId"]["S"] in unwritten]
+
+def import_bikes(event):
+    """
+    Create or replace many bikes at once. Each full chunk of 25 valid rows
+    goes to a small thread pool as soon as it is validated, so writes run
+    while later rows are still being checked. A row with a bikeId replaces
+    that bike. Returns one result per row, numbered from 1.
+    """
+    try:
+        rows = list(itertools.islice(import_rows(event), MAX_IMPORT_ROWS + 1))
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return respond(400, {"message": f"Unreadable import: {str(e)}"})
+    if len(rows) > MAX_IMPORT_ROWS:
+        return respond(413, {"message": f"An import may hold at most {MAX_IMPORT_ROWS} bikes."})
+
+    results = []
+    seen_ids = set()
+    submitted = []
+    chunk = []
+    with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as pool:
+        for index, row in enumerate(rows):
+            item, errors = validate_bike(row, seen_ids)
+            if errors:
+                results.append({"row": index + 1, "status": "invalid", "errors": errors})
+                continue
+            results.append({"row": index + 1, "status": "written", "bikeId": item["bikeId"]["S"]})
+            chunk.append((index, item))
+            if len(chunk) == BATCH_WRITE_LIMIT:
+                submitted.append((pool.submit(write_chunk, chunk), chunk))
+                chunk = []
+        if chunk:
+            submitted.append((pool.submit(write_chunk, chunk), chunk))
+        for future, chunk in submitted:
+            try:
+                failures = future.result()
+            except Exception as e:
+                logger.error(f"Error importing bikes: {str(e)}")
+                failures = [(index, str(e)) for index, _ in chunk]
+            for index, error in failures:
+                results[index]["status"] = "failed"
+                results[index]["error"] = error
+
+    counts = {status: sum(1 for result in results if result["status"] == status)
+              for status in ("written", "invalid", "failed")}
+    if counts["written"]:
+        bump_catalog_version()
+    logger.info(f"Imported bikes: {counts}")
+    return respond(200 if counts["written"] == len(results) else 207, {**counts, "results": results})
+
 def update_bike(bike_id, body):
     if not bike_id:
         logger.warning("Missing bikeId for update request.")
@@ -86,6 +438,9 @@ def update_bike(bike_id, body):
         for key, val in body.items():
             if key == "bikeId":
                 continue
+            if key == "hourlyRate":
+                # A number, as create_bike stores it: TypeRateIndex's sort key
+                val = Decimal(str(val))
             placeholder = f"#{key}" if key.lower() in ["type"] else key
             update_expr.append(f"{placeholder} = :{key}")
             if isinstance(val, float):
@@ -104,6 +459,7 @@ def update_bike(bike_id, body):
         if expr_attr_names:
             update_params["ExpressionAttributeNames"] = expr_attr_names
         table.update_item(**update_params)
+        bump_catalog_version()
         logger.info(f"Updated bike: {bike_id}")
         return respond(200, {"message": "Bike updated."})
     except Exception as e:
@@ -116,12 +472,32 @@ def delete_bike(bike_id):
         return respond(400, {"message": "Missing bikeId in path."})
     try:
         table.delete_item(Key={"bikeId": bike_id})
+        bump_catalog_version()
         logger.info(f"Deleted bike: {bike_id}")
         return respond(200, {"message": "Bike deleted."})
     except Exception as e:
         logger.error(f"Error deleting bike {bike_id}: {str(e)}")
         return respond(500, {"error": str(e)})
 
+def battery_history(bike_id):
+    """The bike's recent battery readings from telemetry, oldest first"""
+    if not bike_id:
+        return respond(400, {"message": "Missing bikeId in path."})
+    try:
+        item = telemetry_table.get_item(Key={"bikeId": bike_id}).get("Item")
+        readings = telemetry.unpack(bytes(item["readings"])) if item else []
+        return respond(200, {
+            "bikeId": bike_id,
+            "readings": [
+                {"reportedAt": telemetry.format_time(epoch), "batteryLife": level}
+                for epoch, level in readings
+            ],
+            "count": len(readings)
+        })
+    except Exception as e:
+        logger.error(f"Error reading battery history of {bike_id}: {str(e)}")
+        return respond(500, {"error": str(e)})
+
 def respond(status, body):
     return {
         "statusCode": status,
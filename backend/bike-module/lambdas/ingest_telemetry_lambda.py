@@ -0,0 +1,220 @@
+import json
+import os
+import random
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dalscooter_runtime import clients
+from dalscooter_runtime.telemetry import format_time, merge, parse_time
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Initialize AWS clients
+dynamodb = clients.client('dynamodb')
+inventory_table = os.environ['DYNAMODB_TABLE']
+telemetry_table = os.environ['TELEMETRY_TABLE']
+catalog_table = os.environ['CATALOG_TABLE']
+
+# The catalog's version counter item, shared with bike_crud_handler: GET
+# /bikes serves batteryLife from a snapshot that is rebuilt when it moves
+CATALOG_KEY = {'catalogId': {'S': 'bikes'}}
+
+# Readings kept per bike: 90 minutes at one report every 30 seconds, which
+# packs into 900 bytes
+HISTORY_SIZE = int(os.environ.get('TELEMETRY_HISTORY', '180'))
+WORKERS = int(os.environ.get('TELEMETRY_WORKERS', '8'))
+
+BATCH_GET_SIZE = 100
+# Tries per write within one invocation, with jittered exponential backoff
+WRITE_ATTEMPTS = 4
+RETRY_BASE_SECONDS = 0.05
+
+
+def _backoff(attempt):
+    time.sleep(random.uniform(0, RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+def parse_readings(records):
+    """
+    Readings by bike from a batch of SQS records, as {bikeId: {epoch:
+    level}}, and the message ids each bike's readings came from. A message
+    holds one reading ({"bikeId", "batteryLife", "reportedAt"}) or a list
+    of them. Malformed readings are logged and dropped rather than retried.
+    """
+    readings = {}
+    sources = {}
+    for record in records:
+        try:
+            body = json.loads(record['body'])
+        except ValueError:
+            logger.warning(f"Dropping unreadable telemetry message {record['messageId']}")
+            continue
+        for reading in body if isinstance(body, list) else [body]:
+            try:
+                bike_id = reading['bikeId']
+                level = int(reading['batteryLife'])
+                reported_at = parse_time(reading['reportedAt'])
+                if not isinstance(bike_id, str) or not 0 <= level <= 100 or reported_at <= 0:
+                    raise ValueError(reading)
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"Dropping malformed reading in message {record['messageId']}")
+                continue
+            readings.setdefault(bike_id, {})[reported_at] = level
+            sources.setdefault(bike_id, set()).add(record['messageId'])
+    return readings, sources
+
+
+def read_histories(bike_ids):
+    """The stored history items of ``bike_ids``, by bike"""
+    items = {}
+    ids = list(bike_ids)
+    for first in range(0, len(ids), BATCH_GET_SIZE):
+        request = {
+            telemetry_table: {
+                'Keys': [{'bikeId': {'S': bike_id}} for bike_id in ids[first:first + BATCH_GET_SIZE]],
+                'ConsistentRead': True
+            }
+        }
+        attempt = 0
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response['Responses'].get(telemetry_table, []):
+                items[item['bikeId']['S']] = item
+            request = response.get('UnprocessedKeys') or {}
+            if request:
+                attempt += 1
+                _backoff(attempt)
+    return items
+
+
+def apply_latest(bike_id, reported_at, level):
+    """
+    Set the bike's batteryLife to its latest reading, unless the bike is
+    gone or already has a newer one. Returns whether the level changed.
+    """
+    try:
+        response = dynamodb.update_item(
+            TableName=inventory_table,
+            Key={'bikeId': {'S': bike_id}},
+            UpdateExpression='SET batteryLife = :level, batteryReportedAt = :at',
+            ConditionExpression='attribute_exists(bikeId) AND '
+                                '(attribute_not_exists(batteryReportedAt) OR batteryReportedAt < :at)',
+            ExpressionAttributeValues={
+                ':level': {'S': f'{level}%'},
+                ':at': {'S': format_time(reported_at)}
+            },
+            ReturnValues='UPDATED_OLD'
+        )
+    except dynamodb.exceptions.ConditionalCheckFailedException:
+        return False
+    return response.get('Attributes', {}).get('batteryLife') != {'S': f'{level}%'}
+
+
+def bump_catalog_version():
+    """
+    Mark the cached catalog snapshots stale after battery levels changed; if
+    this fails the snapshots still expire after CATALOG_MAX_AGE
+    """
+    try:
+        dynamodb.update_item(
+            TableName=catalog_table,
+            Key=CATALOG_KEY,
+            UpdateExpression='ADD #version :one',
+            ExpressionAttributeNames={'#version': 'version'},
+            ExpressionAttributeValues={':one': {'N': '1'}}
+        )
+    except Exception as e:
+        logger.error(f"Error bumping the catalog version: {str(e)}")
+
+
+def store_history(bike_id, readings, item):
+    """
+    Merge ``readings`` into the bike's history. The write is conditional on
+    the history being as read, and re-reads and merges again if another
+    batch changed it first.
+    """
+    for attempt in range(WRITE_ATTEMPTS):
+        if attempt:
+            _backoff(attempt)
+            item = dynamodb.get_item(
+                TableName=telemetry_table,
+                Key={'bikeId': {'S': bike_id}},
+                ConsistentRead=True
+            ).get('Item')
+        history = item['readings']['B'] if item else b''
+        new_item = {
+            'bikeId': {'S': bike_id},
+            'readings': {'B': merge(history, readings, HISTORY_SIZE)},
+            'revision': {'N': str(int(item['revision']['N']) + 1 if item else 1)}
+        }
+        try:
+            if item:
+                dynamodb.put_item(
+                    TableName=telemetry_table,
+                    Item=new_item,
+                    ConditionExpression='revision = :read',
+                    ExpressionAttributeValues={':read': item['revision']}
+                )
+            else:
+                dynamodb.put_item(
+                    TableName=telemetry_table,
+                    Item=new_item,
+                    ConditionExpression='attribute_not_exists(bikeId)'
+                )
+            return
+        except dynamodb.exceptions.ConditionalCheckFailedException:
+            continue
+    raise RuntimeError(f'History of {bike_id} kept changing under us')
+
+
+def apply_bike(bike_id, readings, item, changed):
+    """
+    Apply one bike's readings, adding it to ``changed`` as soon as its level
+    changes: a redelivery after a failed history write finds the reading
+    already applied, so the change would not be seen again
+    """
+    latest = max(readings)
+    if apply_latest(bike_id, latest, readings[latest]):
+        changed.add(bike_id)
+    store_history(bike_id, readings, item)
+
+
+def lambda_handler(event, context):
+    """
+    Apply a batch of battery readings from the telemetry queue. Readings
+    are coalesced per bike: each bike in the batch costs one conditional
+    update of its batteryLife with the latest reading and one write of its
+    history, however many readings it sent. If any level changed, even for
+    a bike whose history write then failed, the catalog version is bumped
+    once for the batch so GET /bikes does not serve the old levels. Bikes whose writes fail are reported so SQS
+    redelivers just their messages.
+    """
+    started = time.perf_counter()
+    readings, sources = parse_readings(event.get('Records', []))
+    histories = read_histories(readings)
+
+    failed = set()
+    changed = set()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        futures = {
+            bike_id: pool.submit(apply_bike, bike_id, bike_readings, histories.get(bike_id), changed)
+            for bike_id, bike_readings in readings.items()
+        }
+        for bike_id, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Error applying telemetry for bike {bike_id}: {str(e)}")
+                failed.add(bike_id)
+    if changed:
+        bump_catalog_version()
+
+    reading_count = sum(len(bike_readings) for bike_readings in readings.values())
+    logger.info(
+        f"Applied {reading_count} readings for {len(readings) - len(failed)} bikes "
+        f"({len(failed)} failed) in {(time.perf_counter() - started) * 1000:.0f} ms"
+    )
+    failed_messages = set().union(*(sources[bike_id] for bike_id in failed)) if failed else set()
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in sorted(failed_messages)]}
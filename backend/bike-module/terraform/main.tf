@@ -10,6 +10,50 @@ resource "aws_dynamodb_table" "bike_inventory" {
     type = "S"
   }
 
+  attribute {
+    name = "type"
+    type = "S"
+  }
+
+  attribute {
+    name = "hourlyRate"
+    type = "N"
+  }
+
+  # Paginated GET /bikes?type=..: a type's bikes, cheapest first. Only the
+  # list view's attributes are projected, not accessCode or features
+  global_secondary_index {
+    name               = "TypeRateIndex"
+    hash_key           = "type"
+    range_key          = "hourlyRate"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["model", "batteryLife", "discount", "createdBy", "createdAt"]
+  }
+
+  tags = {
+    Environment = "dev"
+    Project     = "DALScooter"
+  }
+}
+
+# Key that signs the pagination cursors handed out by GET /bikes
+resource "random_password" "cursor_secret" {
+  length  = 48
+  special = false
+}
+
+# Version counter of the bike catalog; bike writes bump it so warm
+# containers know when their cached catalog snapshot is stale
+resource "aws_dynamodb_table" "bike_catalog" {
+  name           = "BikeCatalogMeta"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "catalogId"
+
+  attribute {
+    name = "catalogId"
+    type = "S"
+  }
+
   tags = {
     Environment = "dev"
     Project     = "DALScooter"
@@ -22,12 +66,16 @@ resource "aws_lambda_function" "bike_crud_handler" {
   source_code_hash = data.archive_file.bike_crud.output_base64sha256
   handler       = "bike_crud_handler.lambda_handler"
   runtime       = "python3.11"
+  layers        = [var.runtime_layer_arn]
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
   timeout       = 60
 
   environment {
     variables = {
-      DYNAMODB_TABLE = aws_dynamodb_table.bike_inventory.name
+      DYNAMODB_TABLE  = aws_dynamodb_table.bike_inventory.name
+      CATALOG_TABLE   = aws_dynamodb_table.bike_catalog.name
+      TELEMETRY_TABLE = aws_dynamodb_table.bike_telemetry.name
+      CURSOR_SECRET   = random_password.cursor_secret.result
     }
   }
 }
@@ -38,6 +86,86 @@ data "archive_file" "bike_crud" {
   output_path = "${path.module}/../lambdas/bike_crud.zip"
 }
 
+# Telemetry messages that failed five receives, kept for inspection
+resource "aws_sqs_queue" "bike_telemetry_dlq" {
+  name                      = "DALScooterBikeTelemetryDLQ"
+  message_retention_seconds = 1209600
+
+  tags = {
+    Environment = "dev"
+    Project     = "DALScooter"
+  }
+}
+
+# Battery readings reported by the scooters, every 30 seconds per bike
+resource "aws_sqs_queue" "bike_telemetry" {
+  name                       = "DALScooterBikeTelemetry"
+  visibility_timeout_seconds = 360
+  message_retention_seconds  = 3600
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.bike_telemetry_dlq.arn
+    maxReceiveCount     = 5
+  })
+
+  tags = {
+    Environment = "dev"
+    Project     = "DALScooter"
+  }
+}
+
+# Recent battery readings per bike, packed into one binary attribute
+resource "aws_dynamodb_table" "bike_telemetry" {
+  name           = "BikeTelemetry"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "bikeId"
+
+  attribute {
+    name = "bikeId"
+    type = "S"
+  }
+
+  tags = {
+    Environment = "dev"
+    Project     = "DALScooter"
+  }
+}
+
+resource "aws_lambda_function" "ingest_telemetry" {
+  function_name = "DALScooterIngestTelemetry"
+  filename      = data.archive_file.ingest_telemetry.output_path
+  source_code_hash = data.archive_file.ingest_telemetry.output_base64sha256
+  handler       = "ingest_telemetry_lambda.lambda_handler"
+  runtime       = "python3.11"
+  layers        = [var.runtime_layer_arn]
+  role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  timeout       = 60
+
+  environment {
+    variables = {
+      DYNAMODB_TABLE  = aws_dynamodb_table.bike_inventory.name
+      TELEMETRY_TABLE = aws_dynamodb_table.bike_telemetry.name
+      CATALOG_TABLE   = aws_dynamodb_table.bike_catalog.name
+    }
+  }
+}
+
+data "archive_file" "ingest_telemetry" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/ingest_telemetry_lambda.py"
+  output_path = "${path.module}/../lambdas/ingest_telemetry.zip"
+}
+
+# Batches of up to a minute of readings, so a bike's two reports in that
+# minute cost one inventory update and one history write
+resource "aws_lambda_event_source_mapping" "ingest_telemetry_queue" {
+  event_source_arn                   = aws_sqs_queue.bike_telemetry.arn
+  function_name                      = aws_lambda_function.ingest_telemetry.arn
+  batch_size                         = 10000
+  maximum_batching_window_in_seconds = 60
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
 resource "aws_apigatewayv2_api" "bike_api" {
   name          = "BikeCrudAPI"
   protocol_type = "HTTP"
@@ -72,6 +200,14 @@ resource "aws_apigatewayv2_route" "get_bikes" {
   target    = "integrations/${aws_apigatewayv2_integration.bike_lambda_integration.id}"
 }
 
+resource "aws_apigatewayv2_route" "get_bike_battery" {
+  api_id    = aws_apigatewayv2_api.bike_api.id
+  route_key = "GET /bikes/{bikeId}/battery"
+  target    = "integrations/${aws_apigatewayv2_integration.bike_lambda_integration.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.cognito_auth.id
+}
+
 # SECURED routes (POST, PUT, DELETE)
 resource "aws_apigatewayv2_route" "post_bike" {
   api_id    = aws_apigatewayv2_api.bike_api.id
@@ -81,6 +217,14 @@ resource "aws_apigatewayv2_route" "post_bike" {
   authorizer_id      = aws_apigatewayv2_authorizer.cognito_auth.id
 }
 
+resource "aws_apigatewayv2_route" "import_bikes" {
+  api_id    = aws_apigatewayv2_api.bike_api.id
+  route_key = "POST /bikes:batch"
+  target    = "integrations/${aws_apigatewayv2_integration.bike_lambda_integration.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.cognito_auth.id
+}
+
 resource "aws_apigatewayv2_route" "put_bike" {
   api_id    = aws_apigatewayv2_api.bike_api.id
   route_key = "PUT /bikes/{bikeId}"
@@ -1,3 +1,6 @@
 output "bike_api_gateway_endpoint" {
   value = aws_apigatewayv2_api.bike_api.api_endpoint
-}
\ No newline at end of file
+}
+output "bike_telemetry_queue_url" {
+  value = aws_sqs_queue.bike_telemetry.url
+}
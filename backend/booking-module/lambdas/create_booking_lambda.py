@@ -1,29 +1,32 @@
 import json
-import boto3
 import os
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
+from booking_runtime.claims import caller_from_event
+from booking_runtime.codec import BOOKING
+from booking_runtime.http import POST_HEADERS, respond
+from booking_runtime.outbox import enqueue_notification, notification_item
+from booking_runtime.overlaps import load_bike_bookings, parse_timestamp
+from booking_runtime.slots import MAX_BOOKING_HOURS, claim_slots, format_utc, is_slot_conflict, to_utc
+from dalscooter_runtime import clients
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
-dynamodb = boto3.client('dynamodb')
+dynamodb = clients.client('dynamodb')
 bookings_table = os.environ['BOOKINGS_TABLE']
 bike_inventory_table = os.environ['BIKE_INVENTORY_TABLE']
-sns = boto3.client("sns")
-sns_topic_arn = os.environ["SNS_TOPIC_ARN"]
+slots_table = os.environ['SLOTS_TABLE']
+outbox_table = os.environ['OUTBOX_TABLE']
 
 def lambda_handler(event, context):
     """
     Create a new booking for an e-scooter
     """
     try:
-        # Debug logging
-        logger.info(f"Event structure: {json.dumps(event, default=str)}")
-        
         # Parse the request
         if event.get('body'):
             body = json.loads(event['body'])
@@ -31,115 +34,41 @@ def lambda_handler(event, context):
             body = event
         
         # Extract user info from Cognito claims
-        try:
-            # Debug the authorizer structure
-            logger.info(f"Authorizer structure: {json.dumps(event.get('requestContext', {}).get('authorizer', {}), default=str)}")
-            
-            authorizer = event.get('requestContext', {}).get('authorizer', {})
-            
-            # Try different possible claim structures
-            if 'claims' in authorizer:
-                claims = authorizer['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-            elif 'jwt' in authorizer:
-                # JWT authorizer might use 'jwt' instead of 'claims'
-                jwt_claims = authorizer['jwt'].get('claims', {})
-                user_id = jwt_claims.get('sub', 'unknown')
-                user_email = jwt_claims.get('email', 'unknown@example.com')
-            else:
-                # Fallback: try to extract from the authorizer directly
-                user_id = authorizer.get('sub', 'unknown')
-                user_email = authorizer.get('email', 'unknown@example.com')
-                
-            logger.info(f"Extracted user_id: {user_id}, user_email: {user_email}")
-            
-        except (KeyError, TypeError) as e:
-            logger.error(f"Error extracting user claims: {str(e)}")
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Invalid authentication token'
-                })
-            }
+        caller = caller_from_event(event)
+        if caller is None:
+            logger.warning("Request without usable Cognito claims")
+            return respond(401, {'error': 'Invalid authentication token'}, POST_HEADERS)
+        user_id, user_email = caller.user_id, caller.email
         
         # Validate required fields
         required_fields = ['bikeId', 'startDate', 'endDate', 'duration']
         for field in required_fields:
             if field not in body:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': f'Missing required field: {field}'
-                    })
-                }
+                return respond(400, {'error': f'Missing required field: {field}'}, POST_HEADERS)
         
         bike_id = body['bikeId']
-        start_date = body['startDate']
-        end_date = body['endDate']
         duration = body['duration']
         notes = body.get('notes', '')
         
-        # Validate dates
+        # Validate dates. They are stored in UTC whatever offset they were
+        # sent with, so that they compare correctly as strings.
         try:
-            start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            end_datetime = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+            start_datetime = to_utc(body['startDate'])
+            end_datetime = to_utc(body['endDate'])
+            start_date = format_utc(start_datetime)
+            end_date = format_utc(end_datetime)
             
             if start_datetime >= end_datetime:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Start date must be before end date'
-                    })
-                }
+                return respond(400, {'error': 'Start date must be before end date'}, POST_HEADERS)
+            
+            if end_datetime - start_datetime > timedelta(hours=MAX_BOOKING_HOURS):
+                return respond(400, {'error': f'Booking duration cannot exceed {MAX_BOOKING_HOURS} hours'}, POST_HEADERS)
             
-            # Use timezone-aware datetime.now() for comparison
-            current_time = datetime.now().replace(tzinfo=start_datetime.tzinfo)
-            if start_datetime < current_time:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Start date cannot be in the past'
-                    })
-                }
+            if start_datetime < datetime.now(timezone.utc):
+                return respond(400, {'error': 'Start date cannot be in the past'}, POST_HEADERS)
                 
-        except ValueError as e:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': f'Invalid date format: {str(e)}'
-                })
-            }
+        except (AttributeError, ValueError) as e:
+            return respond(400, {'error': f'Invalid date format: {str(e)}'}, POST_HEADERS)
         
         # Check if bike exists
         try:
@@ -149,150 +78,124 @@ def lambda_handler(event, context):
             )
             
             if 'Item' not in bike_response:
-                return {
-                    'statusCode': 404,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Bike not found'
-                    })
-                }
+                return respond(404, {'error': 'Bike not found'}, POST_HEADERS)
             
             bike_data = bike_response['Item']
                 
         except Exception as e:
             logger.error(f"Error checking bike: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error checking bike'
-                })
-            }
+            return respond(500, {'error': 'Error checking bike'}, POST_HEADERS)
         
-
+        # Check the bike has no overlapping bookings
+        try:
+            bike_bookings = load_bike_bookings(dynamodb, bookings_table, bike_id, start_datetime, end_datetime)
+            conflict = bike_bookings.find_overlap(
+                parse_timestamp(start_date),
+                parse_timestamp(end_date)
+            )
+            logger.info(f"Checked {len(bike_bookings)} nearby bookings for bike {bike_id}")
+            
+            if conflict:
+                return respond(409, {
+                    'error': 'Bike is already booked for the requested time',
+                    'conflictingBooking': conflict
+                }, POST_HEADERS)
+                
+        except Exception as e:
+            logger.error(f"Error checking bike availability: {str(e)}")
+            return respond(500, {'error': 'Error checking bike availability'}, POST_HEADERS)
         
         # Create booking
         booking_id = str(uuid.uuid4())
         current_time = datetime.now().replace(tzinfo=start_datetime.tzinfo).isoformat()
         
-        booking_item = {
-            'bookingId': {'S': booking_id},
-            'userId': {'S': user_id},
-            'userEmail': {'S': user_email},
-            'bikeId': {'S': bike_id},
-            'startDate': {'S': start_date},
-            'endDate': {'S': end_date},
-            'duration': {'N': str(duration)},
-            'status': {'S': 'active'},
-            'notes': {'S': notes},
-            'createdAt': {'S': current_time},
-            'updatedAt': {'S': current_time},
-            'bookingDate': {'S': start_date.split('T')[0]}  # For GSI
-        }
+        booking_item = BOOKING.encode({
+            'bookingId': booking_id,
+            'userId': user_id,
+            'userEmail': user_email,
+            'bikeId': bike_id,
+            'startDate': start_date,
+            'endDate': end_date,
+            'duration': duration,
+            'status': 'active',
+            'notes': notes,
+            'createdAt': current_time,
+            'updatedAt': current_time,
+            'bikeModel': bike_data.get('model', {'S': 'Unknown'})['S'],
+            'bikeType': bike_data.get('type', {'S': 'Unknown'})['S'],
+            'bookingDate': start_date.split('T')[0],  # For GSI
+            'slotLocked': True,
+            'version': 1  # Bumped by every update, see update_booking_lambda
+        })
         
-        # Add bike details to booking
-        booking_item['bikeModel'] = bike_data.get('model', {'S': 'Unknown'})
-        booking_item['bikeType'] = bike_data.get('type', {'S': 'Unknown'})
+        # Confirmation email, sent by dispatch_notifications_lambda once the
+        # booking is written
+        confirmation = enqueue_notification(
+            outbox_table,
+            "DALScooter Booking Confirmation",
+            (
+                f"Hello {user_email},\n\n"
+                f"Booking confirmed!\n\n"
+                f"Booking ID: {booking_id}\n"
+                f"Bike: {booking_item['bikeModel']['S']} ({booking_item['bikeType']['S']})\n"
+                f"From: {start_date}\nTo: {end_date}\n\n"
+                f"Thank you for choosing DALScooter!"
+            ),
+            booking_id
+        )
         
         try:
-            dynamodb.put_item(
-                TableName=bookings_table,
-                Item=booking_item
+            # Write the booking together with its hourly slot locks so that
+            # concurrent requests for the same bike cannot both succeed, and
+            # with its confirmation so that it is sent exactly when the
+            # booking exists
+            dynamodb.transact_write_items(
+                TransactItems=[
+                    {
+                        'Put': {
+                            'TableName': bookings_table,
+                            'Item': booking_item,
+                            'ConditionExpression': 'attribute_not_exists(bookingId)'
+                        }
+                    }
+                ] + claim_slots(slots_table, bike_id, booking_id, start_datetime, end_datetime)
+                + confirmation
             )
             
             logger.info(f"Booking created successfully: {booking_id}")
-
-            # Publish booking confirmation to SNS
-            sns.publish(
-                TopicArn=booking_topic_arn,
-                Subject="DALScooter Booking Confirmation",
-                Message=(
-                    f"Hello {user_email},\n\n"
-                    f"Booking confirmed!\n\n"
-                    f"Booking ID: {booking_id}\n"
-                    f"Bike: {bike_data.get('model', {'S': 'Unknown'})['S']} ({bike_data.get('type', {'S': 'Unknown'})['S']})\n"
-                    f"From: {start_date}\nTo: {end_date}\n\n"
-                    f"Thank you for choosing DALScooter!"
-                )
-            )
             
-            return {
-                'statusCode': 201,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                },
-                'body': json.dumps({
-                    'message': 'Booking created successfully',
-                    'bookingId': booking_id,
-                    'booking': {
-                        'bookingId': booking_id,
-                        'userId': user_id,
-                        'userEmail': user_email,
-                        'bikeId': bike_id,
-                        'startDate': start_date,
-                        'endDate': end_date,
-                        'duration': duration,
-                        'status': 'active',
-                        'notes': notes,
-                        'createdAt': current_time,
-                        'bikeModel': booking_item['bikeModel']['S'],
-                        'bikeType': booking_item['bikeType']['S']
-                    }
-                })
-            }
+            return respond(201, {
+                'message': 'Booking created successfully',
+                'bookingId': booking_id,
+                'booking': BOOKING.decode(booking_item)
+            }, POST_HEADERS)
             
         except Exception as e:
+            if is_slot_conflict(e):
+                logger.info(f"Slot conflict for bike {bike_id}: {str(e)}")
+                return respond(409, {'error': 'Bike is already booked for the requested time'}, POST_HEADERS)
+            
             logger.error(f"Error creating booking: {str(e)}")
 
-            sns.publish(
-                TopicArn=booking_topic_arn,
-                Subject="DALScooter Booking Failed",
-                Message=(
-                    f"Hello {user_email},\n\n"
-                    f"Unfortunately, your booking attempt failed.\n\n"
-                    f"Booking details:\nBike ID: {bike_id}\n"
-                    f"Start: {start_date}, End: {end_date}\n\n"
-                    f"Please try again or contact support if the issue persists."
+            try:
+                dynamodb.put_item(
+                    TableName=outbox_table,
+                    Item=notification_item(
+                        "DALScooter Booking Failed",
+                        (
+                            f"Hello {user_email},\n\n"
+                            f"Unfortunately, your booking attempt failed.\n\n"
+                            f"Booking details:\nBike ID: {bike_id}\n"
+                            f"Start: {start_date}, End: {end_date}\n\n"
+                            f"Please try again or contact support if the issue persists."
+                        )
+                    )
                 )
-            )
+            except Exception as outbox_error:
+                logger.error(f"Error queueing booking failure notification: {str(outbox_error)}")
 
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'POST,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error creating booking'
-                })
-            }
+            return respond(500, {'error': 'Error creating booking'}, POST_HEADERS)
             
     except Exception as e:
         logger.error(f"Unexpected error in create_booking_lambda: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                'Access-Control-Allow-Methods': 'POST,OPTIONS'
-            },
-            'body': json.dumps({
-                'error': 'Internal server error'
-            })
-        } 
\ No newline at end of file
+        return respond(500, {'error': 'Internal server error'}, POST_HEADERS) 
\ No newline at end of file
@@ -0,0 +1,176 @@
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+import logging
+from dalscooter_runtime import clients
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Initialize AWS clients
+dynamodb = clients.client('dynamodb')
+sns = clients.client('sns')
+outbox_table = os.environ['OUTBOX_TABLE']
+sns_topic_arn = os.environ['SNS_TOPIC_ARN']
+
+# SNS PublishBatch and DynamoDB batch limits
+PUBLISH_BATCH_SIZE = 10
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
+
+# Tries per message within one invocation, with jittered exponential backoff
+PUBLISH_ATTEMPTS = int(os.environ.get('PUBLISH_ATTEMPTS', '3'))
+RETRY_BASE_SECONDS = 0.1
+
+# The scheduled sweep only picks up notifications older than this, leaving
+# recent ones to the stream
+SWEEP_AGE_SECONDS = int(os.environ.get('SWEEP_AGE_SECONDS', '300'))
+
+
+def _backoff(attempt):
+    time.sleep(random.uniform(0, RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+def still_pending(notification_ids):
+    """
+    The subset of ``notification_ids`` still in the outbox. A retried stream
+    batch replays records that were already sent and deleted.
+    """
+    pending = set()
+    ids = list(notification_ids)
+    for first in range(0, len(ids), BATCH_GET_SIZE):
+        request = {
+            outbox_table: {
+                'Keys': [{'notificationId': {'S': i}} for i in ids[first:first + BATCH_GET_SIZE]],
+                'ProjectionExpression': 'notificationId',
+                'ConsistentRead': True
+            }
+        }
+        attempt = 0
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            pending.update(item['notificationId']['S'] for item in response['Responses'].get(outbox_table, []))
+            request = response.get('UnprocessedKeys') or {}
+            if request:
+                attempt += 1
+                _backoff(attempt)
+    return pending
+
+
+def publish(items):
+    """
+    Publish outbox items to SNS in batches of ten, retrying failed entries.
+    Returns the ids of the notifications SNS accepted.
+    """
+    sent = set()
+    for first in range(0, len(items), PUBLISH_BATCH_SIZE):
+        entries = {
+            item['notificationId']['S']: {
+                'Id': item['notificationId']['S'],
+                'Subject': item['subject']['S'],
+                'Message': item['message']['S']
+            }
+            for item in items[first:first + PUBLISH_BATCH_SIZE]
+        }
+        for attempt in range(PUBLISH_ATTEMPTS):
+            if attempt:
+                _backoff(attempt)
+            try:
+                response = sns.publish_batch(
+                    TopicArn=sns_topic_arn,
+                    PublishBatchRequestEntries=list(entries.values())
+                )
+            except Exception as e:
+                logger.warning(f"Error publishing {len(entries)} notifications: {str(e)}")
+                continue
+            for success in response.get('Successful', []):
+                sent.add(success['Id'])
+                entries.pop(success['Id'], None)
+            for failure in response.get('Failed', []):
+                logger.warning(f"SNS rejected notification {failure['Id']}: {failure.get('Code')} {failure.get('Message')}")
+            if not entries:
+                break
+    return sent
+
+
+def delete_sent(notification_ids):
+    ids = list(notification_ids)
+    for first in range(0, len(ids), BATCH_WRITE_SIZE):
+        request = {
+            outbox_table: [
+                {'DeleteRequest': {'Key': {'notificationId': {'S': i}}}}
+                for i in ids[first:first + BATCH_WRITE_SIZE]
+            ]
+        }
+        attempt = 0
+        while request:
+            request = dynamodb.batch_write_item(RequestItems=request).get('UnprocessedItems') or {}
+            if request:
+                attempt += 1
+                _backoff(attempt)
+
+
+def dispatch_stream(records):
+    """
+    Send the notifications inserted in a batch of outbox stream records.
+    On failure, reports the earliest unsent record so Lambda retries the
+    batch from there.
+    """
+    inserted = [
+        (record['dynamodb']['SequenceNumber'], record['dynamodb']['NewImage'])
+        for record in records
+        if record.get('eventName') == 'INSERT'
+    ]
+    if not inserted:
+        return {'batchItemFailures': []}
+
+    pending = still_pending(item['notificationId']['S'] for _, item in inserted)
+    to_send = [item for _, item in inserted if item['notificationId']['S'] in pending]
+    sent = publish(to_send)
+    delete_sent(sent)
+    logger.info(f"Sent {len(sent)} of {len(to_send)} pending notifications ({len(inserted)} records)")
+
+    for sequence, item in inserted:
+        notification_id = item['notificationId']['S']
+        if notification_id in pending and notification_id not in sent:
+            return {'batchItemFailures': [{'itemIdentifier': sequence}]}
+    return {'batchItemFailures': []}
+
+
+def sweep():
+    """
+    Send notifications that have sat in the outbox for longer than
+    SWEEP_AGE_SECONDS, e.g. after the stream gave up on them
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=SWEEP_AGE_SECONDS)).isoformat()
+    scan_params = {
+        'TableName': outbox_table,
+        'FilterExpression': 'createdAt < :cutoff',
+        'ExpressionAttributeValues': {':cutoff': {'S': cutoff}}
+    }
+    stale = []
+    while True:
+        response = dynamodb.scan(**scan_params)
+        stale.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    sent = publish(stale)
+    delete_sent(sent)
+    if stale:
+        logger.info(f"Sweep sent {len(sent)} of {len(stale)} stale notifications")
+    return {'stale': len(stale), 'sent': len(sent)}
+
+
+def lambda_handler(event, context):
+    """
+    Publish pending booking notifications from the outbox table to SNS.
+    Invoked with batches from the outbox table's stream, and on a schedule
+    to sweep up anything left behind.
+    """
+    if 'Records' in (event or {}):
+        return dispatch_stream(event['Records'])
+    return sweep()
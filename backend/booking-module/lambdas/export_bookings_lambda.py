@@ -0,0 +1,264 @@
+import csv
+import gzip
+import io
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import logging
+from dalscooter_runtime import clients
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Initialize AWS clients
+dynamodb = clients.client('dynamodb')
+s3 = clients.client('s3')
+bookings_table = os.environ['BOOKINGS_TABLE']
+export_bucket = os.environ['EXPORT_BUCKET']
+export_prefix = os.environ.get('EXPORT_PREFIX', 'exports/bookings')
+
+# Parallel Scan segments, one worker thread each
+EXPORT_SEGMENTS = int(os.environ.get('EXPORT_SEGMENTS', '8'))
+
+# Uncompressed bytes per output part; each part is a standalone gzip file
+EXPORT_PART_BYTES = int(os.environ.get('EXPORT_PART_BYTES', str(64 * 1024 * 1024)))
+
+# Scan pages (at most 1 MB each) buffered between the scanners and the
+# writer. Together with the part size this bounds the export's memory.
+QUEUE_PAGES = int(os.environ.get('EXPORT_QUEUE_PAGES', '16'))
+
+CSV_COLUMNS = [
+    'bookingId', 'userId', 'userEmail', 'bikeId', 'bikeModel', 'bikeType',
+    'startDate', 'endDate', 'duration', 'status', 'bookingDate',
+    'createdAt', 'updatedAt', 'notes'
+]
+
+_SEGMENT_DONE = object()
+
+
+def plain_value(value):
+    """
+    Convert a DynamoDB typed value to plain JSON-compatible Python
+    """
+    (kind, inner), = value.items()
+    if kind in ('S', 'B', 'BOOL'):
+        return inner
+    if kind == 'N':
+        return float(inner) if any(c in inner for c in '.eE') else int(inner)
+    if kind == 'NULL':
+        return None
+    if kind == 'M':
+        return {name: plain_value(v) for name, v in inner.items()}
+    if kind == 'L':
+        return [plain_value(v) for v in inner]
+    if kind == 'NS':
+        return [plain_value({'N': v}) for v in inner]
+    return list(inner)
+
+
+def _offer(pages, entry, stop):
+    """
+    Queue a page for the writer, giving up once the export is stopping
+    """
+    while not stop.is_set():
+        try:
+            pages.put(entry, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def scan_segment(segment, total_segments, pages, stop):
+    """
+    Scan one segment of the table, queueing each page as it arrives
+    """
+    scan_params = {
+        'TableName': bookings_table,
+        'Segment': segment,
+        'TotalSegments': total_segments
+    }
+    scanned = 0
+    try:
+        while not stop.is_set():
+            response = dynamodb.scan(**scan_params)
+            scanned += response.get('ScannedCount', 0)
+            if not _offer(pages, response.get('Items', []), stop):
+                break
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    finally:
+        _offer(pages, _SEGMENT_DONE, stop)
+    return scanned
+
+
+def scanned_pages(total_segments):
+    """
+    Every page of the bookings table, read by a parallel Scan across a
+    thread pool. Pages are yielded as they arrive from any segment.
+    """
+    pages = queue.Queue(maxsize=QUEUE_PAGES)
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        futures = [
+            executor.submit(scan_segment, segment, total_segments, pages, stop)
+            for segment in range(total_segments)
+        ]
+        try:
+            finished = 0
+            while finished < total_segments:
+                page = pages.get()
+                if page is _SEGMENT_DONE:
+                    finished += 1
+                elif page:
+                    yield page
+        finally:
+            stop.set()
+        # Surface any scan error once every segment has wound down
+        for future in futures:
+            future.result()
+
+
+def _plain_item(item):
+    return {
+        name: value['S'] if 'S' in value else plain_value(value)
+        for name, value in item.items()
+    }
+
+
+def ndjson_blocks(pages):
+    """
+    One block of NDJSON text per page, with the number of items in it
+    """
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    for page in pages:
+        yield ''.join(encode(_plain_item(item)) + '\n' for item in page), len(page)
+
+
+def csv_blocks(pages):
+    """
+    One block of CSV rows per page, with the number of items in it
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for page in pages:
+        writer.writerows(
+            [plain_value(item[column]) if column in item else '' for column in CSV_COLUMNS]
+            for item in page
+        )
+        yield buffer.getvalue(), len(page)
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def csv_header():
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(CSV_COLUMNS)
+    return buffer.getvalue()
+
+
+def gzip_parts(blocks, part_bytes, header=''):
+    """
+    Group text blocks into gzip-compressed parts of about ``part_bytes``
+    uncompressed bytes, yielding (compressed bytes, item count) per part.
+    Compressing a page at a time rather than a line at a time keeps zlib
+    call overhead out of the export.
+    """
+    buffer = io.BytesIO()
+    compressor = None
+    written = 0
+    count = 0
+    for text, items in blocks:
+        if compressor is None:
+            compressor = gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=6)
+            if header:
+                compressor.write(header.encode('utf-8'))
+        data = text.encode('utf-8')
+        compressor.write(data)
+        written += len(data)
+        count += items
+        if written >= part_bytes:
+            compressor.close()
+            yield buffer.getvalue(), count
+            buffer = io.BytesIO()
+            compressor = None
+            written = 0
+            count = 0
+    if compressor is not None:
+        compressor.close()
+        yield buffer.getvalue(), count
+
+
+def lambda_handler(event, context):
+    """
+    Export the whole bookings table to S3 as gzip-compressed NDJSON or CSV
+    parts plus a manifest. Runs daily on a schedule; invoke it directly with
+    {"format": "csv"} for a CSV export.
+    """
+    event = event or {}
+    export_format = event.get('format', os.environ.get('EXPORT_FORMAT', 'ndjson'))
+    segments = int(event.get('segments', EXPORT_SEGMENTS))
+    part_bytes = int(event.get('partBytes', EXPORT_PART_BYTES))
+
+    if export_format not in ('ndjson', 'csv'):
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    started_at = datetime.now(timezone.utc)
+    export_key = f"{export_prefix}/{started_at.strftime('%Y-%m-%d')}/{started_at.strftime('%H%M%S')}"
+    started = time.perf_counter()
+
+    pages = scanned_pages(segments)
+    if export_format == 'csv':
+        parts = gzip_parts(csv_blocks(pages), part_bytes, header=csv_header())
+        content_type = 'text/csv'
+    else:
+        parts = gzip_parts(ndjson_blocks(pages), part_bytes)
+        content_type = 'application/x-ndjson'
+
+    manifest_parts = []
+    total_items = 0
+    total_bytes = 0
+    for number, (body, count) in enumerate(parts):
+        key = f"{export_key}/part-{number:05d}.{export_format}.gz"
+        s3.put_object(
+            Bucket=export_bucket,
+            Key=key,
+            Body=body,
+            ContentType=content_type,
+            ContentEncoding='gzip'
+        )
+        manifest_parts.append({'key': key, 'items': count, 'bytes': len(body)})
+        total_items += count
+        total_bytes += len(body)
+        logger.info(f"Wrote {key}: {count} bookings, {len(body)} bytes")
+
+    elapsed = time.perf_counter() - started
+    manifest = {
+        'table': bookings_table,
+        'format': export_format,
+        'segments': segments,
+        'startedAt': started_at.isoformat(),
+        'items': total_items,
+        'compressedBytes': total_bytes,
+        'seconds': round(elapsed, 3),
+        'itemsPerSecond': round(total_items / elapsed, 1) if elapsed else None,
+        'parts': manifest_parts
+    }
+    s3.put_object(
+        Bucket=export_bucket,
+        Key=f"{export_key}/manifest.json",
+        Body=json.dumps(manifest, indent=2),
+        ContentType='application/json'
+    )
+
+    logger.info(
+        f"Exported {total_items} bookings in {elapsed:.1f}s "
+        f"({manifest['itemsPerSecond']} items/s, {len(manifest_parts)} parts, {total_bytes} bytes)"
+    )
+    return manifest
@@ -0,0 +1,179 @@
+import os
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import logging
+import time
+from booking_runtime.http import GET_HEADERS, respond
+from booking_runtime.slots import MAX_BOOKING_HOURS, slot_hours
+from dalscooter_runtime import clients
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# The window's hours are read in parallel, one SlotHourIndex query each. A
+# window covers at most MAX_BOOKING_HOURS + 1 clock hours; the pool and the
+# client's connection pool are sized together and live for the lifetime of
+# the container.
+AVAILABILITY_WORKERS = int(os.environ.get('AVAILABILITY_WORKERS', str(MAX_BOOKING_HOURS + 1)))
+
+# The inventory changes far less often than bookings, so a warm container
+# reuses its candidate list for this long instead of querying per search
+BIKE_CACHE_SECONDS = float(os.environ.get('BIKE_CACHE_SECONDS', '60'))
+
+# A type's bikes, cheapest first
+TYPE_RATE_INDEX = 'TypeRateIndex'
+# The slot locks of one clock hour (slotStart), by bike
+SLOT_HOUR_INDEX = 'SlotHourIndex'
+
+# Initialize AWS clients
+dynamodb = clients.client('dynamodb', config=Config(max_pool_connections=AVAILABILITY_WORKERS))
+slots_table = os.environ['SLOTS_TABLE']
+bike_inventory_table = os.environ['BIKE_INVENTORY_TABLE']
+executor = ThreadPoolExecutor(max_workers=AVAILABILITY_WORKERS)
+
+# bike type -> (expiry, inventory items)
+_candidate_cache = {}
+
+def load_candidate_bikes(bike_type):
+    """
+    All bikes of the requested type, from TypeRateIndex, cached for
+    BIKE_CACHE_SECONDS
+    """
+    cached = _candidate_cache.get(bike_type)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    query_params = {
+        'TableName': bike_inventory_table,
+        'IndexName': TYPE_RATE_INDEX,
+        'KeyConditionExpression': '#type = :type',
+        'ProjectionExpression': 'bikeId, model, #type, hourlyRate, batteryLife, discount',
+        'ExpressionAttributeNames': {
+            '#type': 'type'
+        },
+        'ExpressionAttributeValues': {
+            ':type': {'S': bike_type}
+        }
+    }
+
+    bikes = []
+    while True:
+        response = dynamodb.query(**query_params)
+        bikes.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    _candidate_cache[bike_type] = (time.monotonic() + BIKE_CACHE_SECONDS, bikes)
+    return bikes
+
+
+def locked_bikes(hour):
+    """
+    The bikes with a slot lock on the clock hour starting at ``hour``. Every
+    booking holds a lock per hour it touches and create_booking claims the
+    same locks, so a bike without one in any hour of the window is one it
+    will accept.
+    """
+    query_params = {
+        'TableName': slots_table,
+        'IndexName': SLOT_HOUR_INDEX,
+        'KeyConditionExpression': 'slotStart = :hour',
+        'ProjectionExpression': 'bikeId',
+        'ExpressionAttributeValues': {
+            ':hour': {'S': hour.isoformat()}
+        }
+    }
+
+    bikes = set()
+    while True:
+        response = dynamodb.query(**query_params)
+        bikes.update(item['bikeId']['S'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return bikes
+
+
+def format_bike(item):
+    battery_life = item.get('batteryLife', {})
+    return {
+        'bikeId': item['bikeId']['S'],
+        'model': item.get('model', {}).get('S', 'Unknown'),
+        'type': item.get('type', {}).get('S', 'Unknown'),
+        'hourlyRate': float(item.get('hourlyRate', {}).get('N', '0')),
+        'batteryLife': battery_life.get('S', battery_life.get('N', '')),
+        'discount': item.get('discount', {}).get('S', '')
+    }
+
+
+def lambda_handler(event, context):
+    """
+    List the bikes of a type that are free for the whole of a time window,
+    cheapest first
+    """
+    try:
+        query_params = event.get('queryStringParameters', {}) or {}
+        bike_type = query_params.get('type')
+        start_date = query_params.get('start')
+        end_date = query_params.get('end')
+
+        if not bike_type or not start_date or not end_date:
+            return respond(400, {
+                'error': 'Query parameters type, start and end are required'
+            }, GET_HEADERS)
+
+        # Validate dates
+        try:
+            start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+            end_datetime = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+        except ValueError as e:
+            return respond(400, {
+                'error': f'Invalid date format: {str(e)}'
+            }, GET_HEADERS)
+
+        if start_datetime >= end_datetime:
+            return respond(400, {
+                'error': 'Start date must be before end date'
+            }, GET_HEADERS)
+
+        if end_datetime - start_datetime > timedelta(hours=MAX_BOOKING_HOURS):
+            return respond(400, {
+                'error': f'Availability window cannot exceed {MAX_BOOKING_HOURS} hours'
+            }, GET_HEADERS)
+
+        window_hours = slot_hours(start_datetime, end_datetime)
+
+        try:
+            bikes = load_candidate_bikes(bike_type)
+            # Read per hour of the window, not per bike, so the cost follows
+            # the bookings in the window rather than the size of the fleet
+            busy = set().union(*executor.map(locked_bikes, window_hours))
+            free_bikes = [format_bike(bike) for bike in bikes if bike['bikeId']['S'] not in busy]
+        except Exception as e:
+            logger.error(f"Error checking fleet availability: {str(e)}")
+            return respond(500, {
+                'error': 'Error checking availability'
+            }, GET_HEADERS)
+
+        free_bikes.sort(key=lambda bike: (bike['hourlyRate'], bike['bikeId']))
+
+        logger.info(f"{len(free_bikes)} of {len(bikes)} {bike_type} bikes free from {start_date} to {end_date}")
+
+        return respond(200, {
+            'bikes': free_bikes,
+            'count': len(free_bikes),
+            'checked': len(bikes),
+            'type': bike_type,
+            'startDate': start_date,
+            'endDate': end_date
+        }, GET_HEADERS)
+
+    except Exception as e:
+        logger.error(f"Unexpected error in get_availability_lambda: {str(e)}")
+        return respond(500, {
+            'error': 'Internal server error'
+        }, GET_HEADERS)
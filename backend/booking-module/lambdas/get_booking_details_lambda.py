@@ -1,15 +1,17 @@
-import json
-import boto3
 import os
 from datetime import datetime
 import logging
+from booking_runtime.claims import caller_from_event
+from booking_runtime.codec import BOOKING
+from booking_runtime.http import GET_HEADERS, respond
+from dalscooter_runtime import clients
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
-dynamodb = boto3.client('dynamodb')
+dynamodb = clients.client('dynamodb')
 bookings_table = os.environ['BOOKINGS_TABLE']
 
 def lambda_handler(event, context):
@@ -18,60 +20,18 @@ def lambda_handler(event, context):
     """
     try:
         # Extract user info from Cognito claims
-        try:
-            authorizer = event.get('requestContext', {}).get('authorizer', {})
-            
-            # Try different possible claim structures
-            if 'claims' in authorizer:
-                claims = authorizer['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                user_groups = claims.get('cognito:groups', '')
-            elif 'jwt' in authorizer:
-                jwt_data = authorizer['jwt']
-                user_id = jwt_data.get('sub', 'unknown')
-                user_email = jwt_data.get('email', 'unknown@example.com')
-                user_groups = jwt_data.get('cognito:groups', '')
-            else:
-                user_id = authorizer.get('sub', 'unknown')
-                user_email = authorizer.get('email', 'unknown@example.com')
-                user_groups = authorizer.get('cognito:groups', '')
-                
-        except (KeyError, TypeError) as e:
-            logger.error(f"Error extracting user claims: {str(e)}")
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Invalid authentication token'
-                })
-            }
-        
-        # Check if user is admin (BikeFranchise group)
-        is_admin = 'BikeFranchise' in user_groups
+        caller = caller_from_event(event)
+        if caller is None:
+            logger.warning("Request without usable Cognito claims")
+            return respond(401, {'error': 'Invalid authentication token'}, GET_HEADERS)
+        user_id, user_email, is_admin = caller.user_id, caller.email, caller.is_admin
         
         # Get booking ID from path parameters
         path_params = event.get('pathParameters', {}) or {}
         booking_id = path_params.get('bookingId')
         
         if not booking_id:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Booking ID is required'
-                })
-            }
+            return respond(400, {'error': 'Booking ID is required'}, GET_HEADERS)
         
         # Get the booking details
         try:
@@ -81,52 +41,16 @@ def lambda_handler(event, context):
             )
             
             if 'Item' not in booking_response:
-                return {
-                    'statusCode': 404,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Booking not found'
-                    })
-                }
+                return respond(404, {'error': 'Booking not found'}, GET_HEADERS)
             
             booking_item = booking_response['Item']
             
             # Check if user owns this booking (unless admin)
             if not is_admin and booking_item['userId']['S'] != user_id:
-                return {
-                    'statusCode': 403,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'You can only view your own bookings'
-                    })
-                }
+                return respond(403, {'error': 'You can only view your own bookings'}, GET_HEADERS)
             
             # Format the booking details
-            booking = {
-                'bookingId': booking_item['bookingId']['S'],
-                'userId': booking_item['userId']['S'],
-                'userEmail': booking_item.get('userEmail', {}).get('S', ''),
-                'bikeId': booking_item['bikeId']['S'],
-                'startDate': booking_item['startDate']['S'],
-                'endDate': booking_item['endDate']['S'],
-                'duration': int(booking_item['duration']['N']),
-                'status': booking_item['status']['S'],
-                'notes': booking_item.get('notes', {}).get('S', ''),
-                'createdAt': booking_item['createdAt']['S'],
-                'updatedAt': booking_item.get('updatedAt', {}).get('S', ''),
-                'bikeModel': booking_item.get('bikeModel', {}).get('S', 'Unknown'),
-                'bikeType': booking_item.get('bikeType', {}).get('S', 'Unknown')
-            }
+            booking = BOOKING.decode(booking_item)
             
             # Add additional calculated fields
             try:
@@ -171,47 +95,16 @@ def lambda_handler(event, context):
             
             logger.info(f"Retrieved booking details for {booking_id}")
             
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                },
-                'body': json.dumps({
-                    'booking': booking,
-                    'userEmail': user_email,
-                    'isAdmin': is_admin
-                })
-            }
+            return respond(200, {
+                'booking': booking,
+                'userEmail': user_email,
+                'isAdmin': is_admin
+            }, GET_HEADERS)
             
         except Exception as e:
             logger.error(f"Error retrieving booking details: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error retrieving booking details'
-                })
-            }
+            return respond(500, {'error': 'Error retrieving booking details'}, GET_HEADERS)
             
     except Exception as e:
         logger.error(f"Unexpected error in get_booking_details_lambda: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                'Access-Control-Allow-Methods': 'GET,OPTIONS'
-            },
-            'body': json.dumps({
-                'error': 'Internal server error'
-            })
-        } 
\ No newline at end of file
+        return respond(500, {'error': 'Internal server error'}, GET_HEADERS) 
\ No newline at end of file
@@ -1,16 +1,30 @@
-import json
-import boto3
 import os
-from datetime import datetime
 import logging
+from booking_runtime.claims import caller_from_event
+from booking_runtime.codec import BOOKING
+from booking_runtime.http import GET_HEADERS, respond
+from dalscooter_runtime import clients
+from dalscooter_runtime.cursors import InvalidCursor, decode_cursor, encode_cursor
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
-dynamodb = boto3.client('dynamodb')
+dynamodb = clients.client('dynamodb')
 bookings_table = os.environ['BOOKINGS_TABLE']
+cursor_secret = os.environ['CURSOR_SECRET']
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+
+# Smallest Limit sent to DynamoDB while filling a page, so a selective
+# status filter does not turn into many tiny reads
+MIN_READ_SIZE = 25
+
+# Most items a single request may evaluate before returning a short page
+# with a cursor instead of reading on
+READ_BUDGET = int(os.environ.get('READ_BUDGET', '500'))
 
 def lambda_handler(event, context):
     """
@@ -19,192 +33,116 @@ def lambda_handler(event, context):
     """
     try:
         # Extract user info from Cognito claims
-        try:
-            # Debug the authorizer structure
-            logger.info(f"Authorizer structure: {json.dumps(event.get('requestContext', {}).get('authorizer', {}), default=str)}")
-            
-            authorizer = event.get('requestContext', {}).get('authorizer', {})
-            
-            # Try different possible claim structures
-            if 'claims' in authorizer:
-                claims = authorizer['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                user_groups = claims.get('cognito:groups', '')
-            elif 'jwt' in authorizer:
-                # JWT authorizer might use 'jwt' instead of 'claims'
-                jwt_data = authorizer['jwt']
-                user_id = jwt_data.get('sub', 'unknown')
-                user_email = jwt_data.get('email', 'unknown@example.com')
-                user_groups = jwt_data.get('cognito:groups', '')
-            else:
-                # Fallback: try to extract from the authorizer directly
-                user_id = authorizer.get('sub', 'unknown')
-                user_email = authorizer.get('email', 'unknown@example.com')
-                user_groups = authorizer.get('cognito:groups', '')
-                
-            logger.info(f"Extracted user_id: {user_id}, user_email: {user_email}, groups: {user_groups}")
-            
-        except (KeyError, TypeError) as e:
-            logger.error(f"Error extracting user claims: {str(e)}")
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Invalid authentication token'
-                })
-            }
-        
-        # Check if user is admin (BikeFranchise group)
-        is_admin = 'BikeFranchise' in user_groups
+        caller = caller_from_event(event)
+        if caller is None:
+            logger.warning("Request without usable Cognito claims")
+            return respond(401, {'error': 'Invalid authentication token'}, GET_HEADERS)
+        user_id, user_email, is_admin = caller.user_id, caller.email, caller.is_admin
         
         # Parse query parameters
         query_params = event.get('queryStringParameters', {}) or {}
         status_filter = query_params.get('status')
         date_filter = query_params.get('date')
-        limit = int(query_params.get('limit', 50))
+        cursor = query_params.get('cursor')
+        try:
+            limit = min(max(int(query_params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            return respond(400, {'error': 'limit must be a number'}, GET_HEADERS)
         
-        # Build query parameters
-        query_params_dynamo = {
-            'TableName': bookings_table,
-            'IndexName': 'UserBookingsIndex',
-            'KeyConditionExpression': 'userId = :userId',
-            'ExpressionAttributeValues': {
-                ':userId': {'S': user_id}
-            },
-            'ScanIndexForward': False,  # Most recent first
-            'Limit': limit
+        # A cursor only continues the listing it was issued for
+        cursor_scope = {
+            'user': '*' if is_admin else user_id,
+            'status': status_filter,
+            'date': date_filter
         }
         
-        # Add status filter if provided
+        if is_admin:
+            # Admins page through the whole table, in table order
+            request_params = {
+                'TableName': bookings_table
+            }
+            key_attributes = ('bookingId',)
+        else:
+            # Users page through their own partition of UserBookingsIndex,
+            # newest bookingDate first; a date filter narrows the range key
+            request_params = {
+                'TableName': bookings_table,
+                'IndexName': 'UserBookingsIndex',
+                'KeyConditionExpression': 'userId = :userId',
+                'ExpressionAttributeValues': {
+                    ':userId': {'S': user_id}
+                },
+                'ScanIndexForward': False  # Most recent first
+            }
+            if date_filter:
+                request_params['KeyConditionExpression'] += ' AND begins_with(bookingDate, :date)'
+                request_params['ExpressionAttributeValues'][':date'] = {'S': date_filter}
+            key_attributes = ('bookingId', 'userId', 'bookingDate')
+        
+        filters = []
         if status_filter:
-            query_params_dynamo['FilterExpression'] = '#status = :status'
-            query_params_dynamo['ExpressionAttributeNames'] = {
+            filters.append('#status = :status')
+            request_params['ExpressionAttributeNames'] = {
                 '#status': 'status'
             }
-            query_params_dynamo['ExpressionAttributeValues'][':status'] = {'S': status_filter}
-        
-        # Add date filter if provided
-        if date_filter:
-            if 'FilterExpression' in query_params_dynamo:
-                query_params_dynamo['FilterExpression'] += ' AND begins_with(bookingDate, :date)'
-            else:
-                query_params_dynamo['FilterExpression'] = 'begins_with(bookingDate, :date)'
-            
-            if 'ExpressionAttributeNames' not in query_params_dynamo:
-                query_params_dynamo['ExpressionAttributeNames'] = {}
-            
-            query_params_dynamo['ExpressionAttributeValues'][':date'] = {'S': date_filter}
+            request_params.setdefault('ExpressionAttributeValues', {})[':status'] = {'S': status_filter}
+        if is_admin and date_filter:
+            filters.append('begins_with(bookingDate, :date)')
+            request_params.setdefault('ExpressionAttributeValues', {})[':date'] = {'S': date_filter}
+        if filters:
+            request_params['FilterExpression'] = ' AND '.join(filters)
         
-        # If admin, get all bookings instead of user-specific
-        if is_admin:
-            # Remove user-specific query and use scan instead
-            scan_params = {
-                'TableName': bookings_table,
-                'Limit': limit
-            }
-            
-            if status_filter:
-                scan_params['FilterExpression'] = '#status = :status'
-                scan_params['ExpressionAttributeNames'] = {
-                    '#status': 'status'
-                }
-                scan_params['ExpressionAttributeValues'] = {
-                    ':status': {'S': status_filter}
-                }
-            
-            try:
-                response = dynamodb.scan(**scan_params)
-            except Exception as e:
-                logger.error(f"Error scanning bookings for admin: {str(e)}")
-                return {
-                    'statusCode': 500,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Error retrieving bookings'
-                    })
-                }
-        else:
-            # Regular user query
+        if cursor:
             try:
-                response = dynamodb.query(**query_params_dynamo)
-            except Exception as e:
-                logger.error(f"Error querying bookings: {str(e)}")
-                return {
-                    'statusCode': 500,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'GET,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Error retrieving bookings'
-                    })
-                }
+                request_params['ExclusiveStartKey'] = decode_cursor(cursor, cursor_scope, cursor_secret)
+            except InvalidCursor as e:
+                logger.warning(f"Rejected pagination cursor: {str(e)}")
+                return respond(400, {'error': 'Invalid pagination cursor'}, GET_HEADERS)
         
-        # Process and format bookings
-        bookings = []
-        for item in response.get('Items', []):
-            booking = {
-                'bookingId': item['bookingId']['S'],
-                'userId': item['userId']['S'],
-                'userEmail': item.get('userEmail', {}).get('S', ''),
-                'bikeId': item['bikeId']['S'],
-                'startDate': item['startDate']['S'],
-                'endDate': item['endDate']['S'],
-                'duration': int(item['duration']['N']),
-                'status': item['status']['S'],
-                'notes': item.get('notes', {}).get('S', ''),
-                'createdAt': item['createdAt']['S'],
-                'updatedAt': item.get('updatedAt', {}).get('S', ''),
-                'bikeModel': item.get('bikeModel', {}).get('S', 'Unknown'),
-                'bikeType': item.get('bikeType', {}).get('S', 'Unknown')
-            }
-            bookings.append(booking)
+        # Keep reading until the page holds `limit` matching bookings, the
+        # listing ends or the read budget is spent. Filters apply after
+        # DynamoDB's Limit, so a single request can come back nearly empty.
+        items = []
+        next_key = None
+        evaluated = 0
+        read_page = dynamodb.scan if is_admin else dynamodb.query
+        try:
+            while True:
+                request_params['Limit'] = max(limit - len(items), MIN_READ_SIZE)
+                response = read_page(**request_params)
+                evaluated += response.get('ScannedCount', 0)
+                page_items = response.get('Items', [])
+                next_key = response.get('LastEvaluatedKey')
+                
+                if len(items) + len(page_items) >= limit:
+                    overflow = len(items) + len(page_items) > limit
+                    items.extend(page_items[:limit - len(items)])
+                    if overflow:
+                        # Resume right after the last booking we return
+                        next_key = {name: items[-1][name] for name in key_attributes}
+                    break
+                
+                items.extend(page_items)
+                if not next_key or evaluated >= READ_BUDGET:
+                    break
+                request_params['ExclusiveStartKey'] = next_key
+        except Exception as e:
+            logger.error(f"Error retrieving bookings: {str(e)}")
+            return respond(500, {'error': 'Error retrieving bookings'}, GET_HEADERS)
         
-        # Sort bookings by creation date (newest first)
-        bookings.sort(key=lambda x: x['createdAt'], reverse=True)
+        # Process and format bookings
+        bookings = [BOOKING.decode(item) for item in items]
         
         logger.info(f"Retrieved {len(bookings)} bookings for user {user_id}")
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                'Access-Control-Allow-Methods': 'GET,OPTIONS'
-            },
-            'body': json.dumps({
-                'bookings': bookings,
-                'count': len(bookings),
-                'userEmail': user_email,
-                'isAdmin': is_admin
-            })
-        }
+        return respond(200, {
+            'bookings': bookings,
+            'count': len(bookings),
+            'nextCursor': encode_cursor(next_key, cursor_scope, cursor_secret) if next_key else None,
+            'userEmail': user_email,
+            'isAdmin': is_admin
+        }, GET_HEADERS)
         
     except Exception as e:
         logger.error(f"Unexpected error in get_bookings_lambda: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                'Access-Control-Allow-Methods': 'GET,OPTIONS'
-            },
-            'body': json.dumps({
-                'error': 'Internal server error'
-            })
-        } 
\ No newline at end of file
+        return respond(500, {'error': 'Internal server error'}, GET_HEADERS) 
\ No newline at end of file
@@ -0,0 +1,77 @@
+import os
+import logging
+from booking_runtime.slots import release_slots
+from dalscooter_runtime import clients
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Initialize AWS clients
+dynamodb = clients.client('dynamodb')
+slots_table = os.environ['SLOTS_TABLE']
+
+
+def cancelled_booking(record):
+    """
+    The new image of a booking that this stream record moved to cancelled
+    while it still held slot locks, or None
+    """
+    if record.get('eventName') != 'MODIFY':
+        return None
+    change = record.get('dynamodb', {})
+    new_image = change.get('NewImage', {})
+    old_image = change.get('OldImage', {})
+    if new_image.get('status', {}).get('S') != 'cancelled':
+        return None
+    if old_image.get('status', {}).get('S') == 'cancelled':
+        return None
+    if not new_image.get('slotLocked', {}).get('BOOL'):
+        return None
+    return new_image
+
+
+def release_booking_slots(booking):
+    booking_id = booking['bookingId']['S']
+    releases = release_slots(
+        slots_table,
+        booking['bikeId']['S'],
+        booking_id,
+        booking['startDate']['S'],
+        booking['endDate']['S']
+    )
+    if not releases:
+        return
+    try:
+        dynamodb.transact_write_items(TransactItems=releases)
+    except dynamodb.exceptions.TransactionCanceledException:
+        # A slot in the range belongs to another booking; release the rest
+        # one at a time and leave that one alone
+        for release in releases:
+            try:
+                dynamodb.delete_item(**release['Delete'])
+            except dynamodb.exceptions.ConditionalCheckFailedException:
+                logger.warning(f"Slot {release['Delete']['Key']['slotId']['S']} is not held by booking {booking_id}")
+    logger.info(f"Released {len(releases)} slots for cancelled booking {booking_id}")
+
+
+def lambda_handler(event, context):
+    """
+    Release the hourly slot locks of cancelled bookings, from the bookings
+    table's DynamoDB stream. Releasing is idempotent, so it is safe for
+    bookings whose locks update_booking already released.
+    """
+    for record in event.get('Records', []):
+        try:
+            booking = cancelled_booking(record)
+            if booking is not None:
+                release_booking_slots(booking)
+        except Exception as e:
+            logger.error(f"Error releasing slots: {str(e)}", exc_info=True)
+            # Retry from this record; later records wait behind it
+            return {
+                'batchItemFailures': [
+                    {'itemIdentifier': record['dynamodb']['SequenceNumber']}
+                ]
+            }
+    return {'batchItemFailures': []}
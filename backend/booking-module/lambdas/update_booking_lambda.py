@@ -1,16 +1,232 @@
 import json
-import boto3
 import os
-from datetime import datetime
+import random
+import time
+from datetime import datetime, timedelta, timezone
 import logging
+from booking_runtime.claims import caller_from_event
+from booking_runtime.http import PUT_HEADERS, respond
+from booking_runtime.overlaps import load_bike_bookings, parse_timestamp
+from booking_runtime.slots import (
+    MAX_BOOKING_HOURS,
+    claim_slots,
+    format_utc,
+    is_booking_conflict,
+    is_slot_conflict,
+    move_slots,
+    release_slots,
+    to_utc,
+)
+from dalscooter_runtime import clients
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
-dynamodb = boto3.client('dynamodb')
+dynamodb = clients.client('dynamodb')
 bookings_table = os.environ['BOOKINGS_TABLE']
+slots_table = os.environ['SLOTS_TABLE']
+
+# Attempts at read-validate-write before giving up with a 409 when other
+# requests keep changing the booking underneath us
+UPDATE_ATTEMPTS = int(os.environ.get('UPDATE_ATTEMPTS', '3'))
+
+# Base of the jittered exponential backoff between attempts
+RETRY_BASE_SECONDS = 0.025
+
+# Fields that can be updated
+UPDATABLE_FIELDS = ['startDate', 'endDate', 'duration', 'notes', 'status']
+
+
+def validate_fields(body):
+    """
+    Check the requested field values on their own, before reading the
+    booking. Returns an error response, or None when they are valid.
+    """
+    for field in ('startDate', 'endDate'):
+        if field not in body:
+            continue
+        try:
+            field_datetime = to_utc(body[field])
+        except (AttributeError, ValueError):
+            return respond(400, {'error': f'Invalid date format for {field}'}, PUT_HEADERS)
+        if field == 'startDate' and field_datetime < datetime.now(timezone.utc):
+            return respond(400, {'error': 'Start date cannot be in the past'}, PUT_HEADERS)
+
+    if 'status' in body and body['status'] not in ['active', 'cancelled', 'completed']:
+        return respond(400, {'error': 'Invalid status. Must be active, cancelled, or completed'}, PUT_HEADERS)
+
+    return None
+
+
+def attempt_update(booking_id, body, user_id, is_admin):
+    """
+    Read the booking, validate the change against it and write it back
+    conditional on the version that was read. Returns the response, or None
+    when another request changed the booking in between and the whole
+    attempt should be retried.
+    """
+    # Get the existing booking
+    try:
+        booking_response = dynamodb.get_item(
+            TableName=bookings_table,
+            Key={'bookingId': {'S': booking_id}},
+            ConsistentRead=True
+        )
+    except Exception as e:
+        logger.error(f"Error retrieving booking: {str(e)}")
+        return respond(500, {'error': 'Error retrieving booking'}, PUT_HEADERS)
+
+    if 'Item' not in booking_response:
+        return respond(404, {'error': 'Booking not found'}, PUT_HEADERS)
+
+    existing_booking = booking_response['Item']
+
+    # Check if user owns this booking (unless admin)
+    if not is_admin and existing_booking['userId']['S'] != user_id:
+        return respond(403, {'error': 'You can only update your own bookings'}, PUT_HEADERS)
+
+    # Check if booking can be updated (not cancelled or completed)
+    booking_status = existing_booking['status']['S']
+    if booking_status in ['cancelled', 'completed']:
+        return respond(400, {'error': f'Cannot update booking with status: {booking_status}'}, PUT_HEADERS)
+
+    # Prepare update expression and attribute values
+    update_expression = "SET "
+    expression_attribute_names = {}
+    expression_attribute_values = {}
+    updated_fields = []
+
+    for field in UPDATABLE_FIELDS:
+        if field in body:
+            attr_name = f"#{field}"
+            attr_value = f":{field}"
+
+            update_expression += f"{attr_name} = {attr_value}, "
+            expression_attribute_names[attr_name] = field
+
+            if field == 'duration':
+                expression_attribute_values[attr_value] = {'N': str(body[field])}
+            else:
+                expression_attribute_values[attr_value] = {'S': str(body[field])}
+
+            updated_fields.append(field)
+
+    # Add updatedAt timestamp
+    current_time = datetime.utcnow().isoformat() + 'Z'
+    update_expression += "#updatedAt = :updatedAt"
+    expression_attribute_names["#updatedAt"] = "updatedAt"
+    expression_attribute_values[":updatedAt"] = {'S': current_time}
+
+    # Update bookingDate if startDate is being updated
+    if 'startDate' in body:
+        update_expression += ", #bookingDate = :bookingDate"
+        expression_attribute_names["#bookingDate"] = "bookingDate"
+        expression_attribute_values[":bookingDate"] = {'S': body['startDate'].split('T')[0]}
+
+    # Move, release or claim the booking's hourly slot locks
+    slot_items = []
+    slot_locked = existing_booking.get('slotLocked', {}).get('BOOL', False)
+    bike_id = existing_booking['bikeId']['S']
+    old_start = existing_booking['startDate']['S']
+    old_end = existing_booking['endDate']['S']
+
+    if body.get('status') == 'cancelled':
+        if slot_locked:
+            slot_items = release_slots(slots_table, bike_id, booking_id, old_start, old_end)
+    elif 'startDate' in body or 'endDate' in body:
+        new_start = body.get('startDate', old_start)
+        new_end = body.get('endDate', old_end)
+
+        try:
+            new_start_datetime = to_utc(new_start)
+            new_end_datetime = to_utc(new_end)
+        except ValueError:
+            return respond(400, {'error': 'Invalid date format'}, PUT_HEADERS)
+
+        if new_start_datetime >= new_end_datetime:
+            return respond(400, {'error': 'Start date must be before end date'}, PUT_HEADERS)
+
+        if new_end_datetime - new_start_datetime > timedelta(hours=MAX_BOOKING_HOURS):
+            return respond(400, {'error': f'Booking duration cannot exceed {MAX_BOOKING_HOURS} hours'}, PUT_HEADERS)
+
+        # Re-check the new times against the bike's other bookings
+        try:
+            bike_bookings = load_bike_bookings(
+                dynamodb, bookings_table, bike_id, new_start_datetime, new_end_datetime,
+                exclude_booking_id=booking_id
+            )
+            conflict = bike_bookings.find_overlap(parse_timestamp(new_start), parse_timestamp(new_end))
+        except Exception as e:
+            logger.error(f"Error checking bike availability: {str(e)}")
+            return respond(500, {'error': 'Error checking bike availability'}, PUT_HEADERS)
+
+        if conflict:
+            return respond(409, {
+                'error': 'Bike is already booked for the requested time',
+                'conflictingBooking': conflict
+            }, PUT_HEADERS)
+
+        if slot_locked:
+            slot_items = move_slots(slots_table, bike_id, booking_id, old_start, old_end, new_start, new_end)
+        else:
+            # Bookings made before slot locking start holding locks once rescheduled
+            slot_items = claim_slots(slots_table, bike_id, booking_id, new_start, new_end)
+            update_expression += ", #slotLocked = :slotLocked"
+            expression_attribute_names["#slotLocked"] = "slotLocked"
+            expression_attribute_values[":slotLocked"] = {'BOOL': True}
+
+    # Only apply the update if the booking is still the version we read.
+    # Bookings written before versioning have no version attribute yet.
+    expression_attribute_names["#version"] = "version"
+    if 'version' in existing_booking:
+        read_version = int(existing_booking['version']['N'])
+        condition = "#version = :readVersion"
+        expression_attribute_values[":readVersion"] = {'N': str(read_version)}
+    else:
+        read_version = 0
+        condition = "attribute_not_exists(#version)"
+    update_expression += ", #version = :version"
+    expression_attribute_values[":version"] = {'N': str(read_version + 1)}
+
+    booking_update = {
+        'TableName': bookings_table,
+        'Key': {'bookingId': {'S': booking_id}},
+        'UpdateExpression': update_expression,
+        'ConditionExpression': condition,
+        'ExpressionAttributeNames': expression_attribute_names,
+        'ExpressionAttributeValues': expression_attribute_values
+    }
+
+    try:
+        # Perform the update
+        if slot_items:
+            dynamodb.transact_write_items(
+                TransactItems=[{'Update': booking_update}] + slot_items
+            )
+        else:
+            dynamodb.update_item(**booking_update)
+    except Exception as e:
+        if is_booking_conflict(e):
+            return None
+        if is_slot_conflict(e):
+            logger.info(f"Slot conflict updating booking {booking_id}: {str(e)}")
+            return respond(409, {'error': 'Bike is already booked for the requested time'}, PUT_HEADERS)
+        logger.error(f"Error updating booking: {str(e)}")
+        return respond(500, {'error': 'Error updating booking'}, PUT_HEADERS)
+
+    logger.info(f"Booking {booking_id} updated successfully to version {read_version + 1}")
+
+    # Return the updated booking
+    return respond(200, {
+        'message': 'Booking updated successfully',
+        'bookingId': booking_id,
+        'updatedFields': updated_fields,
+        'updatedAt': current_time,
+        'version': read_version + 1
+    }, PUT_HEADERS)
+
 
 def lambda_handler(event, context):
     """
@@ -22,272 +238,43 @@ def lambda_handler(event, context):
             body = json.loads(event['body'])
         else:
             body = event
-        
+
         # Extract user info from Cognito claims
-        try:
-            authorizer = event.get('requestContext', {}).get('authorizer', {})
-            
-            # Try different possible claim structures
-            if 'claims' in authorizer:
-                claims = authorizer['claims']
-                user_id = claims.get('sub', 'unknown')
-                user_email = claims.get('email', 'unknown@example.com')
-                user_groups = claims.get('cognito:groups', '')
-            elif 'jwt' in authorizer:
-                jwt_data = authorizer['jwt']
-                user_id = jwt_data.get('sub', 'unknown')
-                user_email = jwt_data.get('email', 'unknown@example.com')
-                user_groups = jwt_data.get('cognito:groups', '')
-            else:
-                user_id = authorizer.get('sub', 'unknown')
-                user_email = authorizer.get('email', 'unknown@example.com')
-                user_groups = authorizer.get('cognito:groups', '')
-                
-        except (KeyError, TypeError) as e:
-            logger.error(f"Error extracting user claims: {str(e)}")
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Invalid authentication token'
-                })
-            }
-        
-        # Check if user is admin (BikeFranchise group)
-        is_admin = 'BikeFranchise' in user_groups
-        
+        caller = caller_from_event(event)
+        if caller is None:
+            logger.warning("Request without usable Cognito claims")
+            return respond(401, {'error': 'Invalid authentication token'}, PUT_HEADERS)
+        user_id, is_admin = caller.user_id, caller.is_admin
+
         # Get booking ID from path parameters
         path_params = event.get('pathParameters', {}) or {}
         booking_id = path_params.get('bookingId')
-        
+
         if not booking_id:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Booking ID is required'
-                })
-            }
-        
-        # Get the existing booking
-        try:
-            booking_response = dynamodb.get_item(
-                TableName=bookings_table,
-                Key={'bookingId': {'S': booking_id}}
-            )
-            
-            if 'Item' not in booking_response:
-                return {
-                    'statusCode': 404,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'Booking not found'
-                    })
-                }
-            
-            existing_booking = booking_response['Item']
-            
-            # Check if user owns this booking (unless admin)
-            if not is_admin and existing_booking['userId']['S'] != user_id:
-                return {
-                    'statusCode': 403,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': 'You can only update your own bookings'
-                    })
-                }
-            
-            # Check if booking can be updated (not cancelled or completed)
-            booking_status = existing_booking['status']['S']
-            if booking_status in ['cancelled', 'completed']:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                        'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                    },
-                    'body': json.dumps({
-                        'error': f'Cannot update booking with status: {booking_status}'
-                    })
-                }
-                
-        except Exception as e:
-            logger.error(f"Error retrieving booking: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error retrieving booking'
-                })
-            }
-        
-        # Prepare update expression and attribute values
-        update_expression = "SET "
-        expression_attribute_names = {}
-        expression_attribute_values = {}
-        
-        # Fields that can be updated
-        updatable_fields = ['startDate', 'endDate', 'duration', 'notes', 'status']
-        updated_fields = []
-        
-        for field in updatable_fields:
+            return respond(400, {'error': 'Booking ID is required'}, PUT_HEADERS)
+
+        invalid = validate_fields(body)
+        if invalid:
+            return invalid
+
+        # Store dates in UTC whatever offset they were sent with, as
+        # create_booking does, so that they compare correctly as strings
+        for field in ('startDate', 'endDate'):
             if field in body:
-                field_value = body[field]
-                
-                # Validate dates if updating
-                if field in ['startDate', 'endDate']:
-                    try:
-                        field_datetime = datetime.fromisoformat(field_value.replace('Z', '+00:00'))
-                        if field == 'startDate' and field_datetime < datetime.now().replace(tzinfo=field_datetime.tzinfo):
-                            return {
-                                'statusCode': 400,
-                                'headers': {
-                                    'Content-Type': 'application/json',
-                                    'Access-Control-Allow-Origin': '*',
-                                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                                    'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                                },
-                                'body': json.dumps({
-                                    'error': 'Start date cannot be in the past'
-                                })
-                            }
-                    except ValueError:
-                        return {
-                            'statusCode': 400,
-                            'headers': {
-                                'Content-Type': 'application/json',
-                                'Access-Control-Allow-Origin': '*',
-                                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                                'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                            },
-                            'body': json.dumps({
-                                'error': f'Invalid date format for {field}'
-                            })
-                        }
-                
-                # Validate status if updating
-                if field == 'status' and field_value not in ['active', 'cancelled', 'completed']:
-                    return {
-                        'statusCode': 400,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                            'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                        },
-                        'body': json.dumps({
-                            'error': 'Invalid status. Must be active, cancelled, or completed'
-                        })
-                    }
-                
-                # Add to update expression
-                attr_name = f"#{field}"
-                attr_value = f":{field}"
-                
-                update_expression += f"{attr_name} = {attr_value}, "
-                expression_attribute_names[attr_name] = field
-                
-                if field == 'duration':
-                    expression_attribute_values[attr_value] = {'N': str(field_value)}
-                else:
-                    expression_attribute_values[attr_value] = {'S': str(field_value)}
-                
-                updated_fields.append(field)
-        
-        # Add updatedAt timestamp
-        current_time = datetime.utcnow().isoformat() + 'Z'
-        update_expression += "#updatedAt = :updatedAt"
-        expression_attribute_names["#updatedAt"] = "updatedAt"
-        expression_attribute_values[":updatedAt"] = {'S': current_time}
-        
-        # Update bookingDate if startDate is being updated
-        if 'startDate' in body:
-            update_expression += ", #bookingDate = :bookingDate"
-            expression_attribute_names["#bookingDate"] = "bookingDate"
-            expression_attribute_values[":bookingDate"] = {'S': body['startDate'].split('T')[0]}
-        
-        try:
-            # Perform the update
-            dynamodb.update_item(
-                TableName=bookings_table,
-                Key={'bookingId': {'S': booking_id}},
-                UpdateExpression=update_expression,
-                ExpressionAttributeNames=expression_attribute_names,
-                ExpressionAttributeValues=expression_attribute_values
-            )
-            
-            logger.info(f"Booking {booking_id} updated successfully")
-            
-            # Return the updated booking
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                },
-                'body': json.dumps({
-                    'message': 'Booking updated successfully',
-                    'bookingId': booking_id,
-                    'updatedFields': updated_fields,
-                    'updatedAt': current_time
-                })
-            }
-            
-        except Exception as e:
-            logger.error(f"Error updating booking: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                    'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-                },
-                'body': json.dumps({
-                    'error': 'Error updating booking'
-                })
-            }
-            
+                body[field] = format_utc(body[field])
+
+        # Optimistic concurrency: each attempt is one read and one
+        # conditional write; a lost race re-reads and re-validates
+        for attempt in range(UPDATE_ATTEMPTS):
+            if attempt:
+                time.sleep(random.uniform(0, RETRY_BASE_SECONDS * 2 ** attempt))
+            response = attempt_update(booking_id, body, user_id, is_admin)
+            if response is not None:
+                return response
+            logger.info(f"Booking {booking_id} changed during update (attempt {attempt + 1} of {UPDATE_ATTEMPTS})")
+
+        return respond(409, {'error': 'Booking was modified by another request, please try again'}, PUT_HEADERS)
+
     except Exception as e:
         logger.error(f"Unexpected error in update_booking_lambda: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-                'Access-Control-Allow-Methods': 'PUT,OPTIONS'
-            },
-            'body': json.dumps({
-                'error': 'Internal server error'
-            })
-        } 
\ No newline at end of file
+        return respond(500, {'error': 'Internal server error'}, PUT_HEADERS)
@@ -0,0 +1,3 @@
+"""
+Shared runtime for the DALScooter booking lambdas, deployed as a Lambda layer.
+"""
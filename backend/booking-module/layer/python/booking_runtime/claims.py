@@ -0,0 +1,68 @@
+"""
+The calling user, from the Cognito claims API Gateway attaches to an event.
+
+The booking API is an HTTP API with a JWT authorizer, which passes the ID
+token's claims as ``requestContext.authorizer.jwt.claims`` and flattens
+``cognito:groups`` to a string like ``"[BikeFranchise Customers]"``. REST API
+Cognito authorizers use ``requestContext.authorizer.claims`` instead, and
+direct invocations may carry the claims on the authorizer itself.
+"""
+from typing import NamedTuple, Optional, Tuple
+
+ADMIN_GROUP = 'BikeFranchise'
+
+
+class Caller(NamedTuple):
+    user_id: str
+    email: str
+    groups: Tuple[str, ...]
+
+    @property
+    def is_admin(self):
+        return ADMIN_GROUP in self.groups
+
+
+def parse_groups(value):
+    """
+    Cognito groups as a tuple, from a list, a flattened "[a b]" string or a
+    comma-separated string
+    """
+    if not value:
+        return ()
+    if isinstance(value, (list, tuple)):
+        return tuple(str(group) for group in value)
+    value = str(value).strip()
+    if value.startswith('[') and value.endswith(']'):
+        value = value[1:-1]
+    return tuple(group for group in value.replace(',', ' ').split() if group)
+
+
+def event_claims(event):
+    """
+    The raw claims dict of an API Gateway event, or None
+    """
+    request_context = (event or {}).get('requestContext') or {}
+    authorizer = request_context.get('authorizer') or {}
+    if not isinstance(authorizer, dict):
+        return None
+    jwt = authorizer.get('jwt')
+    if isinstance(jwt, dict) and isinstance(jwt.get('claims'), dict):
+        return jwt['claims']
+    if isinstance(authorizer.get('claims'), dict):
+        return authorizer['claims']
+    return authorizer
+
+
+def caller_from_event(event) -> Optional[Caller]:
+    """
+    The user making the request, or None when the event carries no usable
+    claims
+    """
+    claims = event_claims(event)
+    if not claims or not claims.get('sub'):
+        return None
+    return Caller(
+        user_id=claims['sub'],
+        email=claims.get('email', 'unknown@example.com'),
+        groups=parse_groups(claims.get('cognito:groups'))
+    )
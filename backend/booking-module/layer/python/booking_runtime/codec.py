@@ -0,0 +1,95 @@
+"""
+Schema-driven conversion between DynamoDB typed items and the plain dicts
+the booking API returns.
+
+A schema lists each attribute once with its DynamoDB type and the default
+returned when an item lacks it. Attributes without a default are required:
+decoding an item without one raises ``KeyError``, as the hand-written
+``item['field']['S']`` lookups it replaces did.
+"""
+from typing import Any, NamedTuple
+
+REQUIRED = object()
+
+
+class Field(NamedTuple):
+    name: str
+    type: str
+    default: Any = REQUIRED
+    # Internal attributes are written but not returned by the API
+    public: bool = True
+
+
+def _number(value):
+    if any(c in value for c in '.eE'):
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    return int(value)
+
+
+_DECODERS = {
+    'S': lambda value: value['S'],
+    'N': lambda value: _number(value['N']),
+    'BOOL': lambda value: value['BOOL'],
+}
+
+_ENCODERS = {
+    'S': lambda value: {'S': str(value)},
+    'N': lambda value: {'N': str(value)},
+    'BOOL': lambda value: {'BOOL': bool(value)},
+}
+
+
+class ItemCodec:
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self._decode = tuple(
+            (field.name, _DECODERS[field.type], field.default)
+            for field in self.fields if field.public
+        )
+        self._encode = {field.name: _ENCODERS[field.type] for field in self.fields}
+
+    def decode(self, item):
+        """
+        Plain dict of the public attributes of a typed item
+        """
+        plain = {}
+        for name, decode, default in self._decode:
+            value = item.get(name)
+            if value is None:
+                if default is REQUIRED:
+                    raise KeyError(name)
+                plain[name] = default
+            else:
+                plain[name] = decode(value)
+        return plain
+
+    def encode(self, values):
+        """
+        Typed item from a plain dict; attributes set to None are left out
+        """
+        return {
+            name: self._encode[name](value)
+            for name, value in values.items()
+            if value is not None
+        }
+
+
+BOOKING = ItemCodec([
+    Field('bookingId', 'S'),
+    Field('userId', 'S'),
+    Field('userEmail', 'S', ''),
+    Field('bikeId', 'S'),
+    Field('startDate', 'S'),
+    Field('endDate', 'S'),
+    Field('duration', 'N'),
+    Field('status', 'S'),
+    Field('notes', 'S', ''),
+    Field('createdAt', 'S'),
+    Field('updatedAt', 'S', ''),
+    Field('bikeModel', 'S', 'Unknown'),
+    Field('bikeType', 'S', 'Unknown'),
+    Field('bookingDate', 'S', public=False),
+    Field('slotLocked', 'BOOL', False, public=False),
+    Field('version', 'N', 0, public=False),
+])
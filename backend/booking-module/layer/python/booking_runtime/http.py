@@ -0,0 +1,53 @@
+"""
+Response building for the booking API handlers.
+
+Each set of CORS headers is built once per container and shared by every
+response. They are read-only dicts, so one invocation cannot change the
+headers of the next by accident, while ``json`` and the Lambda runtime
+still serialize them as plain objects.
+"""
+import json
+
+
+class FrozenHeaders(dict):
+    """
+    A dict that refuses to be modified
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Shared response headers are read-only; copy them with dict() first')
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return FrozenHeaders, (dict(self),)
+
+
+def cors_headers(methods):
+    """
+    Headers for a JSON response from a route serving ``methods``, e.g. 'GET'
+    """
+    return FrozenHeaders({
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+        'Access-Control-Allow-Methods': f'{methods},OPTIONS'
+    })
+
+
+GET_HEADERS = cors_headers('GET')
+POST_HEADERS = cors_headers('POST')
+PUT_HEADERS = cors_headers('PUT')
+DELETE_HEADERS = cors_headers('DELETE')
+
+
+def respond(status_code, body, headers):
+    """
+    An API Gateway proxy response with a JSON body
+    """
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': json.dumps(body)
+    }
@@ -0,0 +1,44 @@
+"""
+Transactional outbox for booking notifications.
+
+A handler that wants to notify the customer adds a pending notification to
+the outbox table in the same transaction as the booking write it describes,
+so the notification exists exactly when the booking does and the request
+never waits on SNS. ``dispatch_notifications_lambda`` publishes pending
+notifications in batches from the outbox table's stream and deletes each
+one once SNS has accepted it; a scheduled sweep retries anything the stream
+could not deliver. Delivery is at least once.
+"""
+import uuid
+from datetime import datetime, timezone
+
+
+def notification_item(subject, message, booking_id=None):
+    """
+    A pending outbox item for one SNS message
+    """
+    item = {
+        'notificationId': {'S': str(uuid.uuid4())},
+        'subject': {'S': subject},
+        'message': {'S': message},
+        'createdAt': {'S': datetime.now(timezone.utc).isoformat()}
+    }
+    if booking_id:
+        item['bookingId'] = {'S': booking_id}
+    return item
+
+
+def enqueue_notification(table, subject, message, booking_id=None):
+    """
+    TransactWriteItems entries adding a pending notification to the outbox,
+    to append after the booking's own entries
+    """
+    return [
+        {
+            'Put': {
+                'TableName': table,
+                'Item': notification_item(subject, message, booking_id),
+                'ConditionExpression': 'attribute_not_exists(notificationId)'
+            }
+        }
+    ]
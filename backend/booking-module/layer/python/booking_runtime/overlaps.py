@@ -0,0 +1,112 @@
+"""
+Overlap checks against a bike's existing bookings.
+
+The slot locks only cover bookings that hold them; this reads the bike's
+bookings from ``BikeBookingsIndex`` so create and reschedule can also reject
+overlaps with bookings made before slot locking, and report which booking
+is in the way.
+"""
+import logging
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+
+from .slots import MAX_BOOKING_HOURS
+
+logger = logging.getLogger(__name__)
+
+
+class IntervalIndex:
+    """
+    Static interval index over a bike's bookings.
+
+    Intervals are sorted by start time alongside a running maximum of their end
+    times, so an overlap lookup is a single binary search no matter how many
+    bookings the bike has. The running maximum keeps the lookup correct even
+    when existing bookings already overlap each other.
+    """
+
+    def __init__(self, intervals):
+        ordered = sorted(intervals, key=lambda interval: interval[0])
+        self._starts = [interval[0] for interval in ordered]
+        self._max_end = []
+        latest = None
+        for interval in ordered:
+            if latest is None or interval[1] > latest[1]:
+                latest = interval
+            self._max_end.append(latest)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def find_overlap(self, start, end):
+        """
+        Return the payload of an interval overlapping [start, end), or None
+        """
+        idx = bisect_left(self._starts, end) - 1
+        if idx < 0:
+            return None
+        candidate = self._max_end[idx]
+        return candidate[2] if candidate[1] > start else None
+
+
+def parse_timestamp(value):
+    """
+    Parse an ISO 8601 timestamp into a UTC epoch; naive values are treated as UTC
+    """
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def load_bike_bookings(client, table, bike_id, start_datetime, end_datetime, exclude_booking_id=None):
+    """
+    Build an IntervalIndex of the bike's non-cancelled bookings that could
+    overlap the requested window, using a BikeBookingsIndex key condition on
+    bookingDate rather than reading the bike's whole history. Bookings last at
+    most MAX_BOOKING_HOURS, so nothing that started earlier can still overlap.
+    A booking being rescheduled passes its own id as ``exclude_booking_id``.
+    """
+    from_date = (start_datetime - timedelta(hours=MAX_BOOKING_HOURS)).date().isoformat()
+    to_date = end_datetime.date().isoformat()
+
+    query_params = {
+        'TableName': table,
+        'IndexName': 'BikeBookingsIndex',
+        'KeyConditionExpression': 'bikeId = :bikeId AND bookingDate BETWEEN :fromDate AND :toDate',
+        'FilterExpression': '#status <> :cancelled',
+        'ProjectionExpression': 'bookingId, startDate, endDate, #status',
+        'ExpressionAttributeNames': {
+            '#status': 'status'
+        },
+        'ExpressionAttributeValues': {
+            ':bikeId': {'S': bike_id},
+            ':fromDate': {'S': from_date},
+            ':toDate': {'S': to_date},
+            ':cancelled': {'S': 'cancelled'}
+        }
+    }
+
+    intervals = []
+    while True:
+        response = client.query(**query_params)
+        for item in response.get('Items', []):
+            if exclude_booking_id and item['bookingId']['S'] == exclude_booking_id:
+                continue
+            try:
+                intervals.append((
+                    parse_timestamp(item['startDate']['S']),
+                    parse_timestamp(item['endDate']['S']),
+                    {
+                        'startDate': item['startDate']['S'],
+                        'endDate': item['endDate']['S']
+                    }
+                ))
+            except (KeyError, ValueError):
+                logger.warning(f"Skipping booking with invalid dates: {item.get('bookingId', {}).get('S')}")
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return IntervalIndex(intervals)
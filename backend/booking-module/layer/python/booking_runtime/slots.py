@@ -0,0 +1,189 @@
+"""
+Per-hour slot locks for bike bookings.
+
+A booking owns one lock item per clock hour it touches, keyed
+``<bikeId>#<YYYY-MM-DDTHH>`` in the slots table. The lock items are written
+in the same transaction as the booking itself with ``attribute_not_exists``
+conditions, so when two requests race for the same hour only one of them can
+commit. Locks are moved in the same transaction that reschedules the
+booking; a cancelled booking's locks are released from the bookings table
+stream.
+
+Hours are the locking granularity: two bookings that share a clock hour
+conflict even if their minutes do not overlap.
+
+Bookings written with locks carry ``slotLocked = true``. Only those bookings
+release locks, since a booking made before slot locking existed never owned
+any and must not delete locks that belong to a later booking.
+"""
+from datetime import datetime, timedelta, timezone
+
+# Longest booking we accept. It bounds both the availability lookback and the
+# number of lock items per booking, which keeps a reschedule (release + claim)
+# well inside the 100-item TransactWriteItems limit.
+MAX_BOOKING_HOURS = 24
+
+# How long a lock item outlives its slot before DynamoDB TTL removes it
+SLOT_TTL_DAYS = 7
+
+_HOUR = timedelta(hours=1)
+
+
+def to_utc(value):
+    """
+    Parse an ISO 8601 timestamp (or pass through a datetime) as an aware UTC
+    datetime; naive values are treated as UTC
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def format_utc(value):
+    """
+    ``value`` as stored in a booking's startDate and endDate: UTC with
+    millisecond precision and a ``Z`` suffix, like JavaScript's
+    toISOString(), so stored dates order lexicographically
+    """
+    return to_utc(value).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def slot_hours(start, end):
+    """
+    Start of every clock hour overlapping [start, end)
+    """
+    start = to_utc(start)
+    end = to_utc(end)
+    hour = start.replace(minute=0, second=0, microsecond=0)
+    hours = []
+    while hour < end:
+        hours.append(hour)
+        hour += _HOUR
+    return hours
+
+
+def slot_mask(window_hours, start, end):
+    """
+    Bitmask over ``window_hours`` (as returned by ``slot_hours``) with bit i
+    set when [start, end) touches hour i of the window
+    """
+    if not window_hours:
+        return 0
+    base = window_hours[0]
+    first = max(0, (to_utc(start) - base) // _HOUR)
+    last = min(len(window_hours), -((base - to_utc(end)) // _HOUR))
+    if first >= last:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def slot_id(bike_id, hour):
+    return f"{bike_id}#{hour.strftime('%Y-%m-%dT%H')}"
+
+
+def slot_ids(bike_id, start, end):
+    return [slot_id(bike_id, hour) for hour in slot_hours(start, end)]
+
+
+def _slot_item(bike_id, booking_id, hour):
+    expires_at = hour + _HOUR + timedelta(days=SLOT_TTL_DAYS)
+    return {
+        'slotId': {'S': slot_id(bike_id, hour)},
+        'bikeId': {'S': bike_id},
+        'bookingId': {'S': booking_id},
+        'slotStart': {'S': hour.isoformat()},
+        'expiresAt': {'N': str(int(expires_at.timestamp()))}
+    }
+
+
+def claim_slots(table, bike_id, booking_id, start, end, hours=None):
+    """
+    TransactWriteItems entries that lock every hour of [start, end) for the
+    booking. A slot already held by the same booking can be claimed again,
+    which keeps rescheduling idempotent.
+    """
+    hours = slot_hours(start, end) if hours is None else hours
+    return [
+        {
+            'Put': {
+                'TableName': table,
+                'Item': _slot_item(bike_id, booking_id, hour),
+                'ConditionExpression': 'attribute_not_exists(slotId) OR bookingId = :bookingId',
+                'ExpressionAttributeValues': {
+                    ':bookingId': {'S': booking_id}
+                }
+            }
+        }
+        for hour in hours
+    ]
+
+
+def release_slots(table, bike_id, booking_id, start, end, hours=None):
+    """
+    TransactWriteItems entries that delete the booking's locks for [start, end).
+    Locks owned by another booking are never deleted, and missing locks (for
+    bookings made before slot locking existed) are ignored.
+    """
+    hours = slot_hours(start, end) if hours is None else hours
+    return [
+        {
+            'Delete': {
+                'TableName': table,
+                'Key': {'slotId': {'S': slot_id(bike_id, hour)}},
+                'ConditionExpression': 'attribute_not_exists(slotId) OR bookingId = :bookingId',
+                'ExpressionAttributeValues': {
+                    ':bookingId': {'S': booking_id}
+                }
+            }
+        }
+        for hour in hours
+    ]
+
+
+def move_slots(table, bike_id, booking_id, old_start, old_end, new_start, new_end):
+    """
+    TransactWriteItems entries that move a booking's locks from the old window
+    to the new one, leaving hours shared by both windows untouched
+    """
+    old_hours = slot_hours(old_start, old_end)
+    new_hours = slot_hours(new_start, new_end)
+    kept = set(old_hours) & set(new_hours)
+    return (
+        release_slots(table, bike_id, booking_id, None, None, [h for h in old_hours if h not in kept])
+        + claim_slots(table, bike_id, booking_id, None, None, [h for h in new_hours if h not in kept])
+    )
+
+
+def _cancellation_codes(error):
+    response = getattr(error, 'response', None) or {}
+    if response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+        return []
+    return [reason.get('Code') for reason in response.get('CancellationReasons') or []]
+
+
+_CONFLICT_CODES = ('ConditionalCheckFailed', 'TransactionConflict')
+
+
+# The booking lambdas always put the booking item first in their
+# transactions, followed by its slot locks.
+
+def is_slot_conflict(error):
+    """
+    True when a transaction was cancelled because another booking holds, or
+    is concurrently writing, one of the requested slots
+    """
+    return any(code in _CONFLICT_CODES for code in _cancellation_codes(error)[1:])
+
+
+def is_booking_conflict(error):
+    """
+    True when the booking item's own condition failed, i.e. it was changed
+    by another request since it was read
+    """
+    response = getattr(error, 'response', None) or {}
+    if response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+        return True
+    codes = _cancellation_codes(error)
+    return bool(codes) and codes[0] in _CONFLICT_CODES
@@ -30,6 +30,10 @@ resource "aws_dynamodb_table" "bookings_table" {
     type = "S"
   }
 
+  # Feeds release_slots_lambda
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
+
   # Global Secondary Index for user bookings
   global_secondary_index {
     name            = "UserBookingsIndex"
@@ -53,6 +57,118 @@ resource "aws_dynamodb_table" "bookings_table" {
   }
 }
 
+# DynamoDB Table for hourly slot locks held by bookings
+resource "aws_dynamodb_table" "booking_slots_table" {
+  name           = "DALScooterBookingSlots"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "slotId"
+
+  attribute {
+    name = "slotId"
+    type = "S"
+  }
+
+  attribute {
+    name = "slotStart"
+    type = "S"
+  }
+
+  attribute {
+    name = "bikeId"
+    type = "S"
+  }
+
+  # GET /availability: the bikes locked for one clock hour
+  global_secondary_index {
+    name            = "SlotHourIndex"
+    hash_key        = "slotStart"
+    range_key       = "bikeId"
+    projection_type = "KEYS_ONLY"
+  }
+
+  # Locks for past slots expire on their own
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+
+  tags = {
+    Environment = "dev"
+    Project     = "DALScooter"
+    Module      = "Booking"
+  }
+}
+
+# DynamoDB Table for booking notifications waiting to be published to SNS
+resource "aws_dynamodb_table" "notification_outbox_table" {
+  name           = "DALScooterNotificationOutbox"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "notificationId"
+
+  attribute {
+    name = "notificationId"
+    type = "S"
+  }
+
+  # Feeds dispatch_notifications_lambda
+  stream_enabled   = true
+  stream_view_type = "NEW_IMAGE"
+
+  tags = {
+    Environment = "dev"
+    Project     = "DALScooter"
+    Module      = "Booking"
+  }
+}
+
+# Shared runtime layer for the booking lambdas
+data "archive_file" "booking_runtime_layer_zip" {
+  type        = "zip"
+  source_dir  = "${path.module}/../layer"
+  output_path = "${path.module}/../booking_runtime_layer.zip"
+}
+
+resource "aws_lambda_layer_version" "booking_runtime" {
+  layer_name          = "DALScooterBookingRuntime"
+  filename            = data.archive_file.booking_runtime_layer_zip.output_path
+  source_code_hash    = data.archive_file.booking_runtime_layer_zip.output_base64sha256
+  compatible_runtimes = ["python3.11"]
+}
+
+# Bucket for the daily bookings export
+resource "aws_s3_bucket" "booking_exports" {
+  bucket = "dalscooter-booking-exports-${data.aws_caller_identity.current.account_id}"
+
+  tags = {
+    Environment = "dev"
+    Project     = "DALScooter"
+    Module      = "Booking"
+  }
+}
+
+resource "aws_s3_bucket_lifecycle_configuration" "booking_exports" {
+  bucket = aws_s3_bucket.booking_exports.id
+
+  rule {
+    id     = "expire-old-exports"
+    status = "Enabled"
+
+    filter {
+      prefix = "exports/"
+    }
+
+    expiration {
+      days = 90
+    }
+  }
+}
+
+# Key that signs the pagination cursors handed out by get_bookings
+resource "random_password" "cursor_secret" {
+  length  = 48
+  special = false
+}
+
 # Archive files for Lambda functions
 data "archive_file" "create_booking_zip" {
   type        = "zip"
@@ -84,6 +200,30 @@ data "archive_file" "get_booking_details_zip" {
   output_path = "${path.module}/../lambdas/get_booking_details_lambda.zip"
 }
 
+data "archive_file" "get_availability_zip" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/get_availability_lambda.py"
+  output_path = "${path.module}/../lambdas/get_availability_lambda.zip"
+}
+
+data "archive_file" "release_slots_zip" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/release_slots_lambda.py"
+  output_path = "${path.module}/../lambdas/release_slots_lambda.zip"
+}
+
+data "archive_file" "dispatch_notifications_zip" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/dispatch_notifications_lambda.py"
+  output_path = "${path.module}/../lambdas/dispatch_notifications_lambda.zip"
+}
+
+data "archive_file" "export_bookings_zip" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/export_bookings_lambda.py"
+  output_path = "${path.module}/../lambdas/export_bookings_lambda.zip"
+}
+
 # Lambda Functions
 resource "aws_lambda_function" "create_booking_lambda" {
   function_name = "DALScooterCreateBookingLambda"
@@ -93,12 +233,14 @@ resource "aws_lambda_function" "create_booking_lambda" {
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
   timeout       = 60
   source_code_hash = data.archive_file.create_booking_zip.output_base64sha256
+  layers        = [aws_lambda_layer_version.booking_runtime.arn, var.runtime_layer_arn]
 
   environment {
     variables = {
       BOOKINGS_TABLE = aws_dynamodb_table.bookings_table.name
       BIKE_INVENTORY_TABLE = "BikeInventoryTable"
-      SNS_TOPIC_ARN = var.sns_topic_arn
+      SLOTS_TABLE = aws_dynamodb_table.booking_slots_table.name
+      OUTBOX_TABLE = aws_dynamodb_table.notification_outbox_table.name
     }
   }
 
@@ -118,10 +260,12 @@ resource "aws_lambda_function" "get_bookings_lambda" {
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
   timeout       = 60
   source_code_hash = data.archive_file.get_bookings_zip.output_base64sha256
+  layers        = [aws_lambda_layer_version.booking_runtime.arn, var.runtime_layer_arn]
 
   environment {
     variables = {
       BOOKINGS_TABLE = aws_dynamodb_table.bookings_table.name
+      CURSOR_SECRET = random_password.cursor_secret.result
     }
   }
 
@@ -141,10 +285,12 @@ resource "aws_lambda_function" "update_booking_lambda" {
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
   timeout       = 60
   source_code_hash = data.archive_file.update_booking_zip.output_base64sha256
+  layers        = [aws_lambda_layer_version.booking_runtime.arn, var.runtime_layer_arn]
 
   environment {
     variables = {
       BOOKINGS_TABLE = aws_dynamodb_table.bookings_table.name
+      SLOTS_TABLE = aws_dynamodb_table.booking_slots_table.name
     }
   }
 
@@ -161,6 +307,7 @@ resource "aws_lambda_function" "cancel_booking_lambda" {
   filename      = data.archive_file.cancel_booking_zip.output_path
   handler       = "cancel_booking_lambda.lambda_handler"
   runtime       = "python3.11"
+  layers        = [aws_lambda_layer_version.booking_runtime.arn, var.runtime_layer_arn]
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
   timeout       = 60
   source_code_hash = data.archive_file.cancel_booking_zip.output_base64sha256
@@ -184,6 +331,7 @@ resource "aws_lambda_function" "get_booking_details_lambda" {
   filename      = data.archive_file.get_booking_details_zip.output_path
   handler       = "get_booking_details_lambda.lambda_handler"
   runtime       = "python3.11"
+  layers        = [aws_lambda_layer_version.booking_runtime.arn, var.runtime_layer_arn]
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
   timeout       = 60
   source_code_hash = data.archive_file.get_booking_details_zip.output_base64sha256
@@ -202,6 +350,205 @@ resource "aws_lambda_function" "get_booking_details_lambda" {
   }
 }
 
+resource "aws_lambda_function" "get_availability_lambda" {
+  function_name = "DALScooterGetAvailabilityLambda"
+  filename      = data.archive_file.get_availability_zip.output_path
+  handler       = "get_availability_lambda.lambda_handler"
+  runtime       = "python3.11"
+  role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  timeout       = 60
+  memory_size   = 512
+  source_code_hash = data.archive_file.get_availability_zip.output_base64sha256
+  layers        = [aws_lambda_layer_version.booking_runtime.arn, var.runtime_layer_arn]
+
+  environment {
+    variables = {
+      SLOTS_TABLE = aws_dynamodb_table.booking_slots_table.name
+      BIKE_INVENTORY_TABLE = "BikeInventoryTable"
+    }
+  }
+
+  depends_on = [data.archive_file.get_availability_zip]
+  
+  # Force update when source code changes
+  tags = {
+    LastModified = timestamp()
+  }
+}
+
+resource "aws_lambda_function" "release_slots_lambda" {
+  function_name = "DALScooterReleaseSlotsLambda"
+  filename      = data.archive_file.release_slots_zip.output_path
+  handler       = "release_slots_lambda.lambda_handler"
+  runtime       = "python3.11"
+  role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  timeout       = 60
+  source_code_hash = data.archive_file.release_slots_zip.output_base64sha256
+  layers        = [aws_lambda_layer_version.booking_runtime.arn, var.runtime_layer_arn]
+
+  environment {
+    variables = {
+      SLOTS_TABLE = aws_dynamodb_table.booking_slots_table.name
+    }
+  }
+
+  depends_on = [data.archive_file.release_slots_zip]
+  
+  # Force update when source code changes
+  tags = {
+    LastModified = timestamp()
+  }
+}
+
+# Stream batches release_slots gave up on: the shard and sequence numbers of
+# the cancellations whose locks are still held
+resource "aws_sqs_queue" "release_slots_failures" {
+  name                      = "DALScooterReleaseSlotsFailures"
+  message_retention_seconds = 1209600
+}
+
+# Release slot locks once a booking is cancelled. A record that keeps
+# failing is split off by bisection, retried a bounded number of times and
+# then sent to the failure queue, so it cannot hold up the rest of the shard.
+resource "aws_lambda_event_source_mapping" "release_slots_stream" {
+  event_source_arn               = aws_dynamodb_table.bookings_table.stream_arn
+  function_name                  = aws_lambda_function.release_slots_lambda.arn
+  starting_position              = "LATEST"
+  batch_size                     = 100
+  maximum_retry_attempts         = 5
+  maximum_record_age_in_seconds  = 3600
+  bisect_batch_on_function_error = true
+  function_response_types        = ["ReportBatchItemFailures"]
+
+  destination_config {
+    on_failure {
+      destination_arn = aws_sqs_queue.release_slots_failures.arn
+    }
+  }
+
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        eventName = ["MODIFY"]
+        dynamodb = {
+          NewImage = {
+            status = { S = ["cancelled"] }
+          }
+        }
+      })
+    }
+  }
+}
+
+resource "aws_lambda_function" "dispatch_notifications_lambda" {
+  function_name = "DALScooterDispatchNotificationsLambda"
+  filename      = data.archive_file.dispatch_notifications_zip.output_path
+  handler       = "dispatch_notifications_lambda.lambda_handler"
+  runtime       = "python3.11"
+  layers        = [var.runtime_layer_arn]
+  role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  timeout       = 60
+  source_code_hash = data.archive_file.dispatch_notifications_zip.output_base64sha256
+
+  environment {
+    variables = {
+      OUTBOX_TABLE = aws_dynamodb_table.notification_outbox_table.name
+      SNS_TOPIC_ARN = var.sns_topic_arn
+    }
+  }
+
+  depends_on = [data.archive_file.dispatch_notifications_zip]
+  
+  # Force update when source code changes
+  tags = {
+    LastModified = timestamp()
+  }
+}
+
+# Publish new notifications in batches as they land in the outbox
+resource "aws_lambda_event_source_mapping" "dispatch_notifications_stream" {
+  event_source_arn                   = aws_dynamodb_table.notification_outbox_table.stream_arn
+  function_name                      = aws_lambda_function.dispatch_notifications_lambda.arn
+  starting_position                  = "LATEST"
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 1
+  maximum_retry_attempts             = 5
+  function_response_types            = ["ReportBatchItemFailures"]
+
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        eventName = ["INSERT"]
+      })
+    }
+  }
+}
+
+# Sweep up notifications the stream gave up on
+resource "aws_cloudwatch_event_rule" "notification_outbox_sweep" {
+  name                = "DALScooterNotificationOutboxSweep"
+  schedule_expression = "rate(5 minutes)"
+}
+
+resource "aws_cloudwatch_event_target" "notification_outbox_sweep" {
+  rule = aws_cloudwatch_event_rule.notification_outbox_sweep.name
+  arn  = aws_lambda_function.dispatch_notifications_lambda.arn
+}
+
+resource "aws_lambda_permission" "notification_outbox_sweep_permission" {
+  statement_id  = "AllowEventBridgeInvokeDispatchNotifications"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.dispatch_notifications_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.notification_outbox_sweep.arn
+}
+
+resource "aws_lambda_function" "export_bookings_lambda" {
+  function_name = "DALScooterExportBookingsLambda"
+  filename      = data.archive_file.export_bookings_zip.output_path
+  handler       = "export_bookings_lambda.lambda_handler"
+  runtime       = "python3.11"
+  layers        = [var.runtime_layer_arn]
+  role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  timeout       = 900
+  memory_size   = 1024
+  source_code_hash = data.archive_file.export_bookings_zip.output_base64sha256
+
+  environment {
+    variables = {
+      BOOKINGS_TABLE = aws_dynamodb_table.bookings_table.name
+      EXPORT_BUCKET = aws_s3_bucket.booking_exports.bucket
+      EXPORT_SEGMENTS = "8"
+    }
+  }
+
+  depends_on = [data.archive_file.export_bookings_zip]
+  
+  # Force update when source code changes
+  tags = {
+    LastModified = timestamp()
+  }
+}
+
+# Daily export for the finance team
+resource "aws_cloudwatch_event_rule" "daily_booking_export" {
+  name                = "DALScooterDailyBookingExport"
+  schedule_expression = "cron(0 5 * * ? *)"
+}
+
+resource "aws_cloudwatch_event_target" "daily_booking_export" {
+  rule = aws_cloudwatch_event_rule.daily_booking_export.name
+  arn  = aws_lambda_function.export_bookings_lambda.arn
+}
+
+resource "aws_lambda_permission" "daily_booking_export_permission" {
+  statement_id  = "AllowEventBridgeInvokeExportBookings"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.export_bookings_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.daily_booking_export.arn
+}
+
 # API Gateway
 resource "aws_apigatewayv2_api" "booking_api" {
   name          = "DALScooterBookingAPI"
@@ -276,6 +623,14 @@ resource "aws_apigatewayv2_integration" "get_booking_details_integration" {
   payload_format_version = "2.0"
 }
 
+resource "aws_apigatewayv2_integration" "get_availability_integration" {
+  api_id             = aws_apigatewayv2_api.booking_api.id
+  integration_type   = "AWS_PROXY"
+  integration_uri    = aws_lambda_function.get_availability_lambda.invoke_arn
+  integration_method = "POST"
+  payload_format_version = "2.0"
+}
+
 # API Routes
 resource "aws_apigatewayv2_route" "create_booking_route" {
   api_id    = aws_apigatewayv2_api.booking_api.id
@@ -317,6 +672,13 @@ resource "aws_apigatewayv2_route" "get_booking_details_route" {
   authorizer_id      = aws_apigatewayv2_authorizer.cognito_auth.id
 }
 
+# GET /availability is PUBLIC (guests can search before signing in)
+resource "aws_apigatewayv2_route" "get_availability_route" {
+  api_id    = aws_apigatewayv2_api.booking_api.id
+  route_key = "GET /availability"
+  target    = "integrations/${aws_apigatewayv2_integration.get_availability_integration.id}"
+}
+
 # Lambda Permissions
 resource "aws_lambda_permission" "create_booking_permission" {
   statement_id  = "AllowAPIGatewayInvokeCreateBooking"
@@ -356,4 +718,12 @@ resource "aws_lambda_permission" "get_booking_details_permission" {
   function_name = aws_lambda_function.get_booking_details_lambda.function_name
   principal     = "apigateway.amazonaws.com"
   source_arn    = "${aws_apigatewayv2_api.booking_api.execution_arn}/*/*"
+}
+
+resource "aws_lambda_permission" "get_availability_permission" {
+  statement_id  = "AllowAPIGatewayInvokeGetAvailability"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.get_availability_lambda.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.booking_api.execution_arn}/*/*"
 } 
\ No newline at end of file
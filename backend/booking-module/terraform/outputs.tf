@@ -1,3 +1,6 @@
 output "booking_api_gateway_endpoint" {
   value = aws_apigatewayv2_api.booking_api.api_endpoint
-} 
\ No newline at end of file
+} 
+output "booking_exports_bucket" {
+  value = aws_s3_bucket.booking_exports.bucket
+}
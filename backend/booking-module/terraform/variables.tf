@@ -12,4 +12,8 @@ variable "cognito_user_pool_client_id" {
 
 variable "sns_topic_arn" {
   type = string
-}
\ No newline at end of file
+}
+
+variable "runtime_layer_arn" {
+  type = string
+}
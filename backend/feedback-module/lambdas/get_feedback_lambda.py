@@ -1,36 +1,102 @@
 import json
-import boto3
 import os
-from boto3.dynamodb.conditions import Attr
+import time
+from datetime import datetime
+from boto3.dynamodb.conditions import Key
 import logging
+from dalscooter_runtime import clients
+from dalscooter_runtime.cursors import InvalidCursor, decode_cursor, encode_cursor
+from dalscooter_runtime.feedback_summary import SCOPES, describe, summary_key
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-dynamodb = boto3.resource('dynamodb')
 table_name = os.environ['FEEDBACK_TABLE']
-table = dynamodb.Table(table_name)
+table = clients.table(table_name)
+summary_table = clients.table(os.environ['SUMMARY_TABLE'])
+backfill_table = clients.table(os.environ['BACKFILL_TABLE'])
+cursor_secret = os.environ['CURSOR_SECRET']
+
+# A model's feedback, newest first
+MODEL_TIME_INDEX = 'ModelTimeIndex'
+# All feedback of one month (feedbackMonth, 'YYYY-MM'), newest first
+MONTH_TIME_INDEX = 'MonthTimeIndex'
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+# How far back the all-feedback listing goes
+FEED_MONTHS = int(os.environ.get('FEED_MONTHS', '12'))
+
+# Stored in the backfill table by a rescore backfill that left no feedback
+# item without a feedbackMonth. Until then MonthTimeIndex misses the feedback
+# written before it existed, so all feedback is paged through with Scan.
+MONTH_INDEX_MARKER = {'runId': 'feedbackMonth', 'segment': 0}
+# How often a container checks for the marker while it is missing
+MONTH_CHECK_SECONDS = 60
+
+# (expiry, whether MonthTimeIndex holds every item)
+_month_index = None
 
 def lambda_handler(event, context):
     try:
         logger.info(f"Incoming event: {json.dumps(event)}")
         query_params = event.get('queryStringParameters') or {}
-        model_filter = query_params.get('model') if 'model' in query_params else None
+        if event.get('rawPath') == '/feedback/summary':
+            return get_summary(query_params)
+
+        try:
+            limit = min(max(int(query_params.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'limit must be a number'})
+            }
+        paged = 'limit' in query_params or 'cursor' in query_params
+        if not paged:
+            # Callers that predate pagination get the newest page as a bare list
+            limit = MAX_PAGE_SIZE
+
+        model_filter = query_params.get('model')
+        cursor_scope = {'model': model_filter}
+        start = None
+        if query_params.get('cursor'):
+            try:
+                start = decode_cursor(query_params['cursor'], cursor_scope, cursor_secret)
+            except InvalidCursor as e:
+                logger.warning(f"Rejected pagination cursor: {str(e)}")
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'Invalid pagination cursor'})
+                }
 
         if model_filter:
             logger.info(f"Fetching feedbacks for model: {model_filter}")
-            response = table.scan(
-                FilterExpression=Attr('model').eq(model_filter)
-            )
+            items, next_start = model_page(model_filter, limit, start)
+        elif (start and 'scan' in start) or (not start and not month_index_complete()):
+            logger.info("Fetching all feedbacks by scanning")
+            items, next_start = scan_page(limit, start and start['scan'])
         else:
             logger.info("Fetching all feedbacks")
-            response = table.scan()
-
-        items = sorted(response['Items'], key=lambda x: x.get('timestamp', ''), reverse=True)
+            items, next_start = recent_page(limit, start)
+        next_cursor = encode_cursor(next_start, cursor_scope, cursor_secret) if next_start else None
 
+        if not paged:
+            # Older callers get a bare list; when there is more than fits,
+            # the header says so and where to carry on
+            response = {
+                'statusCode': 200,
+                'body': json.dumps(items)
+            }
+            if next_cursor:
+                response['headers'] = {'X-Next-Cursor': next_cursor}
+            return response
         return {
             'statusCode': 200,
-            'body': json.dumps(items)
+            'body': json.dumps({
+                'feedback': items,
+                'count': len(items),
+                'nextCursor': next_cursor
+            })
         }
 
     except Exception as e:
@@ -38,4 +104,97 @@ def lambda_handler(event, context):
         return {
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
+
+def model_page(model, limit, start_key):
+    """One page of a model's feedback, newest first, and where the next begins"""
+    params = {
+        'IndexName': MODEL_TIME_INDEX,
+        'KeyConditionExpression': Key('model').eq(model),
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    if start_key:
+        params['ExclusiveStartKey'] = start_key
+    response = table.query(**params)
+    return response['Items'], response.get('LastEvaluatedKey')
+
+def previous_month(month):
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year - 1}-12" if number == 1 else f"{year}-{number - 1:02d}"
+
+def recent_page(limit, start):
+    """
+    One page of all feedback, newest first, from the month partitions of
+    MonthTimeIndex: the month the page starts in, then earlier months until
+    the page is full or FEED_MONTHS have been read. ``start`` is the month
+    to continue from with the key to start after in it, if any.
+    """
+    now = datetime.utcnow()
+    oldest = f"{now.year}-{now.month:02d}"
+    for _ in range(FEED_MONTHS - 1):
+        oldest = previous_month(oldest)
+
+    month = start['month'] if start else f"{now.year}-{now.month:02d}"
+    start_key = start.get('key') if start else None
+    items = []
+    while month >= oldest:
+        params = {
+            'IndexName': MONTH_TIME_INDEX,
+            'KeyConditionExpression': Key('feedbackMonth').eq(month),
+            'ScanIndexForward': False,
+            'Limit': limit - len(items)
+        }
+        if start_key:
+            params['ExclusiveStartKey'] = start_key
+        response = table.query(**params)
+        items.extend(response['Items'])
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key:
+            month = previous_month(month)
+        if len(items) == limit:
+            break
+    if month < oldest:
+        return items, None
+    return items, {'month': month, 'key': start_key}
+
+def month_index_complete():
+    """Whether every feedback item is in MonthTimeIndex, as the marker says"""
+    global _month_index
+    if _month_index and (_month_index[1] or _month_index[0] > time.monotonic()):
+        return _month_index[1]
+    complete = 'Item' in backfill_table.get_item(Key=MONTH_INDEX_MARKER)
+    _month_index = (time.monotonic() + MONTH_CHECK_SECONDS, complete)
+    return complete
+
+def scan_page(limit, start_key):
+    """
+    One page of all feedback read with a single Scan call, for as long as
+    MonthTimeIndex misses older feedback: ``limit`` items in table order
+    from ``start_key`` on, sorted newest first within the page
+    """
+    params = {'Limit': limit}
+    if start_key:
+        params['ExclusiveStartKey'] = start_key
+    response = table.scan(**params)
+    items = sorted(response['Items'], key=lambda item: item.get('timestamp', ''), reverse=True)
+    last_key = response.get('LastEvaluatedKey')
+    return items, {'scan': last_key} if last_key else None
+
+def get_summary(query_params):
+    """
+    The feedback count, average rating and sentiment breakdown of one model
+    (?model=) or bike (?bikeId=), read from its summary item
+    """
+    scope = next((scope for scope in SCOPES if query_params.get(scope)), None)
+    if scope is None:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'model or bikeId is required'})
+        }
+    value = query_params[scope]
+    item = summary_table.get_item(Key={'summaryKey': summary_key(scope, value)}).get('Item')
+    return {
+        'statusCode': 200,
+        'body': json.dumps(describe(scope, value, item))
+    }
@@ -0,0 +1,137 @@
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import logging
+from boto3.dynamodb.types import TypeDeserializer
+from dalscooter_runtime import clients
+from dalscooter_runtime.feedback_summary import COUNTERS, add_update, increments, summary_keys
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+dynamodb = clients.client('dynamodb')
+feedback_table = os.environ['FEEDBACK_TABLE']
+summary_table = os.environ['SUMMARY_TABLE']
+
+# Parallel Scan segments, one worker thread each
+REBUILD_SEGMENTS = int(os.environ.get('REBUILD_SEGMENTS', '4'))
+
+deserializer = TypeDeserializer()
+
+
+def plain(item):
+    return {name: deserializer.deserialize(value) for name, value in item.items()}
+
+
+def scan_all(table_name, segment=None, total_segments=None, **kwargs):
+    """Every item of a table, or of one segment of it"""
+    if total_segments:
+        kwargs.update(Segment=segment, TotalSegments=total_segments)
+    while True:
+        response = dynamodb.scan(TableName=table_name, **kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def summarize_segment(segment):
+    """Summary counters of the feedback in one scan segment, by (scope, value)"""
+    totals = defaultdict(lambda: defaultdict(Decimal))
+    for item in scan_all(
+        feedback_table, segment, REBUILD_SEGMENTS,
+        ProjectionExpression='#model, bikeId, sentiment, rating',
+        ExpressionAttributeNames={'#model': 'model'}
+    ):
+        feedback = plain(item)
+        added = increments(feedback)
+        for key in summary_keys(feedback):
+            for counter, amount in added.items():
+                totals[key][counter] += amount
+    return totals
+
+
+def stored_counters(item):
+    return {counter: Decimal(item[counter]['N']) if counter in item else Decimal(0) for counter in COUNTERS}
+
+
+def correct_summary(scope, value, difference):
+    """
+    Add ``difference`` to a drifted summary. Adding rather than overwriting
+    keeps the feedback submit_feedback adds while the rebuild runs.
+    """
+    dynamodb.update_item(**add_update(summary_table, scope, value, difference)['Update'])
+
+
+def remove_summary(item):
+    """
+    Delete a summary whose feedback is all gone, unless feedback was added
+    to it since it was read
+    """
+    names, values, conditions = {}, {}, []
+    for i, counter in enumerate(COUNTERS):
+        names[f'#c{i}'] = counter
+        if counter in item:
+            values[f':c{i}'] = item[counter]
+            conditions.append(f'#c{i} = :c{i}')
+        else:
+            conditions.append(f'attribute_not_exists(#c{i})')
+    try:
+        dynamodb.delete_item(
+            TableName=summary_table,
+            Key={'summaryKey': item['summaryKey']},
+            ConditionExpression=' AND '.join(conditions),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+    except dynamodb.exceptions.ConditionalCheckFailedException:
+        logger.info(f"Summary {item['summaryKey']['S']} gained feedback during the rebuild; keeping it")
+        return False
+    return True
+
+
+def lambda_handler(event, context):
+    """
+    Recompute every model and bike feedback summary from the feedback table
+    and correct the ones that have drifted, by adding the difference, so
+    feedback added to a summary after it was read is kept. Feedback
+    submitted between the feedback scan and the summary scan may still be
+    miscounted until the next rebuild.
+    """
+    logger.info(f"Incoming event: {json.dumps(event)}")
+
+    totals = {}
+    with ThreadPoolExecutor(max_workers=REBUILD_SEGMENTS) as pool:
+        for segment_totals in pool.map(summarize_segment, range(REBUILD_SEGMENTS)):
+            for key, counters in segment_totals.items():
+                merged = totals.setdefault(key, defaultdict(Decimal))
+                for counter, amount in counters.items():
+                    merged[counter] += amount
+
+    stored = {
+        (item['scope']['S'], item['value']['S']): item
+        for item in scan_all(summary_table)
+    }
+
+    corrections = []
+    for (scope, value), counters in totals.items():
+        current = stored_counters(stored.get((scope, value), {}))
+        difference = {
+            counter: counters.get(counter, Decimal(0)) - current[counter]
+            for counter in COUNTERS
+        }
+        difference = {counter: amount for counter, amount in difference.items() if amount}
+        if difference:
+            corrections.append((scope, value, difference))
+    removals = [item for key, item in stored.items() if key not in totals]
+
+    with ThreadPoolExecutor(max_workers=REBUILD_SEGMENTS) as pool:
+        list(pool.map(lambda correction: correct_summary(*correction), corrections))
+        removed = sum(pool.map(remove_summary, removals))
+    corrected = len(corrections)
+
+    result = {'summaries': len(totals), 'corrected': corrected, 'removed': removed}
+    logger.info(f"Rebuilt feedback summaries: {json.dumps(result)}")
+    return result
@@ -0,0 +1,279 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from botocore.exceptions import ClientError
+from dalscooter_runtime import clients
+from dalscooter_runtime.sentiment import default_scorer
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+dynamodb = clients.client('dynamodb')
+feedback_table = os.environ['FEEDBACK_TABLE']
+checkpoint_table = os.environ['BACKFILL_TABLE']
+# Run after a backfill completes, since rescored feedback moves between the
+# Positive/Negative/Neutral counts of its summaries
+rebuild_function = os.environ.get('REBUILD_FUNCTION')
+
+# Parallel Scan segments of a run, and how many one invocation works at once
+DEFAULT_SEGMENTS = int(os.environ.get('BACKFILL_SEGMENTS', '32'))
+WORKERS = int(os.environ.get('BACKFILL_WORKERS', '8'))
+
+# Write units per second the backfill may use across all its workers, so
+# that live traffic keeps the rest of the table's capacity
+WRITE_BUDGET = float(os.environ.get('BACKFILL_WCU', '1500'))
+
+# Stop taking new pages with this much of the invocation left, then carry on
+# in a fresh invocation
+STOP_MARGIN_MS = 60 * 1000
+
+# Marks that every item has a feedbackMonth, so get_feedback lists all
+# feedback from MonthTimeIndex instead of scanning. Only written by a run that
+# left no item without one.
+MONTH_INDEX_MARKER = {'runId': {'S': 'feedbackMonth'}, 'segment': {'N': '0'}}
+
+BATCH_WRITE_LIMIT = 25
+RETRY_BASE_SECONDS = 0.05
+
+scorer = default_scorer()
+
+
+class WriteBudget:
+    """
+    A token bucket of write units shared by the workers: ``spend`` blocks
+    until the units are available at ``rate`` per second, with at most one
+    second's worth saved up.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._available = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def spend(self, units):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._available = min(self.rate, self._available + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._available >= units or self._available >= self.rate:
+                    self._available -= units
+                    return
+                wait = (units - self._available) / self.rate
+            time.sleep(wait)
+
+
+def write_units(item):
+    """Write units a put of ``item`` consumes: one per KB, rounded up"""
+    size = sum(len(name) + len(json.dumps(value)) for name, value in item.items())
+    return -(-size // 1024)
+
+
+def rescore_page(items):
+    """
+    The items of a scan page that change, updated, with the page's comments
+    scored as one batch, and how many items are left out of MonthTimeIndex.
+    Items written before feedbackMonth existed get it whether or not they
+    have a comment; those without a timestamp cannot, and are counted.
+    """
+    scorable = [item for item in items if 'S' in item.get('comment', {})]
+    sentiments = dict(zip(
+        (item['feedbackId']['S'] for item in scorable),
+        scorer.label_many([item['comment']['S'] for item in scorable])
+    ))
+    changed = []
+    unindexed = 0
+    for item in items:
+        updated = dict(item)
+        sentiment = sentiments.get(item['feedbackId']['S'])
+        if sentiment is not None and item.get('sentiment', {}).get('S') != sentiment:
+            updated['sentiment'] = {'S': sentiment}
+        if 'feedbackMonth' not in item:
+            if 'S' in item.get('timestamp', {}):
+                updated['feedbackMonth'] = {'S': item['timestamp']['S'][:7]}
+            else:
+                unindexed += 1
+        if updated != item:
+            changed.append(updated)
+    return changed, unindexed
+
+
+def write_items(items, budget):
+    for first in range(0, len(items), BATCH_WRITE_LIMIT):
+        chunk = items[first:first + BATCH_WRITE_LIMIT]
+        budget.spend(sum(write_units(item) for item in chunk))
+        pending = {feedback_table: [{'PutRequest': {'Item': item}} for item in chunk]}
+        attempt = 0
+        while pending:
+            response = dynamodb.batch_write_item(RequestItems=pending)
+            pending = response.get('UnprocessedItems') or {}
+            if pending:
+                attempt += 1
+                time.sleep(random.uniform(0, RETRY_BASE_SECONDS * 2 ** min(attempt, 6)))
+
+
+def load_checkpoints(run_id, segments):
+    """The run's checkpoint per segment, creating the missing ones"""
+    checkpoints = {}
+    request = {'KeyConditionExpression': 'runId = :run', 'ExpressionAttributeValues': {':run': {'S': run_id}},
+               'ConsistentRead': True}
+    while True:
+        response = dynamodb.query(TableName=checkpoint_table, **request)
+        for item in response['Items']:
+            checkpoints[int(item['segment']['N'])] = item
+        if 'LastEvaluatedKey' not in response:
+            break
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    for segment in range(segments):
+        if segment not in checkpoints:
+            item = {
+                'runId': {'S': run_id},
+                'segment': {'N': str(segment)},
+                'segments': {'N': str(segments)},
+                'pages': {'N': '0'},
+                'scanned': {'N': '0'},
+                'rescored': {'N': '0'},
+                'unindexed': {'N': '0'},
+                'done': {'BOOL': False}
+            }
+            try:
+                dynamodb.put_item(TableName=checkpoint_table, Item=item,
+                                  ConditionExpression='attribute_not_exists(runId)')
+            except dynamodb.exceptions.ConditionalCheckFailedException:
+                item = dynamodb.get_item(TableName=checkpoint_table, ConsistentRead=True, Key={
+                    'runId': {'S': run_id}, 'segment': {'N': str(segment)}
+                })['Item']
+            checkpoints[segment] = item
+    return checkpoints
+
+
+def save_checkpoint(checkpoint, last_key, scanned, rescored_count, unindexed):
+    """
+    Record a processed page. Conditional on the page count read, so two
+    invocations working the same segment cannot both advance it.
+    """
+    values = {
+        ':pages': checkpoint['pages'],
+        ':next': {'N': str(int(checkpoint['pages']['N']) + 1)},
+        ':scanned': {'N': str(scanned)},
+        ':rescored': {'N': str(rescored_count)},
+        ':unindexed': {'N': str(unindexed)},
+        ':done': {'BOOL': last_key is None}
+    }
+    names = {'#pages': 'pages', '#done': 'done', '#scanned': 'scanned', '#rescored': 'rescored',
+             '#lastKey': 'lastKey', '#unindexed': 'unindexed'}
+    if last_key is None:
+        expression = 'SET #pages = :next, #done = :done REMOVE #lastKey'
+    else:
+        expression = 'SET #pages = :next, #done = :done, #lastKey = :key'
+        values[':key'] = {'S': json.dumps(last_key)}
+    expression += ' ADD #scanned :scanned, #rescored :rescored, #unindexed :unindexed'
+    response = dynamodb.update_item(
+        TableName=checkpoint_table,
+        Key={'runId': checkpoint['runId'], 'segment': checkpoint['segment']},
+        UpdateExpression=expression,
+        ConditionExpression='#pages = :pages',
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+        ReturnValues='ALL_NEW'
+    )
+    return response['Attributes']
+
+
+def run_segment(checkpoint, budget, deadline):
+    """Work one segment from its checkpoint until it is done or time runs out"""
+    segments = int(checkpoint['segments']['N'])
+    params = {
+        'TableName': feedback_table,
+        'Segment': int(checkpoint['segment']['N']),
+        'TotalSegments': segments
+    }
+    while not checkpoint['done']['BOOL'] and time.monotonic() < deadline:
+        if 'lastKey' in checkpoint:
+            params['ExclusiveStartKey'] = json.loads(checkpoint['lastKey']['S'])
+        response = dynamodb.scan(**params)
+        changed, unindexed = rescore_page(response['Items'])
+        write_items(changed, budget)
+        try:
+            checkpoint = save_checkpoint(checkpoint, response.get('LastEvaluatedKey'),
+                                         len(response['Items']), len(changed), unindexed)
+        except dynamodb.exceptions.ConditionalCheckFailedException:
+            logger.warning(f"Segment {params['Segment']} was advanced by another invocation; leaving it")
+            return checkpoint
+    return checkpoint
+
+
+def continue_run(context, run_id, segments):
+    """Carry the run on in a fresh asynchronous invocation of this function"""
+    clients.client('lambda').invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType='Event',
+        Payload=json.dumps({'runId': run_id, 'segments': segments})
+    )
+
+
+def lambda_handler(event, context):
+    """
+    Rescore stored feedback with the current sentiment scorer, rewriting only
+    the items whose sentiment changes, as one resumable run.
+
+    event: {"runId": optional, to resume, "segments": optional, "stopAfterSeconds": optional}
+
+    The table is scanned in parallel segments, WORKERS at a time, and each
+    segment records its LastEvaluatedKey after every page, so a run that is
+    stopped or fails resumes from its checkpoints when invoked again with its
+    runId. Writes share a budget of BACKFILL_WCU write units per second.
+    When the invocation runs low on time it invokes itself to continue; once
+    every segment is done it invokes the summary rebuild.
+    """
+    logger.info(f"Incoming event: {json.dumps(event)}")
+    run_id = event.get('runId') or str(uuid.uuid4())
+    segments = int(event.get('segments') or DEFAULT_SEGMENTS)
+
+    seconds = event.get('stopAfterSeconds')
+    if seconds is None and context is not None:
+        seconds = (context.get_remaining_time_in_millis() - STOP_MARGIN_MS) / 1000
+    deadline = time.monotonic() + seconds if seconds is not None else float('inf')
+
+    checkpoints = load_checkpoints(run_id, segments)
+    pending = [checkpoint for checkpoint in checkpoints.values() if not checkpoint['done']['BOOL']]
+    budget = WriteBudget(WRITE_BUDGET)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        finished = list(pool.map(lambda checkpoint: run_segment(checkpoint, budget, deadline), pending))
+
+    by_segment = {int(checkpoint['segment']['N']): checkpoint for checkpoint in checkpoints.values()}
+    by_segment.update((int(checkpoint['segment']['N']), checkpoint) for checkpoint in finished)
+    complete = all(checkpoint['done']['BOOL'] for checkpoint in by_segment.values())
+    result = {
+        'runId': run_id,
+        'complete': complete,
+        'segmentsDone': sum(checkpoint['done']['BOOL'] for checkpoint in by_segment.values()),
+        'scanned': sum(int(checkpoint['scanned']['N']) for checkpoint in by_segment.values()),
+        'rescored': sum(int(checkpoint['rescored']['N']) for checkpoint in by_segment.values()),
+        # Checkpoints of runs started before this was counted have none
+        'unindexed': sum(int(checkpoint.get('unindexed', {'N': '0'})['N']) for checkpoint in by_segment.values())
+    }
+    logger.info(f"Backfill {run_id}: {json.dumps(result)} after {time.perf_counter() - started:.1f}s")
+    if complete and result['unindexed']:
+        logger.warning(f"Backfill {run_id} left {result['unindexed']} items without a timestamp "
+                       f"out of MonthTimeIndex")
+    elif complete:
+        dynamodb.put_item(TableName=checkpoint_table, Item=dict(MONTH_INDEX_MARKER, completedBy={'S': run_id}))
+
+    if context is not None:
+        try:
+            if not complete:
+                continue_run(context, run_id, segments)
+            elif rebuild_function:
+                clients.client('lambda').invoke(FunctionName=rebuild_function, InvocationType='Event',
+                                                Payload=b'{}')
+        except ClientError as e:
+            logger.error(f"Could not start the next step of backfill {run_id}: {str(e)}")
+    return result
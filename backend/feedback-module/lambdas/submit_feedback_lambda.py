@@ -1,36 +1,26 @@
 import json
-import boto3
 import os
 import uuid
 from datetime import datetime
 import logging
+from boto3.dynamodb.types import TypeSerializer
+from dalscooter_runtime import clients
+from dalscooter_runtime.feedback_summary import add_update, increments, summary_keys
+from dalscooter_runtime.sentiment import default_scorer
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-dynamodb = boto3.resource('dynamodb')
 table_name = os.environ['FEEDBACK_TABLE']
-table = dynamodb.Table(table_name)
+summary_table = os.environ['SUMMARY_TABLE']
+dynamodb = clients.client('dynamodb')
+serializer = TypeSerializer()
 
-def analyze_sentiment(text):
-    positive_keywords = ['good', 'great', 'excellent', 'awesome', 'love', 'nice', 'happy']
-    negative_keywords = ['bad', 'poor', 'terrible', 'hate', 'worst', 'awful', 'disappointed']
-    
-    text_lower = text.lower()
-    score = 0
-    for word in positive_keywords:
-        if word in text_lower:
-            score += 1
-    for word in negative_keywords:
-        if word in text_lower:
-            score -= 1
+# Compiled once per container from SENTIMENT_LEXICON, or the built-in lexicon
+scorer = default_scorer()
 
-    if score > 0:
-        return 'Positive'
-    elif score < 0:
-        return 'Negative'
-    else:
-        return 'Neutral'
+def analyze_sentiment(text):
+    return scorer.label(text)
 
 def lambda_handler(event, context):
     try:
@@ -46,6 +36,7 @@ def lambda_handler(event, context):
         rating = body.get('rating', None)
 
         sentiment = analyze_sentiment(comment)
+        timestamp = datetime.utcnow().isoformat()
 
         item = {
             'feedbackId': str(uuid.uuid4()),
@@ -55,14 +46,28 @@ def lambda_handler(event, context):
             'userEmail': user_email,
             'comment': comment,
             'sentiment': sentiment,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': timestamp,
+            # Partition of MonthTimeIndex, which lists all feedback newest first
+            'feedbackMonth': timestamp[:7]
         }
 
         if rating is not None:
             item['rating'] = str(rating)
 
         logger.info(f"Storing feedback: {item}")
-        table.put_item(Item=item)
+        # The feedback and the model and bike summaries it counts towards are
+        # written together, so the summaries never miss or double-count it
+        added = increments(item)
+        dynamodb.transact_write_items(
+            TransactItems=[
+                {
+                    'Put': {
+                        'TableName': table_name,
+                        'Item': {name: serializer.serialize(value) for name, value in item.items()}
+                    }
+                }
+            ] + [add_update(summary_table, scope, value, added) for scope, value in summary_keys(item)]
+        )
 
         return {
             'statusCode': 200,
@@ -18,6 +18,20 @@ data "archive_file" "get_feedback_zip" {
   output_path = "${path.module}/../lambdas/get_feedback_lambda.zip"
 }
 
+# Archive rebuild feedback summary lambda
+data "archive_file" "rebuild_feedback_summary_zip" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/rebuild_feedback_summary_lambda.py"
+  output_path = "${path.module}/../lambdas/rebuild_feedback_summary_lambda.zip"
+}
+
+# Archive rescore feedback lambda
+data "archive_file" "rescore_feedback_zip" {
+  type        = "zip"
+  source_file = "${path.module}/../lambdas/rescore_feedback_lambda.py"
+  output_path = "${path.module}/../lambdas/rescore_feedback_lambda.zip"
+}
+
 resource "aws_dynamodb_table" "feedback_table" {
   name         = var.feedback_table_name
   billing_mode = "PAY_PER_REQUEST"
@@ -28,22 +42,103 @@ resource "aws_dynamodb_table" "feedback_table" {
     type = "S"
   }
 
+  attribute {
+    name = "model"
+    type = "S"
+  }
+
+  attribute {
+    name = "feedbackMonth"
+    type = "S"
+  }
+
+  attribute {
+    name = "timestamp"
+    type = "S"
+  }
+
+  # GET /get-feedback?model=..: a model's feedback, newest first
+  global_secondary_index {
+    name            = "ModelTimeIndex"
+    hash_key        = "model"
+    range_key       = "timestamp"
+    projection_type = "ALL"
+  }
+
+  # GET /get-feedback: all feedback newest first, one month ("YYYY-MM") per
+  # partition so that no single partition takes every write
+  global_secondary_index {
+    name            = "MonthTimeIndex"
+    hash_key        = "feedbackMonth"
+    range_key       = "timestamp"
+    projection_type = "ALL"
+  }
+
+  tags = {
+    Module = "Feedback"
+    Project = "DALScooter"
+  }
+}
+
+# Feedback count, rating sum and sentiment counts per model ("model#<model>")
+# and per bike ("bikeId#<bikeId>"), added to as feedback is submitted
+resource "aws_dynamodb_table" "feedback_summary_table" {
+  name         = var.feedback_summary_table_name
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "summaryKey"
+
+  attribute {
+    name = "summaryKey"
+    type = "S"
+  }
+
   tags = {
     Module = "Feedback"
     Project = "DALScooter"
   }
 }
 
+# Progress of sentiment backfills: where each scan segment of a run got to
+resource "aws_dynamodb_table" "feedback_backfill_table" {
+  name         = "FeedbackBackfillCheckpoints"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "runId"
+  range_key    = "segment"
+
+  attribute {
+    name = "runId"
+    type = "S"
+  }
+
+  attribute {
+    name = "segment"
+    type = "N"
+  }
+
+  tags = {
+    Module = "Feedback"
+    Project = "DALScooter"
+  }
+}
+
+# Key that signs the pagination cursors handed out by GET /get-feedback
+resource "random_password" "cursor_secret" {
+  length  = 48
+  special = false
+}
+
 resource "aws_lambda_function" "submit_feedback_lambda" {
   function_name = var.submit_feedback_lambda_name
   handler       = "submit_feedback_lambda.lambda_handler"
   runtime       = "python3.11"
+  layers        = [var.runtime_layer_arn]
   filename      = data.archive_file.submit_feedback_zip.output_path
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
 
   environment {
     variables = {
       FEEDBACK_TABLE = aws_dynamodb_table.feedback_table.name
+      SUMMARY_TABLE  = aws_dynamodb_table.feedback_summary_table.name
     }
   }
 }
@@ -52,16 +147,80 @@ resource "aws_lambda_function" "get_feedback_lambda" {
   function_name = var.get_feedback_lambda_name
   handler       = "get_feedback_lambda.lambda_handler"
   runtime       = "python3.11"
+  layers        = [var.runtime_layer_arn]
   filename      = data.archive_file.get_feedback_zip.output_path
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
 
   environment {
     variables = {
       FEEDBACK_TABLE = aws_dynamodb_table.feedback_table.name
+      SUMMARY_TABLE  = aws_dynamodb_table.feedback_summary_table.name
+      BACKFILL_TABLE = aws_dynamodb_table.feedback_backfill_table.name
+      CURSOR_SECRET  = random_password.cursor_secret.result
+    }
+  }
+}
+
+resource "aws_lambda_function" "rebuild_feedback_summary_lambda" {
+  function_name = var.rebuild_feedback_summary_lambda_name
+  handler       = "rebuild_feedback_summary_lambda.lambda_handler"
+  runtime       = "python3.11"
+  layers        = [var.runtime_layer_arn]
+  filename      = data.archive_file.rebuild_feedback_summary_zip.output_path
+  role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  timeout       = 900
+  memory_size   = 512
+
+  environment {
+    variables = {
+      FEEDBACK_TABLE = aws_dynamodb_table.feedback_table.name
+      SUMMARY_TABLE  = aws_dynamodb_table.feedback_summary_table.name
     }
   }
 }
 
+# Invoked by hand after a change to the sentiment scorer, e.g.
+#   aws lambda invoke --function-name DALScooterRescoreFeedbackLambda \
+#     --invocation-type Event --payload '{}' out.json
+# and again with {"runId": ...} to resume a run that stopped
+resource "aws_lambda_function" "rescore_feedback_lambda" {
+  function_name = var.rescore_feedback_lambda_name
+  handler       = "rescore_feedback_lambda.lambda_handler"
+  runtime       = "python3.11"
+  layers        = [var.runtime_layer_arn]
+  filename      = data.archive_file.rescore_feedback_zip.output_path
+  role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
+  timeout       = 900
+  memory_size   = 1024
+
+  environment {
+    variables = {
+      FEEDBACK_TABLE   = aws_dynamodb_table.feedback_table.name
+      BACKFILL_TABLE   = aws_dynamodb_table.feedback_backfill_table.name
+      REBUILD_FUNCTION = aws_lambda_function.rebuild_feedback_summary_lambda.function_name
+    }
+  }
+}
+
+# Nightly rebuild, correcting any summary that has drifted from the feedback
+resource "aws_cloudwatch_event_rule" "nightly_feedback_summary_rebuild" {
+  name                = "DALScooterFeedbackSummaryRebuild"
+  schedule_expression = "cron(0 4 * * ? *)"
+}
+
+resource "aws_cloudwatch_event_target" "nightly_feedback_summary_rebuild" {
+  rule = aws_cloudwatch_event_rule.nightly_feedback_summary_rebuild.name
+  arn  = aws_lambda_function.rebuild_feedback_summary_lambda.arn
+}
+
+resource "aws_lambda_permission" "nightly_feedback_summary_rebuild_permission" {
+  statement_id  = "AllowEventBridgeInvokeRebuildFeedbackSummary"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.rebuild_feedback_summary_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.nightly_feedback_summary_rebuild.arn
+}
+
 resource "aws_apigatewayv2_api" "feedback_api" {
   name          = "feedback-api"
   protocol_type = "HTTP"
@@ -124,6 +283,12 @@ resource "aws_apigatewayv2_route" "get_feedback_route" {
   target    = "integrations/${aws_apigatewayv2_integration.get_feedback_integration.id}"
 }
 
+resource "aws_apigatewayv2_route" "feedback_summary_route" {
+  api_id    = aws_apigatewayv2_api.feedback_api.id
+  route_key = "GET /feedback/summary"
+  target    = "integrations/${aws_apigatewayv2_integration.get_feedback_integration.id}"
+}
+
 resource "aws_lambda_permission" "get_feedback_permission" {
   statement_id  = "AllowAPIGatewayInvokeGet"
   action        = "lambda:InvokeFunction"
@@ -7,6 +7,10 @@ variable "feedback_table_name" {
   default = "FeedbackTable"
 }
 
+variable "feedback_summary_table_name" {
+  default = "FeedbackSummaryTable"
+}
+
 variable "submit_feedback_lambda_name" {
   default = "DALScooterSubmitFeedbackLambda"
 }
@@ -15,6 +19,14 @@ variable "get_feedback_lambda_name" {
   default = "DALScooterGetFeedbackLambda"
 }
 
+variable "rebuild_feedback_summary_lambda_name" {
+  default = "DALScooterRebuildFeedbackSummaryLambda"
+}
+
+variable "rescore_feedback_lambda_name" {
+  default = "DALScooterRescoreFeedbackLambda"
+}
+
 variable "cognito_user_pool_id" {
   description = "Cognito User Pool ID"
   type        = string
@@ -23,4 +35,9 @@ variable "cognito_user_pool_id" {
 variable "cognito_user_pool_client_id" {
   description = "Cognito App Client ID"
   type        = string
-}
\ No newline at end of file
+}
+
+variable "runtime_layer_arn" {
+  description = "ARN of the shared DALScooter runtime layer"
+  type        = string
+}
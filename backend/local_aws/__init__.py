@@ -0,0 +1,12 @@
+"""
+In-process stand-ins for the AWS services the DALScooter backend uses, for
+running handlers and benchmarks locally without an AWS account.
+"""
+from .aws import LocalAWS
+from .cognito import LocalCognito
+from .dynamodb import LocalDynamoDB, LocalDynamoDBResource
+from .s3 import LocalS3
+from .sns import LocalSNS
+from .sqs import LocalSQS
+
+__all__ = ['LocalAWS', 'LocalCognito', 'LocalDynamoDB', 'LocalDynamoDBResource', 'LocalS3', 'LocalSNS', 'LocalSQS']
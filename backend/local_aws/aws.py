@@ -0,0 +1,87 @@
+"""
+Wiring that runs the DALScooter Lambda handlers in-process against the local
+stand-ins instead of AWS.
+"""
+import importlib.util
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import boto3
+
+from .cognito import LocalCognito
+from .dynamodb import LocalDynamoDB, LocalDynamoDBResource
+from .s3 import LocalS3
+from .sns import LocalSNS
+from .sqs import LocalSQS
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Lambda layers are mounted under /opt/python in the Lambda runtime; locally
+# their source directories go on sys.path instead.
+LAYER_PATHS = (
+    BACKEND_DIR / 'shared-module' / 'layer' / 'python',
+    BACKEND_DIR / 'booking-module' / 'layer' / 'python',
+)
+
+_patch_lock = threading.Lock()
+
+
+class LocalAWS:
+    """
+    A set of service stand-ins handed out in place of ``boto3.client`` and
+    ``boto3.resource`` while ``patched()`` is active.
+    """
+
+    def __init__(self, latency_ms=0.0, s3_root=None):
+        self.dynamodb = LocalDynamoDB(latency_ms)
+        self.sns = LocalSNS(latency_ms)
+        self.s3 = LocalS3(latency_ms, s3_root)
+        self.sqs = LocalSQS(latency_ms)
+        self.cognito_idp = LocalCognito(latency_ms)
+        self._resources = {'dynamodb': LocalDynamoDBResource(self.dynamodb)}
+
+    def client(self, service_name, *args, **kwargs):
+        try:
+            return getattr(self, service_name.replace('-', '_'))
+        except AttributeError:
+            raise ValueError(f'No local stand-in for the {service_name} client')
+
+    def resource(self, service_name, *args, **kwargs):
+        try:
+            return self._resources[service_name]
+        except KeyError:
+            raise ValueError(f'No local stand-in for the {service_name} resource')
+
+    @contextmanager
+    def patched(self):
+        """Route ``boto3.client``/``boto3.resource`` to these stand-ins."""
+        with _patch_lock:
+            original = boto3.client, boto3.resource
+            boto3.client, boto3.resource = self.client, self.resource
+        try:
+            yield self
+        finally:
+            with _patch_lock:
+                boto3.client, boto3.resource = original
+
+    def load_handler(self, relative_path, env=None):
+        """
+        Import a handler module from ``backend/<relative_path>`` with ``env``
+        applied to ``os.environ``, so module-level clients bind to these
+        stand-ins. Lazy clients remember the stand-ins they were declared
+        against and build from them on first use.
+        """
+        for layer_path in LAYER_PATHS:
+            if str(layer_path) not in sys.path:
+                sys.path.insert(0, str(layer_path))
+        os.environ.update(env or {})
+
+        path = BACKEND_DIR / relative_path
+        spec = importlib.util.spec_from_file_location(path.stem, path)
+        module = importlib.util.module_from_spec(spec)
+        with self.patched():
+            spec.loader.exec_module(module)
+        return module
@@ -0,0 +1,174 @@
+"""
+In-memory stand-in for the Cognito user pool admin API the handlers call.
+
+The DALScooter pool signs users in by email, so each user's username is
+their ``sub``; ``admin_get_user`` also accepts the email, as Cognito does
+for an email username attribute.
+"""
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+exceptions = SimpleNamespace(ClientError=ClientError, **{
+    code: type(code, (ClientError,), {})
+    for code in ('UserNotFoundException', 'ResourceNotFoundException', 'UsernameExistsException',
+                 'GroupExistsException', 'InvalidParameterException', 'TooManyRequestsException')
+})
+
+# Cognito's page size cap for ListUsers/ListUsersInGroup
+MAX_PAGE = 60
+
+_FILTER = re.compile(r'^\s*"?([\w:]+)"?\s*(=|\^=)\s*"([^"]*)"\s*$')
+
+
+def _error(code, message, operation):
+    return getattr(exceptions, code)({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+class LocalCognito:
+    """In-memory stand-in for ``boto3.client('cognito-idp')``."""
+
+    exceptions = exceptions
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+        self.metrics = Counter()
+        self._users = {}
+        self._groups = {}
+        self._lock = threading.Lock()
+        self._throttle = None
+
+    def _call(self, operation):
+        with self._lock:
+            self.metrics[f'calls.{operation}'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self._throttle and self._throttle(operation):
+            raise _error('TooManyRequestsException', 'Too many requests', operation)
+
+    def set_throttle(self, predicate):
+        """
+        Reject calls for which ``predicate(operation)`` is true with
+        ``TooManyRequestsException``. ``None`` clears it.
+        """
+        self._throttle = predicate
+
+    def add_user(self, email, groups=(), user_id=None, attributes=None):
+        """
+        Seed a confirmed user and their group memberships; returns the sub
+        """
+        user_id = user_id or str(uuid.uuid4())
+        now = datetime.now(timezone.utc)
+        user = {
+            'Username': user_id,
+            'Attributes': {'sub': user_id, 'email': email, 'email_verified': 'true', **(attributes or {})},
+            'UserCreateDate': now,
+            'UserLastModifiedDate': now,
+            'Enabled': True,
+            'UserStatus': 'CONFIRMED',
+        }
+        with self._lock:
+            self._users[user_id] = user
+            for group in groups:
+                self._groups.setdefault(group, []).append(user_id)
+        return user_id
+
+    def _find(self, username, operation):
+        user = self._users.get(username)
+        if user is None:
+            user = next((u for u in self._users.values() if u['Attributes'].get('email') == username), None)
+        if user is None:
+            raise _error('UserNotFoundException', 'User does not exist.', operation)
+        return user
+
+    @staticmethod
+    def _describe(user, attributes_key='Attributes'):
+        return {
+            'Username': user['Username'],
+            attributes_key: [{'Name': name, 'Value': value} for name, value in user['Attributes'].items()],
+            'UserCreateDate': user['UserCreateDate'],
+            'UserLastModifiedDate': user['UserLastModifiedDate'],
+            'Enabled': user['Enabled'],
+            'UserStatus': user['UserStatus'],
+        }
+
+    @staticmethod
+    def _page(usernames, limit, token, operation):
+        limit = MAX_PAGE if limit is None else limit
+        if not 0 < limit <= MAX_PAGE:
+            raise _error('InvalidParameterException', f'Limit must be between 1 and {MAX_PAGE}', operation)
+        start = int(token) if token else 0
+        end = start + limit
+        return usernames[start:end], (str(end) if end < len(usernames) else None)
+
+    def create_group(self, GroupName, UserPoolId, **kwargs):
+        self._call('CreateGroup')
+        with self._lock:
+            if GroupName in self._groups:
+                raise _error('GroupExistsException', 'A group with the name already exists.', 'CreateGroup')
+            self._groups[GroupName] = []
+        return {'Group': {'GroupName': GroupName, 'UserPoolId': UserPoolId}}
+
+    def admin_create_user(self, UserPoolId, Username, UserAttributes=(), **kwargs):
+        self._call('AdminCreateUser')
+        attributes = {attr['Name']: attr['Value'] for attr in UserAttributes}
+        with self._lock:
+            if Username in self._users:
+                raise _error('UsernameExistsException', 'User account already exists.', 'AdminCreateUser')
+        user_id = self.add_user(attributes.pop('email', Username), user_id=Username, attributes=attributes)
+        return {'User': self._describe(self._users[user_id])}
+
+    def admin_add_user_to_group(self, UserPoolId, Username, GroupName):
+        self._call('AdminAddUserToGroup')
+        with self._lock:
+            user = self._find(Username, 'AdminAddUserToGroup')
+            if GroupName not in self._groups:
+                raise _error('ResourceNotFoundException', 'Group not found.', 'AdminAddUserToGroup')
+            if user['Username'] not in self._groups[GroupName]:
+                self._groups[GroupName].append(user['Username'])
+        return {}
+
+    def admin_get_user(self, UserPoolId, Username):
+        self._call('AdminGetUser')
+        with self._lock:
+            user = self._find(Username, 'AdminGetUser')
+            return self._describe(user, 'UserAttributes')
+
+    def list_users_in_group(self, UserPoolId, GroupName, Limit=None, NextToken=None):
+        self._call('ListUsersInGroup')
+        with self._lock:
+            if GroupName not in self._groups:
+                raise _error('ResourceNotFoundException', 'Group not found.', 'ListUsersInGroup')
+            usernames, token = self._page(self._groups[GroupName], Limit, NextToken, 'ListUsersInGroup')
+            response = {'Users': [self._describe(self._users[name]) for name in usernames]}
+        if token:
+            response['NextToken'] = token
+        return response
+
+    def list_users(self, UserPoolId, Limit=None, PaginationToken=None, Filter=None, **kwargs):
+        self._call('ListUsers')
+        with self._lock:
+            users = list(self._users.values())
+            if Filter:
+                match = _FILTER.match(Filter)
+                if not match:
+                    raise _error('InvalidParameterException', f'Invalid filter: {Filter}', 'ListUsers')
+                name, op, value = match.groups()
+                name = 'Username' if name == 'username' else name
+                def attribute(user):
+                    return user['Username'] if name == 'Username' else user['Attributes'].get(name, '')
+                users = [
+                    user for user in users
+                    if (attribute(user) == value if op == '=' else attribute(user).startswith(value))
+                ]
+            page, token = self._page([user['Username'] for user in users], Limit, PaginationToken, 'ListUsers')
+            response = {'Users': [self._describe(self._users[name]) for name in page]}
+        if token:
+            response['PaginationToken'] = token
+        return response
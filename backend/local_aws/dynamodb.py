@@ -0,0 +1,920 @@
+"""
+In-memory stand-in for DynamoDB.
+
+``LocalDynamoDB`` mimics the low-level ``boto3.client('dynamodb')`` API and
+``LocalDynamoDBResource`` the ``boto3.resource('dynamodb')`` API on top of it,
+closely enough that the DALScooter handlers run against it unmodified:
+conditional writes, transactions, batch operations, GSIs with sorted range
+keys, paginated query/scan (including parallel scan segments and the 1 MB
+page limit) and the service's error codes.
+
+Every call takes a single process-wide lock, which makes transactions and
+conditional writes atomic across threads. An optional per-call latency is
+slept outside the lock to model the network round-trip, so concurrency
+benchmarks see realistic overlap between callers.
+"""
+import copy
+import math
+import threading
+import time
+import zlib
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+from .expressions import (
+    ExpressionError,
+    apply_update,
+    evaluate_condition,
+    key_condition_parts,
+    parse_condition,
+    plain_key_value,
+    project,
+    range_bounds,
+    evaluate_operand,
+)
+
+PAGE_SIZE_LIMIT = 1024 * 1024
+SCAN_BUCKETS = 1024
+MAX_BATCH_WRITE = 25
+MAX_BATCH_GET = 100
+MAX_TRANSACT_ITEMS = 100
+
+_ERROR_CODES = (
+    'ConditionalCheckFailedException',
+    'TransactionCanceledException',
+    'TransactionConflictException',
+    'ResourceNotFoundException',
+    'ResourceInUseException',
+    'ValidationException',
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+)
+
+exceptions = SimpleNamespace(ClientError=ClientError, **{
+    code: type(code, (ClientError,), {}) for code in _ERROR_CODES
+})
+
+
+def _error(code, message, operation, **extra):
+    response = {'Error': {'Code': code, 'Message': message}}
+    response.update(extra)
+    return getattr(exceptions, code)(response, operation)
+
+
+def _copy_value(value):
+    (kind, inner), = value.items()
+    if kind == 'M':
+        return {'M': copy_item(inner)}
+    if kind == 'L':
+        return {'L': [_copy_value(element) for element in inner]}
+    if kind in ('SS', 'NS', 'BS'):
+        return {kind: list(inner)}
+    return {kind: inner}
+
+
+def copy_item(item):
+    """
+    Copy of a typed item. Much cheaper than ``copy.deepcopy``, which matters
+    because every read and write hands out or stores a copy.
+    """
+    return {name: _copy_value(value) for name, value in item.items()}
+
+
+def item_size(item):
+    """Approximate DynamoDB item size in bytes."""
+    return sum(len(name) + _value_size(value) for name, value in item.items())
+
+
+def _value_size(value):
+    (type_key, inner), = value.items()
+    if type_key == 'S':
+        return len(inner.encode('utf-8'))
+    if type_key == 'N':
+        return len(inner) // 2 + 2
+    if type_key == 'B':
+        return len(inner)
+    if type_key in ('BOOL', 'NULL'):
+        return 1
+    if type_key == 'L':
+        return 3 + sum(1 + _value_size(v) for v in inner)
+    if type_key == 'M':
+        return 3 + sum(1 + len(k) + _value_size(v) for k, v in inner.items())
+    if type_key == 'SS':
+        return sum(len(s.encode('utf-8')) for s in inner)
+    if type_key == 'NS':
+        return sum(len(n) // 2 + 2 for n in inner)
+    return sum(len(b) for b in inner)
+
+
+class _Index:
+    """A partition-key -> sorted sort-key view over a table's items."""
+
+    def __init__(self, name, hash_key, range_key=None, projection=None):
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.projection = projection or {'ProjectionType': 'ALL'}
+        self.partitions = {}
+
+    def entry(self, item, pk):
+        hash_value = item.get(self.hash_key)
+        if hash_value is None:
+            return None
+        if self.range_key is None:
+            return plain_key_value(hash_value), (pk,)
+        range_value = item.get(self.range_key)
+        if range_value is None:
+            return None
+        return plain_key_value(hash_value), (plain_key_value(range_value), pk)
+
+    def add(self, item, pk):
+        entry = self.entry(item, pk)
+        if entry is not None:
+            insort(self.partitions.setdefault(entry[0], []), entry[1])
+
+    def remove(self, item, pk):
+        entry = self.entry(item, pk)
+        if entry is None:
+            return
+        partition = self.partitions.get(entry[0])
+        idx = bisect_left(partition, entry[1])
+        if idx < len(partition) and partition[idx] == entry[1]:
+            del partition[idx]
+        if not partition:
+            del self.partitions[entry[0]]
+
+    def key_attributes(self):
+        return [self.hash_key] + ([self.range_key] if self.range_key else [])
+
+
+class _Table:
+    def __init__(self, definition):
+        self.name = definition['TableName']
+        self.attribute_types = {
+            attribute['AttributeName']: attribute['AttributeType']
+            for attribute in definition.get('AttributeDefinitions', [])
+        }
+        key_schema = {key['KeyType']: key['AttributeName'] for key in definition['KeySchema']}
+        self.hash_key = key_schema['HASH']
+        self.range_key = key_schema.get('RANGE')
+        self.definition = copy.deepcopy(definition)
+        self.items = {}
+        self.base_index = _Index(None, self.hash_key, self.range_key)
+        self.indexes = {}
+        for gsi in definition.get('GlobalSecondaryIndexes', []) + definition.get('LocalSecondaryIndexes', []):
+            gsi_schema = {key['KeyType']: key['AttributeName'] for key in gsi['KeySchema']}
+            self.indexes[gsi['IndexName']] = _Index(
+                gsi['IndexName'], gsi_schema['HASH'], gsi_schema.get('RANGE'), gsi.get('Projection')
+            )
+        self.buckets = [dict() for _ in range(SCAN_BUCKETS)]
+        self.sorted_buckets = [None] * SCAN_BUCKETS
+        self.ttl = None
+        stream = definition.get('StreamSpecification') or {}
+        self.stream_view = stream.get('StreamViewType') if stream.get('StreamEnabled') else None
+        self.stream = []
+        self.stream_sequence = 0
+
+    def key_names(self):
+        return [self.hash_key] + ([self.range_key] if self.range_key else [])
+
+    def primary_key(self, key, operation):
+        names = self.key_names()
+        if set(key) != set(names):
+            raise _error('ValidationException', 'The provided key element does not match the schema', operation)
+        values = []
+        for name in names:
+            (type_key, _), = key[name].items()
+            expected = self.attribute_types.get(name)
+            if expected and type_key != expected:
+                raise _error('ValidationException', 'The provided key element does not match the schema', operation)
+            values.append(plain_key_value(key[name]))
+        return tuple(values)
+
+    def key_of(self, item):
+        return {name: item[name] for name in self.key_names()}
+
+    def bucket_of(self, pk):
+        return zlib.crc32(repr(pk).encode('utf-8')) % SCAN_BUCKETS
+
+    def store(self, pk, item):
+        old = self.items.get(pk)
+        if old is not None:
+            self._unindex(pk, old)
+        else:
+            bucket = self.bucket_of(pk)
+            self.buckets[bucket][pk] = None
+            self.sorted_buckets[bucket] = None
+        self.items[pk] = item
+        if self.range_key:
+            self.base_index.add(item, pk)
+        for index in self.indexes.values():
+            index.add(item, pk)
+        self._record('MODIFY' if old is not None else 'INSERT', old, item)
+
+    def discard(self, pk):
+        old = self.items.pop(pk, None)
+        if old is None:
+            return None
+        self._unindex(pk, old)
+        bucket = self.bucket_of(pk)
+        self.buckets[bucket].pop(pk, None)
+        self.sorted_buckets[bucket] = None
+        self._record('REMOVE', old, None)
+        return old
+
+    def _record(self, event_name, old, new):
+        """
+        Append a change to the table's stream, if it has one. Stored items are
+        replaced rather than mutated, so the record can hold them as they are.
+        """
+        if self.stream_view is None:
+            return
+        self.stream_sequence += 1
+        self.stream.append((self.stream_sequence, event_name, old, new))
+
+    def _unindex(self, pk, item):
+        if self.range_key:
+            self.base_index.remove(item, pk)
+        for index in self.indexes.values():
+            index.remove(item, pk)
+
+    def bucket_keys(self, bucket):
+        keys = self.sorted_buckets[bucket]
+        if keys is None:
+            keys = self.sorted_buckets[bucket] = sorted(self.buckets[bucket])
+        return keys
+
+    def describe(self):
+        description = copy.deepcopy(self.definition)
+        description['TableStatus'] = 'ACTIVE'
+        description['ItemCount'] = len(self.items)
+        return description
+
+
+class LocalDynamoDB:
+    """In-memory stand-in for the low-level DynamoDB client."""
+
+    exceptions = exceptions
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+        self.metrics = Counter()
+        self.meta = SimpleNamespace(region_name='local', service_model=SimpleNamespace(service_name='dynamodb'))
+        self._tables = {}
+        self._lock = threading.RLock()
+        self._throttle = None
+
+    # Helpers
+
+    def _call(self, operation):
+        with self._lock:
+            self.metrics[f'calls.{operation}'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def set_throttle(self, predicate):
+        """
+        Install ``predicate(operation, request)`` returning True to reject a
+        write request as unprocessed (batch) or throttled (single item).
+        """
+        self._throttle = predicate
+
+    def _table(self, name, operation):
+        try:
+            return self._tables[name]
+        except KeyError:
+            raise _error('ResourceNotFoundException', f'Requested resource not found: Table: {name} not found', operation)
+
+    def _condition_holds(self, expression, item, names, values, operation):
+        if not expression:
+            return True
+        try:
+            return evaluate_condition(parse_condition(expression), item or {}, names, values)
+        except ExpressionError as e:
+            raise _error('ValidationException', str(e), operation)
+
+    def _read_units(self, size, consistent=False):
+        units = math.ceil(max(size, 1) / 4096)
+        return units if consistent else units / 2
+
+    def _write_units(self, size):
+        return math.ceil(max(size, 1) / 1024)
+
+    # Table management
+
+    def create_table(self, **kwargs):
+        self._call('CreateTable')
+        with self._lock:
+            name = kwargs['TableName']
+            if name in self._tables:
+                raise _error('ResourceInUseException', f'Table already exists: {name}', 'CreateTable')
+            self._tables[name] = _Table(kwargs)
+            return {'TableDescription': self._tables[name].describe()}
+
+    def delete_table(self, TableName):
+        self._call('DeleteTable')
+        with self._lock:
+            table = self._table(TableName, 'DeleteTable')
+            del self._tables[TableName]
+            return {'TableDescription': table.describe()}
+
+    def describe_table(self, TableName):
+        with self._lock:
+            return {'Table': self._table(TableName, 'DescribeTable').describe()}
+
+    def list_tables(self, **kwargs):
+        with self._lock:
+            return {'TableNames': sorted(self._tables)}
+
+    def update_time_to_live(self, TableName, TimeToLiveSpecification):
+        with self._lock:
+            self._table(TableName, 'UpdateTimeToLive').ttl = TimeToLiveSpecification
+            return {'TimeToLiveSpecification': TimeToLiveSpecification}
+
+    def truncate(self, TableName):
+        """Remove every item from a table, keeping its definition."""
+        with self._lock:
+            table = self._table(TableName, 'Truncate')
+            self._tables[TableName] = _Table(table.definition)
+
+    def drain_stream(self, TableName, limit=None):
+        """
+        Take pending changes off a table's stream as a DynamoDB Streams
+        Lambda event (``{'Records': [...]}``), oldest first. Tables get a
+        stream by passing ``StreamSpecification`` to ``create_table``.
+        """
+        with self._lock:
+            table = self._table(TableName, 'DrainStream')
+            if table.stream_view is None:
+                raise _error('ValidationException', f'Table {TableName} has no stream', 'DrainStream')
+            count = len(table.stream) if limit is None else min(limit, len(table.stream))
+            changes, table.stream[:count] = table.stream[:count], []
+            return {'Records': [self._stream_record(table, *change) for change in changes]}
+
+    @staticmethod
+    def _stream_record(table, sequence, event_name, old, new):
+        image = new if new is not None else old
+        change = {
+            'Keys': copy_item(table.key_of(image)),
+            'SequenceNumber': str(sequence).rjust(21, '0'),
+            'SizeBytes': item_size(image),
+            'StreamViewType': table.stream_view
+        }
+        if new is not None and table.stream_view in ('NEW_IMAGE', 'NEW_AND_OLD_IMAGES'):
+            change['NewImage'] = copy_item(new)
+        if old is not None and table.stream_view in ('OLD_IMAGE', 'NEW_AND_OLD_IMAGES'):
+            change['OldImage'] = copy_item(old)
+        return {
+            'eventID': str(sequence),
+            'eventName': event_name,
+            'eventSource': 'aws:dynamodb',
+            'eventVersion': '1.1',
+            'awsRegion': 'local',
+            'dynamodb': change,
+            'eventSourceARN': f'arn:aws:dynamodb:local:000000000000:table/{table.name}/stream/local'
+        }
+
+    # Single-item operations
+
+    def get_item(self, TableName, Key, ProjectionExpression=None, ExpressionAttributeNames=None,
+                 ConsistentRead=False, ReturnConsumedCapacity=None):
+        self._call('GetItem')
+        with self._lock:
+            table = self._table(TableName, 'GetItem')
+            item = table.items.get(table.primary_key(Key, 'GetItem'))
+            units = self._read_units(item_size(item) if item else 0, ConsistentRead)
+            self.metrics['read_units'] += units
+            response = {}
+            if item is not None:
+                self.metrics['items_read'] += 1
+                self.metrics['items_returned'] += 1
+                item = copy_item(item)
+                if ProjectionExpression:
+                    item = project(item, ProjectionExpression, ExpressionAttributeNames)
+                response['Item'] = item
+            if ReturnConsumedCapacity and ReturnConsumedCapacity != 'NONE':
+                response['ConsumedCapacity'] = {'TableName': TableName, 'CapacityUnits': units}
+            return response
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValues='NONE',
+                 ReturnValuesOnConditionCheckFailure='NONE', ReturnConsumedCapacity=None):
+        self._call('PutItem')
+        with self._lock:
+            table = self._table(TableName, 'PutItem')
+            self._check_throttle('PutItem', {'TableName': TableName, 'Item': Item})
+            pk = table.primary_key(table.key_of(Item), 'PutItem')
+            old = table.items.get(pk)
+            self._check_condition(ConditionExpression, old, ExpressionAttributeNames, ExpressionAttributeValues,
+                                  'PutItem', ReturnValuesOnConditionCheckFailure)
+            table.store(pk, copy_item(Item))
+            self._count_write(Item)
+            response = {}
+            if ReturnValues == 'ALL_OLD' and old is not None:
+                response['Attributes'] = copy_item(old)
+            return response
+
+    def update_item(self, TableName, Key, UpdateExpression=None, ConditionExpression=None,
+                    ExpressionAttributeNames=None, ExpressionAttributeValues=None, ReturnValues='NONE',
+                    ReturnValuesOnConditionCheckFailure='NONE', ReturnConsumedCapacity=None):
+        self._call('UpdateItem')
+        with self._lock:
+            table = self._table(TableName, 'UpdateItem')
+            self._check_throttle('UpdateItem', {'TableName': TableName, 'Key': Key})
+            pk = table.primary_key(Key, 'UpdateItem')
+            old = table.items.get(pk)
+            self._check_condition(ConditionExpression, old, ExpressionAttributeNames, ExpressionAttributeValues,
+                                  'UpdateItem', ReturnValuesOnConditionCheckFailure)
+            new, touched = self._updated_item(table, Key, old, UpdateExpression, ExpressionAttributeNames,
+                                              ExpressionAttributeValues, 'UpdateItem')
+            table.store(pk, new)
+            self._count_write(new)
+            attributes = self._return_values(ReturnValues, old, new, touched)
+            return {'Attributes': attributes} if attributes else {}
+
+    def delete_item(self, TableName, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE',
+                    ReturnValuesOnConditionCheckFailure='NONE', ReturnConsumedCapacity=None):
+        self._call('DeleteItem')
+        with self._lock:
+            table = self._table(TableName, 'DeleteItem')
+            pk = table.primary_key(Key, 'DeleteItem')
+            old = table.items.get(pk)
+            self._check_condition(ConditionExpression, old, ExpressionAttributeNames, ExpressionAttributeValues,
+                                  'DeleteItem', ReturnValuesOnConditionCheckFailure)
+            table.discard(pk)
+            self._count_write(old or {})
+            response = {}
+            if ReturnValues == 'ALL_OLD' and old is not None:
+                response['Attributes'] = old
+            return response
+
+    def _check_throttle(self, operation, request):
+        if self._throttle and self._throttle(operation, request):
+            self.metrics['throttled'] += 1
+            raise _error('ProvisionedThroughputExceededException', 'Rate of requests exceeds the allowed throughput', operation)
+
+    def _check_condition(self, expression, old, names, values, operation, return_on_failure):
+        if not self._condition_holds(expression, old, names, values, operation):
+            self.metrics['condition_failures'] += 1
+            extra = {}
+            if return_on_failure == 'ALL_OLD' and old is not None:
+                extra['Item'] = copy_item(old)
+            raise _error('ConditionalCheckFailedException', 'The conditional request failed', operation, **extra)
+
+    def _updated_item(self, table, key, old, expression, names, values, operation):
+        new = copy_item(old) if old is not None else copy_item(key)
+        touched = set()
+        if expression:
+            try:
+                touched = apply_update(expression, new, names, values)
+            except ExpressionError as e:
+                raise _error('ValidationException', str(e), operation)
+        if touched & set(table.key_names()):
+            raise _error('ValidationException', 'Cannot update attribute in the key', operation)
+        return new, touched
+
+    @staticmethod
+    def _return_values(mode, old, new, touched):
+        if mode == 'ALL_NEW':
+            return copy_item(new)
+        if mode == 'ALL_OLD':
+            return copy_item(old) if old else None
+        if mode == 'UPDATED_NEW':
+            return {k: _copy_value(new[k]) for k in touched if k in new} or None
+        if mode == 'UPDATED_OLD':
+            return {k: _copy_value(old[k]) for k in touched if old and k in old} or None
+        return None
+
+    def _count_write(self, item, transactional=False):
+        # Transactional writes consume twice the capacity of standard ones
+        self.metrics['items_written'] += 1
+        self.metrics['write_units'] += self._write_units(item_size(item)) * (2 if transactional else 1)
+
+    # Query and scan
+
+    def query(self, TableName, KeyConditionExpression, IndexName=None, FilterExpression=None,
+              ProjectionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+              ScanIndexForward=True, Limit=None, ExclusiveStartKey=None, Select=None,
+              ConsistentRead=False, ReturnConsumedCapacity=None):
+        self._call('Query')
+        names = ExpressionAttributeNames
+        values = ExpressionAttributeValues
+        with self._lock:
+            table = self._table(TableName, 'Query')
+            if IndexName:
+                index = table.indexes.get(IndexName)
+                if index is None:
+                    raise _error('ValidationException', f'The table does not have the specified index: {IndexName}', 'Query')
+            else:
+                index = table.base_index
+
+            try:
+                hash_operand, range_node = key_condition_parts(parse_condition(KeyConditionExpression), names, index.hash_key)
+                hash_value = plain_key_value(evaluate_operand(hash_operand, {}, names, values))
+                _, low, high = range_bounds(range_node, names, values)
+            except ExpressionError as e:
+                raise _error('ValidationException', str(e), 'Query')
+
+            if index.range_key is None:
+                if IndexName is None:
+                    pk = (hash_value,)
+                    entries = [(pk,)] if pk in table.items else []
+                else:
+                    entries = list(index.partitions.get(hash_value, []))
+                start, stop = 0, len(entries)
+            else:
+                entries = index.partitions.get(hash_value, [])
+                start = 0 if low is None else bisect_left(entries, (low,))
+                stop = len(entries) if high is None else bisect_right(entries, (high, _MAX))
+
+            if ExclusiveStartKey:
+                marker = self._query_marker(table, index, ExclusiveStartKey)
+                if ScanIndexForward:
+                    start = max(start, bisect_right(entries, marker, start, stop))
+                else:
+                    stop = min(stop, bisect_left(entries, marker, start, stop))
+
+            positions = range(start, stop) if ScanIndexForward else range(stop - 1, start - 1, -1)
+            candidates = (table.items[entry[-1]] for entry in (entries[p] for p in positions))
+            filtered = (
+                item for item in candidates
+                if range_node is None or self._condition_holds_node(range_node, item, names, values)
+            )
+            return self._page(table, index, filtered, FilterExpression, ProjectionExpression, names, values,
+                              Limit, Select, ConsistentRead, ReturnConsumedCapacity, 'Query')
+
+    def _condition_holds_node(self, node, item, names, values):
+        return evaluate_condition(node, item, names, values)
+
+    def _query_marker(self, table, index, start_key):
+        pk = table.primary_key(table.key_of(start_key), 'Query')
+        if index.range_key is None:
+            return (pk,)
+        return (plain_key_value(start_key[index.range_key]), pk)
+
+    def scan(self, TableName, IndexName=None, FilterExpression=None, ProjectionExpression=None,
+             ExpressionAttributeNames=None, ExpressionAttributeValues=None, Limit=None,
+             ExclusiveStartKey=None, Segment=None, TotalSegments=None, Select=None,
+             ConsistentRead=False, ReturnConsumedCapacity=None):
+        self._call('Scan')
+        with self._lock:
+            table = self._table(TableName, 'Scan')
+            if IndexName:
+                raise _error('ValidationException', 'Index scans are not supported by the local stand-in', 'Scan')
+            if (Segment is None) != (TotalSegments is None):
+                raise _error('ValidationException', 'Segment and TotalSegments must be provided together', 'Scan')
+            total = TotalSegments or 1
+            segment = Segment or 0
+            first_bucket = segment * SCAN_BUCKETS // total
+            last_bucket = (segment + 1) * SCAN_BUCKETS // total
+
+            start_bucket, after = first_bucket, None
+            if ExclusiveStartKey:
+                after = table.primary_key(table.key_of(ExclusiveStartKey), 'Scan')
+                start_bucket = table.bucket_of(after)
+
+            def items():
+                for bucket in range(start_bucket, last_bucket):
+                    keys = table.bucket_keys(bucket)
+                    begin = bisect_right(keys, after) if (after is not None and bucket == start_bucket) else 0
+                    for pk in keys[begin:]:
+                        yield table.items[pk]
+
+            return self._page(table, None, items(), FilterExpression, ProjectionExpression,
+                              ExpressionAttributeNames, ExpressionAttributeValues, Limit, Select,
+                              ConsistentRead, ReturnConsumedCapacity, 'Scan')
+
+    def _page(self, table, index, candidates, filter_expression, projection_expression, names, values,
+              limit, select, consistent, return_capacity, operation):
+        filter_node = None
+        if filter_expression:
+            try:
+                filter_node = parse_condition(filter_expression)
+            except ExpressionError as e:
+                raise _error('ValidationException', str(e), operation)
+
+        result = []
+        scanned = 0
+        size = 0
+        last = None
+        exhausted = True
+        for item in candidates:
+            if (limit is not None and scanned >= limit) or size >= PAGE_SIZE_LIMIT:
+                exhausted = False
+                break
+            scanned += 1
+            size += item_size(item)
+            last = item
+            try:
+                if filter_node is not None and not evaluate_condition(filter_node, item, names, values):
+                    continue
+            except ExpressionError as e:
+                raise _error('ValidationException', str(e), operation)
+            result.append(self._project_for_index(index, item, table))
+
+        if exhausted and limit is not None and scanned >= limit and last is not None:
+            exhausted = False
+
+        units = self._read_units(size, consistent)
+        self.metrics['items_read'] += scanned
+        self.metrics['items_returned'] += len(result)
+        self.metrics['read_units'] += units
+
+        response = {'Count': len(result), 'ScannedCount': scanned}
+        if select != 'COUNT':
+            if projection_expression:
+                result = [project(item, projection_expression, names) for item in result]
+            response['Items'] = [copy_item(item) for item in result]
+        if not exhausted and last is not None:
+            key = table.key_of(last)
+            if index is not None:
+                for name in index.key_attributes():
+                    key[name] = last[name]
+            response['LastEvaluatedKey'] = copy_item(key)
+        if return_capacity and return_capacity != 'NONE':
+            response['ConsumedCapacity'] = {'TableName': table.name, 'CapacityUnits': units}
+        return response
+
+    @staticmethod
+    def _project_for_index(index, item, table):
+        if index is None or index.projection.get('ProjectionType', 'ALL') == 'ALL':
+            return item
+        keep = set(table.key_names()) | set(index.key_attributes())
+        if index.projection['ProjectionType'] == 'INCLUDE':
+            keep |= set(index.projection.get('NonKeyAttributes', []))
+        return {name: value for name, value in item.items() if name in keep}
+
+    # Batch operations
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity=None):
+        self._call('BatchWriteItem')
+        total = sum(len(requests) for requests in RequestItems.values())
+        if total > MAX_BATCH_WRITE:
+            raise _error('ValidationException', 'Too many items requested for the BatchWriteItem call', 'BatchWriteItem')
+        unprocessed = {}
+        with self._lock:
+            seen = set()
+            for table_name, requests in RequestItems.items():
+                table = self._table(table_name, 'BatchWriteItem')
+                for request in requests:
+                    key = table.key_of(request['PutRequest']['Item']) if 'PutRequest' in request else request['DeleteRequest']['Key']
+                    pk = (table_name, table.primary_key(key, 'BatchWriteItem'))
+                    if pk in seen:
+                        raise _error('ValidationException', 'Provided list of item keys contains duplicates', 'BatchWriteItem')
+                    seen.add(pk)
+
+            for table_name, requests in RequestItems.items():
+                table = self._tables[table_name]
+                for request in requests:
+                    if self._throttle and self._throttle('BatchWriteItem', request):
+                        self.metrics['throttled'] += 1
+                        unprocessed.setdefault(table_name, []).append(request)
+                        continue
+                    if 'PutRequest' in request:
+                        item = request['PutRequest']['Item']
+                        table.store(table.primary_key(table.key_of(item), 'BatchWriteItem'), copy_item(item))
+                        self._count_write(item)
+                    else:
+                        old = table.discard(table.primary_key(request['DeleteRequest']['Key'], 'BatchWriteItem'))
+                        self._count_write(old or {})
+        return {'UnprocessedItems': unprocessed}
+
+    def batch_get_item(self, RequestItems, ReturnConsumedCapacity=None):
+        self._call('BatchGetItem')
+        total = sum(len(request['Keys']) for request in RequestItems.values())
+        if total > MAX_BATCH_GET:
+            raise _error('ValidationException', 'Too many items requested for the BatchGetItem call', 'BatchGetItem')
+        responses = {}
+        with self._lock:
+            for table_name, request in RequestItems.items():
+                table = self._table(table_name, 'BatchGetItem')
+                found = responses.setdefault(table_name, [])
+                for key in request['Keys']:
+                    item = table.items.get(table.primary_key(key, 'BatchGetItem'))
+                    if item is None:
+                        continue
+                    self.metrics['items_read'] += 1
+                    self.metrics['items_returned'] += 1
+                    self.metrics['read_units'] += self._read_units(item_size(item), request.get('ConsistentRead'))
+                    item = copy_item(item)
+                    if request.get('ProjectionExpression'):
+                        item = project(item, request['ProjectionExpression'], request.get('ExpressionAttributeNames'))
+                    found.append(item)
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    # Transactions
+
+    def transact_write_items(self, TransactItems, ClientRequestToken=None, ReturnConsumedCapacity=None):
+        self._call('TransactWriteItems')
+        if len(TransactItems) > MAX_TRANSACT_ITEMS:
+            raise _error('ValidationException', f'Member must have length less than or equal to {MAX_TRANSACT_ITEMS}',
+                         'TransactWriteItems')
+        with self._lock:
+            planned = []
+            seen = set()
+            for entry in TransactItems:
+                (action, request), = entry.items()
+                table = self._table(request['TableName'], 'TransactWriteItems')
+                key = table.key_of(request['Item']) if action == 'Put' else request['Key']
+                pk = table.primary_key(key, 'TransactWriteItems')
+                if (table.name, pk) in seen:
+                    raise _error('ValidationException',
+                                 'Transaction request cannot include multiple operations on one item',
+                                 'TransactWriteItems')
+                seen.add((table.name, pk))
+                planned.append((action, request, table, pk))
+
+            reasons = []
+            failed = False
+            for action, request, table, pk in planned:
+                old = table.items.get(pk)
+                if self._condition_holds(request.get('ConditionExpression'), old,
+                                         request.get('ExpressionAttributeNames'),
+                                         request.get('ExpressionAttributeValues'), 'TransactWriteItems'):
+                    reasons.append({'Code': 'None'})
+                    continue
+                failed = True
+                reason = {'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'}
+                if request.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD' and old is not None:
+                    reason['Item'] = copy_item(old)
+                reasons.append(reason)
+
+            if failed:
+                self.metrics['transactions_cancelled'] += 1
+                codes = ', '.join(reason['Code'] for reason in reasons)
+                raise _error('TransactionCanceledException',
+                             f'Transaction cancelled, please refer cancellation reasons for specific reasons [{codes}]',
+                             'TransactWriteItems', CancellationReasons=reasons)
+
+            writes = []
+            for action, request, table, pk in planned:
+                if action == 'Put':
+                    writes.append((table, pk, copy_item(request['Item'])))
+                elif action == 'Update':
+                    new, _ = self._updated_item(table, request['Key'], table.items.get(pk),
+                                                request.get('UpdateExpression'),
+                                                request.get('ExpressionAttributeNames'),
+                                                request.get('ExpressionAttributeValues'), 'TransactWriteItems')
+                    writes.append((table, pk, new))
+                elif action == 'Delete':
+                    writes.append((table, pk, None))
+
+            for table, pk, item in writes:
+                if item is None:
+                    old = table.discard(pk)
+                    self._count_write(old or {}, transactional=True)
+                else:
+                    table.store(pk, item)
+                    self._count_write(item, transactional=True)
+            self.metrics['transactions_committed'] += 1
+            return {}
+
+
+class _Max:
+    """Sorts after every key value; used as an open upper bound for bisect."""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, _Max)
+
+    def __le__(self, other):
+        return isinstance(other, _Max)
+
+    def __ge__(self, other):
+        return True
+
+
+_MAX = _Max()
+
+
+class LocalTable:
+    """Stand-in for ``boto3.resource('dynamodb').Table(name)``."""
+
+    def __init__(self, client, name):
+        from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+        self.meta = SimpleNamespace(client=client)
+        self.name = self.table_name = name
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+
+    def _serialize(self, item):
+        return {k: self._serializer.serialize(v) for k, v in item.items()}
+
+    def _deserialize(self, item):
+        return {k: self._deserializer.deserialize(v) for k, v in item.items()}
+
+    def _request(self, kwargs):
+        from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+
+        builder = ConditionExpressionBuilder()
+        request = dict(kwargs)
+        names = dict(request.pop('ExpressionAttributeNames', None) or {})
+        values = dict(request.pop('ExpressionAttributeValues', None) or {})
+        for field in ('KeyConditionExpression', 'FilterExpression', 'ConditionExpression'):
+            condition = request.get(field)
+            if isinstance(condition, ConditionBase):
+                built = builder.build_expression(condition, is_key_condition=(field == 'KeyConditionExpression'))
+                request[field] = built.condition_expression
+                names.update(built.attribute_name_placeholders)
+                values.update(built.attribute_value_placeholders)
+        if names:
+            request['ExpressionAttributeNames'] = names
+        if values:
+            request['ExpressionAttributeValues'] = self._serialize(values)
+        for field in ('Item', 'Key', 'ExclusiveStartKey'):
+            if field in request:
+                request[field] = self._serialize(request[field])
+        request['TableName'] = self.name
+        return request
+
+    def _response(self, response):
+        response = dict(response)
+        if 'Items' in response:
+            response['Items'] = [self._deserialize(item) for item in response['Items']]
+        for field in ('Item', 'Attributes', 'LastEvaluatedKey'):
+            if field in response:
+                response[field] = self._deserialize(response[field])
+        return response
+
+    def get_item(self, **kwargs):
+        return self._response(self.meta.client.get_item(**self._request(kwargs)))
+
+    def put_item(self, **kwargs):
+        return self._response(self.meta.client.put_item(**self._request(kwargs)))
+
+    def update_item(self, **kwargs):
+        return self._response(self.meta.client.update_item(**self._request(kwargs)))
+
+    def delete_item(self, **kwargs):
+        return self._response(self.meta.client.delete_item(**self._request(kwargs)))
+
+    def query(self, **kwargs):
+        return self._response(self.meta.client.query(**self._request(kwargs)))
+
+    def scan(self, **kwargs):
+        return self._response(self.meta.client.scan(**self._request(kwargs)))
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _BatchWriter(self, overwrite_by_pkeys)
+
+
+class _BatchWriter:
+    """Buffers puts and deletes into 25-item BatchWriteItem calls."""
+
+    def __init__(self, table, overwrite_by_pkeys=None):
+        self._table = table
+        self._client = table.meta.client
+        self._overwrite_by_pkeys = overwrite_by_pkeys
+        self._buffer = []
+
+    def put_item(self, Item):
+        self._add({'PutRequest': {'Item': self._table._serialize(Item)}}, Item)
+
+    def delete_item(self, Key):
+        self._add({'DeleteRequest': {'Key': self._table._serialize(Key)}}, Key)
+
+    def _add(self, request, item):
+        if self._overwrite_by_pkeys:
+            key = tuple(item.get(name) for name in self._overwrite_by_pkeys)
+            self._buffer = [
+                (k, r) for k, r in self._buffer if k != key
+            ]
+            self._buffer.append((key, request))
+        else:
+            self._buffer.append((None, request))
+        if len(self._buffer) >= MAX_BATCH_WRITE:
+            self._flush()
+
+    def _flush(self):
+        pending = [request for _, request in self._buffer[:MAX_BATCH_WRITE]]
+        self._buffer = self._buffer[MAX_BATCH_WRITE:]
+        while pending:
+            response = self._client.batch_write_item(RequestItems={self._table.name: pending})
+            pending = response.get('UnprocessedItems', {}).get(self._table.name, [])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        while self._buffer:
+            self._flush()
+
+
+class LocalDynamoDBResource:
+    """Stand-in for ``boto3.resource('dynamodb')``."""
+
+    def __init__(self, client):
+        self.meta = SimpleNamespace(client=client)
+
+    def Table(self, name):
+        return LocalTable(self.meta.client, name)
@@ -0,0 +1,373 @@
+"""
+The whole DALScooter backend in one process: every HTTP route's handler and
+the asynchronous consumers wired to their triggers, running against the
+local stand-ins.
+
+``Emulator.call`` builds the event API Gateway would deliver for a route
+(payload format 2.0, or 1.0 where the integration has no
+``payload_format_version``), with the caller's Cognito claims from the JWT
+authorizer, and records the handler's latency and status. ``Emulator.pump``
+delivers what the asynchronous triggers would: DynamoDB stream batches to
+their consumers and SNS notifications to subscribed lambdas.
+"""
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from typing import NamedTuple
+
+from .aws import LocalAWS
+from .events import http_event, http_event_v1, jwt_claims, sns_event, sqs_event
+from .schemas import (
+    ALL_TABLES,
+    BIKE_CATALOG_TABLE,
+    BIKE_INVENTORY_TABLE,
+    BIKE_TELEMETRY_TABLE,
+    BOOKING_SLOTS_TABLE,
+    BOOKINGS_TABLE,
+    COMPLAINT_LOGS_TABLE,
+    COMPLAINT_REPLIES_TABLE,
+    FEEDBACK_BACKFILL_TABLE,
+    FEEDBACK_SUMMARY_TABLE,
+    FEEDBACK_TABLE,
+    FRANCHISE_LOAD_TABLE,
+    NOTIFICATION_OUTBOX_TABLE,
+    create_tables,
+)
+
+USER_POOL_ID = 'us-east-1_local'
+ADMIN_GROUP = 'BikeFranchise'
+CUSTOMER_GROUP = 'Customers'
+BOOKING_TOPIC_ARN = 'arn:aws:sns:us-east-1:000000000000:DALScooterBookingNotifications'
+COMPLAINT_TOPIC_ARN = 'arn:aws:sns:us-east-1:000000000000:ComplaintTopic'
+COMPLAINT_QUEUE_ARN = 'arn:aws:sqs:us-east-1:000000000000:DALScooterComplaintRouting'
+
+
+class Handler(NamedTuple):
+    path: str
+    env: dict
+
+
+class Route(NamedTuple):
+    handler: str
+    auth: bool = True
+    payload: str = '2.0'
+
+
+class StreamTrigger(NamedTuple):
+    table: str
+    handler: str
+    batch_size: int = 100
+    event_names: tuple = ()
+    max_retries: int = 5
+
+
+class QueueSubscription(NamedTuple):
+    """An SNS topic delivered to a lambda through an SQS queue, with raw message delivery"""
+    queue_arn: str
+    handler: str
+    batch_size: int = 10
+    max_receives: int = 5
+
+
+_BOOKING_ENV = {
+    'BOOKINGS_TABLE': BOOKINGS_TABLE['TableName'],
+    'BIKE_INVENTORY_TABLE': BIKE_INVENTORY_TABLE['TableName'],
+    'SLOTS_TABLE': BOOKING_SLOTS_TABLE['TableName'],
+    'OUTBOX_TABLE': NOTIFICATION_OUTBOX_TABLE['TableName'],
+    'CURSOR_SECRET': 'local-cursor-secret',
+}
+
+_FEEDBACK_ENV = {
+    'FEEDBACK_TABLE': FEEDBACK_TABLE['TableName'],
+    'SUMMARY_TABLE': FEEDBACK_SUMMARY_TABLE['TableName'],
+    'CURSOR_SECRET': 'local-cursor-secret',
+}
+
+# Handlers by name, with the environment Terraform gives them. Most read
+# their configuration at import; submit_complaint reads SNS_TOPIC_ARN per
+# call, so it is loaded last and keeps the complaint topic in os.environ.
+HANDLERS = {
+    'bike_crud': Handler('bike-module/lambdas/bike_crud_handler.py', {
+        'DYNAMODB_TABLE': BIKE_INVENTORY_TABLE['TableName'],
+        'CATALOG_TABLE': BIKE_CATALOG_TABLE['TableName'],
+        'TELEMETRY_TABLE': BIKE_TELEMETRY_TABLE['TableName'],
+        'CURSOR_SECRET': 'local-cursor-secret',
+    }),
+    'ingest_telemetry': Handler('bike-module/lambdas/ingest_telemetry_lambda.py', {
+        'DYNAMODB_TABLE': BIKE_INVENTORY_TABLE['TableName'],
+        'TELEMETRY_TABLE': BIKE_TELEMETRY_TABLE['TableName'],
+        'CATALOG_TABLE': BIKE_CATALOG_TABLE['TableName'],
+    }),
+    'get_availability': Handler('booking-module/lambdas/get_availability_lambda.py', _BOOKING_ENV),
+    'create_booking': Handler('booking-module/lambdas/create_booking_lambda.py', _BOOKING_ENV),
+    'get_bookings': Handler('booking-module/lambdas/get_bookings_lambda.py', _BOOKING_ENV),
+    'get_booking_details': Handler('booking-module/lambdas/get_booking_details_lambda.py', _BOOKING_ENV),
+    'update_booking': Handler('booking-module/lambdas/update_booking_lambda.py', _BOOKING_ENV),
+    'cancel_booking': Handler('booking-module/lambdas/cancel_booking_lambda.py', _BOOKING_ENV),
+    'release_slots': Handler('booking-module/lambdas/release_slots_lambda.py', _BOOKING_ENV),
+    'dispatch_notifications': Handler('booking-module/lambdas/dispatch_notifications_lambda.py', {
+        'OUTBOX_TABLE': NOTIFICATION_OUTBOX_TABLE['TableName'],
+        'SNS_TOPIC_ARN': BOOKING_TOPIC_ARN,
+    }),
+    'submit_feedback': Handler('feedback-module/lambdas/submit_feedback_lambda.py', _FEEDBACK_ENV),
+    'get_feedback': Handler('feedback-module/lambdas/get_feedback_lambda.py', {
+        **_FEEDBACK_ENV,
+        'BACKFILL_TABLE': FEEDBACK_BACKFILL_TABLE['TableName'],
+    }),
+    'rebuild_feedback_summary': Handler('feedback-module/lambdas/rebuild_feedback_summary_lambda.py', _FEEDBACK_ENV),
+    'rescore_feedback': Handler('feedback-module/lambdas/rescore_feedback_lambda.py', {
+        'FEEDBACK_TABLE': FEEDBACK_TABLE['TableName'],
+        'BACKFILL_TABLE': FEEDBACK_BACKFILL_TABLE['TableName'],
+    }),
+    'route_complaint': Handler('message-module/lambdas/route_complaint_lambda.py', {
+        'DYNAMODB_TABLE_NAME': COMPLAINT_LOGS_TABLE['TableName'],
+        'FRANCHISE_LOAD_TABLE': FRANCHISE_LOAD_TABLE['TableName'],
+        'USER_POOL_ID': USER_POOL_ID,
+    }),
+    'get_complaints': Handler('message-module/lambdas/get_complaints_lambda.py', {
+        'DYNAMODB_TABLE_NAME': COMPLAINT_LOGS_TABLE['TableName'],
+        'CURSOR_SECRET': 'local-cursor-secret',
+        'USER_POOL_ID': USER_POOL_ID,
+    }),
+    'get_single_complaint': Handler('message-module/lambdas/get_single_complaint_lambda.py', {
+        'DYNAMODB_TABLE_NAME': COMPLAINT_LOGS_TABLE['TableName'],
+        'REPLIES_TABLE': COMPLAINT_REPLIES_TABLE['TableName'],
+        'CURSOR_SECRET': 'local-cursor-secret',
+        'USER_POOL_ID': USER_POOL_ID,
+    }),
+    'reply_complaint': Handler('message-module/lambdas/reply_complaint_lambda.py', {
+        'DYNAMODB_TABLE_NAME': COMPLAINT_LOGS_TABLE['TableName'],
+        'REPLIES_TABLE': COMPLAINT_REPLIES_TABLE['TableName'],
+        'FRANCHISE_LOAD_TABLE': FRANCHISE_LOAD_TABLE['TableName'],
+    }),
+    'submit_complaint': Handler('message-module/lambdas/submit_complaint_lambda.py', {
+        'SNS_TOPIC_ARN': COMPLAINT_TOPIC_ARN,
+    }),
+}
+
+# The API Gateway routes of every module's HTTP API
+ROUTES = {
+    'GET /bikes': Route('bike_crud', auth=False),
+    'POST /bikes': Route('bike_crud'),
+    'POST /bikes:batch': Route('bike_crud'),
+    'GET /bikes/{bikeId}/battery': Route('bike_crud'),
+    'PUT /bikes/{bikeId}': Route('bike_crud'),
+    'DELETE /bikes/{bikeId}': Route('bike_crud'),
+    'GET /availability': Route('get_availability', auth=False),
+    'POST /bookings': Route('create_booking'),
+    'GET /bookings': Route('get_bookings'),
+    'GET /bookings/{bookingId}': Route('get_booking_details'),
+    'PUT /bookings/{bookingId}': Route('update_booking'),
+    'DELETE /bookings/{bookingId}': Route('cancel_booking'),
+    'POST /submit-feedback': Route('submit_feedback', payload='1.0'),
+    'GET /get-feedback': Route('get_feedback', auth=False),
+    'GET /feedback/summary': Route('get_feedback', auth=False),
+    'POST /submit-complaint': Route('submit_complaint'),
+    'GET /complaints': Route('get_complaints'),
+    'GET /complaints/{id}': Route('get_single_complaint'),
+    'POST /complaints/{id}/reply': Route('reply_complaint'),
+}
+
+STREAM_TRIGGERS = (
+    StreamTrigger(BOOKINGS_TABLE['TableName'], 'release_slots'),
+    StreamTrigger(NOTIFICATION_OUTBOX_TABLE['TableName'], 'dispatch_notifications', event_names=('INSERT',)),
+)
+
+# SNS subscriptions with the lambda protocol
+SNS_SUBSCRIPTIONS = {}
+
+# SNS subscriptions with the sqs protocol, each queue feeding a lambda
+QUEUE_SUBSCRIPTIONS = {
+    COMPLAINT_TOPIC_ARN: QueueSubscription(COMPLAINT_QUEUE_ARN, 'route_complaint', batch_size=100),
+}
+
+
+class Caller(NamedTuple):
+    user_id: str
+    email: str
+    groups: tuple
+
+    @property
+    def claims(self):
+        return jwt_claims(self.user_id, self.email, self.groups)
+
+
+class Emulator:
+    """
+    Every handler loaded against one ``LocalAWS``, with per-handler latency
+    and status records.
+    """
+
+    def __init__(self, latency_ms=0.0, aws=None):
+        self.aws = aws or LocalAWS(latency_ms=latency_ms)
+        create_tables(self.aws.dynamodb, ALL_TABLES)
+        for group in (ADMIN_GROUP, CUSTOMER_GROUP):
+            self.aws.cognito_idp.create_group(GroupName=group, UserPoolId=USER_POOL_ID)
+        self.handlers = {
+            name: self.aws.load_handler(handler.path, handler.env)
+            for name, handler in HANDLERS.items()
+        }
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.failures = []
+        self._published = 0
+        self._pending = defaultdict(list)
+        self._queued = defaultdict(list)
+        self._record_lock = threading.Lock()
+        self._pump_lock = threading.Lock()
+
+    def add_user(self, email, admin=False):
+        """
+        A confirmed Cognito user in the customer or franchise group
+        """
+        group = ADMIN_GROUP if admin else CUSTOMER_GROUP
+        user_id = self.aws.cognito_idp.add_user(email, groups=(group,))
+        return Caller(user_id, email, (group,))
+
+    def invoke(self, name, event):
+        """
+        Run handler ``name`` on ``event`` and record it. An exception is
+        recorded as status 'exception' and answered with the 502 API
+        Gateway returns when an integration fails.
+        """
+        started = time.perf_counter()
+        try:
+            response = self.handlers[name].lambda_handler(event, None)
+            status = response.get('statusCode', 200) if isinstance(response, dict) else 200
+        except Exception:
+            response = {'statusCode': 502, 'body': '{"message": "Internal Server Error"}'}
+            status = 'exception'
+            with self._record_lock:
+                self.failures.append((name, traceback.format_exc()))
+        elapsed = time.perf_counter() - started
+        with self._record_lock:
+            self.latencies[name].append(elapsed)
+            self.statuses[name][status] += 1
+        return response
+
+    def call(self, route_key, caller=None, body=None, path_parameters=None, query=None, headers=None):
+        """
+        Invoke the handler behind ``route_key`` (e.g. 'DELETE
+        /bookings/{bookingId}') as API Gateway would; returns its response
+        """
+        route = ROUTES[route_key]
+        if route.auth and caller is None:
+            with self._record_lock:
+                self.statuses[route.handler][401] += 1
+            return {'statusCode': 401, 'body': '{"message": "Unauthorized"}'}
+
+        method, template = route_key.split(' ', 1)
+        path = template.format(**(path_parameters or {}))
+        claims = caller.claims if caller is not None else None
+        if route.payload == '1.0':
+            event = http_event_v1(method, path, body=body, claims=claims, path_parameters=path_parameters,
+                                  query=query, resource=template, headers=headers)
+        else:
+            event = http_event(method, path, body=body, claims=claims, path_parameters=path_parameters,
+                               query=query, route_key=route_key, headers=headers)
+        return self.invoke(route.handler, event)
+
+    def pump(self):
+        """
+        Deliver pending stream records and SNS notifications to their
+        lambdas; returns how many records were delivered
+        """
+        with self._pump_lock:
+            delivered = 0
+            for trigger in STREAM_TRIGGERS:
+                delivered += self._pump_stream(trigger)
+
+            published = self.aws.sns.published
+            new, self._published = published[self._published:], len(published)
+            for message in new:
+                handler = SNS_SUBSCRIPTIONS.get(message['TopicArn'])
+                if handler:
+                    # SNS invokes a subscribed lambda once per message
+                    self.invoke(handler, sns_event([message['Message']], message['TopicArn'], message['Subject']))
+                    delivered += 1
+                if message['TopicArn'] in QUEUE_SUBSCRIPTIONS:
+                    self._queued[message['TopicArn']].append([message, 0])
+            for topic_arn, subscription in QUEUE_SUBSCRIPTIONS.items():
+                delivered += self._pump_queue(self._queued[topic_arn], subscription)
+            return delivered
+
+    def _pump_queue(self, pending, subscription):
+        # Each batch goes to the lambda once per pump; the messages it
+        # reports as failed wait for the next pump, until they have been
+        # received max_receives times and go to the dead-letter queue
+        delivered = 0
+        retry = []
+        while pending:
+            batch = pending[:subscription.batch_size]
+            del pending[:len(batch)]
+            messages = [
+                {'MessageId': message['MessageId'], 'ReceiptHandle': message['MessageId'], 'Body': message['Message']}
+                for message, _ in batch
+            ]
+            response = self.invoke(subscription.handler, sqs_event(messages, subscription.queue_arn)) or {}
+            if response.get('statusCode') == 502:
+                failed = {message['MessageId'] for message, _ in batch}
+            else:
+                failed = {failure['itemIdentifier'] for failure in response.get('batchItemFailures') or []}
+            for entry in batch:
+                if entry[0]['MessageId'] not in failed:
+                    delivered += 1
+                    continue
+                entry[1] += 1
+                if entry[1] >= subscription.max_receives:
+                    with self._record_lock:
+                        self.statuses[subscription.handler]['discarded'] += 1
+                else:
+                    retry.append(entry)
+        pending.extend(retry)
+        return delivered
+
+    def _pump_stream(self, trigger):
+        pending = self._pending[trigger.table]
+        pending.extend(
+            [record, 0] for record in self.aws.dynamodb.drain_stream(trigger.table)['Records']
+            if not trigger.event_names or record['eventName'] in trigger.event_names
+        )
+        delivered = 0
+        while pending:
+            batch = pending[:trigger.batch_size]
+            response = self.invoke(trigger.handler, {'Records': [record for record, _ in batch]}) or {}
+            failures = response.get('batchItemFailures') or []
+            if not failures:
+                del pending[:len(batch)]
+                delivered += len(batch)
+                continue
+            # Lambda retries the batch from the first reported failure
+            failed = failures[0]['itemIdentifier']
+            index = next(i for i, (record, _) in enumerate(batch)
+                         if record['dynamodb']['SequenceNumber'] == failed)
+            del pending[:index]
+            delivered += index
+            pending[0][1] += 1
+            if pending[0][1] > trigger.max_retries:
+                with self._record_lock:
+                    self.statuses[trigger.handler]['discarded'] += 1
+                del pending[0]
+            else:
+                break
+        return delivered
+
+    def reset_stats(self):
+        """
+        Forget recorded calls, e.g. those made while seeding
+        """
+        with self._record_lock:
+            self.latencies.clear()
+            self.statuses.clear()
+            self.failures.clear()
+
+    def stats(self):
+        """
+        Calls and statuses per handler, keyed by handler name
+        """
+        with self._record_lock:
+            return {
+                name: {'latencies': list(self.latencies[name]), 'statuses': Counter(self.statuses[name])}
+                for name in set(self.latencies) | set(self.statuses)
+            }
@@ -0,0 +1,158 @@
+"""
+Builders for the events API Gateway and the other AWS triggers deliver to the
+DALScooter handlers.
+"""
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+
+
+def jwt_claims(user_id, email=None, groups=()):
+    """Claims as the HTTP API JWT authorizer passes them from a Cognito ID token."""
+    claims = {
+        'sub': user_id,
+        'email': email or f'{user_id}@example.com',
+        'email_verified': 'true',
+        'token_use': 'id',
+        'auth_time': str(int(time.time())),
+    }
+    if groups:
+        # The HTTP API authorizer flattens list claims to "[a b]"
+        claims['cognito:groups'] = '[' + ' '.join(groups) + ']'
+    return claims
+
+
+def http_event(method, path, body=None, claims=None, path_parameters=None, query=None,
+               route_key=None, headers=None):
+    """An API Gateway HTTP API (payload format 2.0) proxy event."""
+    now = datetime.now(timezone.utc)
+    event = {
+        'version': '2.0',
+        'routeKey': route_key or f'{method} {path}',
+        'rawPath': path,
+        'rawQueryString': '&'.join(f'{k}={v}' for k, v in (query or {}).items()),
+        'headers': {
+            'content-type': 'application/json',
+            'host': 'local.execute-api.localhost',
+            **(headers or {})
+        },
+        'requestContext': {
+            'accountId': '000000000000',
+            'apiId': 'local',
+            'domainName': 'local.execute-api.localhost',
+            'http': {
+                'method': method,
+                'path': path,
+                'protocol': 'HTTP/1.1',
+                'sourceIp': '127.0.0.1',
+                'userAgent': 'local-harness'
+            },
+            'requestId': str(uuid.uuid4()),
+            'routeKey': route_key or f'{method} {path}',
+            'stage': '$default',
+            'time': now.strftime('%d/%b/%Y:%H:%M:%S +0000'),
+            'timeEpoch': int(now.timestamp() * 1000)
+        },
+        'isBase64Encoded': False
+    }
+    if query:
+        event['queryStringParameters'] = {k: str(v) for k, v in query.items()}
+    if path_parameters:
+        event['pathParameters'] = path_parameters
+    if body is not None:
+        event['body'] = body if isinstance(body, str) else json.dumps(body)
+    if claims is not None:
+        event['requestContext']['authorizer'] = {
+            'jwt': {
+                'claims': claims,
+                'scopes': None
+            }
+        }
+    return event
+
+
+def http_event_v1(method, path, body=None, claims=None, path_parameters=None, query=None,
+                  resource=None, headers=None):
+    """
+    An API Gateway HTTP API proxy event in payload format 1.0, which
+    integrations without ``payload_format_version = "2.0"`` receive. The JWT
+    authorizer's claims sit directly under ``requestContext.authorizer``.
+    """
+    now = datetime.now(timezone.utc)
+    headers = {
+        'content-type': 'application/json',
+        'host': 'local.execute-api.localhost',
+        **(headers or {})
+    }
+    event = {
+        'version': '1.0',
+        'resource': resource or path,
+        'path': path,
+        'httpMethod': method,
+        'headers': headers,
+        'multiValueHeaders': {k: [v] for k, v in headers.items()},
+        'queryStringParameters': {k: str(v) for k, v in query.items()} if query else None,
+        'multiValueQueryStringParameters': {k: [str(v)] for k, v in query.items()} if query else None,
+        'pathParameters': path_parameters,
+        'stageVariables': None,
+        'requestContext': {
+            'accountId': '000000000000',
+            'apiId': 'local',
+            'domainName': 'local.execute-api.localhost',
+            'httpMethod': method,
+            'path': path,
+            'protocol': 'HTTP/1.1',
+            'requestId': str(uuid.uuid4()),
+            'requestTime': now.strftime('%d/%b/%Y:%H:%M:%S +0000'),
+            'requestTimeEpoch': int(now.timestamp() * 1000),
+            'resourcePath': resource or path,
+            'stage': '$default',
+            'identity': {'sourceIp': '127.0.0.1', 'userAgent': 'local-harness'}
+        },
+        'body': None if body is None else (body if isinstance(body, str) else json.dumps(body)),
+        'isBase64Encoded': False
+    }
+    if claims is not None:
+        event['requestContext']['authorizer'] = {'claims': claims, 'scopes': None}
+    return event
+
+
+def sns_event(messages, topic_arn, subject=None):
+    """An SNS notification event delivering ``messages`` (strings) to a subscribed lambda."""
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+    return {'Records': [
+        {
+            'EventSource': 'aws:sns',
+            'EventVersion': '1.0',
+            'EventSubscriptionArn': f'{topic_arn}:{uuid.uuid4()}',
+            'Sns': {
+                'Type': 'Notification',
+                'MessageId': str(uuid.uuid4()),
+                'TopicArn': topic_arn,
+                'Subject': subject,
+                'Message': message,
+                'Timestamp': now,
+                'MessageAttributes': {}
+            }
+        }
+        for message in messages
+    ]}
+
+
+def sqs_event(messages, queue_arn):
+    """An SQS event source mapping batch of received ``messages``."""
+    return {'Records': [
+        {
+            'messageId': message['MessageId'],
+            'receiptHandle': message['ReceiptHandle'],
+            'body': message['Body'],
+            'attributes': message.get('Attributes', {}),
+            'messageAttributes': message.get('MessageAttributes', {}),
+            'md5OfBody': message.get('MD5OfBody'),
+            'eventSource': 'aws:sqs',
+            'eventSourceARN': queue_arn,
+            'awsRegion': 'us-east-1'
+        }
+        for message in messages
+    ]}
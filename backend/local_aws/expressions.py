@@ -0,0 +1,611 @@
+"""
+Parser and evaluator for the DynamoDB expression language.
+
+Covers what the DALScooter handlers use: key conditions, condition and filter
+expressions, update expressions and projection expressions. Expressions are
+parsed once into small tuple trees and cached by their source string, so a
+handler that sends the same expression on every call only pays for the parse
+on the first one.
+"""
+import re
+from decimal import Decimal
+from functools import lru_cache
+
+
+class ExpressionError(ValueError):
+    """Raised for malformed expressions or missing placeholders."""
+
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>\d+)
+      | (?P<name>\#[A-Za-z0-9_]+)
+      | (?P<value>:[A-Za-z0-9_]+)
+      | (?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<op><>|<=|>=|=|<|>|\(|\)|,|\.|\[|\]|\+|-)
+    )""", re.VERBOSE)
+
+_KEYWORDS = {'AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'REMOVE', 'ADD', 'DELETE'}
+_CLAUSES = {'SET', 'REMOVE', 'ADD', 'DELETE'}
+_CONDITION_FUNCTIONS = {'attribute_exists', 'attribute_not_exists', 'attribute_type', 'begins_with', 'contains'}
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos:
+            raise ExpressionError(f"Invalid token in expression at {pos}: {text[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        token = match.group(kind)
+        if kind == 'ident' and token.upper() in _KEYWORDS:
+            kind, token = 'keyword', token.upper()
+        tokens.append((kind, token))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self, offset=0):
+        idx = self.pos + offset
+        return self.tokens[idx] if idx < len(self.tokens) else (None, None)
+
+    def take(self, expected=None):
+        kind, token = self.peek()
+        if kind is None:
+            raise ExpressionError(f"Unexpected end of expression: {self.text!r}")
+        if expected is not None and token != expected:
+            raise ExpressionError(f"Expected {expected!r} but found {token!r} in {self.text!r}")
+        self.pos += 1
+        return kind, token
+
+    def at(self, token):
+        return self.peek()[1] == token
+
+    def done(self):
+        return self.pos >= len(self.tokens)
+
+    # Paths and operands
+
+    def path(self):
+        kind, token = self.take()
+        if kind not in ('name', 'ident'):
+            raise ExpressionError(f"Expected attribute name but found {token!r} in {self.text!r}")
+        elements = [token]
+        while True:
+            if self.at('.'):
+                self.take('.')
+                kind, token = self.take()
+                if kind not in ('name', 'ident'):
+                    raise ExpressionError(f"Expected attribute name after '.' in {self.text!r}")
+                elements.append(token)
+            elif self.at('['):
+                self.take('[')
+                kind, token = self.take()
+                if kind != 'number':
+                    raise ExpressionError(f"Expected list index in {self.text!r}")
+                self.take(']')
+                elements.append(int(token))
+            else:
+                return tuple(elements)
+
+    def operand(self):
+        kind, token = self.peek()
+        if kind == 'value':
+            self.take()
+            return ('value', token)
+        if kind == 'ident' and token == 'size' and self.peek(1)[1] == '(':
+            self.take()
+            self.take('(')
+            path = self.path()
+            self.take(')')
+            return ('size', path)
+        return ('path', self.path())
+
+    # Conditions
+
+    def condition(self):
+        node = self.conjunction()
+        while self.at('OR'):
+            self.take()
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.at('AND'):
+            self.take()
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.at('NOT'):
+            self.take()
+            return ('not', self.negation())
+        return self.predicate()
+
+    def predicate(self):
+        kind, token = self.peek()
+        if token == '(':
+            self.take('(')
+            node = self.condition()
+            self.take(')')
+            return node
+        if kind == 'ident' and token in _CONDITION_FUNCTIONS and self.peek(1)[1] == '(':
+            self.take()
+            self.take('(')
+            args = [self.operand()]
+            while self.at(','):
+                self.take(',')
+                args.append(self.operand())
+            self.take(')')
+            return ('func', token, tuple(args))
+
+        left = self.operand()
+        kind, token = self.peek()
+        if token in ('=', '<>', '<', '<=', '>', '>='):
+            self.take()
+            return ('cmp', token, left, self.operand())
+        if token == 'BETWEEN':
+            self.take()
+            low = self.operand()
+            self.take('AND')
+            return ('between', left, low, self.operand())
+        if token == 'IN':
+            self.take()
+            self.take('(')
+            options = [self.operand()]
+            while self.at(','):
+                self.take(',')
+                options.append(self.operand())
+            self.take(')')
+            return ('in', left, tuple(options))
+        raise ExpressionError(f"Expected a comparison after operand in {self.text!r}")
+
+    # Updates
+
+    def update_value(self):
+        kind, token = self.peek()
+        if kind == 'ident' and token in ('if_not_exists', 'list_append') and self.peek(1)[1] == '(':
+            self.take()
+            self.take('(')
+            first = self.update_value()
+            self.take(',')
+            second = self.update_value()
+            self.take(')')
+            return (token, first, second)
+        return self.operand()
+
+    def set_value(self):
+        node = self.update_value()
+        if self.at('+') or self.at('-'):
+            _, op = self.take()
+            node = ('arith', op, node, self.update_value())
+        return node
+
+    def update(self):
+        actions = []
+        seen = set()
+        while not self.done():
+            kind, clause = self.take()
+            if kind != 'keyword' or clause not in _CLAUSES:
+                raise ExpressionError(f"Expected SET, REMOVE, ADD or DELETE in {self.text!r}")
+            if clause in seen:
+                raise ExpressionError(f"The {clause} clause may only appear once: {self.text!r}")
+            seen.add(clause)
+            while True:
+                path = self.path()
+                if clause == 'SET':
+                    self.take('=')
+                    actions.append(('SET', path, self.set_value()))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', path, None))
+                else:
+                    actions.append((clause, path, self.operand()))
+                if not self.at(','):
+                    break
+                self.take(',')
+        if not actions:
+            raise ExpressionError("Update expression is empty")
+        return tuple(actions)
+
+
+@lru_cache(maxsize=1024)
+def parse_condition(text):
+    parser = _Parser(text)
+    node = parser.condition()
+    if not parser.done():
+        raise ExpressionError(f"Unexpected trailing tokens in {text!r}")
+    return node
+
+
+@lru_cache(maxsize=1024)
+def parse_update(text):
+    return _Parser(text).update()
+
+
+@lru_cache(maxsize=1024)
+def parse_projection(text):
+    parser = _Parser(text)
+    paths = [parser.path()]
+    while parser.at(','):
+        parser.take(',')
+        paths.append(parser.path())
+    if not parser.done():
+        raise ExpressionError(f"Unexpected trailing tokens in {text!r}")
+    return tuple(paths)
+
+
+# Evaluation
+
+def resolve_path(path, names):
+    resolved = []
+    for element in path:
+        if isinstance(element, str) and element.startswith('#'):
+            try:
+                element = names[element]
+            except (KeyError, TypeError):
+                raise ExpressionError(f"An expression attribute name used in the document path is not defined: {element}")
+        resolved.append(element)
+    return tuple(resolved)
+
+
+def get_path(item, path):
+    current = item.get(path[0])
+    for element in path[1:]:
+        if current is None:
+            return None
+        if isinstance(element, int):
+            values = current.get('L')
+            current = values[element] if values is not None and element < len(values) else None
+        else:
+            members = current.get('M')
+            current = members.get(element) if members is not None else None
+    return current
+
+
+def _value(token, values):
+    try:
+        return values[token]
+    except (KeyError, TypeError):
+        raise ExpressionError(f"An expression attribute value used in expression is not defined: {token}")
+
+
+def evaluate_operand(node, item, names, values):
+    kind = node[0]
+    if kind == 'path':
+        return get_path(item, resolve_path(node[1], names))
+    if kind == 'value':
+        return _value(node[1], values)
+    if kind == 'size':
+        target = get_path(item, resolve_path(node[1], names))
+        if target is None:
+            return None
+        (type_key, inner), = target.items()
+        return {'N': str(len(inner))}
+    raise ExpressionError(f"Unsupported operand {node!r}")
+
+
+def _plain(value):
+    """Comparable Python value for a typed attribute value."""
+    (type_key, inner), = value.items()
+    if type_key == 'N':
+        return type_key, Decimal(inner)
+    if type_key in ('SS', 'BS'):
+        return type_key, frozenset(inner)
+    if type_key == 'NS':
+        return type_key, frozenset(Decimal(n) for n in inner)
+    if type_key == 'L':
+        return type_key, tuple(_plain(v) for v in inner)
+    if type_key == 'M':
+        return type_key, tuple(sorted((k, _plain(v)) for k, v in inner.items()))
+    return type_key, inner
+
+
+def values_equal(left, right):
+    if left is None or right is None:
+        return False
+    return _plain(left) == _plain(right)
+
+
+def _ordered(left, right):
+    if left is None or right is None:
+        return None
+    left_type, left_value = _plain(left)
+    right_type, right_value = _plain(right)
+    if left_type != right_type or left_type not in ('S', 'N', 'B'):
+        return None
+    return left_value, right_value
+
+
+def _compare(op, left, right):
+    if op == '=':
+        return values_equal(left, right)
+    if op == '<>':
+        return not values_equal(left, right)
+    pair = _ordered(left, right)
+    if pair is None:
+        return False
+    a, b = pair
+    if op == '<':
+        return a < b
+    if op == '<=':
+        return a <= b
+    if op == '>':
+        return a > b
+    return a >= b
+
+
+def evaluate_condition(node, item, names, values):
+    kind = node[0]
+    if kind == 'and':
+        return evaluate_condition(node[1], item, names, values) and evaluate_condition(node[2], item, names, values)
+    if kind == 'or':
+        return evaluate_condition(node[1], item, names, values) or evaluate_condition(node[2], item, names, values)
+    if kind == 'not':
+        return not evaluate_condition(node[1], item, names, values)
+    if kind == 'cmp':
+        return _compare(
+            node[1],
+            evaluate_operand(node[2], item, names, values),
+            evaluate_operand(node[3], item, names, values)
+        )
+    if kind == 'between':
+        target = evaluate_operand(node[1], item, names, values)
+        return (_compare('>=', target, evaluate_operand(node[2], item, names, values))
+                and _compare('<=', target, evaluate_operand(node[3], item, names, values)))
+    if kind == 'in':
+        target = evaluate_operand(node[1], item, names, values)
+        return any(values_equal(target, evaluate_operand(option, item, names, values)) for option in node[2])
+    if kind == 'func':
+        return _evaluate_function(node[1], node[2], item, names, values)
+    raise ExpressionError(f"Unsupported condition node {node!r}")
+
+
+def _evaluate_function(name, args, item, names, values):
+    if name == 'attribute_exists':
+        return evaluate_operand(args[0], item, names, values) is not None
+    if name == 'attribute_not_exists':
+        return evaluate_operand(args[0], item, names, values) is None
+    target = evaluate_operand(args[0], item, names, values)
+    operand = evaluate_operand(args[1], item, names, values)
+    if target is None or operand is None:
+        return False
+    (target_type, target_value), = target.items()
+    if name == 'attribute_type':
+        return target_type == operand.get('S')
+    if name == 'begins_with':
+        (operand_type, operand_value), = operand.items()
+        return target_type == operand_type and target_type in ('S', 'B') and target_value.startswith(operand_value)
+    if name == 'contains':
+        if target_type == 'S':
+            return 'S' in operand and operand['S'] in target_value
+        if target_type == 'L':
+            return any(values_equal(element, operand) for element in target_value)
+        if target_type in ('SS', 'NS', 'BS'):
+            return _plain(operand)[1] in _plain(target)[1]
+        return False
+    raise ExpressionError(f"Unsupported function {name}")
+
+
+def _evaluate_update_value(node, item, names, values):
+    kind = node[0]
+    if kind == 'if_not_exists':
+        existing = evaluate_operand(node[1], item, names, values)
+        return existing if existing is not None else _evaluate_update_value(node[2], item, names, values)
+    if kind == 'list_append':
+        first = _evaluate_update_value(node[1], item, names, values)
+        second = _evaluate_update_value(node[2], item, names, values)
+        if first is None or second is None or 'L' not in first or 'L' not in second:
+            raise ExpressionError("list_append requires two list operands")
+        return {'L': first['L'] + second['L']}
+    if kind == 'arith':
+        left = _evaluate_update_value(node[2], item, names, values)
+        right = _evaluate_update_value(node[3], item, names, values)
+        if left is None or right is None or 'N' not in left or 'N' not in right:
+            raise ExpressionError("An operand in the update expression has an incorrect data type")
+        result = Decimal(left['N']) + Decimal(right['N']) if node[1] == '+' else Decimal(left['N']) - Decimal(right['N'])
+        return {'N': _format_number(result)}
+    value = evaluate_operand(node, item, names, values)
+    if value is None:
+        raise ExpressionError("The provided expression refers to an attribute that does not exist in the item")
+    return value
+
+
+def _format_number(number):
+    text = format(number.normalize(), 'f')
+    return text if text not in ('-0', '') else '0'
+
+
+def _child(container, element):
+    if isinstance(element, int):
+        return container[element] if element < len(container) else None
+    return container.get(element)
+
+
+def _parent_container(item, path):
+    container = item
+    for idx, element in enumerate(path[:-1]):
+        current = _child(container, element)
+        if current is None:
+            return None
+        container = current.get('L') if isinstance(path[idx + 1], int) else current.get('M')
+        if container is None:
+            return None
+    return container
+
+
+def _set_path(item, path, value):
+    container = _parent_container(item, path)
+    if container is None:
+        raise ExpressionError("The document path provided in the update expression is invalid for update")
+    last = path[-1]
+    if isinstance(last, int):
+        if last < len(container):
+            container[last] = value
+        else:
+            container.append(value)
+    else:
+        container[last] = value
+
+
+def _remove_path(item, path):
+    container = _parent_container(item, path)
+    if container is None:
+        return
+    last = path[-1]
+    if isinstance(last, int):
+        if last < len(container):
+            del container[last]
+    else:
+        container.pop(last, None)
+
+
+def apply_update(expression, item, names, values):
+    """
+    Apply an update expression to ``item`` in place and return the set of
+    top-level attribute names it touched. Right-hand sides are evaluated
+    against the item as it was before the update, as DynamoDB does.
+    """
+    actions = parse_update(expression)
+    original = item.copy()
+    planned = []
+    for action, path, operand in actions:
+        resolved = resolve_path(path, names)
+        if action == 'SET':
+            planned.append((action, resolved, _evaluate_update_value(operand, original, names, values)))
+        elif action == 'REMOVE':
+            planned.append((action, resolved, None))
+        else:
+            planned.append((action, resolved, evaluate_operand(operand, original, names, values)))
+
+    touched = set()
+    for action, path, value in planned:
+        touched.add(path[0])
+        if action == 'SET':
+            _set_path(item, path, value)
+        elif action == 'REMOVE':
+            _remove_path(item, path)
+        elif action == 'ADD':
+            existing = get_path(item, path)
+            _set_path(item, path, _add(existing, value))
+        elif action == 'DELETE':
+            existing = get_path(item, path)
+            remaining = _subtract(existing, value)
+            if remaining is None:
+                _remove_path(item, path)
+            else:
+                _set_path(item, path, remaining)
+    return touched
+
+
+def _add(existing, value):
+    (value_type, inner), = value.items()
+    if value_type == 'N':
+        if existing is None:
+            return {'N': inner}
+        if 'N' not in existing:
+            raise ExpressionError("An operand in the update expression has an incorrect data type")
+        return {'N': _format_number(Decimal(existing['N']) + Decimal(inner))}
+    if value_type in ('SS', 'NS', 'BS'):
+        if existing is None:
+            return {value_type: list(dict.fromkeys(inner))}
+        if value_type not in existing:
+            raise ExpressionError("An operand in the update expression has an incorrect data type")
+        return {value_type: list(dict.fromkeys(existing[value_type] + inner))}
+    raise ExpressionError("ADD only supports numbers and sets")
+
+
+def _subtract(existing, value):
+    if existing is None:
+        return None
+    (value_type, inner), = value.items()
+    if value_type not in existing:
+        raise ExpressionError("An operand in the update expression has an incorrect data type")
+    remaining = [member for member in existing[value_type] if member not in set(inner)]
+    return {value_type: remaining} if remaining else None
+
+
+def project(item, expression, names):
+    """Keep only the top-level attributes named in a projection expression."""
+    projected = {}
+    for path in parse_projection(expression):
+        name = resolve_path(path, names)[0]
+        if name in item:
+            projected[name] = item[name]
+    return projected
+
+
+def key_condition_parts(node, names, hash_key):
+    """
+    Split a key condition into the partition key value operand and an
+    optional sort key predicate: returns ``(hash_operand, range_node)``.
+    """
+    predicates = []
+
+    def flatten(current):
+        if current[0] == 'and':
+            flatten(current[1])
+            flatten(current[2])
+        else:
+            predicates.append(current)
+
+    flatten(node)
+    hash_operand = None
+    range_node = None
+    for predicate in predicates:
+        if predicate[0] == 'cmp' and predicate[1] == '=' and hash_operand is None:
+            left, right = predicate[2], predicate[3]
+            if left[0] == 'value':
+                left, right = right, left
+            if left[0] == 'path' and right[0] == 'value' and resolve_path(left[1], names)[0] == hash_key:
+                hash_operand = right
+                continue
+        if range_node is not None:
+            raise ExpressionError("Query key condition not supported")
+        range_node = predicate
+    if hash_operand is None:
+        raise ExpressionError("Query condition missed key schema element")
+    return hash_operand, range_node
+
+
+def range_bounds(range_node, names, values):
+    """
+    Inclusive (low, high) bounds on the sort key implied by a key condition
+    predicate, as plain Python values. Either bound may be None.
+    """
+    if range_node is None:
+        return None, None, None
+    kind = range_node[0]
+    if kind == 'between':
+        name = resolve_path(range_node[1][1], names)[0]
+        return name, _plain(_value(range_node[2][1], values))[1], _plain(_value(range_node[3][1], values))[1]
+    if kind == 'func' and range_node[1] == 'begins_with':
+        name = resolve_path(range_node[2][0][1], names)[0]
+        prefix = _plain(_value(range_node[2][1][1], values))[1]
+        return name, prefix, prefix + ('\U0010ffff' if isinstance(prefix, str) else b'\xff')
+    if kind == 'cmp':
+        op, left, right = range_node[1], range_node[2], range_node[3]
+        if left[0] == 'value':
+            left, right = right, left
+            op = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}.get(op, op)
+        name = resolve_path(left[1], names)[0]
+        bound = _plain(_value(right[1], values))[1]
+        if op == '=':
+            return name, bound, bound
+        if op in ('<', '<='):
+            return name, None, bound
+        return name, bound, None
+    raise ExpressionError("Query key condition not supported")
+
+
+def plain_key_value(value):
+    """Sortable Python value for a key attribute."""
+    return _plain(value)[1]
@@ -0,0 +1,81 @@
+"""
+Directory-backed stand-in for S3. Each bucket is a directory under ``root``
+and each object a file at its key, so exports written through it can be
+inspected with ordinary tools.
+"""
+import hashlib
+import io
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+exceptions = SimpleNamespace(ClientError=ClientError, **{
+    code: type(code, (ClientError,), {})
+    for code in ('NoSuchKey', 'NoSuchBucket')
+})
+
+
+def _error(code, message, operation):
+    return getattr(exceptions, code)({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+class LocalS3:
+    """Directory-backed stand-in for ``boto3.client('s3')``."""
+
+    exceptions = exceptions
+
+    def __init__(self, latency_ms=0.0, root=None):
+        self.latency = latency_ms / 1000.0
+        self.root = Path(root) if root else Path(tempfile.mkdtemp(prefix='local-s3-'))
+        self.metrics = Counter()
+        self._lock = threading.Lock()
+
+    def _call(self, operation):
+        with self._lock:
+            self.metrics[f'calls.{operation}'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _path(self, bucket, key):
+        return self.root / bucket / key
+
+    def put_object(self, Bucket, Key, Body=b'', ContentType=None, ContentEncoding=None, **kwargs):
+        self._call('PutObject')
+        if isinstance(Body, str):
+            Body = Body.encode('utf-8')
+        elif not isinstance(Body, (bytes, bytearray)):
+            Body = Body.read()
+        path = self._path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(Body)
+        with self._lock:
+            self.metrics['bytes_written'] += len(Body)
+        return {'ETag': f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._call('GetObject')
+        path = self._path(Bucket, Key)
+        if not path.is_file():
+            raise _error('NoSuchKey', 'The specified key does not exist.', 'GetObject')
+        body = path.read_bytes()
+        return {
+            'Body': io.BytesIO(body),
+            'ContentLength': len(body),
+            'ETag': f'"{hashlib.md5(body).hexdigest()}"'
+        }
+
+    def list_objects_v2(self, Bucket, Prefix='', **kwargs):
+        self._call('ListObjectsV2')
+        bucket = self.root / Bucket
+        contents = []
+        if bucket.is_dir():
+            for path in sorted(bucket.rglob('*')):
+                key = path.relative_to(bucket).as_posix()
+                if path.is_file() and key.startswith(Prefix):
+                    contents.append({'Key': key, 'Size': path.stat().st_size})
+        return {'Contents': contents, 'KeyCount': len(contents), 'IsTruncated': False}
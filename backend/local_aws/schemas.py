@@ -0,0 +1,271 @@
+"""
+Table definitions for the local DynamoDB stand-in, mirroring the tables the
+Terraform modules create. Keep these in sync with the ``aws_dynamodb_table``
+resources when a key schema or index changes.
+"""
+
+BOOKINGS_TABLE = {
+    'TableName': 'DALScooterBookings',
+    'KeySchema': [
+        {'AttributeName': 'bookingId', 'KeyType': 'HASH'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'bookingId', 'AttributeType': 'S'},
+        {'AttributeName': 'userId', 'AttributeType': 'S'},
+        {'AttributeName': 'bikeId', 'AttributeType': 'S'},
+        {'AttributeName': 'bookingDate', 'AttributeType': 'S'}
+    ],
+    'GlobalSecondaryIndexes': [
+        {
+            'IndexName': 'UserBookingsIndex',
+            'KeySchema': [
+                {'AttributeName': 'userId', 'KeyType': 'HASH'},
+                {'AttributeName': 'bookingDate', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'}
+        },
+        {
+            'IndexName': 'BikeBookingsIndex',
+            'KeySchema': [
+                {'AttributeName': 'bikeId', 'KeyType': 'HASH'},
+                {'AttributeName': 'bookingDate', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'}
+        }
+    ],
+    'StreamSpecification': {
+        'StreamEnabled': True,
+        'StreamViewType': 'NEW_AND_OLD_IMAGES'
+    },
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+BOOKING_SLOTS_TABLE = {
+    'TableName': 'DALScooterBookingSlots',
+    'KeySchema': [
+        {'AttributeName': 'slotId', 'KeyType': 'HASH'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'slotId', 'AttributeType': 'S'},
+        {'AttributeName': 'slotStart', 'AttributeType': 'S'},
+        {'AttributeName': 'bikeId', 'AttributeType': 'S'}
+    ],
+    'GlobalSecondaryIndexes': [
+        {
+            'IndexName': 'SlotHourIndex',
+            'KeySchema': [
+                {'AttributeName': 'slotStart', 'KeyType': 'HASH'},
+                {'AttributeName': 'bikeId', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'KEYS_ONLY'}
+        }
+    ],
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+NOTIFICATION_OUTBOX_TABLE = {
+    'TableName': 'DALScooterNotificationOutbox',
+    'KeySchema': [
+        {'AttributeName': 'notificationId', 'KeyType': 'HASH'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'notificationId', 'AttributeType': 'S'}
+    ],
+    'StreamSpecification': {
+        'StreamEnabled': True,
+        'StreamViewType': 'NEW_IMAGE'
+    },
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+BIKE_INVENTORY_TABLE = {
+    'TableName': 'BikeInventoryTable',
+    'KeySchema': [
+        {'AttributeName': 'bikeId', 'KeyType': 'HASH'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'bikeId', 'AttributeType': 'S'},
+        {'AttributeName': 'type', 'AttributeType': 'S'},
+        {'AttributeName': 'hourlyRate', 'AttributeType': 'N'}
+    ],
+    'GlobalSecondaryIndexes': [
+        {
+            'IndexName': 'TypeRateIndex',
+            'KeySchema': [
+                {'AttributeName': 'type', 'KeyType': 'HASH'},
+                {'AttributeName': 'hourlyRate', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {
+                'ProjectionType': 'INCLUDE',
+                'NonKeyAttributes': ['model', 'batteryLife', 'discount', 'createdBy', 'createdAt']
+            }
+        }
+    ],
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+BIKE_CATALOG_TABLE = {
+    'TableName': 'BikeCatalogMeta',
+    'KeySchema': [
+        {'AttributeName': 'catalogId', 'KeyType': 'HASH'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'catalogId', 'AttributeType': 'S'}
+    ],
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+BIKE_TELEMETRY_TABLE = {
+    'TableName': 'BikeTelemetry',
+    'KeySchema': [
+        {'AttributeName': 'bikeId', 'KeyType': 'HASH'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'bikeId', 'AttributeType': 'S'}
+    ],
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+FEEDBACK_TABLE = {
+    'TableName': 'FeedbackTable',
+    'KeySchema': [
+        {'AttributeName': 'feedbackId', 'KeyType': 'HASH'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'feedbackId', 'AttributeType': 'S'},
+        {'AttributeName': 'model', 'AttributeType': 'S'},
+        {'AttributeName': 'feedbackMonth', 'AttributeType': 'S'},
+        {'AttributeName': 'timestamp', 'AttributeType': 'S'}
+    ],
+    'GlobalSecondaryIndexes': [
+        {
+            'IndexName': 'ModelTimeIndex',
+            'KeySchema': [
+                {'AttributeName': 'model', 'KeyType': 'HASH'},
+                {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'}
+        },
+        {
+            'IndexName': 'MonthTimeIndex',
+            'KeySchema': [
+                {'AttributeName': 'feedbackMonth', 'KeyType': 'HASH'},
+                {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'}
+        }
+    ],
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+FEEDBACK_SUMMARY_TABLE = {
+    'TableName': 'FeedbackSummaryTable',
+    'KeySchema': [
+        {'AttributeName': 'summaryKey', 'KeyType': 'HASH'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'summaryKey', 'AttributeType': 'S'}
+    ],
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+FEEDBACK_BACKFILL_TABLE = {
+    'TableName': 'FeedbackBackfillCheckpoints',
+    'KeySchema': [
+        {'AttributeName': 'runId', 'KeyType': 'HASH'},
+        {'AttributeName': 'segment', 'KeyType': 'RANGE'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'runId', 'AttributeType': 'S'},
+        {'AttributeName': 'segment', 'AttributeType': 'N'}
+    ],
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+COMPLAINT_LOGS_TABLE = {
+    'TableName': 'ComplaintLogs',
+    'KeySchema': [
+        {'AttributeName': 'messageId', 'KeyType': 'HASH'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'messageId', 'AttributeType': 'S'},
+        {'AttributeName': 'userId', 'AttributeType': 'S'},
+        {'AttributeName': 'assignedFranchiseId', 'AttributeType': 'S'},
+        {'AttributeName': 'timestampUTC', 'AttributeType': 'S'}
+    ],
+    'GlobalSecondaryIndexes': [
+        {
+            'IndexName': 'UserComplaintsIndex',
+            'KeySchema': [
+                {'AttributeName': 'userId', 'KeyType': 'HASH'},
+                {'AttributeName': 'timestampUTC', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'}
+        },
+        {
+            'IndexName': 'FranchiseComplaintsIndex',
+            'KeySchema': [
+                {'AttributeName': 'assignedFranchiseId', 'KeyType': 'HASH'},
+                {'AttributeName': 'timestampUTC', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'}
+        }
+    ],
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+COMPLAINT_REPLIES_TABLE = {
+    'TableName': 'ComplaintReplies',
+    'KeySchema': [
+        {'AttributeName': 'messageId', 'KeyType': 'HASH'},
+        {'AttributeName': 'replyKey', 'KeyType': 'RANGE'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'messageId', 'AttributeType': 'S'},
+        {'AttributeName': 'replyKey', 'AttributeType': 'S'}
+    ],
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+FRANCHISE_LOAD_TABLE = {
+    'TableName': 'FranchiseComplaintLoad',
+    'KeySchema': [
+        {'AttributeName': 'franchiseId', 'KeyType': 'HASH'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'franchiseId', 'AttributeType': 'S'}
+    ],
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+USERS_TABLE = {
+    'TableName': 'DALScooterUsers',
+    'KeySchema': [
+        {'AttributeName': 'userId', 'KeyType': 'HASH'}
+    ],
+    'AttributeDefinitions': [
+        {'AttributeName': 'userId', 'AttributeType': 'S'}
+    ],
+    'BillingMode': 'PAY_PER_REQUEST'
+}
+
+ALL_TABLES = (
+    BOOKINGS_TABLE,
+    BOOKING_SLOTS_TABLE,
+    NOTIFICATION_OUTBOX_TABLE,
+    BIKE_INVENTORY_TABLE,
+    BIKE_CATALOG_TABLE,
+    BIKE_TELEMETRY_TABLE,
+    FEEDBACK_TABLE,
+    FEEDBACK_SUMMARY_TABLE,
+    FEEDBACK_BACKFILL_TABLE,
+    COMPLAINT_LOGS_TABLE,
+    COMPLAINT_REPLIES_TABLE,
+    FRANCHISE_LOAD_TABLE,
+    USERS_TABLE,
+)
+
+
+def create_tables(client, definitions=ALL_TABLES):
+    for definition in definitions:
+        client.create_table(**definition)
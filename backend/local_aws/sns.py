@@ -0,0 +1,106 @@
+"""
+In-memory stand-in for SNS. Published messages are recorded on the instance
+so harnesses and benchmarks can inspect what a handler sent.
+"""
+import threading
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+exceptions = SimpleNamespace(ClientError=ClientError, **{
+    code: type(code, (ClientError,), {})
+    for code in ('NotFoundException', 'InvalidParameterException', 'ThrottledException',
+                 'TooManyEntriesInBatchRequestException', 'BatchEntryIdsNotDistinctException')
+})
+
+# Entries per PublishBatch call
+MAX_PUBLISH_BATCH = 10
+
+
+def _error(code, message, operation):
+    return getattr(exceptions, code)({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+class LocalSNS:
+    """In-memory stand-in for ``boto3.client('sns')``."""
+
+    exceptions = exceptions
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+        self.published = []
+        self.subscriptions = []
+        self.metrics = Counter()
+        self._lock = threading.Lock()
+        self._failure = None
+
+    def _call(self, operation):
+        with self._lock:
+            self.metrics[f'calls.{operation}'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def set_failure(self, predicate):
+        """
+        Fail messages for which ``predicate(operation, message)`` is true:
+        ``Publish`` raises ``ThrottledException`` and ``PublishBatch``
+        reports the entry under ``Failed``. ``None`` clears it.
+        """
+        self._failure = predicate
+
+    def _fails(self, operation, message):
+        if self._failure and self._failure(operation, message):
+            with self._lock:
+                self.metrics['failed'] += 1
+            return True
+        return False
+
+    def _record(self, topic_arn, message, subject, attributes):
+        message_id = str(uuid.uuid4())
+        with self._lock:
+            self.published.append({
+                'MessageId': message_id,
+                'TopicArn': topic_arn,
+                'Subject': subject,
+                'Message': message,
+                'MessageAttributes': attributes or {}
+            })
+        return message_id
+
+    def publish(self, TopicArn=None, Message=None, Subject=None, MessageAttributes=None, **kwargs):
+        self._call('Publish')
+        if self._fails('Publish', Message):
+            raise _error('ThrottledException', 'Rate exceeded', 'Publish')
+        return {'MessageId': self._record(TopicArn, Message, Subject, MessageAttributes)}
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        self._call('PublishBatch')
+        if len(PublishBatchRequestEntries) > MAX_PUBLISH_BATCH:
+            raise _error('TooManyEntriesInBatchRequestException',
+                         'The batch request contains more entries than permissible', 'PublishBatch')
+        if len({entry['Id'] for entry in PublishBatchRequestEntries}) != len(PublishBatchRequestEntries):
+            raise _error('BatchEntryIdsNotDistinctException',
+                         'Two or more batch entries in the request have the same Id', 'PublishBatch')
+        successful, failed = [], []
+        for entry in PublishBatchRequestEntries:
+            if self._fails('PublishBatch', entry['Message']):
+                failed.append({'Id': entry['Id'], 'Code': 'Throttled', 'Message': 'Rate exceeded', 'SenderFault': False})
+                continue
+            message_id = self._record(TopicArn, entry['Message'], entry.get('Subject'), entry.get('MessageAttributes'))
+            successful.append({'Id': entry['Id'], 'MessageId': message_id})
+        return {'Successful': successful, 'Failed': failed}
+
+    def subscribe(self, TopicArn, Protocol, Endpoint=None, ReturnSubscriptionArn=False, **kwargs):
+        self._call('Subscribe')
+        arn = f'{TopicArn}:{uuid.uuid4()}'
+        with self._lock:
+            self.subscriptions.append({
+                'SubscriptionArn': arn,
+                'TopicArn': TopicArn,
+                'Protocol': Protocol,
+                'Endpoint': Endpoint
+            })
+        return {'SubscriptionArn': arn}
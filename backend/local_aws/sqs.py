@@ -0,0 +1,219 @@
+"""
+In-memory stand-in for SQS. Queues are FIFO lists of messages with the
+service's visibility timeout semantics: a received message stays in the
+queue, invisible, until it is deleted or its timeout runs out.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+exceptions = SimpleNamespace(ClientError=ClientError, **{
+    code: type(code, (ClientError,), {})
+    for code in ('QueueDoesNotExist', 'QueueNameExists', 'ReceiptHandleIsInvalid',
+                 'TooManyEntriesInBatchRequest', 'BatchEntryIdsNotDistinct',
+                 'EmptyBatchRequest', 'InvalidParameterValue')
+})
+
+# Entries per SendMessageBatch/DeleteMessageBatch call, and messages per
+# ReceiveMessage call
+MAX_BATCH = 10
+
+DEFAULT_VISIBILITY_TIMEOUT = 30
+
+QUEUE_URL_PREFIX = 'https://sqs.us-east-1.amazonaws.com/000000000000/'
+
+
+def _error(code, message, operation):
+    return getattr(exceptions, code)({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+class _Queue:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.url = QUEUE_URL_PREFIX + name
+        self.attributes = dict(attributes or {})
+        self.visibility_timeout = int(self.attributes.get('VisibilityTimeout', DEFAULT_VISIBILITY_TIMEOUT))
+        self.messages = []
+
+
+class LocalSQS:
+    """In-memory stand-in for ``boto3.client('sqs')``."""
+
+    exceptions = exceptions
+
+    def __init__(self, latency_ms=0.0, clock=time.monotonic):
+        self.latency = latency_ms / 1000.0
+        self.clock = clock
+        self.metrics = Counter()
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def _call(self, operation):
+        with self._lock:
+            self.metrics[f'calls.{operation}'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _queue(self, url, operation):
+        try:
+            return self._queues[url]
+        except KeyError:
+            raise _error('QueueDoesNotExist', 'The specified queue does not exist.', operation)
+
+    def create_queue(self, QueueName, Attributes=None, **kwargs):
+        self._call('CreateQueue')
+        with self._lock:
+            url = QUEUE_URL_PREFIX + QueueName
+            if url not in self._queues:
+                self._queues[url] = _Queue(QueueName, Attributes)
+        return {'QueueUrl': url}
+
+    def get_queue_url(self, QueueName, **kwargs):
+        self._call('GetQueueUrl')
+        url = QUEUE_URL_PREFIX + QueueName
+        self._queue(url, 'GetQueueUrl')
+        return {'QueueUrl': url}
+
+    def get_queue_attributes(self, QueueUrl, AttributeNames=None):
+        self._call('GetQueueAttributes')
+        with self._lock:
+            queue = self._queue(QueueUrl, 'GetQueueAttributes')
+            now = self.clock()
+            visible = sum(1 for message in queue.messages if message['visibleAt'] <= now)
+            attributes = dict(queue.attributes)
+            attributes.update({
+                'ApproximateNumberOfMessages': str(visible),
+                'ApproximateNumberOfMessagesNotVisible': str(len(queue.messages) - visible),
+                'VisibilityTimeout': str(queue.visibility_timeout),
+            })
+        return {'Attributes': attributes}
+
+    def _enqueue(self, queue, body, delay, attributes):
+        message_id = str(uuid.uuid4())
+        queue.messages.append({
+            'MessageId': message_id,
+            'Body': body,
+            'MD5OfBody': hashlib.md5(body.encode('utf-8')).hexdigest(),
+            'MessageAttributes': attributes or {},
+            'SentTimestamp': str(int(time.time() * 1000)),
+            'visibleAt': self.clock() + (delay or 0),
+            'receiveCount': 0,
+            'receiptHandle': None,
+        })
+        return message_id
+
+    def send_message(self, QueueUrl, MessageBody, DelaySeconds=0, MessageAttributes=None, **kwargs):
+        self._call('SendMessage')
+        with self._lock:
+            queue = self._queue(QueueUrl, 'SendMessage')
+            message_id = self._enqueue(queue, MessageBody, DelaySeconds, MessageAttributes)
+        return {
+            'MessageId': message_id,
+            'MD5OfMessageBody': hashlib.md5(MessageBody.encode('utf-8')).hexdigest()
+        }
+
+    def _check_batch(self, entries, operation):
+        if not entries:
+            raise _error('EmptyBatchRequest', 'There should be at least one entry in the request.', operation)
+        if len(entries) > MAX_BATCH:
+            raise _error('TooManyEntriesInBatchRequest',
+                         f'Maximum number of entries per request are {MAX_BATCH}.', operation)
+        if len({entry['Id'] for entry in entries}) != len(entries):
+            raise _error('BatchEntryIdsNotDistinct', 'Id must be distinct among batch entries.', operation)
+
+    def send_message_batch(self, QueueUrl, Entries):
+        self._call('SendMessageBatch')
+        self._check_batch(Entries, 'SendMessageBatch')
+        successful = []
+        with self._lock:
+            queue = self._queue(QueueUrl, 'SendMessageBatch')
+            for entry in Entries:
+                message_id = self._enqueue(queue, entry['MessageBody'], entry.get('DelaySeconds'),
+                                           entry.get('MessageAttributes'))
+                successful.append({'Id': entry['Id'], 'MessageId': message_id})
+        return {'Successful': successful, 'Failed': []}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, VisibilityTimeout=None,
+                        WaitTimeSeconds=0, AttributeNames=None, MessageAttributeNames=None, **kwargs):
+        self._call('ReceiveMessage')
+        if not 1 <= MaxNumberOfMessages <= MAX_BATCH:
+            raise _error('InvalidParameterValue',
+                         f'Value {MaxNumberOfMessages} for parameter MaxNumberOfMessages is invalid.',
+                         'ReceiveMessage')
+        received = []
+        with self._lock:
+            queue = self._queue(QueueUrl, 'ReceiveMessage')
+            timeout = queue.visibility_timeout if VisibilityTimeout is None else VisibilityTimeout
+            now = self.clock()
+            for message in queue.messages:
+                if len(received) == MaxNumberOfMessages:
+                    break
+                if message['visibleAt'] > now:
+                    continue
+                message['visibleAt'] = now + timeout
+                message['receiveCount'] += 1
+                message['receiptHandle'] = str(uuid.uuid4())
+                received.append({
+                    'MessageId': message['MessageId'],
+                    'ReceiptHandle': message['receiptHandle'],
+                    'MD5OfBody': message['MD5OfBody'],
+                    'Body': message['Body'],
+                    'Attributes': {
+                        'ApproximateReceiveCount': str(message['receiveCount']),
+                        'SentTimestamp': message['SentTimestamp'],
+                    },
+                    'MessageAttributes': message['MessageAttributes'],
+                })
+        return {'Messages': received} if received else {}
+
+    def _delete(self, queue, receipt_handle):
+        for i, message in enumerate(queue.messages):
+            if message['receiptHandle'] == receipt_handle:
+                del queue.messages[i]
+                return True
+        return False
+
+    def delete_message(self, QueueUrl, ReceiptHandle):
+        self._call('DeleteMessage')
+        with self._lock:
+            queue = self._queue(QueueUrl, 'DeleteMessage')
+            if not self._delete(queue, ReceiptHandle):
+                raise _error('ReceiptHandleIsInvalid', f'The input receipt handle "{ReceiptHandle}" is not valid.',
+                             'DeleteMessage')
+        return {}
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        self._call('DeleteMessageBatch')
+        self._check_batch(Entries, 'DeleteMessageBatch')
+        successful, failed = [], []
+        with self._lock:
+            queue = self._queue(QueueUrl, 'DeleteMessageBatch')
+            for entry in Entries:
+                if self._delete(queue, entry['ReceiptHandle']):
+                    successful.append({'Id': entry['Id']})
+                else:
+                    failed.append({'Id': entry['Id'], 'Code': 'ReceiptHandleIsInvalid',
+                                   'Message': 'The input receipt handle is not valid.', 'SenderFault': True})
+        return {'Successful': successful, 'Failed': failed}
+
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout):
+        self._call('ChangeMessageVisibility')
+        with self._lock:
+            queue = self._queue(QueueUrl, 'ChangeMessageVisibility')
+            for message in queue.messages:
+                if message['receiptHandle'] == ReceiptHandle:
+                    message['visibleAt'] = self.clock() + VisibilityTimeout
+                    return {}
+        raise _error('ReceiptHandleIsInvalid', f'The input receipt handle "{ReceiptHandle}" is not valid.',
+                     'ChangeMessageVisibility')
+
+    def purge_queue(self, QueueUrl):
+        self._call('PurgeQueue')
+        with self._lock:
+            self._queue(QueueUrl, 'PurgeQueue').messages.clear()
+        return {}
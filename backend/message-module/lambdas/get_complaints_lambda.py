@@ -1,14 +1,32 @@
 import json
 import os
-import boto3
 import logging
 from boto3.dynamodb.conditions import Key, Attr
+from dalscooter_runtime import clients
+from dalscooter_runtime.cursors import InvalidCursor, decode_cursor, encode_cursor
+from dalscooter_runtime.user_emails import EmailCache
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(os.environ["DYNAMODB_TABLE_NAME"])
+table = clients.table(os.environ["DYNAMODB_TABLE_NAME"])
+cursor_secret = os.environ["CURSOR_SECRET"]
+user_emails = EmailCache(clients.client("cognito-idp"), os.environ["USER_POOL_ID"])
+
+# A customer's complaints, and a franchise's inbox, newest timestampUTC first
+USER_INDEX = ("UserComplaintsIndex", "userId")
+FRANCHISE_INDEX = ("FranchiseComplaintsIndex", "assignedFranchiseId")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+# Smallest Limit sent to DynamoDB while filling a page, so a selective
+# status filter does not turn into many tiny reads
+MIN_READ_SIZE = 25
+
+# Most complaints a single request may evaluate before returning a short
+# page with a cursor instead of reading on
+READ_BUDGET = int(os.environ.get("READ_BUDGET", "500"))
 
 def lambda_handler(event, context):
     logger.info("Incoming event: %s", json.dumps(event))
@@ -18,25 +36,54 @@ def lambda_handler(event, context):
         user_id = claims["sub"]
         query_params = event.get("queryStringParameters", {}) or {}
         role = query_params.get("role", "user").lower()
+        status = query_params.get("status")
 
         logger.info("Caller role: %s | Cognito sub: %s", role, user_id)
 
-        # Filter by assignedFranchiseId if role is franchise
-        if role == "franchise":
-            filter_expr = Attr("assignedFranchiseId").eq(user_id)
-        else:
-            filter_expr = Attr("userId").eq(user_id)
-
-        # Scan with filter (assuming PAY_PER_REQUEST, no GSI needed)
-        response = table.scan(
-            FilterExpression=filter_expr
-        )
-        items = response.get("Items", [])
+        try:
+            limit = min(max(int(query_params.get("limit", DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"error": "limit must be a number"})
+            }
+        paged = "limit" in query_params or "cursor" in query_params
+        if not paged:
+            # Callers that predate pagination get the newest page as a bare list
+            limit = MAX_PAGE_SIZE
+
+        # Franchises read the complaints assigned to them, everyone else
+        # the complaints they raised
+        index_name, partition = FRANCHISE_INDEX if role == "franchise" else USER_INDEX
+        cursor_scope = {"index": index_name, "user": user_id, "status": status}
+        start_key = None
+        if query_params.get("cursor"):
+            try:
+                start_key = decode_cursor(query_params["cursor"], cursor_scope, cursor_secret)
+            except InvalidCursor as e:
+                logger.warning("Rejected pagination cursor: %s", str(e))
+                return {
+                    "statusCode": 400,
+                    "body": json.dumps({"error": "Invalid pagination cursor"})
+                }
+
+        items, next_key = complaint_page(index_name, partition, user_id, status, limit, start_key)
         logger.info("Fetched %d complaint(s)", len(items))
+        if role == "franchise":
+            add_user_emails(items)
 
+        if not paged:
+            return {
+                "statusCode": 200,
+                "body": json.dumps(items)
+            }
         return {
             "statusCode": 200,
-            "body": json.dumps(items)
+            "body": json.dumps({
+                "complaints": items,
+                "count": len(items),
+                "nextCursor": encode_cursor(next_key, cursor_scope, cursor_secret) if next_key else None
+            })
         }
 
     except Exception as e:
@@ -44,4 +91,62 @@ def lambda_handler(event, context):
         return {
             "statusCode": 500,
             "body": json.dumps({"error": "Internal Server Error"})
-        }
\ No newline at end of file
+        }
+
+def complaint_page(index_name, partition, user_id, status, limit, start_key):
+    """
+    One page of the caller's partition of ``index_name``, newest first, and
+    the key to continue after. Reads on until the page holds ``limit``
+    complaints matching ``status``, the partition ends or READ_BUDGET
+    complaints have been evaluated, since the filter applies after Limit.
+    """
+    params = {
+        "IndexName": index_name,
+        "KeyConditionExpression": Key(partition).eq(user_id),
+        "ScanIndexForward": False
+    }
+    if status:
+        params["FilterExpression"] = Attr("status").eq(status)
+    if start_key:
+        params["ExclusiveStartKey"] = start_key
+
+    items = []
+    evaluated = 0
+    while True:
+        params["Limit"] = max(limit - len(items), MIN_READ_SIZE) if status else limit - len(items)
+        response = table.query(**params)
+        evaluated += response.get("ScannedCount", 0)
+        page_items = response.get("Items", [])
+        next_key = response.get("LastEvaluatedKey")
+
+        if len(items) + len(page_items) >= limit:
+            overflow = len(items) + len(page_items) > limit
+            items.extend(page_items[:limit - len(items)])
+            if overflow:
+                # Resume right after the last complaint returned
+                next_key = {name: items[-1][name] for name in ("messageId", partition, "timestampUTC")}
+            return items, next_key
+
+        items.extend(page_items)
+        if not next_key or evaluated >= READ_BUDGET:
+            return items, next_key
+        params["ExclusiveStartKey"] = next_key
+
+def add_user_emails(items):
+    """
+    Give the complaints routed before the email was stored with them their
+    customer's email from the container's cache. The cache looks up a
+    capped number of customers per request; complaints whose customer it
+    did not get to are returned without userEmail.
+    """
+    missing = [item for item in items if not item.get("userEmail")]
+    if not missing:
+        return
+    try:
+        emails = user_emails.prefetch(item["userId"] for item in missing)
+    except Exception as e:
+        logger.warning("Unable to fetch user emails: %s", str(e))
+        return
+    for item in missing:
+        if item["userId"] in emails:
+            item["userEmail"] = emails[item["userId"]]
@@ -1,15 +1,23 @@
 import json
 import os
-import boto3
 import logging
+from boto3.dynamodb.conditions import Key
+from dalscooter_runtime import clients
+from dalscooter_runtime.cursors import InvalidCursor, decode_cursor, encode_cursor
+from dalscooter_runtime.user_emails import EmailCache
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(os.environ["DYNAMODB_TABLE_NAME"])
+table = clients.table(os.environ["DYNAMODB_TABLE_NAME"])
+replies_table = clients.table(os.environ["REPLIES_TABLE"])
+cursor_secret = os.environ["CURSOR_SECRET"]
 
-cognito = boto3.client("cognito-idp")
+cognito = clients.client("cognito-idp")
+user_emails = EmailCache(cognito, os.environ["USER_POOL_ID"])
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
 
 def lambda_handler(event, context):
     logger.info("Event: %s", json.dumps(event))
@@ -21,6 +29,21 @@ def lambda_handler(event, context):
         is_franchise = "BikeFranchise" in groups
 
         complaint_id = event["pathParameters"]["id"]
+        query_params = event.get("queryStringParameters") or {}
+
+        try:
+            limit = min(max(int(query_params.get("limit", DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            return {"statusCode": 400, "body": json.dumps({"error": "limit must be a number"})}
+
+        cursor_scope = {"complaint": complaint_id}
+        start_key = None
+        if query_params.get("cursor"):
+            try:
+                start_key = decode_cursor(query_params["cursor"], cursor_scope, cursor_secret)
+            except InvalidCursor as e:
+                logger.warning("Rejected pagination cursor: %s", str(e))
+                return {"statusCode": 400, "body": json.dumps({"error": "Invalid pagination cursor"})}
 
         # Fetch the complaint by ID
         response = table.get_item(Key={"messageId": complaint_id})
@@ -33,21 +56,26 @@ def lambda_handler(event, context):
         if not (user_id == item["userId"] or user_id == item["assignedFranchiseId"]):
             return {"statusCode": 403, "body": json.dumps({"error": "Unauthorized to view this complaint."})}
 
-        # If the requester is the assigned franchise, fetch user email
+        # The assigned franchise sees who raised the complaint. Complaints
+        # routed since the email was stored with them carry it; older ones
+        # fall back to the container's Cognito cache
         if is_franchise and user_id == item["assignedFranchiseId"]:
-            try:
-                user_info = cognito.admin_get_user(
-                    UserPoolId=os.environ["USER_POOL_ID"],
-                    Username=item["userId"]
-                )
-                user_email = next(
-                    (attr["Value"] for attr in user_info["UserAttributes"] if attr["Name"] == "email"),
-                    None
-                )
-                item["userEmail"] = user_email
-            except Exception as e:
-                logger.warning("Unable to fetch user email: %s", str(e))
-        
+            if not item.get("userEmail"):
+                try:
+                    item["userEmail"] = user_emails.get(item["userId"])
+                except Exception as e:
+                    logger.warning("Unable to fetch user email: %s", str(e))
+        else:
+            item.pop("userEmail", None)
+
+        # Replies written before they moved to their own table are still in
+        # the complaint's responses list; they predate the rest of the
+        # thread, so they lead its first page
+        legacy = item.pop("responses", [])
+        responses, next_key = reply_page(complaint_id, limit, start_key)
+        item["responses"] = responses if start_key else legacy + responses
+        item["nextCursor"] = encode_cursor(next_key, cursor_scope, cursor_secret) if next_key else None
+
         return {
             "statusCode": 200,
             "body": json.dumps(item)
@@ -55,4 +83,19 @@ def lambda_handler(event, context):
 
     except Exception as e:
         logger.error("Error retrieving complaint thread: %s", str(e), exc_info=True)
-        return {"statusCode": 500, "body": json.dumps({"error": "Internal Server Error"})}
\ No newline at end of file
+        return {"statusCode": 500, "body": json.dumps({"error": "Internal Server Error"})}
+
+def reply_page(complaint_id, limit, start_key):
+    """One page of a complaint's replies, oldest first, and where the next begins"""
+    params = {
+        "KeyConditionExpression": Key("messageId").eq(complaint_id),
+        "Limit": limit
+    }
+    if start_key:
+        params["ExclusiveStartKey"] = start_key
+    response = replies_table.query(**params)
+    replies = [
+        {"responderId": reply["responderId"], "message": reply["message"], "timestamp": reply["timestamp"]}
+        for reply in response.get("Items", [])
+    ]
+    return replies, response.get("LastEvaluatedKey")
@@ -1,15 +1,25 @@
 import json
-import boto3
 import os
 import logging
+import random
+import time
+import uuid
 from datetime import datetime
-from boto3.dynamodb.conditions import Key
+from dalscooter_runtime import clients
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(os.environ["DYNAMODB_TABLE_NAME"])
+table_name = os.environ["DYNAMODB_TABLE_NAME"]
+replies_table = os.environ["REPLIES_TABLE"]
+load_table = os.environ["FRANCHISE_LOAD_TABLE"]
+table = clients.table(table_name)
+dynamodb = clients.client("dynamodb")
+
+# Attempts at a reply whose transaction conflicts with another write to the
+# complaint or the franchise's open-complaint count
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 0.05
 
 def lambda_handler(event, context):
     logger.info("Received event: %s", json.dumps(event))
@@ -31,38 +41,35 @@ def lambda_handler(event, context):
         if not reply_message:
             return {"statusCode": 400, "body": json.dumps({"error": "Missing reply message."})}
 
-        # Get complaint from DynamoDB
-        response = table.get_item(Key={"messageId": complaint_id})
-        complaint = response.get("Item")
+        # Each reply is its own item in the replies table, keyed so the
+        # thread reads back in order; the complaint itself only gets its
+        # status and lastReplyAt updated, so a reply costs the same however
+        # long the thread is and concurrent replies cannot overwrite each other
+        timestamp = datetime.utcnow().isoformat() + "Z"
+        reply = {
+            "messageId": {"S": complaint_id},
+            "replyKey": {"S": f"{timestamp}#{uuid.uuid4().hex[:8]}"},
+            "responderId": {"S": user_id},
+            "message": {"S": reply_message},
+            "timestamp": {"S": timestamp}
+        }
 
+        complaint = table.get_item(Key={"messageId": complaint_id}, ConsistentRead=True).get("Item")
         if not complaint:
             return {"statusCode": 404, "body": json.dumps({"error": "Complaint not found."})}
-
         if complaint.get("assignedFranchiseId") != user_id:
             return {"statusCode": 403, "body": json.dumps({"error": "You are not assigned to this complaint."})}
 
-        # Append new response
-        new_response = {
-            "responderId": user_id,
-            "message": reply_message,
-            "timestamp": datetime.utcnow().isoformat() + "Z"
-        }
-
-        updated_responses = complaint.get("responses", [])
-        updated_responses.append(new_response)
-
-        table.update_item(
-            Key={"messageId": complaint_id},
-            UpdateExpression="SET #r = :r, #s = :s",
-            ExpressionAttributeNames={
-                "#r": "responses",
-                "#s": "status"
-            },
-            ExpressionAttributeValues={
-                ":r": updated_responses,
-                ":s": "answered"
-            }
-        )
+        # The first answer also takes the complaint off the franchise's
+        # open-complaint count; later replies are stored without touching it
+        if not store_reply(complaint_id, user_id, reply, first_answer=complaint.get("status") != "answered"):
+            # Deleted or reassigned since it was read
+            complaint = table.get_item(Key={"messageId": complaint_id}, ConsistentRead=True).get("Item")
+            if not complaint:
+                return {"statusCode": 404, "body": json.dumps({"error": "Complaint not found."})}
+            if complaint.get("assignedFranchiseId") != user_id:
+                return {"statusCode": 403, "body": json.dumps({"error": "You are not assigned to this complaint."})}
+            raise RuntimeError(f"Reply to complaint {complaint_id} was not stored")
 
         return {
             "statusCode": 200,
@@ -74,4 +81,85 @@ def lambda_handler(event, context):
         return {
             "statusCode": 500,
             "body": json.dumps({"error": "Internal Server Error"})
-        }
\ No newline at end of file
+        }
+
+def store_reply(complaint_id, user_id, reply, first_answer):
+    """
+    Store ``reply`` and mark the complaint answered in one transaction,
+    conditional on the caller being its assigned franchise. With
+    ``first_answer``, also conditional on the complaint not being answered
+    yet, and the franchise's open-complaint count is decremented.
+
+    A transaction that conflicted with another write is tried again. If the
+    complaint was answered in the meantime, the reply is stored as a later
+    one; if the count is already zero, it is stored without the decrement.
+    Returns False if the complaint is no longer the caller's.
+    """
+    decrement = first_answer
+    attempt = 0
+    while True:
+        try:
+            dynamodb.transact_write_items(
+                TransactItems=reply_transaction(complaint_id, user_id, reply, first_answer, decrement)
+            )
+            return True
+        except dynamodb.exceptions.TransactionCanceledException as e:
+            codes = [reason.get("Code") for reason in e.response.get("CancellationReasons") or []]
+            if "TransactionConflict" in codes:
+                attempt += 1
+                if attempt >= MAX_ATTEMPTS:
+                    raise
+                time.sleep(random.uniform(0, RETRY_BASE_SECONDS * 2 ** attempt))
+            elif codes and codes[0] == "ConditionalCheckFailed":
+                if not first_answer:
+                    return False
+                logger.info("Complaint %s was answered concurrently", complaint_id)
+                first_answer = decrement = False
+            elif decrement and len(codes) > 2 and codes[2] == "ConditionalCheckFailed":
+                logger.warning("Open-complaint count of franchise %s is already zero", user_id)
+                decrement = False
+            else:
+                raise
+
+def reply_transaction(complaint_id, user_id, reply, first_answer, decrement):
+    condition = "#f = :me"
+    values = {
+        ":s": {"S": "answered"},
+        ":t": reply["timestamp"],
+        ":me": {"S": user_id}
+    }
+    if first_answer:
+        condition += " AND #s <> :s"
+    transact_items = [
+        {
+            "Update": {
+                "TableName": table_name,
+                "Key": {"messageId": {"S": complaint_id}},
+                "UpdateExpression": "SET #s = :s, #l = :t",
+                "ConditionExpression": condition,
+                "ExpressionAttributeNames": {
+                    "#s": "status",
+                    "#l": "lastReplyAt",
+                    "#f": "assignedFranchiseId"
+                },
+                "ExpressionAttributeValues": values
+            }
+        },
+        {
+            "Put": {
+                "TableName": replies_table,
+                "Item": reply
+            }
+        }
+    ]
+    if decrement:
+        transact_items.append({
+            "Update": {
+                "TableName": load_table,
+                "Key": {"franchiseId": {"S": user_id}},
+                "UpdateExpression": "ADD openComplaints :minus",
+                "ConditionExpression": "openComplaints > :zero",
+                "ExpressionAttributeValues": {":minus": {"N": "-1"}, ":zero": {"N": "0"}}
+            }
+        })
+    return transact_items
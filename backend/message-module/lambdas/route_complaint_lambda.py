@@ -1,55 +1,248 @@
 import json
-import boto3
 import os
 import random
-import uuid
+import time
 import logging
+from collections import Counter
 from datetime import datetime
+from botocore.exceptions import ClientError
+from boto3.dynamodb.types import TypeSerializer
+from dalscooter_runtime import clients
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-def lambda_handler(event, context):
-    logger.info("Received SNS event: %s", json.dumps(event))
+cognito = clients.client("cognito-idp")
+dynamodb = clients.client("dynamodb")
+table_name = os.environ["DYNAMODB_TABLE_NAME"]
+load_table = os.environ["FRANCHISE_LOAD_TABLE"]
+serializer = TypeSerializer()
+
+FRANCHISE_GROUP = "BikeFranchise"
+
+# Franchise accounts change rarely, so a warm container reuses the roster
+# for this long instead of listing the group per complaint
+ROSTER_CACHE_SECONDS = float(os.environ.get("ROSTER_CACHE_SECONDS", "300"))
+
+# Open-complaint counts are re-read this often; in between, the container
+# counts its own assignments on top of what it read
+LOAD_CACHE_SECONDS = float(os.environ.get("LOAD_CACHE_SECONDS", "15"))
+
+BATCH_GET_LIMIT = 100
+# Actions per TransactWriteItems call
+TRANSACT_LIMIT = 100
+RETRY_BASE_SECONDS = 0.05
+
+# (expiry, {franchise sub: email})
+_roster = None
+# (expiry, {franchise sub: open complaints})
+_loads = None
+
+def franchise_roster():
+    """Every member of the franchise group, following NextToken, cached for ROSTER_CACHE_SECONDS"""
+    global _roster
+    if _roster and _roster[0] > time.monotonic():
+        return _roster[1]
+
+    roster = {}
+    params = {"UserPoolId": os.environ["USER_POOL_ID"], "GroupName": FRANCHISE_GROUP, "Limit": 60}
+    while True:
+        response = cognito.list_users_in_group(**params)
+        for user in response["Users"]:
+            attributes = {attr["Name"]: attr["Value"] for attr in user["Attributes"]}
+            roster[attributes["sub"]] = attributes.get("email")
+        if not response.get("NextToken"):
+            break
+        params["NextToken"] = response["NextToken"]
+
+    logger.info("Loaded a roster of %d franchise user(s)", len(roster))
+    _roster = (time.monotonic() + ROSTER_CACHE_SECONDS, roster)
+    return roster
+
+def franchise_loads(roster):
+    """Open complaints per franchise in ``roster``, cached for LOAD_CACHE_SECONDS"""
+    global _loads
+    if _loads and _loads[0] > time.monotonic() and _loads[1].keys() == roster.keys():
+        return _loads[1]
+
+    loads = dict.fromkeys(roster, 0)
+    keys = [{"franchiseId": {"S": franchise_id}} for franchise_id in roster]
+    for first in range(0, len(keys), BATCH_GET_LIMIT):
+        pending = {load_table: {"Keys": keys[first:first + BATCH_GET_LIMIT]}}
+        attempt = 0
+        while pending:
+            response = dynamodb.batch_get_item(RequestItems=pending)
+            for item in response["Responses"].get(load_table, []):
+                loads[item["franchiseId"]["S"]] = int(item.get("openComplaints", {}).get("N", "0"))
+            pending = response.get("UnprocessedKeys") or {}
+            if pending:
+                attempt += 1
+                time.sleep(random.uniform(0, RETRY_BASE_SECONDS * 2 ** min(attempt, 6)))
+
+    _loads = (time.monotonic() + LOAD_CACHE_SECONDS, loads)
+    return loads
+
+def least_loaded(loads):
+    """A franchise with the fewest open complaints, ties broken at random"""
+    fewest = min(loads.values())
+    return random.choice([franchise_id for franchise_id, count in loads.items() if count == fewest])
 
+def assign(log_entry):
+    """
+    Store one complaint and count it against its franchise in one
+    transaction. Returns False if the complaint was already stored, as when
+    a message is delivered twice, in which case nothing is counted again.
+    """
     try:
-        message = json.loads(event["Records"][0]["Sns"]["Message"])
-        logger.info("Parsed message: %s", message)
+        dynamodb.transact_write_items(TransactItems=[complaint_put(log_entry)] + counter_updates([log_entry]))
+    except dynamodb.exceptions.TransactionCanceledException as e:
+        reasons = e.response.get("CancellationReasons") or []
+        if reasons and reasons[0].get("Code") == "ConditionalCheckFailed":
+            return False
+        raise
+    return True
 
-        cognito = boto3.client("cognito-idp")
-        dynamodb = boto3.resource("dynamodb")
-        table = dynamodb.Table(os.environ["DYNAMODB_TABLE_NAME"])
+def complaint_put(log_entry):
+    return {
+        "Put": {
+            "TableName": table_name,
+            "Item": {name: serializer.serialize(value) for name, value in log_entry.items()},
+            "ConditionExpression": "attribute_not_exists(messageId)"
+        }
+    }
+
+def counter_updates(log_entries):
+    """One ADD per franchise for the complaints of ``log_entries`` assigned to it"""
+    added = Counter(log_entry["assignedFranchiseId"] for log_entry in log_entries)
+    return [
+        {
+            "Update": {
+                "TableName": load_table,
+                "Key": {"franchiseId": {"S": franchise_id}},
+                "UpdateExpression": "ADD openComplaints :added",
+                "ExpressionAttributeValues": {":added": {"N": str(count)}}
+            }
+        }
+        for franchise_id, count in added.items()
+    ]
+
+def transaction_chunks(log_entries):
+    """
+    ``log_entries`` split into groups whose puts and counter updates fit in
+    one transaction
+    """
+    chunk, franchises = [], set()
+    for log_entry in log_entries:
+        franchise_id = log_entry["assignedFranchiseId"]
+        if len(chunk) + len(franchises | {franchise_id}) >= TRANSACT_LIMIT:
+            yield chunk
+            chunk, franchises = [], set()
+        chunk.append(log_entry)
+        franchises.add(franchise_id)
+    if chunk:
+        yield chunk
+
+def store_complaints(log_entries):
+    """
+    Store the complaints and their counter increments, as few transactions
+    as the transaction size allows. If a transaction is cancelled, which a
+    redelivered complaint already stored does, its complaints are stored
+    one at a time instead. Returns the messageIds that could not be stored,
+    and those that were already.
+    """
+    failed, stored_before = [], []
+    for chunk in transaction_chunks(log_entries):
+        try:
+            dynamodb.transact_write_items(
+                TransactItems=[complaint_put(log_entry) for log_entry in chunk] + counter_updates(chunk)
+            )
+            continue
+        except ClientError as e:
+            logger.warning("Storing %d complaint(s) together failed, storing them one at a time: %s",
+                           len(chunk), str(e))
+        for log_entry in chunk:
+            try:
+                if not assign(log_entry):
+                    logger.info("Complaint %s was already routed", log_entry["messageId"])
+                    stored_before.append(log_entry["messageId"])
+            except ClientError as e:
+                logger.error("Error storing complaint %s: %s", log_entry["messageId"], str(e))
+                failed.append(log_entry["messageId"])
+    return failed, stored_before
+
+def parse_complaint(record):
+    """The complaint message of an SQS record, raw or in an SNS envelope"""
+    message = json.loads(record["body"])
+    if message.get("Type") == "Notification" and "Message" in message:
+        message = json.loads(message["Message"])
+    for field in ("messageId", "bookingRef", "userId", "complaint"):
+        if field not in message:
+            raise ValueError(f"missing {field}")
+    return message
 
-        response = cognito.list_users_in_group(
-            UserPoolId=os.environ["USER_POOL_ID"],
-            GroupName="BikeFranchise"
-        )
-        franchise_users = response["Users"]
-        logger.info("Fetched franchise users: %s", franchise_users)
+def lambda_handler(event, context):
+    """
+    Route a batch of complaints from the complaint queue: assign each to the
+    least-loaded franchise and store them with batched transactional writes.
+    Returns the records that failed as batchItemFailures, so only those are
+    delivered again.
+    """
+    records = event.get("Records", [])
+    logger.info("Received %d complaint record(s)", len(records))
 
-        selected = random.choice(franchise_users)
-        logger.info("Selected franchise user: %s", selected)
+    failures = []
+    # messageId -> (complaint, the records that carry it); a complaint sent
+    # twice in one batch is routed once
+    complaints = {}
+    for record in records:
+        try:
+            message = parse_complaint(record)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.error("Unreadable complaint record %s: %s", record.get("messageId"), str(e))
+            failures.append(record["messageId"])
+            continue
+        complaints.setdefault(message["messageId"], (message, []))[1].append(record["messageId"])
+    if not complaints:
+        return {"batchItemFailures": [{"itemIdentifier": record_id} for record_id in failures]}
 
-        assignedFranchiseId = next(attr['Value'] for attr in selected['Attributes'] if attr['Name'] == 'sub')
-        assignedFranchiseEmail = next((attr['Value'] for attr in selected['Attributes'] if attr['Name'] == 'email'), None)
+    try:
+        roster = franchise_roster()
+        if not roster:
+            raise RuntimeError("No franchise users to route complaints to")
+        loads = franchise_loads(roster)
+    except Exception as e:
+        logger.error("Error loading the franchise roster: %s", str(e), exc_info=True)
+        failures.extend(record_id for _, record_ids in complaints.values() for record_id in record_ids)
+        return {"batchItemFailures": [{"itemIdentifier": record_id} for record_id in failures]}
 
+    timestamp = datetime.utcnow().isoformat() + "Z"
+    log_entries = []
+    for message, _ in complaints.values():
+        # Counted as soon as it is picked, so the batch spreads out
+        assignedFranchiseId = least_loaded(loads)
+        loads[assignedFranchiseId] += 1
         log_entry = {
             "messageId": message["messageId"],
             "bookingRef": message["bookingRef"],
             "userId": message["userId"],
             "complaint": message["complaint"],
             "assignedFranchiseId": assignedFranchiseId,
-            "assignedFranchiseEmail": assignedFranchiseEmail,
-            "timestampUTC": datetime.utcnow().isoformat() + "Z",
+            "assignedFranchiseEmail": roster[assignedFranchiseId],
+            "timestampUTC": timestamp,
             "status": "forwarded"
         }
+        # Complaints submitted before the email came with them have none
+        if message.get("userEmail"):
+            log_entry["userEmail"] = message["userEmail"]
+        log_entries.append(log_entry)
 
-        logger.info("Logging complaint to DynamoDB: %s", log_entry)
+    failed, stored_before = store_complaints(log_entries)
+    uncounted = set(failed) | set(stored_before)
+    for log_entry in log_entries:
+        if log_entry["messageId"] in uncounted:
+            loads[log_entry["assignedFranchiseId"]] -= 1
+    for message_id in failed:
+        failures.extend(complaints[message_id][1])
 
-        table.put_item(Item=log_entry)
-
-        return {"statusCode": 200}
-
-    except Exception as e:
-        logger.error("Error processing complaint: %s", str(e), exc_info=True)
-        return {"statusCode": 500}
\ No newline at end of file
+    logger.info("Routed %d complaint(s), %d failed", len(records) - len(failures), len(failures))
+    return {"batchItemFailures": [{"itemIdentifier": record_id} for record_id in failures]}
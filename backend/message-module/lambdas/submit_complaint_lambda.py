@@ -1,20 +1,22 @@
 import json
-import boto3
 import os
 import uuid
 import logging
+from dalscooter_runtime import clients
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+sns = clients.client("sns")
+
 def lambda_handler(event, context):
     logger.info("Received event: %s", json.dumps(event))
 
     try:
         body = json.loads(event["body"])
-        sns = boto3.client("sns")
 
-        user_id = event["requestContext"]["authorizer"]["jwt"]["claims"]["sub"]
+        claims = event["requestContext"]["authorizer"]["jwt"]["claims"]
+        user_id = claims["sub"]
         logger.info("Extracted userId from JWT: %s", user_id)
 
         message = {
@@ -23,6 +25,10 @@ def lambda_handler(event, context):
             "userId": user_id,
             "complaint": body["complaint"]
         }
+        # Stored with the complaint, so the franchise's view of it needs no
+        # Cognito lookup
+        if claims.get("email"):
+            message["userEmail"] = claims["email"]
 
         logger.info("Publishing message to SNS: %s", message)
 
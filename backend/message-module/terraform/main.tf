@@ -13,6 +13,76 @@ resource "aws_dynamodb_table" "complaint_logs" {
     name = "messageId"
     type = "S"
   }
+
+  attribute {
+    name = "userId"
+    type = "S"
+  }
+
+  attribute {
+    name = "assignedFranchiseId"
+    type = "S"
+  }
+
+  attribute {
+    name = "timestampUTC"
+    type = "S"
+  }
+
+  # GET /complaints: a customer's complaints, newest first
+  global_secondary_index {
+    name            = "UserComplaintsIndex"
+    hash_key        = "userId"
+    range_key       = "timestampUTC"
+    projection_type = "ALL"
+  }
+
+  # GET /complaints?role=franchise: a franchise's inbox, newest first
+  global_secondary_index {
+    name            = "FranchiseComplaintsIndex"
+    hash_key        = "assignedFranchiseId"
+    range_key       = "timestampUTC"
+    projection_type = "ALL"
+  }
+}
+
+# One item per complaint reply, in thread order, so a reply is a single
+# small write and the thread reads back a page at a time
+resource "aws_dynamodb_table" "complaint_replies" {
+  name         = "ComplaintReplies"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "messageId"
+  range_key    = "replyKey"
+
+  attribute {
+    name = "messageId"
+    type = "S"
+  }
+
+  attribute {
+    name = "replyKey"
+    type = "S"
+  }
+}
+
+# Open complaints per franchise user: route_complaint adds one when it
+# assigns a complaint and reply_complaint takes it off on the first answer
+resource "aws_dynamodb_table" "franchise_load" {
+  name         = "FranchiseComplaintLoad"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "franchiseId"
+
+  attribute {
+    name = "franchiseId"
+    type = "S"
+  }
+}
+
+# Key that signs the pagination cursors handed out by GET /complaints and
+# GET /complaints/{id}
+resource "random_password" "cursor_secret" {
+  length  = 48
+  special = false
 }
 
 data "archive_file" "submit_complaint_zip" {
@@ -24,6 +94,7 @@ data "archive_file" "submit_complaint_zip" {
 resource "aws_lambda_function" "submit_complaint" {
   function_name = "DALScooter_Submit_complaint_lambda"
   runtime       = "python3.12"
+  layers        = [var.runtime_layer_arn]
   handler       = "submit_complaint_lambda.lambda_handler"
   filename      = data.archive_file.submit_complaint_zip.output_path
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
@@ -45,6 +116,7 @@ data "archive_file" "route_complaint_zip" {
 resource "aws_lambda_function" "route_complaint" {
   function_name = "DALScooter_Route_complaint_lambda"
   runtime       = "python3.12"
+  layers        = [var.runtime_layer_arn]
   handler       = "route_complaint_lambda.lambda_handler"
   filename      = data.archive_file.route_complaint_zip.output_path
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
@@ -52,8 +124,9 @@ resource "aws_lambda_function" "route_complaint" {
 
   environment {
     variables = {
-      DYNAMODB_TABLE_NAME = aws_dynamodb_table.complaint_logs.name
-      USER_POOL_ID        = var.cognito_user_pool_id
+      DYNAMODB_TABLE_NAME  = aws_dynamodb_table.complaint_logs.name
+      FRANCHISE_LOAD_TABLE = aws_dynamodb_table.franchise_load.name
+      USER_POOL_ID         = var.cognito_user_pool_id
     }
   }
 }
@@ -67,6 +140,7 @@ data "archive_file" "get_complaints_zip" {
 resource "aws_lambda_function" "get_complaints" {
   function_name = "DALScooter_Get_complaints_lambda"
   runtime       = "python3.12"
+  layers        = [var.runtime_layer_arn]
   handler       = "get_complaints_lambda.lambda_handler"
   filename      = data.archive_file.get_complaints_zip.output_path
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
@@ -75,6 +149,8 @@ resource "aws_lambda_function" "get_complaints" {
   environment {
     variables = {
       DYNAMODB_TABLE_NAME = aws_dynamodb_table.complaint_logs.name
+      CURSOR_SECRET       = random_password.cursor_secret.result
+      USER_POOL_ID        = var.cognito_user_pool_id
     }
   }
 }
@@ -88,6 +164,7 @@ data "archive_file" "reply_complaint_zip" {
 resource "aws_lambda_function" "reply_complaint" {
   function_name = "DALScooter_Reply_complaint_lambda"
   runtime       = "python3.12"
+  layers        = [var.runtime_layer_arn]
   handler       = "reply_complaint_lambda.lambda_handler"
   filename      = data.archive_file.reply_complaint_zip.output_path
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
@@ -95,7 +172,9 @@ resource "aws_lambda_function" "reply_complaint" {
 
   environment {
     variables = {
-      DYNAMODB_TABLE_NAME = aws_dynamodb_table.complaint_logs.name
+      DYNAMODB_TABLE_NAME  = aws_dynamodb_table.complaint_logs.name
+      FRANCHISE_LOAD_TABLE = aws_dynamodb_table.franchise_load.name
+      REPLIES_TABLE        = aws_dynamodb_table.complaint_replies.name
     }
   }
 }
@@ -109,6 +188,7 @@ data "archive_file" "get_single_complaint_zip" {
 resource "aws_lambda_function" "get_single_complaint" {
   function_name = "DALScooter_Get_single_complaint_lambda"
   runtime       = "python3.12"
+  layers        = [var.runtime_layer_arn]
   handler       = "get_single_complaint_lambda.lambda_handler"
   filename      = data.archive_file.get_single_complaint_zip.output_path
   role          = "arn:aws:iam::${data.aws_caller_identity.current.account_id}:role/LabRole"
@@ -117,23 +197,66 @@ resource "aws_lambda_function" "get_single_complaint" {
   environment {
     variables = {
       DYNAMODB_TABLE_NAME = aws_dynamodb_table.complaint_logs.name
+      REPLIES_TABLE       = aws_dynamodb_table.complaint_replies.name
+      CURSOR_SECRET       = random_password.cursor_secret.result
       USER_POOL_ID        = var.cognito_user_pool_id
     }
   }
 }
 
-resource "aws_sns_topic_subscription" "lambda_sub" {
-  topic_arn = aws_sns_topic.complaint_topic.arn
-  protocol  = "lambda"
-  endpoint  = aws_lambda_function.route_complaint.arn
+# Complaints reach the router through a queue, so it takes them in batches
+# and only the ones that fail are delivered again; after five failed
+# receives a complaint moves to the dead-letter queue
+resource "aws_sqs_queue" "complaint_routing_dlq" {
+  name                      = "DALScooterComplaintRoutingDLQ"
+  message_retention_seconds = 1209600
 }
 
-resource "aws_lambda_permission" "allow_sns" {
-  statement_id  = "AllowExecutionFromSNS"
-  action        = "lambda:InvokeFunction"
-  function_name = aws_lambda_function.route_complaint.function_name
-  principal     = "sns.amazonaws.com"
-  source_arn    = aws_sns_topic.complaint_topic.arn
+resource "aws_sqs_queue" "complaint_routing" {
+  name                       = "DALScooterComplaintRouting"
+  visibility_timeout_seconds = 360
+  message_retention_seconds  = 345600
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.complaint_routing_dlq.arn
+    maxReceiveCount     = 5
+  })
+}
+
+resource "aws_sns_topic_subscription" "routing_queue_sub" {
+  topic_arn            = aws_sns_topic.complaint_topic.arn
+  protocol             = "sqs"
+  endpoint             = aws_sqs_queue.complaint_routing.arn
+  raw_message_delivery = true
+}
+
+resource "aws_sqs_queue_policy" "allow_sns_to_routing_queue" {
+  queue_url = aws_sqs_queue.complaint_routing.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect    = "Allow"
+        Principal = "*"
+        Action    = "sqs:SendMessage"
+        Resource  = aws_sqs_queue.complaint_routing.arn
+        Condition = {
+          ArnEquals = {
+            "aws:SourceArn" = aws_sns_topic.complaint_topic.arn
+          }
+        }
+      }
+    ]
+  })
+}
+
+resource "aws_lambda_event_source_mapping" "route_complaint_queue" {
+  event_source_arn                   = aws_sqs_queue.complaint_routing.arn
+  function_name                      = aws_lambda_function.route_complaint.arn
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 5
+  function_response_types            = ["ReportBatchItemFailures"]
 }
 
 # --- HTTP API Gateway ---
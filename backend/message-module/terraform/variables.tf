@@ -11,4 +11,9 @@ variable "cognito_user_pool_id" {
 variable "cognito_user_pool_client_id" {
   description = "User Pool Client ID"
   type        = string
-}
\ No newline at end of file
+}
+
+variable "runtime_layer_arn" {
+  description = "ARN of the shared DALScooter runtime layer"
+  type        = string
+}
@@ -0,0 +1,3 @@
+"""
+Runtime shared by the DALScooter lambdas of every module, deployed as a Lambda layer.
+"""
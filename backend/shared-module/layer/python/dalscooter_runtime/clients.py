@@ -0,0 +1,105 @@
+"""
+AWS clients built once per container, on first use.
+
+Creating a boto3 client or resource loads and parses the service model,
+which is a large share of a handler's cold start. Handlers still declare
+their clients at module level:
+
+    dynamodb = clients.client('dynamodb')
+    table = clients.table(os.environ['DYNAMODB_TABLE'])
+
+but each one is only built the first time one of its methods is called, so
+a request rejected by validation never pays for a client it does not use,
+and every later invocation in the container reuses the same instance.
+Handlers in one process that declare the same client share it.
+"""
+import threading
+
+import boto3
+
+_built = {}
+# Re-entrant: building a table builds the shared resource first
+_lock = threading.RLock()
+
+
+class LazyClient:
+    """
+    Stands in for a boto3 client, resource or table and builds it on first
+    attribute access
+    """
+    __slots__ = ('_key', '_build')
+
+    def __init__(self, key, build):
+        self._key = key
+        self._build = build
+
+    def get(self):
+        """
+        The underlying client, building it if this container has not yet
+        """
+        try:
+            return _built[self._key]
+        except KeyError:
+            pass
+        with _lock:
+            if self._key not in _built:
+                _built[self._key] = self._build()
+            return _built[self._key]
+
+    @property
+    def built(self):
+        return self._key in _built
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __repr__(self):
+        state = 'built' if self.built else 'not built'
+        return f'<LazyClient {self._key[1]}:{self._key[2]} ({state})>'
+
+
+def _key(factory, kind, name, kwargs):
+    # The factory is part of the key so clients built against different
+    # boto3 stand-ins in one process stay apart
+    return (factory, kind, name, tuple(sorted(kwargs.items())))
+
+
+def client(service_name, **kwargs):
+    """
+    A boto3 client for ``service_name``, built on first use
+    """
+    factory = boto3.client
+    return LazyClient(
+        _key(factory, 'client', service_name, kwargs),
+        lambda: factory(service_name, **kwargs)
+    )
+
+
+def resource(service_name, **kwargs):
+    """
+    A boto3 resource for ``service_name``, built on first use
+    """
+    factory = boto3.resource
+    return LazyClient(
+        _key(factory, 'resource', service_name, kwargs),
+        lambda: factory(service_name, **kwargs)
+    )
+
+
+def table(table_name):
+    """
+    A DynamoDB resource ``Table``, built with the shared resource on first use
+    """
+    dynamodb = resource('dynamodb')
+    return LazyClient(
+        dynamodb._key + ('table', table_name),
+        lambda: dynamodb.get().Table(table_name)
+    )
+
+
+def reset():
+    """
+    Forget every built client, as a new container would
+    """
+    with _lock:
+        _built.clear()
@@ -0,0 +1,59 @@
+"""
+Opaque, signed pagination cursors.
+
+A cursor wraps a DynamoDB ``LastEvaluatedKey`` together with the scope of the
+listing it continues (whose bookings, which bike type, which filters) and is
+signed with HMAC-SHA256. Clients can neither forge a key into someone else's partition
+nor replay a cursor against a different query.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _sign(payload, secret):
+    return hmac.new(secret.encode('utf-8'), payload, hashlib.sha256).digest()
+
+
+def encode_cursor(last_key, scope, secret):
+    """
+    Wrap a LastEvaluatedKey for the listing described by ``scope`` (a JSON
+    serialisable dict) into a URL-safe token
+    """
+    payload = json.dumps({'k': last_key, 's': scope}, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload, secret))}"
+
+
+def decode_cursor(cursor, scope, secret):
+    """
+    Return the LastEvaluatedKey inside ``cursor``, raising InvalidCursor if it
+    was tampered with or belongs to a listing other than ``scope``
+    """
+    try:
+        encoded_payload, encoded_signature = cursor.split('.')
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except (ValueError, binascii.Error):
+        raise InvalidCursor('Malformed cursor')
+
+    if not hmac.compare_digest(signature, _sign(payload, secret)):
+        raise InvalidCursor('Cursor signature does not match')
+
+    data = json.loads(payload)
+    if data.get('s') != json.loads(json.dumps(scope)):
+        raise InvalidCursor('Cursor belongs to a different query')
+    return data['k']
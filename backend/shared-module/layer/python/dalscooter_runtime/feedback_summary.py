@@ -0,0 +1,90 @@
+"""
+Per-model and per-bike feedback aggregates.
+
+A summary item holds counters for one model or one bike: how much feedback
+it has, how many of those carried a numeric rating and their sum, and how
+many were Positive, Negative and Neutral. submit_feedback_lambda adds each
+feedback to its summaries in the transaction that stores it, so a
+summary is one GetItem however much feedback there is, and
+rebuild_feedback_summary_lambda recomputes them from the feedback table.
+"""
+from decimal import Decimal, InvalidOperation
+
+SENTIMENTS = ('Positive', 'Negative', 'Neutral')
+
+# Feedback attributes summarized, and the query parameter naming each
+SCOPES = ('model', 'bikeId')
+
+COUNTERS = ('feedbackCount', 'ratingCount', 'ratingSum') + SENTIMENTS
+
+
+def summary_key(scope, value):
+    return f'{scope}#{value}'
+
+
+def summary_keys(feedback):
+    """``(scope, value)`` of each summary ``feedback`` counts towards"""
+    return [(scope, feedback[scope]) for scope in SCOPES if feedback.get(scope)]
+
+
+def rating_value(rating):
+    """A stored rating as a number, or None if there is none or it is not numeric"""
+    if rating is None:
+        return None
+    try:
+        value = Decimal(str(rating))
+    except InvalidOperation:
+        return None
+    return value if value.is_finite() else None
+
+
+def increments(feedback):
+    """What ``feedback`` adds to each of its summaries' counters"""
+    added = {'feedbackCount': 1}
+    if feedback.get('sentiment') in SENTIMENTS:
+        added[feedback['sentiment']] = 1
+    rating = rating_value(feedback.get('rating'))
+    if rating is not None:
+        added['ratingCount'] = 1
+        added['ratingSum'] = rating
+    return added
+
+
+def add_update(table_name, scope, value, added):
+    """
+    A TransactWriteItems Update adding ``added`` to the summary of
+    ``scope`` ``value``, creating it if needed
+    """
+    names = {'#scope': 'scope', '#value': 'value'}
+    values = {':scope': {'S': scope}, ':value': {'S': value}}
+    additions = []
+    for i, (counter, amount) in enumerate(sorted(added.items())):
+        names[f'#c{i}'] = counter
+        values[f':c{i}'] = {'N': str(amount)}
+        additions.append(f'#c{i} :c{i}')
+    return {
+        'Update': {
+            'TableName': table_name,
+            'Key': {'summaryKey': {'S': summary_key(scope, value)}},
+            'UpdateExpression': 'SET #scope = :scope, #value = :value ADD ' + ', '.join(additions),
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values
+        }
+    }
+
+
+def describe(scope, value, item):
+    """
+    The response for a summary item as the resource API returns it, or for
+    no feedback at all when ``item`` is None
+    """
+    item = item or {}
+    rating_count = int(item.get('ratingCount', 0))
+    rating_sum = Decimal(item.get('ratingSum', 0))
+    return {
+        scope: value,
+        'feedbackCount': int(item.get('feedbackCount', 0)),
+        'ratingCount': rating_count,
+        'averageRating': round(float(rating_sum / rating_count), 2) if rating_count else None,
+        'sentiment': {sentiment: int(item.get(sentiment, 0)) for sentiment in SENTIMENTS}
+    }
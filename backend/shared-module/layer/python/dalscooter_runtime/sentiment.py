@@ -0,0 +1,148 @@
+"""
+Lexicon-based sentiment scoring of feedback comments.
+
+A ``Scorer`` is built once, at import, from a weighted lexicon of words and
+short phrases. Scoring tokenizes the comment with one regular expression
+and looks each word up in a dict, and the phrases ending at it when it ends
+any, so the cost grows with the comment's length and not with the
+lexicon's size.
+Whole words only match: "goodbye" is not "good". A negation ("not",
+"never", "isn't", ...) flips the weight of sentiment terms in the next
+``NEGATION_SCOPE`` words of its clause, so "not good" counts against.
+
+The lexicon is ``DEFAULT_LEXICON`` unless ``SENTIMENT_LEXICON`` names a file
+of ``term<TAB>weight`` lines, which replaces it.
+"""
+import os
+import re
+
+DEFAULT_LEXICON = {
+    'good': 1.0, 'great': 1.5, 'excellent': 2.0, 'awesome': 2.0, 'love': 2.0, 'loved': 2.0,
+    'nice': 1.0, 'happy': 1.5, 'smooth': 1.0, 'comfortable': 1.0, 'fast': 0.5, 'easy': 1.0,
+    'clean': 0.5, 'reliable': 1.5, 'perfect': 2.0, 'amazing': 2.0, 'fantastic': 2.0, 'fun': 1.0,
+    'recommend': 1.5, 'friendly': 1.0, 'helpful': 1.0, 'quiet': 0.5, 'worth it': 1.5,
+    'lasted all day': 1.5, 'well maintained': 1.5,
+    'bad': -1.0, 'poor': -1.0, 'terrible': -2.0, 'hate': -2.0, 'worst': -2.0, 'awful': -2.0,
+    'disappointed': -1.5, 'disappointing': -1.5, 'broken': -2.0, 'dirty': -1.0, 'slow': -0.5,
+    'uncomfortable': -1.0, 'dangerous': -2.0, 'unsafe': -2.0, 'noisy': -0.5, 'expensive': -0.5,
+    'overpriced': -1.0, 'rude': -1.5, 'useless': -2.0, 'flat': -1.0, 'died': -1.5, 'stuck': -1.0,
+    'rip off': -2.0, 'waste of money': -2.0, 'ran out': -1.0, 'not working': -2.0,
+}
+
+NEGATIONS = frozenset((
+    'not', 'no', 'never', 'nothing', 'hardly', 'barely', 'without', 'neither', 'nor',
+    "isn't", "wasn't", "aren't", "weren't", "don't", "doesn't", "didn't", "won't", "wouldn't",
+    "can't", "couldn't", "shouldn't", 'cannot', 'isnt', 'wasnt', 'dont', 'doesnt', 'didnt', 'cant',
+))
+
+# Words after a negation whose sentiment it flips, within the clause
+NEGATION_SCOPE = 3
+
+# Words, or punctuation that ends a clause
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|[.!?;,]")
+_CLAUSE_END = frozenset('.!?;,')
+
+
+class Scorer:
+    """
+    A compiled lexicon. ``score`` gives a comment's summed weight and
+    ``label`` its Positive/Negative/Neutral class; ``label_many`` classifies
+    a batch of comments in one call.
+    """
+
+    def __init__(self, lexicon, threshold=0.0):
+        self.threshold = threshold
+        self._words = {}
+        self._phrases = {}
+        self._longest = 1
+        for term, weight in lexicon.items():
+            words = tuple(_TOKEN.findall(term.lower()))
+            if not words or weight == 0:
+                continue
+            if len(words) == 1:
+                self._words[words[0]] = float(weight)
+            else:
+                self._phrases[words] = float(weight)
+                self._longest = max(self._longest, len(words))
+        # Last words of phrases: only these need the phrase lookups
+        self._phrase_ends = frozenset(words[-1] for words in self._phrases)
+        self.size = len(self._words) + len(self._phrases)
+
+    @classmethod
+    def from_file(cls, path, threshold=0.0):
+        """A scorer for a file of ``term<TAB>weight`` lines; ``#`` starts a comment"""
+        lexicon = {}
+        with open(path, encoding='utf-8') as lines:
+            for number, line in enumerate(lines, 1):
+                line = line.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                term, _, weight = line.rpartition('\t')
+                try:
+                    lexicon[term] = float(weight)
+                except ValueError:
+                    raise ValueError(f'{path}:{number}: expected "term<TAB>weight"')
+        return cls(lexicon, threshold)
+
+    def scores(self, texts):
+        """Summed weights of ``texts``, in order"""
+        words = self._words
+        phrases = self._phrases
+        phrase_ends = self._phrase_ends
+        longest = self._longest
+        tokenize = _TOKEN.findall
+        scope = NEGATION_SCOPE
+        results = []
+        for text in texts:
+            window = []
+            # Position of the clause's last negation word
+            negation = -scope - 1
+            total = 0.0
+            position = 0
+            for token in tokenize(text.lower()):
+                if token in _CLAUSE_END:
+                    window.clear()
+                    negation = -scope - 1
+                    continue
+                position += 1
+                window.append(token)
+                if len(window) > longest:
+                    del window[0]
+                # The longest term ending at this word counts, so "not
+                # working" is one term rather than a negation of "working"
+                weight = None
+                first = position
+                if token in phrase_ends:
+                    for start in range(len(window) - 1):
+                        weight = phrases.get(tuple(window[start:]))
+                        if weight is not None:
+                            first = position - len(window) + start + 1
+                            break
+                if weight is None:
+                    weight = words.get(token)
+                if weight is not None:
+                    total += -weight if negation < first <= negation + scope else weight
+                if token in NEGATIONS:
+                    negation = position
+            results.append(total)
+        return results
+
+    def score(self, text):
+        return self.scores((text,))[0]
+
+    def label_many(self, texts):
+        """Labels of ``texts``, in order"""
+        threshold = self.threshold
+        return [
+            'Positive' if score > threshold else 'Negative' if score < -threshold else 'Neutral'
+            for score in self.scores(texts)
+        ]
+
+    def label(self, text):
+        return self.label_many((text,))[0]
+
+
+def default_scorer():
+    """The scorer configured by the environment"""
+    path = os.environ.get('SENTIMENT_LEXICON')
+    return Scorer.from_file(path) if path else Scorer(DEFAULT_LEXICON)
@@ -0,0 +1,47 @@
+"""
+Battery telemetry history, kept as a compact ring buffer per bike.
+
+Each reading packs into five bytes: the report time in epoch seconds
+(big-endian, so packed readings sort by time) and the battery level. A
+bike's history is one binary attribute holding its most recent readings,
+oldest first, which stays under a kilobyte and so one write unit.
+"""
+import struct
+from datetime import datetime, timezone
+
+_READING = struct.Struct('>IB')
+READING_SIZE = _READING.size
+
+
+def parse_time(value):
+    """Epoch seconds of an ISO 8601 timestamp or a number of seconds"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def format_time(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def pack(readings):
+    """``(epoch, level)`` pairs as bytes"""
+    return b''.join(_READING.pack(epoch, level) for epoch, level in readings)
+
+
+def unpack(data):
+    """The ``(epoch, level)`` pairs in packed ``data``"""
+    return [_READING.unpack_from(data, offset) for offset in range(0, len(data) - READING_SIZE + 1, READING_SIZE)]
+
+
+def merge(history, readings, capacity):
+    """
+    Packed ``history`` with ``readings`` added: one reading per second,
+    oldest first, keeping only the newest ``capacity``
+    """
+    by_time = dict(unpack(history))
+    by_time.update(readings)
+    return pack(sorted(by_time.items())[-capacity:])
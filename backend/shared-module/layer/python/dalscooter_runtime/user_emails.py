@@ -0,0 +1,116 @@
+"""
+Email addresses of Cognito users, by sub, cached per container.
+
+Records written since the email was stored with them (complaints, the users
+table) carry it already; this covers the records that predate that. A warm
+container asks Cognito about a user at most once every ``max_age`` seconds,
+and a caller that needs several addresses at once prefetches them:
+
+    emails = EmailCache(clients.client('cognito-idp'), os.environ['USER_POOL_ID'])
+    emails.prefetch(item['userId'] for item in items)
+    email = emails.get(item['userId'])
+
+Each unknown user is one AdminGetUser, a few at a time, and a prefetch looks
+up at most ``max_lookups`` of them, so a page of old records costs a bounded
+number of Cognito calls however large the pool is. Users that are not found
+are remembered too, as ``None``, so a deleted account does not cost a
+Cognito call per request.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+CACHE_SECONDS = float(os.environ.get('USER_EMAIL_CACHE_SECONDS', '900'))
+
+# Most users one prefetch looks up; the rest are left for a later request
+MAX_LOOKUPS = int(os.environ.get('USER_EMAIL_MAX_LOOKUPS', '10'))
+# AdminGetUser calls in flight at once
+LOOKUP_WORKERS = 4
+
+
+def email_of(attributes):
+    """The email in a Cognito ``Attributes`` or ``UserAttributes`` list"""
+    return next((attr['Value'] for attr in attributes if attr['Name'] == 'email'), None)
+
+
+class EmailCache:
+    def __init__(self, cognito, user_pool_id, max_age=CACHE_SECONDS, max_lookups=MAX_LOOKUPS,
+                 clock=time.monotonic):
+        self._cognito = cognito
+        self._user_pool_id = user_pool_id
+        self._max_age = max_age
+        self._max_lookups = max_lookups
+        self._clock = clock
+        # sub -> (expiry, email or None)
+        self._emails = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, user_id, now):
+        entry = self._emails.get(user_id)
+        if entry and entry[0] > now:
+            return True, entry[1]
+        return False, None
+
+    def _remember(self, emails):
+        expiry = self._clock() + self._max_age
+        with self._lock:
+            for user_id, email in emails.items():
+                self._emails[user_id] = (expiry, email)
+
+    def get(self, user_id):
+        """
+        The email of the user ``user_id``, or None if Cognito has no such
+        user, the user has no email or the lookup failed
+        """
+        return self.prefetch([user_id]).get(user_id)
+
+    def prefetch(self, user_ids):
+        """
+        Look up the users of ``user_ids`` not cached yet, up to the lookup
+        cap, and return the emails known for them. Users past the cap, or
+        whose lookup failed, are left out.
+        """
+        now = self._clock()
+        emails, missing = {}, []
+        with self._lock:
+            for user_id in dict.fromkeys(user_ids):
+                found, email = self._cached(user_id, now)
+                if found:
+                    emails[user_id] = email
+                else:
+                    missing.append(user_id)
+        if not missing:
+            return emails
+
+        if len(missing) > self._max_lookups:
+            logger.info('Looking up %d of %d uncached user(s)', self._max_lookups, len(missing))
+            missing = missing[:self._max_lookups]
+        if len(missing) == 1:
+            fetched = dict([self._get(missing[0])])
+        else:
+            with ThreadPoolExecutor(max_workers=min(LOOKUP_WORKERS, len(missing))) as pool:
+                fetched = dict(pool.map(self._get, missing))
+        fetched = {user_id: email for user_id, email in fetched.items() if email is not _FAILED}
+        self._remember(fetched)
+        emails.update(fetched)
+        return emails
+
+    def _get(self, user_id):
+        try:
+            user = self._cognito.admin_get_user(UserPoolId=self._user_pool_id, Username=user_id)
+        except self._cognito.exceptions.UserNotFoundException:
+            logger.warning('No Cognito user %s', user_id)
+            return user_id, None
+        except Exception as e:
+            # Throttled or unavailable: not cached, so the next request tries again
+            logger.warning('Unable to look up Cognito user %s: %s', user_id, str(e))
+            return user_id, _FAILED
+        return user_id, email_of(user['UserAttributes'])
+
+
+# Marks a lookup that failed, as opposed to a user without an email
+_FAILED = object()
@@ -0,0 +1,13 @@
+# Runtime layer shared by the lambdas of every module
+data "archive_file" "dalscooter_runtime_layer_zip" {
+  type        = "zip"
+  source_dir  = "${path.module}/../layer"
+  output_path = "${path.module}/../dalscooter_runtime_layer.zip"
+}
+
+resource "aws_lambda_layer_version" "dalscooter_runtime" {
+  layer_name          = "DALScooterRuntime"
+  filename            = data.archive_file.dalscooter_runtime_layer_zip.output_path
+  source_code_hash    = data.archive_file.dalscooter_runtime_layer_zip.output_base64sha256
+  compatible_runtimes = ["python3.9", "python3.11", "python3.12"]
+}
@@ -0,0 +1,3 @@
+output "runtime_layer_arn" {
+  value = aws_lambda_layer_version.dalscooter_runtime.arn
+}
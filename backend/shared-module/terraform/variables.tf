@@ -0,0 +1,4 @@
+variable "aws_region" {
+  description = "AWS region for deployment"
+  type        = string
+}
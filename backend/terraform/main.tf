@@ -2,10 +2,17 @@ provider "aws" {
   region = var.aws_region
 }
 
+# Shared runtime layer used by the lambdas of every module
+module "shared_module" {
+  source     = "../shared-module/terraform"
+  aws_region = var.aws_region
+}
+
 # Auth Module
 module "auth_module" {
-  source     = "../auth-module/terraform"
-  aws_region = var.aws_region
+  source            = "../auth-module/terraform"
+  aws_region        = var.aws_region
+  runtime_layer_arn = module.shared_module.runtime_layer_arn
 }
 
 module "amplify_deploy" {
@@ -28,6 +35,7 @@ module "bike_module" {
   aws_region                = var.aws_region
   cognito_user_pool_id      = module.auth_module.user_pool_id
   cognito_user_pool_client_id = module.auth_module.user_pool_client_id
+  runtime_layer_arn           = module.shared_module.runtime_layer_arn
 }
 
 # Feedback Module
@@ -36,6 +44,7 @@ module "feedback_module" {
   aws_region                    = var.aws_region
   cognito_user_pool_id          = module.auth_module.user_pool_id
   cognito_user_pool_client_id   = module.auth_module.user_pool_client_id
+  runtime_layer_arn             = module.shared_module.runtime_layer_arn
 }
 
 module "message_module" {
@@ -43,6 +52,7 @@ module "message_module" {
   aws_region                    = var.aws_region
   cognito_user_pool_id          = module.auth_module.user_pool_id
   cognito_user_pool_client_id   = module.auth_module.user_pool_client_id
+  runtime_layer_arn             = module.shared_module.runtime_layer_arn
 }
 
 # Booking Module
@@ -52,4 +62,5 @@ module "booking_module" {
   cognito_user_pool_id          = module.auth_module.user_pool_id
   cognito_user_pool_client_id   = module.auth_module.user_pool_client_id
   sns_topic_arn                 = module.auth_module.sns_topic_arn
+  runtime_layer_arn             = module.shared_module.runtime_layer_arn
 }
\ No newline at end of file